@@ -9,15 +9,26 @@ class ApiConfig(AppConfig):
         print("[APP] ========== ApiConfig.ready() APPELE ==========")
 
         try:
-            from django.db.models.signals import pre_save, post_save, post_delete
+            from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
             from api.models import (
                 Site, SousSite,
                 Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
                 Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon,
             )
+            from api_planification.models import Tache, DistributionCharge
+            from api_reclamations.models import Reclamation, SatisfactionClient
             from api.signals import (
                 site_pre_save, site_post_save,
-                invalidate_gis_object_cache, invalidate_site_cache,
+                gis_object_pre_save, invalidate_gis_object_cache, invalidate_site_cache,
+                invalidate_reclamation_map_cache, reclamation_map_pre_save,
+                kpi_tache_pre_save, kpi_tache_changed, kpi_tache_objets_changed,
+                kpi_distribution_pre_save, kpi_distribution_changed,
+                kpi_reclamation_pre_save, kpi_reclamation_changed,
+                kpi_satisfaction_changed,
+                search_index_site_pre_save, search_index_site_saved, search_index_soussite_saved,
+                search_index_soussite_pre_delete, search_index_soussite_deleted,
+                search_index_objet_saved, search_index_objet_deleted,
+                inventory_facets_changed,
             )
 
             # Signals existants — notifications superviseur
@@ -35,9 +46,47 @@ class ApiConfig(AppConfig):
                 Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon,
             ]
             for model in gis_models:
+                pre_save.connect(gis_object_pre_save, sender=model)
                 post_save.connect(invalidate_gis_object_cache, sender=model)
                 post_delete.connect(invalidate_gis_object_cache, sender=model)
 
+            # Index de recherche unifié (IndexRecherche)
+            pre_save.connect(search_index_site_pre_save, sender=Site)
+            post_save.connect(search_index_site_saved, sender=Site)
+            post_save.connect(search_index_soussite_saved, sender=SousSite)
+            pre_delete.connect(search_index_soussite_pre_delete, sender=SousSite)
+            post_delete.connect(search_index_soussite_deleted, sender=SousSite)
+            for model in gis_models:
+                post_save.connect(search_index_objet_saved, sender=model)
+                post_delete.connect(search_index_objet_deleted, sender=model)
+
+            # Facettes de l'inventaire (FacetteInventaire) — recalcul des (type, site) touchés
+            for model in gis_models:
+                post_save.connect(inventory_facets_changed, sender=model)
+                post_delete.connect(inventory_facets_changed, sender=model)
+
+            # Invalidation du cache carte — couche réclamations (par site)
+            pre_save.connect(reclamation_map_pre_save, sender=Reclamation)
+            post_save.connect(invalidate_reclamation_map_cache, sender=Reclamation)
+            post_delete.connect(invalidate_reclamation_map_cache, sender=Reclamation)
+
+            # Cumuls mensuels des KPIs (KPIMensuel) — recalcul des (mois, site) touchés
+            kpi_handlers = [
+                (Tache, kpi_tache_pre_save, kpi_tache_changed),
+                (DistributionCharge, kpi_distribution_pre_save, kpi_distribution_changed),
+                (Reclamation, kpi_reclamation_pre_save, kpi_reclamation_changed),
+                (SatisfactionClient, None, kpi_satisfaction_changed),
+            ]
+            for model, pre_handler, handler in kpi_handlers:
+                if pre_handler:
+                    pre_save.connect(pre_handler, sender=model)
+                post_save.connect(handler, sender=model)
+                post_delete.connect(handler, sender=model)
+
+            # Objets d'une tâche liés après sa sauvegarde (objets.set()) :
+            # KPIs et rapports des sites ajoutés / retirés
+            m2m_changed.connect(kpi_tache_objets_changed, sender=Tache.objets.through)
+
             print("[APP] Signals + cache invalidation connectes")
         except Exception as e:
             print(f"[APP] ERREUR lors de la connexion des signals: {e}")
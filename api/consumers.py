@@ -133,18 +133,26 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
                 'notification': notification,
             })
 
+    async def notification_batch(self, event):
+        """
+        Handler pour plusieurs notifications fusionnées en un message
+        (api/services/ws_fanout.py) : une trame par notification.
+        """
+        for notification in event.get('notifications', []):
+            await self.send_json({
+                'type': 'new_notification',
+                'notification': notification,
+            })
+
     # =========================================================================
     # METHODES DATABASE
     # =========================================================================
 
     @database_sync_to_async
     def get_unread_count(self):
-        """Retourne le nombre de notifications non lues."""
-        from api.models import Notification
-        return Notification.objects.filter(
-            destinataire=self.user,
-            lu=False
-        ).count()
+        """Retourne le nombre de notifications non lues (compteur Redis)."""
+        from api.services.unread_counters import get_unread_count
+        return get_unread_count(self.user.id)
 
     @database_sync_to_async
     def get_unread_notifications(self):
@@ -182,4 +190,7 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             lu=False
         ).update(lu=True, date_lecture=timezone.now())
 
+        from api.services.unread_counters import all_read
+        all_read(self.user.id)
+
         return count
\ No newline at end of file
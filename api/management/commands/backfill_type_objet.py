@@ -0,0 +1,52 @@
+"""
+Commande Django : Renseigne la colonne Objet.type_objet pour les objets existants.
+
+Les nouveaux objets sont typés automatiquement à la sauvegarde ; cette commande
+rattrape les lignes créées avant l'ajout de la colonne (ou via des imports SQL).
+Une requête UPDATE par type (15 au total), quel que soit le volume.
+
+Usage:
+    python manage.py backfill_type_objet
+    python manage.py backfill_type_objet --dry-run
+"""
+from django.core.management.base import BaseCommand
+
+from api.models import Objet, OBJET_TYPE_MODELS
+
+
+class Command(BaseCommand):
+    help = "Renseigne le type réel (type_objet) des objets GIS existants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche le nombre d\'objets à mettre à jour sans rien modifier',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        total = 0
+
+        for type_name, Model in OBJET_TYPE_MODELS.items():
+            to_update = Objet.objects.filter(
+                pk__in=Model.objects.values('pk')
+            ).exclude(type_objet=type_name)
+
+            if dry_run:
+                count = to_update.count()
+            else:
+                count = to_update.update(type_objet=type_name)
+
+            if count:
+                self.stdout.write(f"{type_name}: {count} objet(s)")
+            total += count
+
+        orphans = Objet.objects.filter(type_objet='').count() if not dry_run else None
+        if orphans:
+            self.stdout.write(self.style.WARNING(
+                f"{orphans} objet(s) sans table enfant (type_objet vide)"
+            ))
+
+        verb = "à mettre à jour" if dry_run else "mis à jour"
+        self.stdout.write(self.style.SUCCESS(f"\nTotal: {total} objet(s) {verb}"))
@@ -0,0 +1,54 @@
+"""
+Commande Django : Reconstruit les facettes matérialisées de l'inventaire
+(FacetteInventaire).
+
+Les facettes sont normalement tenues à jour par les signals des 15 types
+d'objets et par l'import en masse. Cette commande les reconstruit après une
+reprise de données, un import SQL ou une mise à jour en masse (update()).
+
+Étape de déploiement : la migration 0013_facetteinventaire crée la table
+vide, lancer cette commande une fois après `migrate`.
+
+Usage:
+    python manage.py rebuild_inventory_facets
+    python manage.py rebuild_inventory_facets --types Arbre Vanne
+    python manage.py rebuild_inventory_facets --sites 3 7
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import OBJET_TYPE_MODELS
+from api.services.inventory_facets import refresh_facettes
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les facettes matérialisées de l'inventaire (FacetteInventaire)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--types',
+            nargs='+',
+            help="Types d'objets à reconstruire (ex: Arbre Vanne) ; défaut : les 15 types",
+        )
+        parser.add_argument(
+            '--sites',
+            type=int,
+            nargs='+',
+            help='Reconstruit uniquement ces sites',
+        )
+
+    def handle(self, *args, **options):
+        types = options['types'] or list(OBJET_TYPE_MODELS)
+        inconnus = [t for t in types if t not in OBJET_TYPE_MODELS]
+        if inconnus:
+            raise CommandError(
+                f"Type(s) inconnu(s) : {', '.join(inconnus)}. "
+                f"Valeurs possibles : {', '.join(OBJET_TYPE_MODELS)}"
+            )
+
+        total_rows = 0
+        for type_objet in types:
+            rows = refresh_facettes(type_objet, options['sites'])
+            total_rows += rows
+            self.stdout.write(f"{type_objet}: {rows} facette(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"\nTotal: {total_rows} facette(s) reconstruite(s)"))
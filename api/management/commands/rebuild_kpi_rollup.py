@@ -0,0 +1,80 @@
+"""
+Commande Django : Reconstruit la table de cumuls mensuels des KPIs (KPIMensuel).
+
+Les cumuls sont normalement tenus à jour par les signals (Tache,
+DistributionCharge, Reclamation, SatisfactionClient). Cette commande les
+reconstruit après une reprise de données, un import SQL ou une mise à jour
+en masse. Chaque mois est recalculé dans sa propre transaction.
+
+Usage:
+    python manage.py rebuild_kpi_rollup
+    python manage.py rebuild_kpi_rollup --depuis 2025-01
+    python manage.py rebuild_kpi_rollup --mois 2026-09
+"""
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from api.services.kpi_rollup import month_start, refresh_kpi_rollup
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les cumuls mensuels des KPIs (KPIMensuel)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mois',
+            help='Reconstruit uniquement ce mois (YYYY-MM)',
+        )
+        parser.add_argument(
+            '--depuis',
+            help='Premier mois à reconstruire (YYYY-MM) ; défaut : plus ancienne donnée',
+        )
+
+    def _parse_month(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f"Mois invalide '{value}'. Utilisez YYYY-MM")
+
+    def _first_month(self):
+        """Mois de la plus ancienne donnée prise en compte par les KPIs."""
+        from api_planification.models import DistributionCharge, Tache
+        from api_reclamations.models import Reclamation, SatisfactionClient
+
+        candidates = [
+            Tache.objects.aggregate(d=Min('date_fin_reelle'))['d'],
+            DistributionCharge.objects.aggregate(d=Min('date'))['d'],
+            Reclamation.objects.aggregate(d=Min('date_creation'))['d'],
+            SatisfactionClient.objects.aggregate(d=Min('date_evaluation'))['d'],
+        ]
+        months = [month_start(d) for d in candidates if d]
+        return min(months) if months else None
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+
+        if options['mois']:
+            first = last = self._parse_month(options['mois'])
+        else:
+            first = self._parse_month(options['depuis']) if options['depuis'] else self._first_month()
+            last = current
+            if first is None:
+                self.stdout.write(self.style.WARNING("Aucune donnée : rien à reconstruire"))
+                return
+
+        total_rows = 0
+        mois = first
+        while mois <= last:
+            rows = refresh_kpi_rollup(mois)
+            total_rows += rows
+            self.stdout.write(f"{mois:%Y-%m}: {rows} ligne(s)")
+            mois += relativedelta(months=1)
+
+        from greensig_web.cache_utils import invalidate
+        invalidate('KPIS')
+
+        self.stdout.write(self.style.SUCCESS(f"\nTotal: {total_rows} ligne(s) reconstruite(s)"))
@@ -0,0 +1,44 @@
+"""
+Commande Django : Reconstruit l'index de recherche unifié (IndexRecherche).
+
+L'index est normalement tenu à jour par les signals (Site, SousSite, 15 types
+d'objets) et par l'import en masse. Cette commande le reconstruit après une
+reprise de données, un import SQL ou une mise à jour en masse (update()).
+
+Étape de déploiement : la migration 0012_indexrecherche crée la table vide,
+lancer cette commande une fois après `migrate`.
+
+Usage:
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --sites 3 7
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.services.search_index import rebuild_search_index, refresh_sites
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche unifié (IndexRecherche)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sites',
+            type=int,
+            nargs='+',
+            help='Réindexe uniquement ces sites (avec leurs sous-sites et objets)',
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+
+        with transaction.atomic():
+            if options['sites']:
+                rows = refresh_sites(options['sites'])
+            else:
+                rows = rebuild_search_index()
+
+        duree_ms = round((time.monotonic() - debut) * 1000)
+        self.stdout.write(self.style.SUCCESS(f"{rows} ligne(s) indexée(s) en {duree_ms} ms"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_alter_notification_type_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objet',
+            name='type_objet',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Nom de la classe enfant (Arbre, Gazon, Puit...), renseigné automatiquement', max_length=20, verbose_name='Type réel'),
+        ),
+    ]
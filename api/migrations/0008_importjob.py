@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-16 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_objet_type_objet'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(upload_to='imports/sources/', verbose_name='Fichier importe')),
+                ('format_fichier', models.CharField(choices=[('geojson', 'GeoJSON'), ('kml', 'KML'), ('shapefile', 'Shapefile')], max_length=20, verbose_name='Format')),
+                ('fichier_features', models.FileField(blank=True, upload_to='imports/features/', verbose_name='Features parsees (JSON)')),
+                ('target_type', models.CharField(max_length=20, verbose_name='Type cible')),
+                ('mapping', models.JSONField(blank=True, default=dict, verbose_name='Mapping des attributs')),
+                ('options', models.JSONField(blank=True, default=dict, help_text='site_id, sous_site_id, auto_detect_site, import_mode', verbose_name='Options')),
+                ('batch_size', models.PositiveIntegerField(default=1000, verbose_name='Taille des lots')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('analyse', 'Analyse du fichier'), ('validation', 'Validation'), ('import', 'Import en cours'), ('termine', 'Termine'), ('echec', 'Echec')], db_index=True, default='en_attente', max_length=20, verbose_name='Statut')),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='ID tache Celery')),
+                ('total_features', models.PositiveIntegerField(default=0, verbose_name='Features')),
+                ('parsed_count', models.PositiveIntegerField(default=0, verbose_name='Features parsees')),
+                ('validated_count', models.PositiveIntegerField(default=0, verbose_name='Features validees')),
+                ('inserted_count', models.PositiveIntegerField(default=0, verbose_name='Objets inseres')),
+                ('skipped_count', models.PositiveIntegerField(default=0, verbose_name='Doublons ignores')),
+                ('last_batch', models.IntegerField(default=-1, verbose_name='Dernier lot commite')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('message_erreur', models.TextField(blank=True, verbose_name="Message d'erreur")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de creation')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise a jour')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Job d'import",
+                'verbose_name_plural': "Jobs d'import",
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-16 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_importjob'),
+        ('api_users', '0004_add_structure_client'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPIMensuel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(verbose_name='Mois (premier jour)')),
+                ('taches_terminees', models.PositiveIntegerField(default=0, verbose_name='Taches terminees')),
+                ('taches_dans_delais', models.PositiveIntegerField(default=0, verbose_name='Taches dans les delais')),
+                ('evaluations', models.PositiveIntegerField(default=0, verbose_name='Evaluations')),
+                ('evaluations_satisfaites', models.PositiveIntegerField(default=0, verbose_name='Evaluations >= 4')),
+                ('somme_notes', models.PositiveIntegerField(default=0, verbose_name='Somme des notes')),
+                ('reclamations_ouvertes', models.PositiveIntegerField(default=0, verbose_name='Reclamations ouvertes')),
+                ('reclamations_ouvertes_fermees', models.PositiveIntegerField(default=0, verbose_name='Reclamations ouvertes et cloturees dans le mois')),
+                ('delais_par_type', models.JSONField(blank=True, default=dict, verbose_name='Delais de traitement par type')),
+                ('temps_par_type_tache', models.JSONField(blank=True, default=dict, verbose_name='Temps par type de tache')),
+                ('heures_totales', models.FloatField(default=0, verbose_name='Heures totales')),
+                ('nb_interventions', models.PositiveIntegerField(default=0, verbose_name='Interventions')),
+                ('date_calcul', models.DateTimeField(auto_now=True, verbose_name='Date de calcul')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='kpis_mensuels', to='api.site', verbose_name='Site')),
+                ('structure_client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='kpis_mensuels', to='api_users.structureclient', verbose_name='Structure cliente')),
+            ],
+            options={
+                'verbose_name': 'KPI mensuel',
+                'verbose_name_plural': 'KPIs mensuels',
+                'ordering': ['-mois'],
+                'indexes': [models.Index(fields=['mois', 'site'], name='kpi_mensuel_mois_site_idx')],
+            },
+        ),
+    ]
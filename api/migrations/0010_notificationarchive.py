@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-16 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_kpimensuel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('lu', True)), fields=['created_at'], name='notif_lues_created_idx'),
+        ),
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name="ID d'origine")),
+                ('type_notification', models.CharField(choices=[('tache_creee', 'Nouvelle tache'), ('tache_assignee', 'Tache assignee'), ('tache_modifiee', 'Tache modifiee'), ('tache_terminee', 'Tache terminee'), ('tache_en_retard', 'Tache en retard'), ('tache_annulee', 'Tache annulee'), ('reclamation_creee', 'Nouvelle reclamation'), ('reclamation_urgente', 'Reclamation urgente'), ('reclamation_prise_en_compte', 'Reclamation prise en compte'), ('reclamation_resolue', 'Reclamation resolue'), ('reclamation_cloturee', 'Reclamation cloturee'), ('absence_demandee', 'Demande absence'), ('absence_validee', 'Absence validee'), ('absence_refusee', 'Absence refusee'), ('equipe_membre_ajoute', 'Membre ajoute'), ('equipe_membre_retire', 'Membre retire'), ('site_assigne', 'Site assigne'), ('site_retire', 'Site retire'), ('site_cree', 'Nouveau site'), ('site_modifie', 'Site modifie'), ('info', 'Information'), ('alerte', 'Alerte')], max_length=50, verbose_name='Type')),
+                ('titre', models.CharField(max_length=255, verbose_name='Titre')),
+                ('message', models.TextField(verbose_name='Message')),
+                ('priorite', models.CharField(choices=[('low', 'Basse'), ('normal', 'Normale'), ('high', 'Haute'), ('urgent', 'Urgente')], max_length=10, verbose_name='Priorite')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Donnees JSON')),
+                ('date_lecture', models.DateTimeField(blank=True, null=True, verbose_name='Date de lecture')),
+                ('created_at', models.DateTimeField(verbose_name='Date de creation')),
+                ('archived_at', models.DateTimeField(verbose_name="Date d'archivage")),
+                ('acteur', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Acteur')),
+                ('destinataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications_archivees', to=settings.AUTH_USER_MODEL, verbose_name='Destinataire')),
+            ],
+            options={
+                'verbose_name': 'Notification archivee',
+                'verbose_name_plural': 'Notifications archivees',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['destinataire', '-created_at'], name='notif_archive_dest_idx')],
+            },
+        ),
+    ]
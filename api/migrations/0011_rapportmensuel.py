@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-16 17:30
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_notificationarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RapportMensuel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(verbose_name='Mois (premier jour)')),
+                ('donnees', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Donnees du rapport')),
+                ('perime', models.BooleanField(default=True, verbose_name='Perime')),
+                ('generation', models.PositiveIntegerField(default=0, verbose_name='Generation')),
+                ('date_calcul', models.DateTimeField(blank=True, null=True, verbose_name='Date de calcul')),
+                ('duree_calcul_ms', models.FloatField(blank=True, null=True, verbose_name='Duree du calcul (ms)')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rapports_mensuels', to='api.site', verbose_name='Site')),
+            ],
+            options={
+                'verbose_name': 'Rapport mensuel de site',
+                'verbose_name_plural': 'Rapports mensuels de site',
+                'ordering': ['-mois'],
+                'indexes': [models.Index(condition=models.Q(('perime', True)), fields=['mois'], name='rapport_mensuel_perime_idx')],
+                'constraints': [models.UniqueConstraint(fields=('site', 'mois'), name='rapport_mensuel_site_mois_uniq')],
+            },
+        ),
+    ]
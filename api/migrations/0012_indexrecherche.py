@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-16 18:40
+#
+# Crée l'index vide. Étape de déploiement après la migration :
+#     python manage.py rebuild_search_index
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_rapportmensuel'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='IndexRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_entite', models.CharField(choices=[('site', 'Site'), ('soussite', 'Sous-site'), ('objet', 'Objet')], max_length=10, verbose_name="Type d'entite")),
+                ('entite_id', models.BigIntegerField(verbose_name="ID de l'entite")),
+                ('type_objet', models.CharField(blank=True, default='', max_length=20, verbose_name="Type d'objet")),
+                ('libelle', models.CharField(blank=True, default='', max_length=255, verbose_name='Libelle')),
+                ('texte', models.TextField(verbose_name='Texte indexe')),
+                ('texte_contexte', models.TextField(blank=True, default='', verbose_name='Texte du site / sous-site')),
+                ('position', django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326, verbose_name='Position')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.site', verbose_name='Site')),
+            ],
+            options={
+                'verbose_name': 'Index de recherche',
+                'verbose_name_plural': 'Index de recherche',
+                'indexes': [
+                    django.contrib.postgres.indexes.GinIndex(fields=['texte'], name='index_recherche_texte_trgm', opclasses=['gin_trgm_ops']),
+                    django.contrib.postgres.indexes.GinIndex(fields=['texte_contexte'], name='index_recherche_ctx_trgm', opclasses=['gin_trgm_ops']),
+                ],
+                'constraints': [models.UniqueConstraint(fields=('type_entite', 'entite_id'), name='index_recherche_entite_uniq')],
+            },
+        ),
+    ]
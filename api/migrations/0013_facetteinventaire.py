@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-16 19:25
+#
+# Crée la table vide. Étape de déploiement après la migration :
+#     python manage.py rebuild_inventory_facets
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_indexrecherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetteInventaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(max_length=20, verbose_name="Type d'objet")),
+                ('attribut', models.CharField(max_length=20, verbose_name='Attribut')),
+                ('valeur', models.CharField(blank=True, default='', max_length=255, verbose_name='Valeur')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name="Nombre d'objets")),
+                ('valeur_min', models.FloatField(blank=True, null=True, verbose_name='Valeur minimale')),
+                ('valeur_max', models.FloatField(blank=True, null=True, verbose_name='Valeur maximale')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.site', verbose_name='Site')),
+            ],
+            options={
+                'verbose_name': "Facette d'inventaire",
+                'verbose_name_plural': "Facettes d'inventaire",
+                'constraints': [models.UniqueConstraint(fields=('site', 'type_objet', 'attribut', 'valeur'), name='facette_inventaire_uniq')],
+            },
+        ),
+    ]
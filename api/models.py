@@ -1,4 +1,6 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import uuid
 
@@ -102,6 +104,66 @@ ETAT_CHOICES = [
 ]
 
 
+class ObjetQuerySet(models.QuerySet):
+    """
+    QuerySet polymorphe pour Objet.
+
+    S'appuie sur la colonne matérialisée `type_objet` pour résoudre les
+    instances enfants en une requête par type présent (au lieu de 15 probes
+    `hasattr` par objet).
+    """
+
+    def ids_by_type(self):
+        """
+        Regroupe les IDs par type réel en une seule requête.
+
+        Returns:
+            dict: {'Arbre': [1, 5], 'Gazon': [2], ...}
+            Les objets non encore backfillés sont rangés sous la clé ''.
+        """
+        grouped = {}
+        for pk, type_objet in self.values_list('pk', 'type_objet'):
+            grouped.setdefault(type_objet or '', []).append(pk)
+        return grouped
+
+    def resolve_children(self, *related_fields):
+        """
+        Retourne les instances enfants typées (Arbre, Gazon, Puit, ...).
+
+        Args:
+            *related_fields: champs passés à select_related() (ex: 'site', 'sous_site')
+
+        Returns:
+            dict: {objet_id: instance enfant}
+
+        Example:
+            >>> enfants = Objet.objects.filter(pk__in=ids).resolve_children('site')
+            >>> enfants[42].nom
+        """
+        grouped = self.ids_by_type()
+        resolved = {}
+
+        for type_name, ids in grouped.items():
+            model = OBJET_TYPE_MODELS.get(type_name)
+            models_to_query = [model] if model else OBJET_TYPE_MODELS.values()
+            # Objets sans type matérialisé (avant backfill) : repli sur les 15 tables
+            remaining = set(ids)
+            for child_model in models_to_query:
+                if not remaining:
+                    break
+                qs = child_model.objects.filter(pk__in=remaining)
+                if related_fields:
+                    qs = qs.select_related(*related_fields)
+                for child in qs:
+                    resolved[child.pk] = child
+                    remaining.discard(child.pk)
+
+        return resolved
+
+
+ObjetManager = models.Manager.from_queryset(ObjetQuerySet)
+
+
 class Objet(models.Model):
     """
     Classe Mère CONCRÈTE (crée une table 'api_objet' en base de données).
@@ -111,6 +173,10 @@ class Objet(models.Model):
 
     Les 15 types enfants (Arbre, Gazon, Palmier, etc.) héritent de cette classe
     et créent leurs propres tables avec un lien vers api_objet.
+
+    Le discriminant `type_objet` (nom de la classe enfant) est renseigné
+    automatiquement à chaque save() d'un enfant et backfillé par la commande
+    `backfill_type_objet`.
     """
     site = models.ForeignKey(Site, on_delete=models.CASCADE)
     sous_site = models.ForeignKey(SousSite, on_delete=models.SET_NULL, null=True, blank=True)
@@ -121,6 +187,15 @@ class Objet(models.Model):
         verbose_name="État de l'objet",
         db_index=True
     )
+    type_objet = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name="Type réel",
+        help_text="Nom de la classe enfant (Arbre, Gazon, Puit...), renseigné automatiquement"
+    )
 
     ETAT_CHOICES = [
         ('bon', 'Bon'),
@@ -130,10 +205,21 @@ class Objet(models.Model):
     ]
     etat = models.CharField(max_length=50, choices=ETAT_CHOICES, default='bon', verbose_name="État")
 
+    objects = ObjetManager()
+
+    def save(self, *args, **kwargs):
+        # Matérialiser le type réel lors de la sauvegarde d'un enfant
+        if type(self) is not Objet:
+            self.type_objet = type(self).__name__
+        super().save(*args, **kwargs)
+
     def get_type_reel(self):
         """
         Retourne l'instance enfant réelle (Arbre, Gazon, Puit, etc.).
 
+        Utilise la colonne `type_objet` : une seule requête au lieu de
+        15 probes. Repli sur les probes pour les objets non backfillés.
+
         Returns:
             Instance du type enfant ou None si pas trouvé
 
@@ -142,6 +228,12 @@ class Objet(models.Model):
             >>> arbre = objet.get_type_reel()
             >>> print(arbre.nom)  # "Palmier Phoenix"
         """
+        if type(self) is not Objet:
+            return self
+
+        if self.type_objet:
+            return getattr(self, self.type_objet.lower(), None)
+
         types = [
             'arbre', 'gazon', 'palmier', 'arbuste', 'vivace', 'cactus', 'graminee',
             'puit', 'pompe', 'vanne', 'clapet', 'canalisation', 'aspersion', 'goutte', 'ballon'
@@ -158,6 +250,8 @@ class Objet(models.Model):
         Returns:
             str: Nom de la classe ou 'Objet' si pas de type enfant
         """
+        if self.type_objet:
+            return self.type_objet
         objet_reel = self.get_type_reel()
         if objet_reel:
             return objet_reel.__class__.__name__
@@ -361,6 +455,16 @@ class Ballon(Objet):
     geometry = models.PointField(srid=4326)
 
 
+# Registre des 15 types enfants, indexé par la valeur de Objet.type_objet
+OBJET_TYPE_MODELS = {
+    model.__name__: model
+    for model in (
+        Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
+        Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon,
+    )
+}
+
+
 # ==============================================================================
 # NOTIFICATIONS TEMPS REEL
 # ==============================================================================
@@ -465,6 +569,12 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['destinataire', 'lu', '-created_at']),
             models.Index(fields=['type_notification']),
+            # Parcours du job d'archivage (notifications lues les plus anciennes)
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(lu=True),
+                name='notif_lues_created_idx',
+            ),
         ]
 
     def __str__(self):
@@ -473,6 +583,8 @@ class Notification(models.Model):
     def marquer_comme_lu(self):
         """Marque la notification comme lue"""
         if not self.lu:
+            from api.services.unread_counters import notification_removed
+            notification_removed(self)
             self.lu = True
             self.date_lecture = timezone.now()
             self.save(update_fields=['lu', 'date_lecture'])
@@ -492,4 +604,376 @@ class Notification(models.Model):
                 'nom': f"{self.acteur.prenom} {self.acteur.nom}",
             } if self.acteur else None,
             'created_at': self.created_at.isoformat(),
-        }
\ No newline at end of file
+        }
+
+
+class NotificationArchive(models.Model):
+    """
+    Notification lue archivée (api/services/notification_retention.py).
+
+    La table Notification ne garde que les données chaudes : les
+    notifications lues plus anciennes que NOTIFICATION_RETENTION_DAYS sont
+    déplacées ici par la tâche quotidienne `archive_notifications`, en
+    conservant leur ID. Forme compacte : pas de statut de lecture (toujours
+    lue), pas de contrainte de clé étrangère sur l'acteur.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID d'origine")
+    destinataire = models.ForeignKey(
+        'api_users.Utilisateur',
+        on_delete=models.CASCADE,
+        related_name='notifications_archivees',
+        verbose_name="Destinataire"
+    )
+    acteur = models.ForeignKey(
+        'api_users.Utilisateur',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Acteur"
+    )
+    type_notification = models.CharField(
+        max_length=50,
+        choices=Notification.TYPE_CHOICES,
+        verbose_name="Type"
+    )
+    titre = models.CharField(max_length=255, verbose_name="Titre")
+    message = models.TextField(verbose_name="Message")
+    priorite = models.CharField(
+        max_length=10,
+        choices=Notification.PRIORITY_CHOICES,
+        verbose_name="Priorite"
+    )
+    data = models.JSONField(default=dict, blank=True, verbose_name="Donnees JSON")
+    date_lecture = models.DateTimeField(null=True, blank=True, verbose_name="Date de lecture")
+    created_at = models.DateTimeField(verbose_name="Date de creation")
+    archived_at = models.DateTimeField(verbose_name="Date d'archivage")
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Notification archivee"
+        verbose_name_plural = "Notifications archivees"
+        indexes = [
+            models.Index(fields=['destinataire', '-created_at'], name='notif_archive_dest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.titre} -> {self.destinataire_id} (archivee)"
+
+# ==============================================================================
+# JOBS D'IMPORT ASYNCHRONES
+# ==============================================================================
+
+class ImportJob(models.Model):
+    """
+    Import de fichier géographique exécuté par Celery (api.tasks.import_job_async).
+
+    Le fichier est stocké une seule fois ; les features parsées sont conservées
+    dans `fichier_features` pour qu'une reprise ne re-parse pas le fichier.
+    Chaque lot inséré est commité avec `last_batch` : un job en échec reprend
+    au lot suivant.
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('analyse', 'Analyse du fichier'),
+        ('validation', 'Validation'),
+        ('import', 'Import en cours'),
+        ('termine', 'Termine'),
+        ('echec', 'Echec'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('geojson', 'GeoJSON'),
+        ('kml', 'KML'),
+        ('shapefile', 'Shapefile'),
+    ]
+
+    utilisateur = models.ForeignKey(
+        'api_users.Utilisateur',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+        verbose_name="Utilisateur"
+    )
+
+    # Fichier source et features parsées
+    fichier = models.FileField(upload_to='imports/sources/', verbose_name="Fichier importe")
+    format_fichier = models.CharField(max_length=20, choices=FORMAT_CHOICES, verbose_name="Format")
+    fichier_features = models.FileField(
+        upload_to='imports/features/',
+        blank=True,
+        verbose_name="Features parsees (JSON)"
+    )
+
+    # Paramètres de l'import
+    target_type = models.CharField(max_length=20, verbose_name="Type cible")
+    mapping = models.JSONField(default=dict, blank=True, verbose_name="Mapping des attributs")
+    options = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Options",
+        help_text="site_id, sous_site_id, auto_detect_site, import_mode"
+    )
+    batch_size = models.PositiveIntegerField(default=1000, verbose_name="Taille des lots")
+
+    # Avancement
+    statut = models.CharField(
+        max_length=20,
+        choices=STATUT_CHOICES,
+        default='en_attente',
+        db_index=True,
+        verbose_name="Statut"
+    )
+    task_id = models.CharField(max_length=255, blank=True, verbose_name="ID tache Celery")
+    total_features = models.PositiveIntegerField(default=0, verbose_name="Features")
+    parsed_count = models.PositiveIntegerField(default=0, verbose_name="Features parsees")
+    validated_count = models.PositiveIntegerField(default=0, verbose_name="Features validees")
+    inserted_count = models.PositiveIntegerField(default=0, verbose_name="Objets inseres")
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name="Doublons ignores")
+    last_batch = models.IntegerField(default=-1, verbose_name="Dernier lot commite")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Erreurs")
+    message_erreur = models.TextField(blank=True, verbose_name="Message d'erreur")
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de creation")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise a jour")
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Job d'import"
+        verbose_name_plural = "Jobs d'import"
+
+    def __str__(self):
+        return f"Import #{self.pk} {self.target_type} ({self.statut})"
+
+    def to_progress_payload(self):
+        """Avancement du job (exposé par TaskStatusView et l'endpoint du job)."""
+        return {
+            'job_id': self.pk,
+            'statut': self.statut,
+            'target_type': self.target_type,
+            'total': self.total_features,
+            'parsed': self.parsed_count,
+            'validated': self.validated_count,
+            'inserted': self.inserted_count,
+            'skipped': self.skipped_count,
+            'last_batch': self.last_batch,
+            'errors': self.errors[:100],
+            'error_count': len(self.errors),
+            'message_erreur': self.message_erreur or None,
+        }
+
+
+# ==============================================================================
+# CUMULS MENSUELS DES KPIs
+# ==============================================================================
+
+class KPIMensuel(models.Model):
+    """
+    Composantes additives des KPIs d'un mois pour un couple (site, structure).
+
+    Les KPIs d'un périmètre (site, structure cliente, sites d'un superviseur)
+    sont recomposés en sommant ces lignes (voir api/services/kpi_rollup.py) :
+    un mois clôturé n'est jamais recalculé depuis les données brutes.
+
+    Les lignes d'un (mois, site) sont recalculées à la sauvegarde d'une
+    Tache, DistributionCharge, Reclamation ou SatisfactionClient, et
+    reconstruites par `python manage.py rebuild_kpi_rollup`. La ligne
+    (site=None, structure=None) existe pour tout mois calculé.
+    """
+
+    mois = models.DateField(verbose_name="Mois (premier jour)")
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='kpis_mensuels',
+        verbose_name="Site"
+    )
+    structure_client = models.ForeignKey(
+        'api_users.StructureClient',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='kpis_mensuels',
+        verbose_name="Structure cliente"
+    )
+
+    # KPI 1 : respect du planning
+    taches_terminees = models.PositiveIntegerField(default=0, verbose_name="Taches terminees")
+    taches_dans_delais = models.PositiveIntegerField(default=0, verbose_name="Taches dans les delais")
+    # KPI 2 : qualité de service
+    evaluations = models.PositiveIntegerField(default=0, verbose_name="Evaluations")
+    evaluations_satisfaites = models.PositiveIntegerField(default=0, verbose_name="Evaluations >= 4")
+    somme_notes = models.PositiveIntegerField(default=0, verbose_name="Somme des notes")
+    # KPI 3 : taux de réalisation des réclamations
+    reclamations_ouvertes = models.PositiveIntegerField(default=0, verbose_name="Reclamations ouvertes")
+    reclamations_ouvertes_fermees = models.PositiveIntegerField(
+        default=0, verbose_name="Reclamations ouvertes et cloturees dans le mois"
+    )
+    # KPI 4 : {type_reclamation_id: [somme des délais (h), nombre]}
+    delais_par_type = models.JSONField(default=dict, blank=True, verbose_name="Delais de traitement par type")
+    # KPI 5 : {type_tache_id: [heures, nombre]}
+    temps_par_type_tache = models.JSONField(default=dict, blank=True, verbose_name="Temps par type de tache")
+    # KPI 6 : temps total de travail
+    heures_totales = models.FloatField(default=0, verbose_name="Heures totales")
+    nb_interventions = models.PositiveIntegerField(default=0, verbose_name="Interventions")
+
+    date_calcul = models.DateTimeField(auto_now=True, verbose_name="Date de calcul")
+
+    class Meta:
+        ordering = ['-mois']
+        verbose_name = "KPI mensuel"
+        verbose_name_plural = "KPIs mensuels"
+        indexes = [
+            models.Index(fields=['mois', 'site'], name='kpi_mensuel_mois_site_idx'),
+        ]
+
+    def __str__(self):
+        return f"KPI {self.mois:%Y-%m} site={self.site_id} structure={self.structure_client_id}"
+
+
+# ==============================================================================
+# SNAPSHOTS DES RAPPORTS DE SITE
+# ==============================================================================
+
+class RapportMensuel(models.Model):
+    """
+    Rapport de site d'un mois calendaire, précalculé (voir
+    api/services/report_snapshots.py).
+
+    GET /api/monthly-report/ sur un mois complet sert `donnees` tant que le
+    snapshot n'est pas périmé. Les signals de Tache, DistributionCharge,
+    Reclamation et Photo marquent périmés les snapshots (site, mois)
+    touchés et planifient leur reconstruction. `generation` est incrémentée
+    à chaque péremption : un calcul commencé avant une modification
+    n'écrase pas la péremption.
+    """
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        related_name='rapports_mensuels',
+        verbose_name="Site"
+    )
+    mois = models.DateField(verbose_name="Mois (premier jour)")
+    donnees = models.JSONField(
+        default=dict,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name="Donnees du rapport"
+    )
+    perime = models.BooleanField(default=True, verbose_name="Perime")
+    generation = models.PositiveIntegerField(default=0, verbose_name="Generation")
+    date_calcul = models.DateTimeField(null=True, blank=True, verbose_name="Date de calcul")
+    duree_calcul_ms = models.FloatField(null=True, blank=True, verbose_name="Duree du calcul (ms)")
+
+    class Meta:
+        ordering = ['-mois']
+        verbose_name = "Rapport mensuel de site"
+        verbose_name_plural = "Rapports mensuels de site"
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'mois'], name='rapport_mensuel_site_mois_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['mois'], condition=models.Q(perime=True), name='rapport_mensuel_perime_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rapport {self.mois:%Y-%m} site={self.site_id}{' (perime)' if self.perime else ''}"
+
+
+# ==============================================================================
+# INDEX DE RECHERCHE (sites, sous-sites, 15 types d'objets)
+# ==============================================================================
+
+class IndexRecherche(models.Model):
+    """
+    Index de recherche dénormalisé : une ligne par site, sous-site et objet
+    (voir api/services/search_index.py).
+
+    `texte` (champs propres en minuscules) et `texte_contexte` (site et
+    sous-site d'un objet) portent des index GIN pg_trgm : les recherches
+    LIKE '%...%' de GET /api/search/ et de l'inventaire utilisent l'index
+    au lieu de parcourir chaque table.
+
+    Tenu à jour par les signals de Site, SousSite et des 15 types d'objets
+    (api/signals.py), par l'import en masse, et reconstruit par
+    `python manage.py rebuild_search_index`.
+    """
+    TYPE_ENTITE_CHOICES = [
+        ('site', 'Site'),
+        ('soussite', 'Sous-site'),
+        ('objet', 'Objet'),
+    ]
+
+    type_entite = models.CharField(max_length=10, choices=TYPE_ENTITE_CHOICES, verbose_name="Type d'entite")
+    entite_id = models.BigIntegerField(verbose_name="ID de l'entite")
+    type_objet = models.CharField(max_length=20, blank=True, default='', verbose_name="Type d'objet")
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Site"
+    )
+    libelle = models.CharField(max_length=255, blank=True, default='', verbose_name="Libelle")
+    texte = models.TextField(verbose_name="Texte indexe")
+    texte_contexte = models.TextField(blank=True, default='', verbose_name="Texte du site / sous-site")
+    position = models.PointField(srid=4326, null=True, blank=True, verbose_name="Position")
+
+    class Meta:
+        verbose_name = "Index de recherche"
+        verbose_name_plural = "Index de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['type_entite', 'entite_id'], name='index_recherche_entite_uniq'),
+        ]
+        indexes = [
+            GinIndex(fields=['texte'], opclasses=['gin_trgm_ops'], name='index_recherche_texte_trgm'),
+            GinIndex(fields=['texte_contexte'], opclasses=['gin_trgm_ops'], name='index_recherche_ctx_trgm'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_entite}:{self.entite_id} {self.libelle}"
+
+
+class FacetteInventaire(models.Model):
+    """
+    Facettes matérialisées de l'inventaire, par (site, type d'objet, attribut)
+    (voir api/services/inventory_facets.py).
+
+    - Attribut texte (famille, materiau, type, etat) : une ligne par valeur
+      distincte avec son nombre d'objets.
+    - Attribut numérique (area_sqm, diametre, profondeur, densite) : une
+      ligne (valeur vide) avec le nombre d'objets renseignés et la plage.
+
+    GET /api/inventory/filter-options/ agrège ces lignes pour le périmètre de
+    l'utilisateur en une requête. Tenues à jour par les signals des 15 types
+    d'objets et par l'import en masse.
+    """
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Site"
+    )
+    type_objet = models.CharField(max_length=20, verbose_name="Type d'objet")
+    attribut = models.CharField(max_length=20, verbose_name="Attribut")
+    valeur = models.CharField(max_length=255, blank=True, default='', verbose_name="Valeur")
+    nombre = models.PositiveIntegerField(default=0, verbose_name="Nombre d'objets")
+    valeur_min = models.FloatField(null=True, blank=True, verbose_name="Valeur minimale")
+    valeur_max = models.FloatField(null=True, blank=True, verbose_name="Valeur maximale")
+
+    class Meta:
+        verbose_name = "Facette d'inventaire"
+        verbose_name_plural = "Facettes d'inventaire"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['site', 'type_objet', 'attribut', 'valeur'],
+                name='facette_inventaire_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.site_id} {self.type_objet}.{self.attribut}={self.valeur} ({self.nombre})"
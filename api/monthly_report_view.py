@@ -28,6 +28,11 @@ class MonthlyReportView(APIView):
         - site_id (int, requis): ID du site
         - date_debut (str, requis): Date de début au format YYYY-MM-DD
         - date_fin (str, requis): Date de fin au format YYYY-MM-DD
+        - refresh (bool, optionnel): true = calcul direct, sans snapshot
+
+    Un mois calendaire complet (1er au dernier jour) est servi depuis le
+    snapshot RapportMensuel, recalculé seulement après une modification des
+    données du site sur la période.
 
     Returns:
         {
@@ -90,11 +95,24 @@ class MonthlyReportView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Mois calendaire complet : snapshot précalculé (api/services/report_snapshots.py)
+        from .services.report_snapshots import full_month, get_or_build_snapshot
+
+        mois = full_month(date_debut, date_fin)
+        if mois is not None and request.query_params.get('refresh') != 'true':
+            return Response(get_or_build_snapshot(site, mois))
+
+        return Response(self.build_report(site, date_debut, date_fin))
+
+    def build_report(self, site, date_debut, date_fin):
+        """Assemble le rapport du site sur la période (bornes datetime UTC incluses)."""
+        site_id = site.id
+
         # Calculer le nombre de jours
         nb_jours = (date_fin.date() - date_debut.date()).days + 1
 
         # Structure du rapport
-        report = {
+        return {
             'periode': {
                 'date_debut': date_debut.isoformat(),
                 'date_fin': date_fin.isoformat(),
@@ -109,8 +127,6 @@ class MonthlyReportView(APIView):
             'statistiques': self._get_statistiques(site_id, date_debut, date_fin),
         }
 
-        return Response(report)
-
     def _get_site_info(self, site):
         """Informations du site avec coordonnées pour la carte."""
         # Récupérer les coordonnées du centroid si disponible
@@ -380,11 +396,10 @@ class MonthlyReportView(APIView):
                 date_fin_reelle__gte=date_debut,
                 date_fin_reelle__lte=date_fin,
                 objets__site_id=site_id
-            ).distinct().prefetch_related(
+            ).distinct().with_work_metrics().prefetch_related(
                 'participations__id_operateur',
-                'distributions_charge',
                 'equipes'
-            )
+            )  # temps_travail_total calculé en SQL (with_work_metrics)
 
             # Récupérer les IDs de toutes les équipes qui ont travaillé sur ces tâches
             equipes_ids_actives = set()
@@ -574,6 +589,7 @@ class MonthlyReportView(APIView):
         """Photos avant/après sur le site pour la période."""
         try:
             from api_suivi_taches.models import Photo
+            from api_suivi_taches.photo_variants import VARIANTES_RAPPORT
 
             # Récupérer toutes les photos AVANT/APRES liées au site
             # Via objet.site OU via tache.objets.site
@@ -602,7 +618,9 @@ class MonthlyReportView(APIView):
 
                 photo_data = {
                     'id': photo.id,
-                    'url': photo.fichier.url if photo.fichier else None,
+                    # Variante moyenne : pas d'image 4000 px dans le rapport
+                    'url': photo.url_variante(*VARIANTES_RAPPORT),
+                    'miniature': photo.url_variante('miniature'),
                     'date': photo.date_prise.isoformat() if photo.date_prise else None,
                     'commentaire': photo.legende,
                 }
@@ -719,7 +737,7 @@ class MonthlyReportView(APIView):
                 date_fin_reelle__gte=date_debut,
                 date_fin_reelle__lte=date_fin,
                 objets__site_id=site_id
-            ).distinct().prefetch_related('distributions_charge', 'participations')
+            ).distinct().with_work_metrics()  # temps_travail_total calculé en SQL
 
             # Calculer le total et le ratio de productivité
             heures_totales = 0
@@ -7,6 +7,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
+from api_users.access_scope import ROLE_CLIENT, get_access_scope
 from greensig_web.cache_utils import cache_get, cache_set
 from django.db.models import Count, Avg, Sum, Q, F
 from django.utils import timezone
@@ -63,14 +64,12 @@ class ReportingView(APIView):
     def get(self, request):
         now = timezone.now()
         seven_days_ago = now - timedelta(days=7)
-        structure_filter = None
-        user = request.user
-        if user.roles_utilisateur.filter(role__nom_role='CLIENT').exists():
-            if hasattr(user, 'client_profile') and user.client_profile.structure:
-                structure_filter = user.client_profile.structure
+        # Rôle CLIENT : statistiques limitées à sa structure (périmètre d'accès en cache)
+        scope = get_access_scope(request.user)
+        structure_filter = scope.structure_id if ROLE_CLIENT in scope.roles else None
 
         # Cache Redis versionné (invalidé automatiquement après mutations)
-        structure_key = structure_filter.id if structure_filter else 'all'
+        structure_key = structure_filter or 'all'
         cached = cache_get('REPORTING', structure_key)
         if cached:
             cached['cached'] = True
@@ -5,7 +5,7 @@ from rest_framework import serializers
 from .models import (
     Site, SousSite, Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
     Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon,
-    Notification
+    Notification, NotificationArchive
 )
 
 
@@ -607,3 +607,17 @@ class AdminNotificationSerializer(NotificationSerializer):
         if role:
             return role.role.nom_role
         return 'ADMIN'
+
+
+class NotificationArchiveSerializer(NotificationSerializer):
+    """Notification archivee (meme format que NotificationSerializer, toujours lue)."""
+
+    lu = serializers.SerializerMethodField()
+
+    class Meta(NotificationSerializer.Meta):
+        model = NotificationArchive
+        fields = NotificationSerializer.Meta.fields + ('archived_at',)
+        read_only_fields = fields
+
+    def get_lu(self, obj):
+        return True
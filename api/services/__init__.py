@@ -13,6 +13,10 @@ from .geo_io import (
     export_to_geojson,
     export_to_kml,
     export_to_shapefile,
+    iter_geojson,
+    iter_kml,
+    write_shapefile,
+    write_xlsx,
     GEOMETRY_TYPE_MAPPING,
 )
 
@@ -37,6 +41,10 @@ __all__ = [
     'export_to_geojson',
     'export_to_kml',
     'export_to_shapefile',
+    'iter_geojson',
+    'iter_kml',
+    'write_shapefile',
+    'write_xlsx',
     'GEOMETRY_TYPE_MAPPING',
     # validation
     'validate_geometry',
@@ -0,0 +1,555 @@
+# api/services/bulk_import.py
+"""
+Moteur d'import en masse des objets GIS (et des sites).
+
+Remplace l'import objet par objet (un create() + une détection de site en
+Python + une recherche de doublon par feature) par un traitement par lots :
+
+1. Préparation : conversion des géométries et mapping des attributs (Python)
+2. Résolution : une requête PostGIS par lot pour détecter le site de chaque
+   feature (jointure spatiale) et une autre pour les doublons existants,
+   puis une pour les doublons internes au fichier
+3. Écriture : bulk_create sur api_objet puis INSERT groupé dans la table enfant
+
+Les erreurs de préparation/résolution sont connues avant toute écriture :
+l'import reste « tout ou rien » comme auparavant, mais la transaction ne
+contient plus que des INSERT groupés.
+"""
+
+import logging
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from api.models import OBJET_TYPE_MODELS, Objet, Site
+from .geo_io import GEOMETRY_TYPE_MAPPING, OBJECT_FIELDS, apply_attribute_mapping, convert_geometry
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+IMPORT_BATCH_SIZE = 1000
+DUPLICATE_TOLERANCE_METERS = 5.0
+
+# Même stratégie de correspondance que find_existing_match (validation.py)
+TYPES_WITH_NOM = {'Arbre', 'Palmier', 'Gazon', 'Arbuste', 'Vivace', 'Cactus', 'Graminee', 'Puit', 'Pompe'}
+TYPES_WITH_MARQUE = {'Vanne', 'Clapet', 'Ballon', 'Canalisation', 'Aspersion'}
+
+# Progression : callback(phase, traités, total) avec phase in
+# ('staged', 'validated', 'inserted')
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def get_import_model(target_type: str):
+    """Modèle Django correspondant à un type d'import (Site ou l'un des 15 types)."""
+    if target_type == 'Site':
+        return Site
+    return OBJET_TYPE_MODELS.get(target_type)
+
+
+def batches(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _tolerance_degrees(tolerance_meters: float) -> float:
+    """
+    Marge (en degrés) du pré-filtre && utilisé avant ST_DWithin en mètres.
+
+    Majorant valable jusqu'à 60° de latitude (1° de longitude >= 55,6 km).
+    """
+    return tolerance_meters / 55660.0
+
+
+# =============================================================================
+# 1. PRÉPARATION
+# =============================================================================
+
+def stage_features(features: List[Dict], mapping: Dict, target_type: str) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Convertit les géométries et applique le mapping d'attributs.
+
+    Returns:
+        (staged, errors) : staged contient pour chaque feature valide
+        {'index', 'geom', 'attributes', 'mapped'} où `mapped` est le mapping
+        brut (avant valeurs par défaut), utilisé pour la détection de doublons.
+    """
+    expected_geom_type = GEOMETRY_TYPE_MAPPING[target_type]
+    staged = []
+    errors = []
+
+    for position, feature in enumerate(features):
+        idx = feature.get('index', position)
+        try:
+            geometry = feature.get('geometry')
+            if not geometry:
+                errors.append({'index': idx, 'error': 'Missing geometry'})
+                continue
+
+            geom, _ = convert_geometry(geometry, expected_geom_type)
+            mapped = apply_attribute_mapping(feature, mapping, target_type)
+            attributes = dict(mapped)
+
+            if target_type == 'Site':
+                # Sites have different field names
+                attributes['geometrie_emprise'] = geom
+                attributes['centroid'] = geom.centroid
+                attributes['actif'] = True
+                if 'nom_site' not in attributes:
+                    props = feature.get('properties', {})
+                    attributes['nom_site'] = props.get('name') or props.get('nom') or f"Site Import {idx + 1}"
+                if 'code_site' not in attributes:
+                    attributes['code_site'] = f"SITE_{uuid.uuid4().hex[:8].upper()}"
+            else:
+                attributes['geometry'] = geom
+                if 'nom' not in attributes and 'nom' in OBJECT_FIELDS.get(target_type, []):
+                    attributes['nom'] = f"{target_type} Import {idx + 1}"
+
+            staged.append({'index': idx, 'geom': geom, 'attributes': attributes, 'mapped': mapped})
+        except Exception as e:
+            errors.append({'index': idx, 'error': str(e)})
+
+    return staged, errors
+
+
+# =============================================================================
+# 2. RÉSOLUTION ENSEMBLISTE (une requête PostGIS par lot)
+# =============================================================================
+
+def resolve_sites(batch: List[Dict]) -> Dict[int, int]:
+    """
+    Détecte le site actif de chaque feature du lot par jointure spatiale.
+
+    Un site contenant la géométrie est préféré à un site qui l'intersecte.
+
+    Returns:
+        {position dans le lot: site_id} (positions sans site absentes)
+    """
+    if not batch:
+        return {}
+    site_table = connection.ops.quote_name(Site._meta.db_table)
+    sql = f"""
+        WITH f AS (
+            SELECT u.pos, ST_GeomFromEWKT(u.ewkt) AS geom
+            FROM unnest(%s::int[], %s::text[]) AS u(pos, ewkt)
+        )
+        SELECT DISTINCT ON (f.pos) f.pos, s.id
+        FROM f
+        JOIN {site_table} s
+          ON s.actif
+         AND s.geometrie_emprise && f.geom
+         AND ST_Intersects(s.geometrie_emprise, f.geom)
+        ORDER BY f.pos, ST_Contains(s.geometrie_emprise, f.geom) DESC, s.id
+    """
+    params = [list(range(len(batch))), [row['geom'].ewkt for row in batch]]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(cursor.fetchall())
+
+
+def find_existing_matches(batch: List[Dict], target_type: str,
+                          tolerance_meters: float = DUPLICATE_TOLERANCE_METERS) -> Dict[int, int]:
+    """
+    Version ensembliste de find_existing_match pour un lot de features.
+
+    - Site : même code_site (insensible à la casse), sinon emprise qui intersecte
+    - Objets : même site + nom/marque (selon le type) + distance < tolérance
+
+    Returns:
+        {position dans le lot: id de l'objet existant}
+    """
+    if not batch:
+        return {}
+    qn = connection.ops.quote_name
+    positions = list(range(len(batch)))
+    ewkts = [row['geom'].ewkt for row in batch]
+
+    if target_type == 'Site':
+        sql = f"""
+            WITH f AS (
+                SELECT u.pos, ST_GeomFromEWKT(u.ewkt) AS geom, u.code
+                FROM unnest(%s::int[], %s::text[], %s::text[]) AS u(pos, ewkt, code)
+            )
+            SELECT DISTINCT ON (f.pos) f.pos, s.id
+            FROM f
+            JOIN {qn(Site._meta.db_table)} s
+              ON CASE WHEN f.code IS NOT NULL THEN UPPER(s.code_site) = UPPER(f.code)
+                      ELSE ST_Intersects(s.geometrie_emprise, f.geom) END
+            ORDER BY f.pos, s.id
+        """
+        codes = [row['mapped'].get('code_site') or None for row in batch]
+        params = [positions, ewkts, codes]
+    else:
+        model_class = OBJET_TYPE_MODELS[target_type]
+        label_field = 'nom' if target_type in TYPES_WITH_NOM else 'marque' if target_type in TYPES_WITH_MARQUE else None
+        label_sql = (
+            f"AND (f.label IS NULL OR UPPER(c.{qn(label_field)}) = UPPER(f.label))" if label_field else ""
+        )
+        sql = f"""
+            WITH f AS (
+                SELECT u.pos, ST_GeomFromEWKT(u.ewkt) AS geom, u.site_id, u.label
+                FROM unnest(%s::int[], %s::text[], %s::bigint[], %s::text[]) AS u(pos, ewkt, site_id, label)
+            )
+            SELECT DISTINCT ON (f.pos) f.pos, c.objet_ptr_id
+            FROM f
+            JOIN {qn(model_class._meta.db_table)} c
+              ON c.geometry && ST_Expand(f.geom, %s)
+             AND ST_DWithin(c.geometry::geography, f.geom::geography, %s)
+            JOIN {qn(Objet._meta.db_table)} o ON o.id = c.objet_ptr_id
+            WHERE (f.site_id IS NULL OR o.site_id = f.site_id)
+            {label_sql}
+            ORDER BY f.pos, c.objet_ptr_id
+        """
+        site_ids = [row['attributes'].get('site_id') for row in batch]
+        labels = [(row['mapped'].get(label_field) or None) if label_field else None for row in batch]
+        params = [
+            positions, ewkts, site_ids, labels,
+            _tolerance_degrees(tolerance_meters), tolerance_meters,
+        ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(cursor.fetchall())
+
+
+def find_file_duplicates(rows: List[Dict], target_type: str,
+                         tolerance_meters: float = DUPLICATE_TOLERANCE_METERS) -> Dict[int, int]:
+    """
+    Doublons internes au fichier, avec la même clé que find_existing_matches :
+    une feature qui correspond à une feature précédente du fichier créée est
+    ignorée, comme l'ancien import objet par objet (la seconde trouvait la
+    première en base).
+
+    - Site : même code_site (insensible à la casse), sinon emprise qui intersecte
+    - Objets : même site + nom/marque (selon le type) + distance < tolérance
+
+    Args:
+        rows: Features résolues à créer, dans l'ordre du fichier
+
+    Returns:
+        {position du doublon: position de la feature créée correspondante}
+    """
+    if len(rows) < 2:
+        return {}
+    positions = list(range(len(rows)))
+    ewkts = [row['geom'].ewkt for row in rows]
+
+    if target_type == 'Site':
+        # f.code : code du fichier (clé de recherche), f.stored : code enregistré
+        sql = """
+            WITH f AS (
+                SELECT u.pos, ST_GeomFromEWKT(u.ewkt) AS geom, u.code, u.stored
+                FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[]) AS u(pos, ewkt, code, stored)
+            )
+            SELECT j.pos, i.pos
+            FROM f j
+            JOIN f i
+              ON i.pos < j.pos
+             AND CASE WHEN j.code IS NOT NULL THEN UPPER(i.stored) = UPPER(j.code)
+                      ELSE i.geom && j.geom AND ST_Intersects(i.geom, j.geom) END
+        """
+        params = [
+            positions, ewkts,
+            [row['mapped'].get('code_site') or None for row in rows],
+            [row['attributes'].get('code_site') for row in rows],
+        ]
+    else:
+        label_field = 'nom' if target_type in TYPES_WITH_NOM else 'marque' if target_type in TYPES_WITH_MARQUE else None
+        label_sql = "AND (j.label IS NULL OR UPPER(i.stored) = UPPER(j.label))" if label_field else ""
+        sql = f"""
+            WITH f AS (
+                SELECT u.pos, ST_GeomFromEWKT(u.ewkt) AS geom, u.site_id, u.label, u.stored
+                FROM unnest(%s::int[], %s::text[], %s::bigint[], %s::text[], %s::text[])
+                     AS u(pos, ewkt, site_id, label, stored)
+            )
+            SELECT j.pos, i.pos
+            FROM f j
+            JOIN f i
+              ON i.site_id = j.site_id
+             AND i.pos < j.pos
+             AND i.geom && ST_Expand(j.geom, %s)
+             AND ST_DWithin(i.geom::geography, j.geom::geography, %s)
+            {label_sql}
+        """
+        params = [
+            positions, ewkts,
+            [row['attributes'].get('site_id') for row in rows],
+            [(row['mapped'].get(label_field) or None) if label_field else None for row in rows],
+            [row['attributes'].get(label_field) if label_field else None for row in rows],
+            _tolerance_degrees(tolerance_meters), tolerance_meters,
+        ]
+
+    earlier: Dict[int, List[int]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for j, i in cursor.fetchall():
+            earlier.setdefault(j, []).append(i)
+
+    # Ordre du fichier : une feature n'est doublon que d'une feature créée
+    duplicates: Dict[int, int] = {}
+    for j in sorted(earlier):
+        created = [i for i in sorted(earlier[j]) if i not in duplicates]
+        if created:
+            duplicates[j] = created[0]
+    return duplicates
+
+
+def split_file_duplicates(rows: List[Dict], target_type: str, import_mode: str
+                          ) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Écarte les doublons internes au fichier (mode 'skip_duplicates').
+
+    Returns:
+        (à créer, feature créée répétée par chaque doublon écarté)
+    """
+    if import_mode != 'skip_duplicates':
+        return rows, []
+    duplicates = find_file_duplicates(rows, target_type)
+    to_create = [row for position, row in enumerate(rows) if position not in duplicates]
+    repeated = [rows[canonical] for _, canonical in sorted(duplicates.items())]
+    return to_create, repeated
+
+
+def duplicate_ids(repeated: List[Dict], to_create: List[Dict], created_ids: List[int]) -> List[int]:
+    """IDs signalés pour les doublons du fichier : ceux des features créées qu'ils répètent."""
+    created_by_row = {id(row): pk for row, pk in zip(to_create, created_ids)}
+    return [created_by_row[id(row)] for row in repeated]
+
+
+# =============================================================================
+# 3. ÉCRITURE GROUPÉE
+# =============================================================================
+
+# Lignes enfants par INSERT multi-lignes (paramètres par requête bornés)
+CHILD_INSERT_CHUNK = 500
+
+
+def _insert_child_rows(model_class, children: List) -> None:
+    """
+    INSERT groupé des lignes enfants (objet_ptr_id + champs locaux).
+
+    Django refuse bulk_create sur un modèle à héritage multi-tables et
+    save() insérerait une ligne à la fois (plus une requête par parent) :
+    les lignes parentes existent déjà, on écrit donc directement la table
+    enfant. Les valeurs passent par get_db_prep_save de chaque champ
+    (adaptateur PostGIS pour la géométrie, JSON, dates...), comme un
+    INSERT de l'ORM.
+    """
+    fields = model_class._meta.local_concrete_fields
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in fields)
+    row_placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(children), CHILD_INSERT_CHUNK):
+            chunk = children[start:start + CHILD_INSERT_CHUNK]
+            params = [
+                field.get_db_prep_save(field.pre_save(child, True), connection)
+                for child in chunk for field in fields
+            ]
+            cursor.execute(
+                f"INSERT INTO {qn(model_class._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([row_placeholder] * len(chunk))}",
+                params
+            )
+
+
+def bulk_insert(target_type: str, rows: List[Dict]) -> List[int]:
+    """
+    Insère un lot de features préparées et retourne les IDs créés.
+
+    Pour les 15 types (héritage multi-tables), bulk_create n'est pas supporté
+    par Django : les lignes parentes (api_objet, avec type_objet renseigné
+    explicitement puisque save() n'est pas appelé) sont créées par
+    bulk_create, puis les lignes enfants par un INSERT groupé sur les seuls
+    champs locaux de la table enfant (_insert_child_rows).
+    """
+    if not rows:
+        return []
+
+    if target_type == 'Site':
+        sites = Site.objects.bulk_create([Site(**row['attributes']) for row in rows])
+        site_ids = [site.pk for site in sites]
+        from api.services.search_index import refresh_sites
+        refresh_sites(site_ids)
+        return site_ids
+
+    model_class = OBJET_TYPE_MODELS[target_type]
+    children = [model_class(**row['attributes']) for row in rows]
+
+    parent_fields = [
+        f.attname for f in Objet._meta.concrete_fields
+        if not f.primary_key and f.attname != 'type_objet'
+    ]
+    parents = Objet.objects.bulk_create([
+        Objet(type_objet=target_type, **{name: getattr(child, name) for name in parent_fields})
+        for child in children
+    ])
+
+    for parent, child in zip(parents, children):
+        child.id = parent.pk
+        child.objet_ptr_id = parent.pk
+        child._state.adding = False
+
+    _insert_child_rows(model_class, children)
+
+    # bulk_create n'émet pas post_save : journaliser pour la synchronisation
+    # et indexer pour la recherche et les facettes de l'inventaire
+    from api_planification.sync import ENTITE_OBJET, record_changes
+    from api.services.inventory_facets import mark_facets_dirty
+    from api.services.search_index import refresh_objets
+    created_ids = [parent.pk for parent in parents]
+    record_changes(ENTITE_OBJET, created_ids)
+    refresh_objets(created_ids)
+    mark_facets_dirty(target_type, {parent.site_id for parent in parents})
+    return created_ids
+
+
+def resolve_batch(batch: List[Dict], target_type: str, site: Optional[Site] = None, sous_site=None,
+                  auto_detect_site: bool = False, import_mode: str = 'create'
+                  ) -> Tuple[List[Dict], List[int], List[Dict]]:
+    """
+    Résout le site et les doublons d'un lot de features préparées.
+
+    Returns:
+        (à créer, IDs existants ignorés, erreurs)
+    """
+    if target_type != 'Site':
+        detected = resolve_sites(batch) if auto_detect_site else {}
+        for position, row in enumerate(batch):
+            if auto_detect_site:
+                row['attributes']['site_id'] = detected.get(position)
+            else:
+                row['attributes']['site_id'] = site.pk if site else None
+            if sous_site:
+                row['attributes']['sous_site_id'] = sous_site.pk
+
+    matched = {}
+    if import_mode == 'skip_duplicates':
+        candidates = [
+            row for row in batch
+            if target_type == 'Site' or row['attributes']['site_id'] is not None
+        ]
+        matches = find_existing_matches(candidates, target_type)
+        matched = {id(candidates[position]): match_id for position, match_id in matches.items()}
+
+    to_create, skipped_ids, errors = [], [], []
+    for row in batch:
+        if target_type != 'Site' and row['attributes']['site_id'] is None:
+            errors.append({'index': row['index'], 'error': 'Geometry is not within any site boundary'})
+        elif id(row) in matched:
+            skipped_ids.append(matched[id(row)])
+        else:
+            to_create.append(row)
+    return to_create, skipped_ids, errors
+
+
+def invalidate_import_caches(target_type: str, site_ids) -> None:
+    """bulk_create ne déclenche pas post_save : invalider explicitement."""
+    from greensig_web.cache_utils import invalidate_on_gis_object_mutation, invalidate_on_site_mutation
+
+    if target_type == 'Site':
+        invalidate_on_site_mutation()
+    else:
+        invalidate_on_gis_object_mutation(*site_ids)
+
+
+# =============================================================================
+# POINT D'ENTRÉE
+# =============================================================================
+
+def run_bulk_import(
+    features: List[Dict],
+    mapping: Dict,
+    target_type: str,
+    site: Optional[Site] = None,
+    sous_site=None,
+    auto_detect_site: bool = False,
+    import_mode: str = 'create',
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Importe des features par lots.
+
+    Args:
+        features: Features parsées ({'index', 'geometry', 'properties'})
+        mapping: Mapping attribut cible -> attribut source
+        target_type: 'Site' ou l'un des 15 types d'objets
+        site: Site de rattachement (ignoré si auto_detect_site)
+        sous_site: Sous-site optionnel
+        auto_detect_site: Détecter le site de chaque feature par jointure spatiale
+        import_mode: 'create' ou 'skip_duplicates'
+        batch_size: Taille des lots (requêtes de résolution et INSERT)
+        progress: Callback de progression (phase, traités, total)
+
+    Returns:
+        Même structure que la réponse de GeoImportExecuteView :
+        {created, skipped, errors, summary, rolled_back}
+    """
+    total = len(features)
+
+    def report(phase, done):
+        if progress:
+            progress(phase, done, total)
+
+    staged, errors = stage_features(features, mapping, target_type)
+    report('staged', total)
+
+    # Résolution des sites et des doublons, lot par lot (aucune écriture)
+    to_create = []
+    skipped_ids = []
+    validated = len(errors)
+    for batch in batches(staged, batch_size):
+        batch_create, batch_skipped, batch_errors = resolve_batch(
+            batch, target_type, site, sous_site, auto_detect_site, import_mode
+        )
+        to_create.extend(batch_create)
+        skipped_ids.extend(batch_skipped)
+        errors.extend(batch_errors)
+
+        validated += len(batch)
+        report('validated', validated)
+
+    def result(created_ids, rolled_back):
+        errors.sort(key=lambda e: e['index'])
+        return {
+            'created': created_ids,
+            'skipped': skipped_ids,
+            'errors': errors,
+            'summary': {
+                'total': total,
+                'created': len(created_ids),
+                'skipped': len(skipped_ids),
+                'failed': len(errors),
+            },
+            'rolled_back': rolled_back,
+        }
+
+    # Tout ou rien : aucune écriture si une feature est invalide
+    if errors:
+        return result([], True)
+
+    # Doublons internes au fichier (les doublons en base sont déjà écartés)
+    to_create, repeated = split_file_duplicates(to_create, target_type, import_mode)
+
+    created_ids = []
+    with transaction.atomic():
+        for batch in batches(to_create, batch_size):
+            created_ids.extend(bulk_insert(target_type, batch))
+            report('inserted', len(created_ids))
+
+    skipped_ids.extend(duplicate_ids(repeated, to_create, created_ids))
+
+    site_ids = {row['attributes'].get('site_id') for row in to_create}
+    transaction.on_commit(lambda: invalidate_import_caches(target_type, site_ids))
+
+    logger.info(
+        f"[BULK_IMPORT] {target_type}: {len(created_ids)} créé(s), "
+        f"{len(skipped_ids)} ignoré(s) sur {total} feature(s)"
+    )
+    return result(created_ids, False)
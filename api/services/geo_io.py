@@ -4,13 +4,15 @@ Service for geo data import/export operations.
 Handles GeoJSON, KML, and Shapefile formats.
 """
 
+import datetime
 import json
 import zipfile
 import tempfile
 import os
 from io import BytesIO
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Tuple
 from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
 
 import logging
 
@@ -18,6 +20,8 @@ from django.contrib.gis.geos import (
     GEOSGeometry, Point, Polygon, LineString,
     MultiPolygon, MultiLineString, MultiPoint
 )
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -615,149 +619,215 @@ def parse_shapefile(file_content: bytes) -> Dict[str, Any]:
 # EXPORT FUNCTIONS
 # ==============================================================================
 
-def export_to_geojson(queryset, serializer_class=None) -> Dict:
-    """
-    Export a queryset to GeoJSON format.
+# Taille des lots lus en base par les exports (QuerySet.iterator) :
+# la mémoire utilisée reste constante quel que soit le nombre d'objets
+EXPORT_CHUNK_SIZE = 2000
 
-    Args:
-        queryset: Django queryset of geo objects
-        serializer_class: Optional DRF serializer to use
+GEOMETRY_FIELD_NAMES = ('geometry', 'geometrie', 'geometrie_emprise', 'centroid')
 
-    Returns:
-        GeoJSON FeatureCollection dict
+
+def _get_geometry(obj):
+    """Return the main geometry of an object (geometry, geometrie or geometrie_emprise)."""
+    for field_name in ('geometry', 'geometrie', 'geometrie_emprise'):
+        if hasattr(obj, field_name):
+            return getattr(obj, field_name)
+    return None
+
+
+def _prepare_export_queryset(queryset):
     """
-    features = []
+    Select the foreign keys used in properties (names) in the same query,
+    so that streaming exports never issue one query per object.
+    """
+    related = [
+        field.name for field in queryset.model._meta.fields
+        if field.is_relation and (field.many_to_one or field.one_to_one)
+        and not field.remote_field.parent_link
+    ]
+    return queryset.select_related(*related) if related else queryset
 
-    for obj in queryset:
-        # Get geometry
-        geometry = None
-        if hasattr(obj, 'geometry'):
-            geometry = obj.geometry
-        elif hasattr(obj, 'geometrie'):
-            geometry = obj.geometrie
-        elif hasattr(obj, 'geometrie_emprise'):
-            geometry = obj.geometrie_emprise
-
-        if geometry is None:
-            continue
 
-        # Build properties
-        properties = {}
-        for field in obj._meta.fields:
-            field_name = field.name
-            if field_name in ('geometry', 'geometrie', 'geometrie_emprise', 'centroid'):
+def _iter_export_objects(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Iterate over a queryset in chunks (server-side cursor, no result cache)."""
+    return _prepare_export_queryset(queryset).iterator(chunk_size=chunk_size)
+
+
+def _geojson_properties(obj) -> Dict:
+    """Build the GeoJSON properties of an object (FKs as ids + related names)."""
+    properties = {}
+    for field in obj._meta.fields:
+        field_name = field.name
+        if field_name in GEOMETRY_FIELD_NAMES:
+            continue
+        if field.is_relation:
+            # attname : l'ID est lu sans requête supplémentaire
+            value = getattr(obj, field.attname)
+            if value is None:
+                continue
+            properties[field_name] = value
+            if field.remote_field.parent_link:
                 continue
+            related = getattr(obj, field_name)
+            if hasattr(related, 'nom'):
+                properties[f'{field_name}_nom'] = related.nom
+            elif hasattr(related, 'nom_site'):
+                properties[f'{field_name}_nom'] = related.nom_site
+        else:
             value = getattr(obj, field_name)
-            # Handle FK
-            if hasattr(value, 'pk'):
-                properties[field_name] = value.pk
-                if hasattr(value, 'nom'):
-                    properties[f'{field_name}_nom'] = value.nom
-                elif hasattr(value, 'nom_site'):
-                    properties[f'{field_name}_nom'] = value.nom_site
-            elif value is not None:
+            if value is not None:
                 properties[field_name] = value
 
-        # Add object type
-        properties['object_type'] = obj.__class__.__name__
+    # Add object type
+    properties['object_type'] = obj.__class__.__name__
+    return properties
 
-        feature = {
-            'type': 'Feature',
-            'id': obj.pk,
-            'geometry': json.loads(geometry.geojson),
-            'properties': properties,
-        }
-        features.append(feature)
 
+def _geojson_feature(obj) -> Optional[Dict]:
+    """Build a GeoJSON feature for an object (None if it has no geometry)."""
+    geometry = _get_geometry(obj)
+    if geometry is None:
+        return None
     return {
-        'type': 'FeatureCollection',
-        'features': features,
+        'type': 'Feature',
+        'id': obj.pk,
+        'geometry': json.loads(geometry.geojson),
+        'properties': _geojson_properties(obj),
     }
 
 
-def export_to_kml(queryset) -> str:
+def iter_geojson(queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
     """
-    Export a queryset to KML format.
+    Stream a queryset as a GeoJSON FeatureCollection.
+
+    Yields text fragments (header, one feature at a time, footer) that can be
+    written to a file or passed to a StreamingHttpResponse.
+    """
+    yield '{"type": "FeatureCollection", "features": [\n'
+    first = True
+    for obj in _iter_export_objects(queryset, chunk_size):
+        feature = _geojson_feature(obj)
+        if feature is None:
+            continue
+        prefix = '' if first else ',\n'
+        first = False
+        yield prefix + json.dumps(feature, ensure_ascii=False, cls=DjangoJSONEncoder)
+    yield '\n]}\n'
+
+
+def export_to_geojson(queryset, serializer_class=None) -> Dict:
+    """
+    Export a queryset to GeoJSON format.
+
+    Builds the whole collection in memory: use iter_geojson() for large exports.
 
     Args:
         queryset: Django queryset of geo objects
+        serializer_class: Optional DRF serializer to use
 
     Returns:
-        KML string
+        GeoJSON FeatureCollection dict
     """
-    kml_header = '''<?xml version="1.0" encoding="UTF-8"?>
+    features = []
+    for obj in _iter_export_objects(queryset):
+        feature = _geojson_feature(obj)
+        if feature is not None:
+            features.append(feature)
+
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+    }
+
+
+KML_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
 <kml xmlns="http://www.opengis.net/kml/2.2">
 <Document>
 <name>GreenSIG Export</name>
 '''
-    kml_footer = '''</Document>
+KML_FOOTER = '''</Document>
 </kml>'''
 
-    placemarks = []
-
-    for obj in queryset:
-        # Get geometry
-        geometry = None
-        if hasattr(obj, 'geometry'):
-            geometry = obj.geometry
-        elif hasattr(obj, 'geometrie'):
-            geometry = obj.geometrie
-        elif hasattr(obj, 'geometrie_emprise'):
-            geometry = obj.geometrie_emprise
 
-        if geometry is None:
-            continue
+def _kml_placemark(obj) -> Optional[str]:
+    """Build the KML Placemark of an object (None if it has no geometry)."""
+    geometry = _get_geometry(obj)
+    if geometry is None:
+        return None
 
-        # Get name
-        name = getattr(obj, 'nom', None) or getattr(obj, 'nom_site', None) or f"{obj.__class__.__name__} {obj.pk}"
+    # Get name
+    name = getattr(obj, 'nom', None) or getattr(obj, 'nom_site', None) or f"{obj.__class__.__name__} {obj.pk}"
 
-        # Build KML geometry
-        kml_geom = ""
-        if geometry.geom_type == 'Point':
-            coords = f"{geometry.x},{geometry.y},0"
-            kml_geom = f"<Point><coordinates>{coords}</coordinates></Point>"
+    # Build KML geometry
+    kml_geom = ""
+    if geometry.geom_type == 'Point':
+        coords = f"{geometry.x},{geometry.y},0"
+        kml_geom = f"<Point><coordinates>{coords}</coordinates></Point>"
 
-        elif geometry.geom_type == 'LineString':
-            coords = " ".join([f"{c[0]},{c[1]},0" for c in geometry.coords])
-            kml_geom = f"<LineString><coordinates>{coords}</coordinates></LineString>"
+    elif geometry.geom_type == 'LineString':
+        coords = " ".join([f"{c[0]},{c[1]},0" for c in geometry.coords])
+        kml_geom = f"<LineString><coordinates>{coords}</coordinates></LineString>"
 
-        elif geometry.geom_type == 'Polygon':
-            coords = " ".join([f"{c[0]},{c[1]},0" for c in geometry.exterior_ring.coords])
-            kml_geom = f"""<Polygon>
+    elif geometry.geom_type == 'Polygon':
+        coords = " ".join([f"{c[0]},{c[1]},0" for c in geometry.exterior_ring.coords])
+        kml_geom = f"""<Polygon>
 <outerBoundaryIs><LinearRing><coordinates>{coords}</coordinates></LinearRing></outerBoundaryIs>
 </Polygon>"""
 
-        # Build description
-        desc_parts = []
-        for field in obj._meta.fields:
-            field_name = field.name
-            if field_name in ('geometry', 'geometrie', 'geometrie_emprise', 'centroid', 'id'):
-                continue
-            value = getattr(obj, field_name)
-            if value is not None and not hasattr(value, 'pk'):
-                desc_parts.append(f"{field_name}: {value}")
-        description = "<br/>".join(desc_parts)
+    # Build description
+    desc_parts = []
+    for field in obj._meta.fields:
+        field_name = field.name
+        if field_name in GEOMETRY_FIELD_NAMES or field_name == 'id' or field.is_relation:
+            continue
+        value = getattr(obj, field_name)
+        if value is not None:
+            desc_parts.append(f"{field_name}: {value}")
+    description = "<br/>".join(desc_parts)
 
-        placemark = f"""<Placemark>
-<name>{name}</name>
+    return f"""<Placemark>
+<name>{xml_escape(str(name))}</name>
 <description><![CDATA[{description}]]></description>
 {kml_geom}
 </Placemark>"""
-        placemarks.append(placemark)
 
-    return kml_header + "\n".join(placemarks) + kml_footer
 
+def iter_kml(queryset, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Stream a queryset as a KML document, one Placemark at a time."""
+    yield KML_HEADER
+    first = True
+    for obj in _iter_export_objects(queryset, chunk_size):
+        placemark = _kml_placemark(obj)
+        if placemark is None:
+            continue
+        yield placemark if first else "\n" + placemark
+        first = False
+    yield KML_FOOTER
 
-def export_to_shapefile(queryset, filename: str = 'export') -> bytes:
+
+def export_to_kml(queryset) -> str:
     """
-    Export a queryset to Shapefile format (ZIP).
+    Export a queryset to KML format.
 
     Args:
         queryset: Django queryset of geo objects
-        filename: Base filename for the shapefile
 
     Returns:
-        ZIP file bytes containing .shp, .shx, .dbf, .prj
+        KML string
+    """
+    return ''.join(iter_kml(queryset))
+
+
+def write_shapefile(queryset, fileobj: BinaryIO, filename: str = 'export',
+                    chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """
+    Write a queryset as a zipped Shapefile into a binary file object.
+
+    Features are written one by one to a temporary directory by Fiona, then
+    the components are zipped into fileobj: memory does not grow with the
+    number of objects.
+
+    Returns:
+        Number of features written
     """
     try:
         import fiona
@@ -770,32 +840,25 @@ def export_to_shapefile(queryset, filename: str = 'export') -> bytes:
     if not first_obj:
         raise ValueError("Empty queryset")
 
-    geometry = None
-    if hasattr(first_obj, 'geometry'):
-        geometry = first_obj.geometry
-    elif hasattr(first_obj, 'geometrie'):
-        geometry = first_obj.geometrie
-    elif hasattr(first_obj, 'geometrie_emprise'):
-        geometry = first_obj.geometrie_emprise
-
+    geometry = _get_geometry(first_obj)
     if geometry is None:
         raise ValueError("No geometry found on objects")
 
-    geom_type = geometry.geom_type
-
     # Build schema from model fields
     schema = {
-        'geometry': geom_type,
+        'geometry': geometry.geom_type,
         'properties': {}
     }
+    fields = []
 
     for field in first_obj._meta.fields:
         field_name = field.name
-        if field_name in ('geometry', 'geometrie', 'geometrie_emprise', 'centroid'):
+        if field_name in GEOMETRY_FIELD_NAMES:
             continue
 
         # Truncate field name to 10 chars for DBF
         short_name = field_name[:10]
+        fields.append((field, short_name))
 
         # Map Django field types to Fiona types
         field_type = field.get_internal_type()
@@ -808,7 +871,7 @@ def export_to_shapefile(queryset, filename: str = 'export') -> bytes:
         else:
             schema['properties'][short_name] = 'str'
 
-    # Create temp directory
+    count = 0
     with tempfile.TemporaryDirectory() as tmpdir:
         shp_path = os.path.join(tmpdir, f"{filename}.shp")
 
@@ -819,53 +882,89 @@ def export_to_shapefile(queryset, filename: str = 'export') -> bytes:
             crs=from_epsg(4326),
             schema=schema
         ) as dst:
-            for obj in queryset:
-                # Get geometry
-                geom = None
-                if hasattr(obj, 'geometry'):
-                    geom = obj.geometry
-                elif hasattr(obj, 'geometrie'):
-                    geom = obj.geometrie
-                elif hasattr(obj, 'geometrie_emprise'):
-                    geom = obj.geometrie_emprise
-
+            for obj in queryset.iterator(chunk_size=chunk_size):
+                geom = _get_geometry(obj)
                 if geom is None:
                     continue
 
-                # Build properties
-                props = {}
-                for field in obj._meta.fields:
-                    field_name = field.name
-                    if field_name in ('geometry', 'geometrie', 'geometrie_emprise', 'centroid'):
-                        continue
-
-                    short_name = field_name[:10]
-                    value = getattr(obj, field_name)
-
-                    # Handle FK
-                    if hasattr(value, 'pk'):
-                        props[short_name] = value.pk
-                    elif value is not None:
-                        props[short_name] = value
-                    else:
-                        props[short_name] = None
-
-                # Write feature
+                # Build properties (FK: ID via attname, no extra query)
+                props = {
+                    short_name: getattr(obj, field.attname)
+                    for field, short_name in fields
+                }
+
                 dst.write({
                     'geometry': json.loads(geom.geojson),
                     'properties': props,
                 })
+                count += 1
 
-        # Create ZIP with all shapefile components
-        buffer = BytesIO()
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # ZIP all shapefile components
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
             for ext in ['.shp', '.shx', '.dbf', '.prj', '.cpg']:
                 filepath = os.path.join(tmpdir, f"{filename}{ext}")
                 if os.path.exists(filepath):
                     zf.write(filepath, f"{filename}{ext}")
 
-        buffer.seek(0)
-        return buffer.getvalue()
+    return count
+
+
+def export_to_shapefile(queryset, filename: str = 'export') -> bytes:
+    """
+    Export a queryset to Shapefile format (ZIP).
+
+    Args:
+        queryset: Django queryset of geo objects
+        filename: Base filename for the shapefile
+
+    Returns:
+        ZIP file bytes containing .shp, .shx, .dbf, .prj
+    """
+    buffer = BytesIO()
+    write_shapefile(queryset, buffer, filename)
+    return buffer.getvalue()
+
+
+def _xlsx_value(value):
+    """Convert a DB value to a type accepted by openpyxl."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        # Excel ne gère pas les fuseaux horaires
+        return timezone.make_naive(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return value
+
+
+def write_xlsx(queryset, fileobj, title: str = 'Export',
+               chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """
+    Write a queryset as an XLSX sheet into a file path or binary file object.
+
+    Uses openpyxl write-only mode: rows are flushed to disk as they are
+    appended, and values are read with values_list().iterator(), so memory
+    stays constant. Geometry columns are not exported.
+
+    Returns:
+        Number of rows written
+    """
+    from openpyxl import Workbook
+
+    columns = [
+        field.attname for field in queryset.model._meta.concrete_fields
+        if field.name not in GEOMETRY_FIELD_NAMES
+    ]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])  # Excel limite à 31 caractères
+    ws.append(columns)
+
+    count = 0
+    for row in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+        ws.append([_xlsx_value(value) for value in row])
+        count += 1
+
+    wb.save(fileobj)
+    return count
 
 
 # ==============================================================================
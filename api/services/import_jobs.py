@@ -0,0 +1,181 @@
+# api/services/import_jobs.py
+"""
+Exécution des jobs d'import asynchrones (modèle ImportJob, tâche Celery
+api.tasks.import_job_async).
+
+Étapes :
+1. Analyse : le fichier stocké est parsé une seule fois, les features sont
+   sauvegardées en JSON (fichier_features)
+2. Validation : préparation + résolution site/doublons de tous les lots,
+   sans écriture (l'import reste « tout ou rien » vis-à-vis des erreurs)
+3. Import : un lot = une transaction, commitée avec le point de reprise
+   (last_batch) et les compteurs du job
+
+Une reprise après échec relit les features JSON et repart du lot suivant
+last_batch, sans re-parser le fichier ni ré-insérer les lots commités.
+"""
+
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+
+from api.models import ImportJob, Site, SousSite
+from .bulk_import import (
+    batches, bulk_insert, duplicate_ids, invalidate_import_caches, resolve_batch,
+    split_file_duplicates, stage_features,
+)
+from .geo_io import parse_geojson, parse_kml, parse_shapefile
+
+logger = logging.getLogger(__name__)
+
+PARSERS = {
+    'geojson': parse_geojson,
+    'kml': parse_kml,
+    'shapefile': parse_shapefile,
+}
+
+
+def detect_import_format(filename: str, file_format: str = '') -> Optional[str]:
+    """Format d'import à partir du paramètre explicite ou de l'extension."""
+    file_format = (file_format or '').lower()
+    if file_format and file_format != 'auto':
+        return file_format if file_format in PARSERS else None
+
+    filename = filename.lower()
+    if filename.endswith('.geojson') or filename.endswith('.json'):
+        return 'geojson'
+    if filename.endswith('.kml') or filename.endswith('.kmz'):
+        return 'kml'
+    if filename.endswith('.zip'):
+        return 'shapefile'
+    return None
+
+
+def _set_status(job: ImportJob, statut: str, **fields) -> None:
+    job.statut = statut
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=['statut', 'updated_at', *fields.keys()])
+
+
+def load_features(job: ImportJob) -> List[Dict]:
+    """
+    Retourne les features du job : relues depuis le JSON si le fichier a déjà
+    été parsé, sinon parsées puis sauvegardées.
+    """
+    if job.fichier_features:
+        with job.fichier_features.open('rb') as f:
+            return json.load(f)
+
+    _set_status(job, 'analyse')
+    with job.fichier.open('rb') as f:
+        content = f.read()
+    result = PARSERS[job.format_fichier](content)
+    features = result.get('features', [])
+
+    if result.get('errors') and not features:
+        raise ValueError('; '.join(str(e) for e in result['errors'][:10]))
+
+    job.fichier_features.save(
+        f"job_{job.pk}_features.json",
+        ContentFile(json.dumps(features).encode('utf-8')),
+        save=False,
+    )
+    job.total_features = len(features)
+    job.parsed_count = len(features)
+    job.save(update_fields=['fichier_features', 'total_features', 'parsed_count', 'updated_at'])
+    return features
+
+
+def run_import_job(job: ImportJob, progress: Optional[Callable[[ImportJob], None]] = None) -> ImportJob:
+    """
+    Exécute (ou reprend) un job d'import.
+
+    Args:
+        job: Job à exécuter
+        progress: Callback appelé avec le job après chaque étape / lot
+
+    Returns:
+        Le job mis à jour (statut 'termine' ou 'echec')
+    """
+    def report():
+        if progress:
+            progress(job)
+
+    options = job.options or {}
+    target_type = job.target_type
+    import_mode = options.get('import_mode', 'create')
+    auto_detect_site = bool(options.get('auto_detect_site'))
+    site = Site.objects.get(pk=options['site_id']) if options.get('site_id') and not auto_detect_site else None
+    sous_site = SousSite.objects.get(pk=options['sous_site_id']) if options.get('sous_site_id') else None
+
+    features = load_features(job)
+    report()
+
+    staged, errors = stage_features(features, job.mapping or {}, target_type)
+    staged_batches = list(batches(staged, job.batch_size))
+
+    # Validation complète avant la première écriture (sautée lors d'une reprise)
+    if job.last_batch < 0:
+        _set_status(job, 'validation', validated_count=0)
+        validated = len(errors)
+        for batch in staged_batches:
+            _, _, batch_errors = resolve_batch(
+                batch, target_type, site, sous_site, auto_detect_site, import_mode
+            )
+            errors.extend(batch_errors)
+            validated += len(batch)
+            job.validated_count = validated
+            job.save(update_fields=['validated_count', 'updated_at'])
+            report()
+
+        if errors:
+            errors.sort(key=lambda e: e['index'])
+            _set_status(job, 'echec', errors=errors, message_erreur=f"{len(errors)} feature(s) invalide(s)")
+            report()
+            return job
+
+    _set_status(job, 'import')
+    report()
+
+    # Un lot = une transaction, commitée avec le point de reprise
+    site_ids = set()
+    for number, batch in enumerate(staged_batches):
+        if number <= job.last_batch:
+            continue
+
+        to_create, skipped_ids, batch_errors = resolve_batch(
+            batch, target_type, site, sous_site, auto_detect_site, import_mode
+        )
+        if batch_errors:
+            raise ValueError(f"Lot {number}: {batch_errors[0]['error']}")
+
+        # Doublons du lot entre eux (les lots précédents sont déjà en base)
+        to_create, repeated = split_file_duplicates(to_create, target_type, import_mode)
+
+        with transaction.atomic():
+            created_ids = bulk_insert(target_type, to_create)
+            skipped_ids = skipped_ids + duplicate_ids(repeated, to_create, created_ids)
+            ImportJob.objects.filter(pk=job.pk).update(
+                last_batch=number,
+                inserted_count=F('inserted_count') + len(created_ids),
+                skipped_count=F('skipped_count') + len(skipped_ids),
+            )
+
+        job.refresh_from_db(fields=['last_batch', 'inserted_count', 'skipped_count'])
+        site_ids.update(row['attributes'].get('site_id') for row in to_create)
+        report()
+
+    invalidate_import_caches(target_type, site_ids)
+    _set_status(job, 'termine')
+    report()
+
+    logger.info(
+        f"[IMPORT_JOB] #{job.pk} {target_type}: {job.inserted_count} inseres, "
+        f"{job.skipped_count} ignores sur {job.total_features}"
+    )
+    return job
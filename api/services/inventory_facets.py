@@ -0,0 +1,193 @@
+# api/services/inventory_facets.py
+"""
+Facettes matérialisées de l'inventaire (modèle FacetteInventaire).
+
+Les options de filtrage (familles, matériaux, types d'équipement, états)
+et les plages numériques (surface, diamètre, profondeur, densité) sont
+stockées par (site, type d'objet, attribut), avec le nombre d'objets par
+valeur. GET /api/inventory/filter-options/ les agrège pour le périmètre de
+l'utilisateur en une requête, au lieu d'un DISTINCT / MIN / MAX par modèle.
+
+Mise à jour :
+- Incrémentale : les signals des 15 types d'objets (api/signals.py) et
+  l'import en masse marquent les couples (site, type) touchés ; seules
+  ces tranches sont recalculées (un INSERT ... SELECT GROUP BY par type),
+  après le commit de la transaction.
+- Complète : `python manage.py rebuild_inventory_facets` (au déploiement
+  après `migrate`, et après une mise à jour en masse par .update(), qui
+  n'émet pas de signal).
+"""
+
+import logging
+import threading
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+
+logger = logging.getLogger(__name__)
+
+# Attributs texte : une facette par valeur distincte (champ de la table enfant,
+# sauf etat porté par api_objet)
+ATTRIBUTS_TEXTE = ('famille', 'materiau', 'type')
+ATTRIBUT_ETAT = 'etat'
+
+# Attributs numériques : nombre d'objets renseignés et plage
+ATTRIBUTS_NUMERIQUES = ('area_sqm', 'diametre', 'profondeur', 'densite')
+
+_pending = threading.local()
+
+
+def _attributs(model) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Attributs texte et numériques d'un modèle → colonnes de la table enfant."""
+    colonnes = {f.name: f.column for f in model._meta.local_concrete_fields}
+    texte = {nom: colonnes[nom] for nom in ATTRIBUTS_TEXTE if nom in colonnes}
+    numerique = {nom: colonnes[nom] for nom in ATTRIBUTS_NUMERIQUES if nom in colonnes}
+    return texte, numerique
+
+
+def _lock_type(type_objet: str) -> None:
+    """Verrou transactionnel PostgreSQL : un seul recalcul d'un type à la fois."""
+    lock_id = zlib.crc32(f"facettes_inventaire:{type_objet}".encode())
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_id])
+
+
+# ==============================================================================
+# RECALCUL
+# ==============================================================================
+
+def refresh_facettes(type_objet: str, site_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recalcule les facettes d'un type d'objet.
+
+    Args:
+        type_objet: Nom du modèle ('Arbre', 'Vanne', ...)
+        site_ids: Sites à recalculer ; None = tous les sites
+
+    Returns:
+        Nombre de lignes écrites
+    """
+    from api.models import OBJET_TYPE_MODELS, FacetteInventaire, Objet
+
+    model = OBJET_TYPE_MODELS[type_objet]
+    if site_ids is not None:
+        site_ids = [pk for pk in set(site_ids) if pk]
+        if not site_ids:
+            return 0
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    objets = qn(Objet._meta.db_table)
+    texte, numerique = _attributs(model)
+
+    selects = [
+        f"SELECT o.site_id, '{ATTRIBUT_ETAT}', o.etat, count(*), NULL::float, NULL::float "
+        f"FROM base o GROUP BY o.site_id, o.etat"
+    ]
+    for nom, colonne in texte.items():
+        selects.append(
+            f"SELECT o.site_id, '{nom}', o.{qn(colonne)}, count(*), NULL::float, NULL::float "
+            f"FROM base o WHERE o.{qn(colonne)} <> '' GROUP BY o.site_id, o.{qn(colonne)}"
+        )
+    for nom, colonne in numerique.items():
+        selects.append(
+            f"SELECT o.site_id, '{nom}', '', count(*), min(o.{qn(colonne)}), max(o.{qn(colonne)}) "
+            f"FROM base o WHERE o.{qn(colonne)} IS NOT NULL GROUP BY o.site_id"
+        )
+
+    scope_sql = 'AND p.site_id = ANY(%s)' if site_ids is not None else ''
+    params = [site_ids] if site_ids is not None else []
+    sql = f"""
+        WITH base AS MATERIALIZED (
+            SELECT p.site_id, p.etat, c.*
+            FROM {table} c
+            JOIN {objets} p ON p.id = c.objet_ptr_id
+            WHERE TRUE {scope_sql}
+        )
+        INSERT INTO {qn(FacetteInventaire._meta.db_table)}
+            (site_id, attribut, valeur, nombre, valeur_min, valeur_max, type_objet)
+        SELECT f.*, %s FROM ({' UNION ALL '.join(selects)}) f
+    """
+
+    with transaction.atomic():
+        _lock_type(type_objet)
+        existing = FacetteInventaire.objects.filter(type_objet=type_objet)
+        if site_ids is not None:
+            existing = existing.filter(site_id__in=site_ids)
+        existing.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [type_objet])
+            return cursor.rowcount
+
+
+def rebuild_inventory_facets() -> int:
+    """Recalcule toutes les facettes, type par type."""
+    from api.models import OBJET_TYPE_MODELS
+
+    return sum(refresh_facettes(type_objet) for type_objet in OBJET_TYPE_MODELS)
+
+
+# ==============================================================================
+# RECALCUL INCRÉMENTAL (signals, import en masse)
+# ==============================================================================
+
+def mark_facets_dirty(type_objet: str, site_ids: Iterable[Optional[int]]) -> None:
+    """Planifie le recalcul des facettes (site, type) après le commit."""
+    slices = {(type_objet, site_id) for site_id in site_ids if site_id}
+    if not slices:
+        return
+
+    pending = getattr(_pending, 'slices', None)
+    if pending is None:
+        pending = _pending.slices = set()
+    pending.update(slices)
+    # Un callback par appel : après un rollback, les couples restés en
+    # attente sont repris au commit suivant.
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    pending = getattr(_pending, 'slices', None)
+    if not pending:
+        return
+    _pending.slices = set()
+
+    by_type: Dict[str, set] = {}
+    for type_objet, site_id in pending:
+        by_type.setdefault(type_objet, set()).add(site_id)
+
+    for type_objet, site_ids in by_type.items():
+        try:
+            refresh_facettes(type_objet, site_ids)
+        except Exception:
+            logger.exception(f"[FACETTES] Echec du recalcul {type_objet} (sites {sorted(site_ids)})")
+
+
+# ==============================================================================
+# LECTURE
+# ==============================================================================
+
+def get_facets(site_condition) -> Dict[Tuple[str, str], list]:
+    """
+    Facettes agrégées sur les sites visibles, en une requête.
+
+    Args:
+        site_condition: Condition Q sur site_id (AccessScope.site_condition)
+
+    Returns:
+        {(type_objet, attribut): [(valeur, nombre, min, max), ...]}
+    """
+    from api.models import FacetteInventaire
+
+    rows = (
+        FacetteInventaire.objects.filter(site_condition)
+        .values('type_objet', 'attribut', 'valeur')
+        .annotate(total=Sum('nombre'), vmin=Min('valeur_min'), vmax=Max('valeur_max'))
+        .values_list('type_objet', 'attribut', 'valeur', 'total', 'vmin', 'vmax')
+    )
+    facets: Dict[Tuple[str, str], list] = {}
+    for type_objet, attribut, valeur, total, vmin, vmax in rows:
+        facets.setdefault((type_objet, attribut), []).append((valeur, total, vmin, vmax))
+    return facets
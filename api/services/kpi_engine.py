@@ -0,0 +1,500 @@
+# api/services/kpi_engine.py
+"""
+Moteur de calcul des 6 KPIs (voir api/kpi_view.py) sur une plage de mois.
+
+Le calcul se fait en deux temps :
+
+1. compute_components() : composantes ADDITIVES (effectifs, sommes de notes,
+   de délais, d'heures) groupées par (mois, site, structure). Une requête
+   groupée par KPI (5 au total), quel que soit le nombre de mois ou de sites.
+   Ce sont les lignes stockées dans la table de cumuls KPIMensuel.
+2. combine_components() : somme des composantes d'un périmètre (site, rôle)
+   puis calcul des taux et moyennes, dans le format attendu par les vues.
+
+Une tâche est rattachée à chacun des sites de ses objets (couples
+(tâche, site) distincts) : chaque ligne (mois, site) ne dépend que de son
+site, et un recalcul partiel par site reste exact.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import (
+    Count, DurationField, ExpressionWrapper, F, Q, Sum,
+)
+from django.db.models.functions import Coalesce, TruncMonth
+
+STATUTS_RECLAMATION_CLOTUREE = ['CLOTUREE', 'RESOLUE']
+TOLERANCE_RETARD = timedelta(days=7)
+
+# Composantes scalaires (colonnes de KPIMensuel)
+COMPONENT_FIELDS = [
+    'taches_terminees', 'taches_dans_delais',
+    'evaluations', 'evaluations_satisfaites', 'somme_notes',
+    'reclamations_ouvertes', 'reclamations_ouvertes_fermees',
+    'heures_totales', 'nb_interventions',
+]
+# Composantes par type (JSON {type_id: [heures, nombre]})
+COMPONENT_JSON_FIELDS = ['delais_par_type', 'temps_par_type_tache']
+
+# Clé d'une ligne de composantes : ('YYYY-MM', site_id, structure_id)
+ComponentKey = Tuple[str, Optional[int], Optional[int]]
+
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def month_key(value) -> str:
+    """Clé 'YYYY-MM' d'une date / datetime."""
+    return value.strftime('%Y-%m')
+
+
+def _hours(delta: Optional[timedelta]) -> Optional[float]:
+    return delta.total_seconds() / 3600 if delta is not None else None
+
+
+def _json_key(value) -> str:
+    """Clé JSON d'un identifiant (None → '')."""
+    return '' if value is None else str(value)
+
+
+def _from_json_key(key: str) -> Optional[int]:
+    return int(key) if key else None
+
+
+def _site_filter(field: str, site_ids) -> Q:
+    """Restriction sur une liste de sites (None dans la liste = sans site)."""
+    ids = [s for s in site_ids if s is not None]
+    condition = Q(**{f'{field}__in': ids})
+    if None in site_ids:
+        condition |= Q(**{f'{field}__isnull': True})
+    return condition
+
+
+def empty_components() -> Dict:
+    """Composantes d'une ligne sans donnée."""
+    components = {name: 0 for name in COMPONENT_FIELDS}
+    components['heures_totales'] = 0.0
+    for name in COMPONENT_JSON_FIELDS:
+        components[name] = {}
+    return components
+
+
+def _add_to(mapping: Dict, key: str, heures: float, nombre: int) -> None:
+    current = mapping.setdefault(key, [0.0, 0])
+    current[0] += heures
+    current[1] += nombre
+
+
+def _empty_kpis() -> Dict:
+    """KPIs d'un mois sans aucune donnée (même structure que le calcul complet)."""
+    return {
+        'respect_planning': None,
+        'respect_planning_details': {'total_terminees': 0, 'dans_delais': 0, 'en_retard': 0},
+        'qualite_service': None,
+        'qualite_service_details': {
+            'total_evaluations': 0, 'satisfaits': 0, 'insatisfaits': 0, 'note_moyenne': None,
+        },
+        'taux_realisation_reclamations': None,
+        'taux_realisation_reclamations_details': {
+            'total_ouvertes': 0, 'ouvertes_et_fermees': 0, 'non_realisees': 0,
+        },
+        'temps_moyen_traitement': {
+            'global': {'valeur': None, 'total_cloturees': 0},
+            'par_type': [],
+        },
+        'temps_realisation_tache': [],
+        'temps_total_par_site': [],
+        'temps_total_par_site_total': 0,
+    }
+
+
+def _rate(part, total):
+    return round((part / total * 100), 1) if total > 0 else None
+
+
+# ==============================================================================
+# COMPOSANTES (une requête groupée par (mois, site, structure) et par KPI)
+# ==============================================================================
+
+def _components_taches(get, date_start, date_end, site_ids, site_structures):
+    """
+    KPI 1: Respect du planning — tâches terminées / terminées avec retard ≤ 7j,
+    par mois de fin réelle et par site de leurs objets.
+
+    Les couples (tâche, site) distincts sont comptés : une tâche compte sur
+    chaque site qu'elle touche (comme les KPIs 5 et 6), une fois par site
+    même si elle porte plusieurs objets de ce site.
+    """
+    from api_planification.models import Tache
+
+    rows = (
+        Tache.objects.filter(
+            statut='TERMINEE',
+            date_fin_reelle__gte=date_start,
+            date_fin_reelle__lt=date_end,
+        )
+        .annotate(t_site=F('objets__site_id'), mois=TruncMonth('date_fin_reelle'))
+    )
+    if site_ids is not None:
+        rows = rows.filter(_site_filter('t_site', site_ids))
+    rows = (
+        rows.values('mois', 't_site')
+        .annotate(
+            total=Count('id', distinct=True),
+            dans_delais=Count('id', distinct=True, filter=Q(
+                date_fin_reelle__lte=F('date_fin_planifiee') + TOLERANCE_RETARD
+            )),
+        )
+        .order_by()
+    )
+    for row in rows:
+        site = row['t_site']
+        components = get(month_key(row['mois']), site, site_structures.get(site))
+        components['taches_terminees'] += row['total']
+        components['taches_dans_delais'] += row['dans_delais']
+
+
+def _components_satisfaction(get, start, end, site_ids):
+    """KPI 2: Qualité de service — notes SatisfactionClient par mois d'évaluation."""
+    from api_reclamations.models import SatisfactionClient
+
+    rows = SatisfactionClient.objects.filter(
+        date_evaluation__gte=start,
+        date_evaluation__lt=end,
+        reclamation__actif=True,
+    )
+    if site_ids is not None:
+        rows = rows.filter(_site_filter('reclamation__site_id', site_ids))
+    rows = (
+        rows.annotate(
+            mois=TruncMonth('date_evaluation', tzinfo=dt_timezone.utc),
+            r_site=F('reclamation__site_id'),
+            r_structure=Coalesce(
+                'reclamation__structure_client_id', 'reclamation__site__structure_client_id'
+            ),
+        )
+        .values('mois', 'r_site', 'r_structure')
+        .annotate(
+            total=Count('id'),
+            satisfaits=Count('id', filter=Q(note__gte=4)),
+            somme_notes=Sum('note'),
+        )
+        .order_by()
+    )
+    for row in rows:
+        components = get(month_key(row['mois']), row['r_site'], row['r_structure'])
+        components['evaluations'] += row['total']
+        components['evaluations_satisfaites'] += row['satisfaits']
+        components['somme_notes'] += row['somme_notes'] or 0
+
+
+def _reclamations(start_field, start, end, site_ids):
+    from api_reclamations.models import Reclamation
+
+    reclamations = Reclamation.objects.filter(
+        actif=True, **{f'{start_field}__gte': start, f'{start_field}__lt': end}
+    )
+    if site_ids is not None:
+        reclamations = reclamations.filter(_site_filter('site_id', site_ids))
+    return reclamations.annotate(
+        r_structure=Coalesce('structure_client_id', 'site__structure_client_id'),
+    )
+
+
+def _components_reclamations_ouvertes(get, start, end, site_ids):
+    """
+    KPI 3: Taux de réalisation — réclamations ouvertes en M / ouvertes ET
+    clôturées en M, par mois de création.
+    """
+    rows = (
+        _reclamations('date_creation', start, end, site_ids)
+        .annotate(
+            mois=TruncMonth('date_creation', tzinfo=dt_timezone.utc),
+            mois_cloture=TruncMonth('date_cloture_reelle', tzinfo=dt_timezone.utc),
+        )
+        .values('mois', 'site_id', 'r_structure')
+        .annotate(
+            total_ouvertes=Count('id'),
+            ouvertes_et_fermees=Count('id', filter=Q(
+                statut__in=STATUTS_RECLAMATION_CLOTUREE,
+                mois_cloture=F('mois'),
+            )),
+        )
+        .order_by()
+    )
+    for row in rows:
+        components = get(month_key(row['mois']), row['site_id'], row['r_structure'])
+        components['reclamations_ouvertes'] += row['total_ouvertes']
+        components['reclamations_ouvertes_fermees'] += row['ouvertes_et_fermees']
+
+
+def _components_delais_traitement(get, start, end, site_ids):
+    """
+    KPI 4: Temps moyen de traitement — SOMME des délais (date_cloture_reelle -
+    date_creation) et effectif par type, par mois de clôture : la moyenne
+    d'un périmètre est recomposée exactement (Σ délais / Σ nombres).
+    """
+    rows = (
+        _reclamations('date_cloture_reelle', start, end, site_ids)
+        .filter(statut__in=STATUTS_RECLAMATION_CLOTUREE, date_creation__isnull=False)
+        .annotate(
+            mois=TruncMonth('date_cloture_reelle', tzinfo=dt_timezone.utc),
+            delai=ExpressionWrapper(
+                F('date_cloture_reelle') - F('date_creation'),
+                output_field=DurationField()
+            ),
+        )
+        .values('mois', 'site_id', 'r_structure', 'type_reclamation_id')
+        .annotate(somme_delai=Sum('delai'), total=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        components = get(month_key(row['mois']), row['site_id'], row['r_structure'])
+        _add_to(
+            components['delais_par_type'], _json_key(row['type_reclamation_id']),
+            _hours(row['somme_delai']) or 0.0, row['total'],
+        )
+
+
+def _components_temps_travail(get, date_start, date_end, site_ids):
+    """
+    KPI 5: Temps de réalisation par tâche — Par TypeTache, par Site
+        Σ(heure_fin_reelle - heure_debut_reelle) des distributions réalisées
+    KPI 6: Temps total de travail par site — Par Site
+        Σ COALESCE(heures_reelles, heures_planifiees)
+
+    Une seule requête : les couples (distribution, site) distincts sont
+    regroupés par (mois, site, type de tâche). Une distribution dont la
+    tâche porte plusieurs objets du même site n'est comptée qu'une fois.
+    """
+    from api.models import Objet, Site
+    from api_planification.models import DistributionCharge, Tache
+
+    qn = connection.ops.quote_name
+    objets_through = Tache.objets.through._meta
+
+    scope_sql, scope_params = '', []
+    if site_ids is not None:
+        scope_sql = ' AND (o.site_id = ANY(%s)'
+        scope_params.append([s for s in site_ids if s is not None])
+        scope_sql += ' OR o.site_id IS NULL)' if None in site_ids else ')'
+
+    sql = f"""
+        WITH pairs AS (
+            SELECT DISTINCT d.id, d.date, t.id_type_tache_id AS type_id,
+                   o.site_id, s.structure_client_id,
+                   d.heure_debut_reelle, d.heure_fin_reelle,
+                   COALESCE(d.heures_reelles, d.heures_planifiees) AS heures
+            FROM {qn(DistributionCharge._meta.db_table)} d
+            JOIN {qn(Tache._meta.db_table)} t ON t.id = d.tache_id
+            LEFT JOIN {qn(objets_through.db_table)} tob ON tob.tache_id = t.id
+            LEFT JOIN {qn(Objet._meta.db_table)} o ON o.id = tob.objet_id
+            LEFT JOIN {qn(Site._meta.db_table)} s ON s.id = o.site_id
+            WHERE d.status = 'REALISEE' AND d.date >= %s AND d.date < %s{scope_sql}
+        )
+        SELECT date_trunc('month', date)::date AS mois, site_id, structure_client_id, type_id,
+               COUNT(*) FILTER (WHERE heure_fin_reelle > heure_debut_reelle),
+               SUM(heure_fin_reelle - heure_debut_reelle) FILTER (WHERE heure_fin_reelle > heure_debut_reelle),
+               COUNT(*),
+               SUM(heures)
+        FROM pairs
+        GROUP BY 1, 2, 3, 4
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [date_start, date_end, *scope_params])
+        rows = cursor.fetchall()
+
+    for mois, site, structure, type_id, nb_horaires, duree, nb, heures in rows:
+        components = get(month_key(mois), site, structure)
+        if nb_horaires:
+            _add_to(
+                components['temps_par_type_tache'], _json_key(type_id),
+                _hours(duree) or 0.0, nb_horaires,
+            )
+        components['heures_totales'] += float(heures or 0)
+        components['nb_interventions'] += nb
+
+
+def compute_components(start, end, site_ids: Optional[Iterable[Optional[int]]] = None
+                       ) -> Dict[ComponentKey, Dict]:
+    """
+    Calcule les composantes additives des KPIs sur [start, end[.
+
+    Args:
+        start, end: Bornes (datetimes UTC, premiers jours de mois à minuit)
+        site_ids: Restreint le calcul à ces sites (None dans la liste = lignes
+            sans site) ; None = tous les sites
+
+    Returns:
+        {('YYYY-MM', site_id, structure_id): composantes} — seules les
+        combinaisons ayant des données sont présentes.
+    """
+    from api.models import Site
+
+    if site_ids is not None:
+        site_ids = set(site_ids)
+    site_structures = dict(Site.objects.values_list('id', 'structure_client_id'))
+
+    results: Dict[ComponentKey, Dict] = {}
+
+    def get(key, site, structure):
+        return results.setdefault((key, site, structure), empty_components())
+
+    date_start, date_end = start.date(), end.date()
+    _components_taches(get, date_start, date_end, site_ids, site_structures)
+    _components_satisfaction(get, start, end, site_ids)
+    _components_reclamations_ouvertes(get, start, end, site_ids)
+    _components_delais_traitement(get, start, end, site_ids)
+    _components_temps_travail(get, date_start, date_end, site_ids)
+    return results
+
+
+# ==============================================================================
+# COMBINAISON DES COMPOSANTES → KPIs
+# ==============================================================================
+
+def combine_components(rows_by_month: Dict[str, List[Tuple[Optional[int], Dict]]]) -> Dict[str, Dict]:
+    """
+    Calcule les KPIs de chaque mois à partir des composantes du périmètre.
+
+    Args:
+        rows_by_month: {'YYYY-MM': [(site_id, composantes), ...]}
+
+    Returns:
+        {'YYYY-MM': {respect_planning, respect_planning_details, ...}} —
+        même structure pour chaque mois, y compris sans données.
+    """
+    from api.models import Site
+    from api_planification.models import TypeTache
+    from api_reclamations.models import TypeReclamation
+
+    # Libellés : une requête par référentiel pour tous les mois
+    type_reclamation_ids, type_tache_ids, site_ids = set(), set(), set()
+    for rows in rows_by_month.values():
+        for site, components in rows:
+            type_reclamation_ids.update(components['delais_par_type'])
+            type_tache_ids.update(components['temps_par_type_tache'])
+            site_ids.add(site)
+    types_reclamation = {
+        pk: (nom, categorie)
+        for pk, nom, categorie in TypeReclamation.objects.filter(
+            pk__in=[_from_json_key(k) for k in type_reclamation_ids if k]
+        ).values_list('id', 'nom_reclamation', 'categorie')
+    }
+    type_names = dict(TypeTache.objects.filter(
+        pk__in=[_from_json_key(k) for k in type_tache_ids if k]
+    ).values_list('id', 'nom_tache'))
+    site_names = dict(Site.objects.filter(
+        pk__in=[s for s in site_ids if s is not None]
+    ).values_list('id', 'nom_site'))
+
+    return {
+        key: _combine_month(rows, types_reclamation, type_names, site_names)
+        for key, rows in rows_by_month.items()
+    }
+
+
+def _combine_month(rows, types_reclamation, type_names, site_names) -> Dict:
+    kpis = _empty_kpis()
+    totals = {name: 0 for name in COMPONENT_FIELDS}
+    delais_par_type: Dict[str, List] = {}
+    temps_par_type_site: Dict[Tuple[str, Optional[int]], List] = {}
+    par_site: Dict[Optional[int], List] = {}
+
+    for site, components in rows:
+        for name in COMPONENT_FIELDS:
+            totals[name] += components[name]
+        for type_key, (heures, nombre) in components['delais_par_type'].items():
+            _add_to(delais_par_type, type_key, heures, nombre)
+        for type_key, (heures, nombre) in components['temps_par_type_tache'].items():
+            _add_to(temps_par_type_site, (type_key, site), heures, nombre)
+        if components['nb_interventions']:
+            _add_to(par_site, site, components['heures_totales'], components['nb_interventions'])
+
+    # KPI 1: Respect du planning (>95%) — Global
+    total, dans_delais = totals['taches_terminees'], totals['taches_dans_delais']
+    if total:
+        kpis['respect_planning'] = _rate(dans_delais, total)
+        kpis['respect_planning_details'] = {
+            'total_terminees': total,
+            'dans_delais': dans_delais,
+            'en_retard': total - dans_delais,
+        }
+
+    # KPI 2: Qualité de service (>95%) — Global
+    total, satisfaits = totals['evaluations'], totals['evaluations_satisfaites']
+    if total:
+        kpis['qualite_service'] = _rate(satisfaits, total)
+        kpis['qualite_service_details'] = {
+            'total_evaluations': total,
+            'satisfaits': satisfaits,
+            'insatisfaits': total - satisfaits,
+            'note_moyenne': round(totals['somme_notes'] / total, 2) if totals['somme_notes'] else None,
+        }
+
+    # KPI 3: Taux de réalisation des réclamations — Global
+    total, fermees = totals['reclamations_ouvertes'], totals['reclamations_ouvertes_fermees']
+    if total:
+        kpis['taux_realisation_reclamations'] = _rate(fermees, total)
+        kpis['taux_realisation_reclamations_details'] = {
+            'total_ouvertes': total,
+            'ouvertes_et_fermees': fermees,
+            'non_realisees': total - fermees,
+        }
+
+    # KPI 4: Temps moyen de traitement — Par TypeReclamation
+    par_type = []
+    for type_key, (heures, nombre) in delais_par_type.items():
+        type_id = _from_json_key(type_key)
+        nom, categorie = types_reclamation.get(type_id, (None, None))
+        par_type.append({
+            'type_id': type_id,
+            'nom': nom or 'Non défini',
+            'categorie': categorie or 'AUTRE',
+            'valeur': round(heures / nombre, 1) if nombre else None,
+            'total': nombre,
+        })
+    par_type.sort(key=lambda r: (r['categorie'], r['nom']))
+    nb_cloturees = sum(r['total'] for r in par_type)
+    heures_cloturees = sum(heures for heures, _ in delais_par_type.values())
+    kpis['temps_moyen_traitement'] = {
+        'global': {
+            'valeur': round(heures_cloturees / nb_cloturees, 1) if nb_cloturees else None,
+            'total_cloturees': nb_cloturees,
+        },
+        'par_type': par_type,
+    }
+
+    # KPI 5: Temps de réalisation par tâche — Par TypeTache × Site
+    temps_realisation = [
+        {
+            'type_tache_id': _from_json_key(type_key),
+            'type_tache': type_names.get(_from_json_key(type_key)) or 'Non défini',
+            'site_id': site,
+            'site_nom': site_names.get(site) or 'Non défini',
+            'heures': round(heures, 1),
+            'nb_interventions': nombre,
+        }
+        for (type_key, site), (heures, nombre) in temps_par_type_site.items()
+    ]
+    temps_realisation.sort(key=lambda r: (r['site_nom'], r['type_tache']))
+    kpis['temps_realisation_tache'] = temps_realisation
+
+    # KPI 6: Temps total de travail par site — Par Site
+    sites = [
+        {
+            'site_id': site,
+            'site_nom': site_names.get(site) or 'Non défini',
+            'heures': round(heures, 1),
+            'nb_interventions': nombre,
+        }
+        for site, (heures, nombre) in par_site.items()
+    ]
+    sites.sort(key=lambda r: -r['heures'])
+    kpis['temps_total_par_site'] = sites
+    kpis['temps_total_par_site_total'] = round(sum(s['heures'] for s in sites), 1)
+
+    return kpis
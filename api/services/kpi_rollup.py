@@ -0,0 +1,240 @@
+# api/services/kpi_rollup.py
+"""
+Table de cumuls mensuels des KPIs (modèle KPIMensuel).
+
+Les vues KPI lisent les composantes stockées par (mois, site, structure) et
+les combinent pour le périmètre demandé (site, structure cliente, sites d'un
+superviseur) : un mois déjà calculé n'est jamais recalculé depuis les
+DistributionCharge / Reclamation brutes.
+
+Mise à jour :
+- Incrémentale : les signals (api/signals.py) marquent les couples
+  (mois, site) touchés par une sauvegarde ; seules ces lignes sont
+  recalculées, après le commit de la transaction.
+- Complète : `python manage.py rebuild_kpi_rollup`.
+- Filet de sécurité : les lignes du mois en cours plus anciennes que
+  KPI_ROLLUP_CURRENT_MONTH_TTL sont recalculées à la lecture (mises à jour
+  en masse par .update(), qui n'émettent pas de signal).
+"""
+
+import logging
+import threading
+import zlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from api.models import KPIMensuel
+from .kpi_engine import (
+    COMPONENT_FIELDS, COMPONENT_JSON_FIELDS, combine_components, compute_components, month_key,
+)
+
+logger = logging.getLogger(__name__)
+
+ALL_SITES = '*'  # Marqueur « tous les sites du mois » dans les recalculs en attente
+
+_pending = threading.local()
+
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def month_start(value) -> date:
+    """Premier jour du mois d'une date / datetime (datetime ramené en UTC)."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(dt_timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def _month_bounds(mois: date):
+    start = datetime(mois.year, mois.month, 1, tzinfo=dt_timezone.utc)
+    return start, start + relativedelta(months=1)
+
+
+def _lock_month(mois: date) -> None:
+    """Verrou transactionnel PostgreSQL : un seul recalcul d'un mois à la fois."""
+    lock_id = zlib.crc32(f"kpi_mensuel:{mois:%Y-%m}".encode())
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_id])
+
+
+# ==============================================================================
+# RECALCUL
+# ==============================================================================
+
+def _month_computed(mois: date) -> bool:
+    """Le mois a été calculé en entier (ligne marqueur sans site ni structure)."""
+    return KPIMensuel.objects.filter(
+        mois=mois, site__isnull=True, structure_client__isnull=True
+    ).exists()
+
+
+def refresh_kpi_rollup(mois: date, site_ids: Optional[Iterable[Optional[int]]] = None) -> int:
+    """
+    Recalcule les lignes KPIMensuel d'un mois.
+
+    Args:
+        mois: Premier jour du mois
+        site_ids: Sites à recalculer (None dans la liste = lignes sans site) ;
+            None = tout le mois
+
+    Returns:
+        Nombre de lignes écrites
+    """
+    mois = month_start(mois)
+    if site_ids is not None:
+        site_ids = set(site_ids)
+    start, end = _month_bounds(mois)
+
+    with transaction.atomic():
+        _lock_month(mois)
+
+        # Mois jamais calculé (pas de ligne marqueur) : un recalcul partiel
+        # le laisserait incomplet → tout le mois
+        if site_ids is not None and not _month_computed(mois):
+            site_ids = None
+
+        components = compute_components(start, end, site_ids)
+
+        rows = [
+            KPIMensuel(mois=mois, site_id=site, structure_client_id=structure, **values)
+            for (_, site, structure), values in components.items()
+        ]
+        # La ligne (None, None) marque le mois comme calculé
+        if (site_ids is None or None in site_ids) and (month_key(mois), None, None) not in components:
+            rows.append(KPIMensuel(mois=mois))
+
+        existing = KPIMensuel.objects.filter(mois=mois)
+        if site_ids is not None:
+            ids = [s for s in site_ids if s is not None]
+            condition = Q(site_id__in=ids)
+            if None in site_ids:
+                condition |= Q(site__isnull=True)
+            existing = existing.filter(condition)
+        existing.delete()
+        KPIMensuel.objects.bulk_create(rows)
+
+    return len(rows)
+
+
+def ensure_kpi_rollup(months: Iterable[date]) -> None:
+    """
+    Calcule les mois non calculés, et rafraîchit le mois en cours s'il est périmé.
+
+    Un mois est calculé quand sa ligne marqueur (sans site ni structure)
+    existe : des lignes de quelques sites seulement (recalcul partiel) ne
+    suffisent pas.
+    """
+    months = {month_start(m) for m in months}
+    last_computed = dict(
+        KPIMensuel.objects.filter(
+            mois__in=months, site__isnull=True, structure_client__isnull=True
+        )
+        .values('mois')
+        .annotate(last=Max('date_calcul'))
+        .values_list('mois', 'last')
+    )
+    now = timezone.now()
+    current = month_start(now)
+    stale_before = now - timedelta(seconds=settings.KPI_ROLLUP_CURRENT_MONTH_TTL)
+
+    for mois in sorted(months):
+        last = last_computed.get(mois)
+        if last is None or (mois >= current and last < stale_before):
+            refresh_kpi_rollup(mois)
+
+
+# ==============================================================================
+# RECALCUL INCRÉMENTAL (signals)
+# ==============================================================================
+
+def mark_kpis_dirty(dates: Iterable, site_ids: Optional[Iterable[Optional[int]]]) -> None:
+    """
+    Planifie le recalcul des lignes (mois, site) après le commit.
+
+    Args:
+        dates: Dates / datetimes touchées (None ignorés)
+        site_ids: Sites touchés (vide = lignes sans site, None = tous les sites)
+    """
+    months = {month_start(d) for d in dates if d}
+    if not months:
+        return
+
+    sites = {ALL_SITES} if site_ids is None else (set(site_ids) or {None})
+    pending = getattr(_pending, 'slices', None)
+    if pending is None:
+        pending = _pending.slices = set()
+    pending.update((mois, site) for mois in months for site in sites)
+
+    # Un callback par appel : après un rollback, les couples restés en
+    # attente sont repris au commit suivant.
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    pending = getattr(_pending, 'slices', None)
+    if not pending:
+        return
+    _pending.slices = set()
+
+    by_month: Dict[date, set] = {}
+    for mois, site in pending:
+        by_month.setdefault(mois, set()).add(site)
+
+    from greensig_web.cache_utils import invalidate
+
+    for mois, sites in by_month.items():
+        try:
+            refresh_kpi_rollup(mois, None if ALL_SITES in sites else sites)
+        except Exception:
+            logger.exception(f"[KPI_ROLLUP] Echec du recalcul {mois:%Y-%m}")
+    invalidate('KPIS')
+
+
+# ==============================================================================
+# LECTURE
+# ==============================================================================
+
+def get_monthly_kpis(month_starts: Iterable, site_id=None,
+                     structure_filter=None, superviseur_filter=None) -> Dict[str, Dict]:
+    """
+    KPIs de chacun des mois demandés, lus depuis KPIMensuel.
+
+    Args:
+        month_starts: Premiers jours des mois (dates ou datetimes)
+        site_id: Filtre optionnel sur un site
+        structure_filter: StructureClient ou son ID (rôle CLIENT)
+        superviseur_filter: Superviseur ou son ID (rôle SUPERVISEUR)
+
+    Returns:
+        {'YYYY-MM': {respect_planning, respect_planning_details, ...}}
+    """
+    months = sorted({month_start(m) for m in month_starts})
+    if not months:
+        return {}
+    ensure_kpi_rollup(months)
+
+    rows = KPIMensuel.objects.filter(mois__in=months)
+    if site_id:
+        rows = rows.filter(site_id=site_id)
+    if structure_filter:
+        rows = rows.filter(
+            Q(structure_client=structure_filter) |
+            Q(site__structure_client=structure_filter)
+        )
+    elif superviseur_filter:
+        rows = rows.filter(site__superviseur=superviseur_filter)
+
+    rows_by_month = {month_key(mois): [] for mois in months}
+    for row in rows.values('mois', 'site_id', *COMPONENT_FIELDS, *COMPONENT_JSON_FIELDS):
+        rows_by_month[month_key(row['mois'])].append((row['site_id'], row))
+
+    return combine_components(rows_by_month)
@@ -0,0 +1,104 @@
+# api/services/map_cache.py
+"""
+Cache serveur des réponses carte (/api/map/) et des tuiles vectorielles.
+
+Clé de cache = (portée du rôle, types demandés, emprise alignée ou tuile, zoom)
++ versions des sites dont l'emprise recoupe la zone.
+
+Invalidation (voir api/signals.py et greensig_web/cache_utils.py) :
+- modification d'un objet GIS / d'une réclamation → version de SON site uniquement
+- modification d'un Site / SousSite → version globale du domaine MAP
+
+Ainsi, une édition sur un site n'invalide que les entrées carte qui le couvrent,
+les autres clients continuent d'être servis depuis Redis.
+"""
+
+import hashlib
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+
+from greensig_web.cache_utils import (
+    cache_get, cache_set, get_cache_ttl, get_site_versions, hash_params, make_cache_key,
+)
+
+BBox = Tuple[float, float, float, float]
+
+
+def snap_bbox(bbox: BBox, zoom: int) -> BBox:
+    """
+    Aligne une bbox (west, south, east, north) vers l'extérieur sur une grille
+    dépendant du zoom (quart de tuile XYZ), pour que des déplacements proches
+    partagent la même entrée de cache.
+    """
+    zoom = min(max(zoom, 0), 22)
+    step = 360.0 / (2 ** zoom) / 4
+    west, south, east, north = bbox
+    return (
+        max(math.floor(west / step) * step, -180.0),
+        max(math.floor(south / step) * step, -90.0),
+        min(math.ceil(east / step) * step, 180.0),
+        min(math.ceil(north / step) * step, 90.0),
+    )
+
+
+def bbox_key(bbox: Optional[BBox]) -> str:
+    """Représentation stable d'une bbox pour les clés de cache."""
+    if bbox is None:
+        return 'nobbox'
+    return ','.join(f'{v:.6f}' for v in bbox)
+
+
+def site_ids_in_bbox(bbox: Optional[BBox]) -> List[int]:
+    """
+    IDs des sites dont l'emprise recoupe la bbox.
+
+    Mis en cache sous la version globale MAP (invalidée à chaque mutation de site).
+    """
+    if bbox is None:
+        return []
+    area_key = bbox_key(bbox)
+    site_ids = cache_get('MAP', 'sites-in', area_key)
+    if site_ids is None:
+        from api.models import Site
+        site_ids = list(
+            Site.objects.filter(geometrie_emprise__intersects=Polygon.from_bbox(bbox))
+            .values_list('id', flat=True)
+        )
+        cache_set('MAP', 'sites-in', area_key, data=site_ids)
+    return site_ids
+
+
+def map_cache_key(kind: str, scope_key: str, types: Iterable[str], area_key: str,
+                  zoom: int, site_ids: Sequence[int]) -> str:
+    """
+    Construit la clé versionnée d'une réponse carte.
+
+    Args:
+        kind: 'objects' (/api/map/) ou 'tile' (/api/map/tiles/)
+        scope_key: portée du rôle (ex: 'admin', 'structure-3', 'superviseur-7')
+        types: types / couches demandés
+        area_key: bbox alignée ou 'z/x/y'
+        zoom: niveau de zoom
+        site_ids: sites recoupant la zone (leurs versions entrent dans la clé)
+    """
+    versions = get_site_versions(site_ids)
+    return make_cache_key(
+        'MAP', kind, scope_key, hash_params({'types': sorted(types)}), area_key, zoom,
+        hash_params(versions),
+    )
+
+
+def etag_for_key(key: str) -> str:
+    """ETag HTTP dérivé d'une clé de cache (change avec les versions)."""
+    return '"{}"'.format(hashlib.md5(key.encode()).hexdigest()[:16])
+
+
+def get_cached(key: str):
+    return cache.get(key)
+
+
+def set_cached(key: str, data) -> None:
+    cache.set(key, data, get_cache_ttl('MAP'))
@@ -0,0 +1,133 @@
+# api/services/map_generalization.py
+"""
+Généralisation des objets de la carte (/api/map/) selon le niveau de zoom.
+
+- Couches ponctuelles (Arbre, Palmier, Puit, Vanne...) : en dessous de
+  MAP_CLUSTER_MAX_ZOOM, les points sont regroupés par cellule de grille
+  (ST_SnapToGrid) et renvoyés en clusters avec leur effectif.
+- Couches polygones et lignes (Gazon, Arbuste, Canalisation...) : en dessous de
+  MAP_SIMPLIFY_MAX_ZOOM, la géométrie est simplifiée par PostGIS
+  (ST_SimplifyPreserveTopology, comme simplify_geometry dans validation.py)
+  avec une tolérance d'environ un pixel au zoom demandé.
+
+Les deux opérations sont faites dans la base : les géométries complètes ne
+transitent ni vers Python ni vers le client.
+"""
+
+from typing import Dict, List
+
+from django.conf import settings
+from django.contrib.gis.db.models import Collect, GeometryField, PointField
+from django.contrib.gis.db.models.functions import Centroid
+from django.db.models import Count, FloatField, Func, Min, Value
+
+TILE_SIZE_PX = 256  # Taille d'une tuile écran (Web Mercator)
+
+
+# =============================================================================
+# PARAMÈTRES DÉPENDANT DU ZOOM
+# =============================================================================
+
+def degrees_per_pixel(zoom: int) -> float:
+    """Largeur d'un pixel écran en degrés de longitude au zoom donné."""
+    return 360.0 / (2 ** max(zoom, 0)) / TILE_SIZE_PX
+
+
+def cluster_cell_size(zoom: int) -> float:
+    """Taille (en degrés) d'une cellule de clustering au zoom donné."""
+    return degrees_per_pixel(zoom) * settings.MAP_CLUSTER_RADIUS_PX
+
+
+def simplification_tolerance(zoom: int) -> float:
+    """Tolérance de simplification (en degrés) : un pixel au zoom donné."""
+    return degrees_per_pixel(zoom)
+
+
+def is_point_model(Model) -> bool:
+    """True si le modèle porte une géométrie ponctuelle."""
+    return Model._meta.get_field('geometry').geom_type == 'POINT'
+
+
+def should_cluster(Model, zoom: int) -> bool:
+    return is_point_model(Model) and zoom < settings.MAP_CLUSTER_MAX_ZOOM
+
+
+def should_simplify(Model, zoom: int) -> bool:
+    return not is_point_model(Model) and zoom < settings.MAP_SIMPLIFY_MAX_ZOOM
+
+
+# =============================================================================
+# CLUSTERING DES POINTS
+# =============================================================================
+
+def cluster_features(queryset, Model, zoom: int) -> List[Dict]:
+    """
+    Regroupe les points du queryset par cellule de grille.
+
+    Une seule requête GROUP BY : chaque cellule renvoie son effectif et le
+    barycentre de ses points.
+
+    Returns:
+        Liste de features GeoJSON (properties.cluster = True, point_count).
+        Pour une cellule d'un seul objet, properties.object_id donne son ID.
+    """
+    size = cluster_cell_size(zoom)
+    cells = (
+        queryset.order_by()
+        .annotate(_cellule=Func(
+            'geometry',
+            Value(size, output_field=FloatField()),
+            Value(size, output_field=FloatField()),
+            function='ST_SnapToGrid',
+            output_field=PointField(srid=4326),
+        ))
+        .values('_cellule')
+        .annotate(
+            point_count=Count('pk'),
+            first_id=Min('pk'),
+            center=Centroid(Collect('geometry')),
+        )
+    )
+
+    features = []
+    for cell in cells:
+        center = cell['center']
+        features.append({
+            'type': 'Feature',
+            'id': f"{Model.__name__}-cluster-{cell['first_id']}",
+            'geometry': {'type': 'Point', 'coordinates': [center.x, center.y]},
+            'properties': {
+                'object_type': Model.__name__,
+                'cluster': True,
+                'point_count': cell['point_count'],
+                'object_id': cell['first_id'] if cell['point_count'] == 1 else None,
+            },
+        })
+    return features
+
+
+# =============================================================================
+# SIMPLIFICATION DES POLYGONES ET LIGNES
+# =============================================================================
+
+def with_simplified_geometry(queryset, zoom: int):
+    """
+    Remplace le chargement de la géométrie complète par sa version simplifiée.
+
+    À utiliser avec apply_simplified_geometry() sur chaque instance avant
+    sérialisation.
+    """
+    return queryset.defer('geometry').annotate(
+        _geometry_simplifiee=Func(
+            'geometry',
+            Value(simplification_tolerance(zoom), output_field=FloatField()),
+            function='ST_SimplifyPreserveTopology',
+            output_field=GeometryField(srid=4326),
+        )
+    )
+
+
+def apply_simplified_geometry(obj):
+    """Substitue la géométrie simplifiée (annotée) à la géométrie de l'instance."""
+    obj.geometry = obj._geometry_simplifiee
+    return obj
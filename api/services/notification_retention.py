@@ -0,0 +1,91 @@
+# api/services/notification_retention.py
+"""
+Rétention des notifications : archivage des notifications lues anciennes.
+
+La table Notification ne conserve que les données chaudes (non lues, ou
+lues depuis moins de NOTIFICATION_RETENTION_DAYS jours, selon created_at) :
+la boîte de réception, le badge et le WebSocket ne lisent qu'elle. Les
+autres sont déplacées dans NotificationArchive, consultable via
+GET /api/notifications/?archives=true.
+
+Déplacement par lots, une seule requête par lot (SELECT ... SKIP LOCKED,
+DELETE ... RETURNING, INSERT ... SELECT) : chaque lot est atomique, une
+ligne n'est jamais perdue ni dupliquée, et les lignes verrouillées par une
+lecture en cours sont reprises au passage suivant.
+
+Les notifications non lues ne sont jamais archivées : les compteurs Redis
+(api/services/unread_counters.py) ne changent pas.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_COLONNES = (
+    'id', 'destinataire_id', 'acteur_id', 'type_notification', 'titre',
+    'message', 'priorite', 'data', 'date_lecture', 'created_at',
+)
+
+
+def _sql_deplacement() -> str:
+    from api.models import Notification, NotificationArchive
+
+    qn = connection.ops.quote_name
+    notifications = qn(Notification._meta.db_table)
+    archives = qn(NotificationArchive._meta.db_table)
+    colonnes = ', '.join(qn(c) for c in _COLONNES)
+
+    return f"""
+        WITH lot AS (
+            SELECT id FROM {notifications}
+            WHERE lu AND created_at < %s
+            ORDER BY created_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ), deplacees AS (
+            DELETE FROM {notifications} n
+            USING lot
+            WHERE n.id = lot.id
+            RETURNING n.*
+        )
+        INSERT INTO {archives} ({colonnes}, {qn('archived_at')})
+        SELECT {colonnes}, %s FROM deplacees
+    """
+
+
+def archiver_notifications(jours: int = None, batch_size: int = None) -> int:
+    """
+    Déplace les notifications lues plus anciennes que `jours` dans
+    NotificationArchive.
+
+    Args:
+        jours: Âge minimal (défaut: NOTIFICATION_RETENTION_DAYS)
+        batch_size: Lignes par lot (défaut: NOTIFICATION_ARCHIVE_BATCH_SIZE)
+
+    Returns:
+        Nombre de notifications archivées
+    """
+    jours = settings.NOTIFICATION_RETENTION_DAYS if jours is None else jours
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    maintenant = timezone.now()
+    limite = maintenant - timedelta(days=jours)
+
+    sql = _sql_deplacement()
+    total = 0
+    while True:
+        # Hors transaction englobante : chaque lot est commité seul
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [limite, batch_size, maintenant])
+            deplacees = cursor.rowcount
+        total += deplacees
+        if deplacees < batch_size:
+            break
+
+    if total:
+        logger.info(f"[NOTIF] {total} notification(s) lue(s) archivee(s) (> {jours} jours)")
+    return total
@@ -10,7 +10,6 @@ Architecture:
 
 import logging
 from typing import List, Optional, Union
-from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 logger = logging.getLogger(__name__)
@@ -84,7 +83,8 @@ class NotificationService:
     @staticmethod
     def _get_user_group_name(user_id: int) -> str:
         """Retourne le nom du groupe WebSocket pour un utilisateur."""
-        return f"notifications_user_{user_id}"
+        from .ws_fanout import group_name
+        return group_name(user_id)
 
     @staticmethod
     def send(
@@ -171,7 +171,6 @@ class NotificationService:
         from api_users.models import Utilisateur
 
         data = data or {}
-        channel_layer = NotificationService._get_channel_layer()
 
         # Recuperer l'acteur si c'est un ID
         acteur_instance = None
@@ -214,23 +213,16 @@ class NotificationService:
         created_notifications = Notification.objects.bulk_create(notifications_to_create)
         logger.info(f"[NOTIF] {len(created_notifications)} notifications creees en batch")
 
-        # Envoyer via WebSocket (toujours individuel car chaque user a son groupe)
-        sent_count = 0
-        for notification in created_notifications:
-            user = notification.destinataire
-            group_name = NotificationService._get_user_group_name(user.id)
-            try:
-                async_to_sync(channel_layer.group_send)(
-                    group_name,
-                    {
-                        'type': 'notification_message',
-                        'notification': notification.to_websocket_payload(),
-                    }
-                )
-                sent_count += 1
-            except Exception as e:
-                # L'utilisateur n'est peut-etre pas connecte - normal
-                sent_count += 1  # La notification est quand meme creee en base
+        from .unread_counters import notifications_created
+        notifications_created(created_notifications)
+
+        # Envoyer via WebSocket : un seul lot pour tous les destinataires
+        from .ws_fanout import publish
+        publish(
+            (notification.destinataire_id, notification.to_websocket_payload())
+            for notification in created_notifications
+        )
+        sent_count = len(created_notifications)  # Les notifications sont creees en base
 
         return sent_count > 0
 
@@ -306,20 +298,15 @@ class NotificationService:
             created = Notification.objects.bulk_create(notifications_to_create)
             logger.info(f"[NOTIF] {len(created)} notifications creees en bulk")
 
-            # Envoyer via WebSocket
-            channel_layer = NotificationService._get_channel_layer()
-            for notification in created:
-                group_name = NotificationService._get_user_group_name(notification.destinataire_id)
-                try:
-                    async_to_sync(channel_layer.group_send)(
-                        group_name,
-                        {
-                            'type': 'notification_message',
-                            'notification': notification.to_websocket_payload(),
-                        }
-                    )
-                except Exception:
-                    pass  # WebSocket non disponible, normal
+            from .unread_counters import notifications_created
+            notifications_created(created)
+
+            # Envoyer via WebSocket : un seul lot pour tous les destinataires
+            from .ws_fanout import publish
+            publish(
+                (notification.destinataire_id, notification.to_websocket_payload())
+                for notification in created
+            )
 
             return len(created)
 
@@ -0,0 +1,251 @@
+# api/services/report_snapshots.py
+"""
+Snapshots des rapports de site mensuels (modèle RapportMensuel).
+
+GET /api/monthly-report/ sur un mois calendaire complet sert le rapport
+stocké au lieu de l'assembler à chaque requête (tâches, équipes, absences,
+photos, réclamations, statistiques).
+
+Péremption :
+- Les signals (api/signals.py, api_suivi_taches/signals.py) appellent
+  mark_reports_stale() avec les dates et sites touchés. Après le commit, les
+  snapshots correspondants sont marqués périmés (`generation` + 1) et leur
+  reconstruction est planifiée (Celery).
+- Une date touche le rapport de son mois et celui du mois précédent (section
+  « travaux planifiés » : 31 jours après la période).
+- Filet de sécurité : un snapshot d'un mois encore ouvert (en cours ou
+  précédent) plus ancien que REPORT_SNAPSHOT_TTL est recalculé à la lecture
+  (absences, équipes, mises à jour en masse sans signal).
+
+Construction :
+- À la demande (premier accès, snapshot périmé) ou par la tâche quotidienne
+  `build_report_snapshots` (mois précédent de chaque site actif + snapshots
+  périmés).
+- Le résultat n'est enregistré que si `generation` n'a pas changé pendant le
+  calcul : une modification concurrente laisse le snapshot périmé.
+"""
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Optional
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import RapportMensuel
+
+logger = logging.getLogger(__name__)
+
+ALL_SITES = '*'  # Marqueur « tous les sites du mois »
+
+# Fenêtre de la section « travaux planifiés » (jours après la période)
+FENETRE_TRAVAUX_PLANIFIES = 31
+
+_pending = threading.local()
+
+
+# ==============================================================================
+# HELPERS
+# ==============================================================================
+
+def month_start(value) -> date:
+    """Premier jour du mois d'une date / datetime (datetime ramené en UTC)."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(dt_timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def month_bounds(mois: date):
+    """Bornes du mois au format de MonthlyReportView (00:00:00 → 23:59:59 UTC)."""
+    debut = datetime(mois.year, mois.month, 1, tzinfo=dt_timezone.utc)
+    fin = debut + relativedelta(months=1) - timedelta(seconds=1)
+    return debut, fin
+
+
+def full_month(date_debut: datetime, date_fin: datetime) -> Optional[date]:
+    """Premier jour du mois si la période couvre exactement un mois calendaire, sinon None."""
+    mois = date_debut.date()
+    if mois.day != 1:
+        return None
+    if date_fin.date() != mois + relativedelta(months=1) - timedelta(days=1):
+        return None
+    return mois
+
+
+def _months_touched(dates: Iterable) -> set:
+    months = set()
+    for d in dates:
+        if not d:
+            continue
+        months.add(month_start(d))
+        months.add(month_start(d - timedelta(days=FENETRE_TRAVAUX_PLANIFIES)))
+    return months
+
+
+def _is_open_month(mois: date) -> bool:
+    """Mois dont le rapport dépend encore de données courantes (mois en cours ou précédent)."""
+    return mois >= month_start(timezone.now() - timedelta(days=FENETRE_TRAVAUX_PLANIFIES))
+
+
+def _is_fresh(snapshot: RapportMensuel) -> bool:
+    if snapshot.perime or snapshot.date_calcul is None:
+        return False
+    if _is_open_month(snapshot.mois):
+        age = (timezone.now() - snapshot.date_calcul).total_seconds()
+        return age < settings.REPORT_SNAPSHOT_TTL
+    return True
+
+
+# ==============================================================================
+# CONSTRUCTION
+# ==============================================================================
+
+def build_snapshot(site, mois: date) -> dict:
+    """
+    Calcule le rapport (site, mois) et l'enregistre si aucune modification
+    n'est intervenue pendant le calcul.
+
+    Returns:
+        Données du rapport
+    """
+    from api.monthly_report_view import MonthlyReportView
+
+    snapshot, _ = RapportMensuel.objects.get_or_create(site=site, mois=mois)
+    generation = snapshot.generation
+
+    debut = time.perf_counter()
+    date_debut, date_fin = month_bounds(mois)
+    donnees = MonthlyReportView().build_report(site, date_debut, date_fin)
+    duree_ms = round((time.perf_counter() - debut) * 1000, 1)
+
+    enregistre = RapportMensuel.objects.filter(
+        pk=snapshot.pk, generation=generation
+    ).update(
+        donnees=donnees,
+        perime=False,
+        date_calcul=timezone.now(),
+        duree_calcul_ms=duree_ms,
+    )
+    if not enregistre:
+        logger.info(f"[RAPPORT] Snapshot {mois:%Y-%m} site={site.pk} modifie pendant le calcul, reste perime")
+    return donnees
+
+
+def get_or_build_snapshot(site, mois: date) -> dict:
+    """Données du rapport (site, mois) : snapshot à jour, sinon calcul et enregistrement."""
+    snapshot = RapportMensuel.objects.filter(site=site, mois=mois).first()
+    if snapshot is not None and _is_fresh(snapshot):
+        return snapshot.donnees
+    return build_snapshot(site, mois)
+
+
+def rebuild_snapshots(snapshot_ids: Iterable[int]) -> int:
+    """Reconstruit les snapshots périmés parmi `snapshot_ids`. Retourne le nombre reconstruit."""
+    count = 0
+    snapshots = RapportMensuel.objects.filter(
+        pk__in=list(snapshot_ids), perime=True
+    ).select_related('site')
+    for snapshot in snapshots:
+        try:
+            build_snapshot(snapshot.site, snapshot.mois)
+            count += 1
+        except Exception:
+            logger.exception(f"[RAPPORT] Echec du calcul {snapshot.mois:%Y-%m} site={snapshot.site_id}")
+    return count
+
+
+def build_due_snapshots() -> int:
+    """
+    Passage quotidien : rapport du mois précédent de chaque site actif
+    (construit une fois) et snapshots périmés restants.
+
+    Returns:
+        Nombre de snapshots calculés
+    """
+    from api.models import Site
+
+    mois_precedent = month_start(timezone.now()) - relativedelta(months=1)
+    a_jour = set(
+        RapportMensuel.objects.filter(mois=mois_precedent, perime=False).values_list('site_id', flat=True)
+    )
+
+    count = 0
+    for site in Site.objects.filter(actif=True).exclude(pk__in=a_jour):
+        try:
+            build_snapshot(site, mois_precedent)
+            count += 1
+        except Exception:
+            logger.exception(f"[RAPPORT] Echec du calcul {mois_precedent:%Y-%m} site={site.pk}")
+
+    count += rebuild_snapshots(
+        RapportMensuel.objects.filter(perime=True).values_list('pk', flat=True)
+    )
+    return count
+
+
+# ==============================================================================
+# PÉREMPTION (signals)
+# ==============================================================================
+
+def mark_reports_stale(dates: Iterable, site_ids: Optional[Iterable[Optional[int]]]) -> None:
+    """
+    Marque périmés, après le commit, les snapshots (site, mois) touchés.
+
+    Args:
+        dates: Dates / datetimes touchées (None ignorés)
+        site_ids: Sites touchés (None = tous les sites)
+    """
+    months = _months_touched(dates)
+    if not months:
+        return
+
+    sites = {ALL_SITES} if site_ids is None else {s for s in site_ids if s}
+    if not sites:
+        return
+
+    pending = getattr(_pending, 'slices', None)
+    if pending is None:
+        pending = _pending.slices = set()
+    pending.update((mois, site) for mois in months for site in sites)
+
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    pending = getattr(_pending, 'slices', None)
+    if not pending:
+        return
+    _pending.slices = set()
+
+    by_month: Dict[date, set] = {}
+    for mois, site in pending:
+        by_month.setdefault(mois, set()).add(site)
+
+    condition = Q()
+    for mois, sites in by_month.items():
+        if ALL_SITES in sites:
+            condition |= Q(mois=mois)
+        else:
+            condition |= Q(mois=mois, site_id__in=sites)
+
+    snapshots = RapportMensuel.objects.filter(condition)
+    snapshot_ids = list(snapshots.values_list('pk', flat=True))
+    if not snapshot_ids:
+        return
+    RapportMensuel.objects.filter(pk__in=snapshot_ids).update(
+        perime=True, generation=F('generation') + 1
+    )
+
+    try:
+        from api.tasks import build_report_snapshots
+        build_report_snapshots.delay(snapshot_ids=snapshot_ids)
+    except Exception as e:
+        # Celery indisponible : recalcul à la prochaine lecture
+        logger.warning(f"[RAPPORT] Reconstruction de {len(snapshot_ids)} snapshot(s) non planifiee: {e}")
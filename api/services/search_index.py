@@ -0,0 +1,279 @@
+# api/services/search_index.py
+"""
+Index de recherche unifié (modèle IndexRecherche).
+
+Une ligne par site, sous-site et objet (15 types) :
+- texte : champs propres en minuscules
+    site      → nom, code
+    sous-site → nom
+    objet     → nom, famille, marque, type, observation
+- texte_contexte (objets) : nom et code du site, nom du sous-site
+- position : point d'affichage (centroïde pour polygones et lignes)
+
+Les deux colonnes texte portent un index GIN pg_trgm : `LIKE '%terme%'`
+utilise l'index quelle que soit la taille de l'inventaire.
+
+Mise à jour ensembliste : chaque refresh_*() est un INSERT ... SELECT
+... ON CONFLICT DO UPDATE calculé depuis les tables sources (aucune
+instance chargée), exécuté dans la transaction de la modification.
+- Site modifié → la ligne du site ; ses sous-sites et ses objets
+  (contexte) seulement si le nom ou le code du site change
+- Sous-site modifié → le sous-site et ses objets
+- Objet créé / modifié → l'objet ; supprimé → remove()
+
+Usage:
+    search(scope, 'palmier')                  # GET /api/search/
+    matching_ids('phoenix', Arbre)            # sous-requête pour l'inventaire
+    rebuild_search_index()                    # manage.py rebuild_search_index (après migrate)
+"""
+
+import logging
+from typing import Iterable, List
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Résultats au plus par catégorie et au total (GET /api/search/)
+MAX_SITES = 10
+MAX_PAR_TYPE = 5
+MAX_RESULTATS = 30
+
+# Champs texte propres d'un objet, dans l'ordre de concaténation
+CHAMPS_TEXTE_OBJET = ('nom', 'famille', 'marque', 'type', 'observation')
+
+
+def normalize(value: str) -> str:
+    """Terme de recherche au format de l'index (minuscules, espaces réduits)."""
+    return ' '.join((value or '').lower().split())
+
+
+def like_pattern(value: str) -> str:
+    """Motif LIKE '%terme%' (caractères spéciaux échappés)."""
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _tables():
+    from api.models import IndexRecherche, Objet, Site, SousSite
+
+    qn = connection.ops.quote_name
+    return (
+        qn(IndexRecherche._meta.db_table),
+        qn(Objet._meta.db_table),
+        qn(Site._meta.db_table),
+        qn(SousSite._meta.db_table),
+    )
+
+
+_UPSERT = """
+    ON CONFLICT (type_entite, entite_id) DO UPDATE SET
+        type_objet = EXCLUDED.type_objet,
+        site_id = EXCLUDED.site_id,
+        libelle = EXCLUDED.libelle,
+        texte = EXCLUDED.texte,
+        texte_contexte = EXCLUDED.texte_contexte,
+        position = EXCLUDED.position
+"""
+
+_COLONNES = "(type_entite, entite_id, type_objet, site_id, libelle, texte, texte_contexte, position)"
+
+
+# ==============================================================================
+# MISE À JOUR
+# ==============================================================================
+
+def _objets_source() -> str:
+    """UNION ALL des 15 tables enfants : champs texte et point d'affichage."""
+    from api.models import OBJET_TYPE_MODELS
+
+    qn = connection.ops.quote_name
+    branches = []
+    for model in OBJET_TYPE_MODELS.values():
+        colonnes = {f.name: f.column for f in model._meta.concrete_fields}
+        champs = [
+            f"c.{qn(colonnes[nom])}::text" if nom in colonnes else 'NULL::text'
+            for nom in CHAMPS_TEXTE_OBJET
+        ]
+        branches.append(
+            f"SELECT c.objet_ptr_id, {', '.join(champs)}, "
+            f"ST_Centroid(c.{qn(colonnes['geometry'])}) AS position "
+            f"FROM {qn(model._meta.db_table)} c"
+        )
+    colonnes = ', '.join(CHAMPS_TEXTE_OBJET)
+    return f"SELECT * FROM ({' UNION ALL '.join(branches)}) AS e(objet_ptr_id, {colonnes}, position)"
+
+
+def _refresh_objets_where(condition: str, params: list) -> int:
+    index, objets, sites, sous_sites = _tables()
+    sql = f"""
+        INSERT INTO {index} {_COLONNES}
+        SELECT 'objet', o.id, o.type_objet, o.site_id,
+               COALESCE(e.nom, ''),
+               lower(concat_ws(' ', e.nom, e.famille, e.marque, e.type, e.observation)),
+               lower(concat_ws(' ', s.nom_site, s.code_site, ss.nom)),
+               e.position
+        FROM {objets} o
+        JOIN ({_objets_source()}) e ON e.objet_ptr_id = o.id
+        JOIN {sites} s ON s.id = o.site_id
+        LEFT JOIN {sous_sites} ss ON ss.id = o.sous_site_id
+        WHERE {condition}
+        {_UPSERT}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def refresh_objets(objet_ids: Iterable[int]) -> int:
+    """Réindexe des objets (création, modification, import en masse)."""
+    objet_ids = [pk for pk in set(objet_ids) if pk]
+    if not objet_ids:
+        return 0
+    return _refresh_objets_where('o.id = ANY(%s)', [objet_ids])
+
+
+def refresh_sous_sites(sous_site_ids: Iterable[int]) -> int:
+    """Réindexe des sous-sites et le contexte de leurs objets."""
+    sous_site_ids = [pk for pk in set(sous_site_ids) if pk]
+    if not sous_site_ids:
+        return 0
+
+    index, _, sites, sous_sites = _tables()
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {index} {_COLONNES}
+            SELECT 'soussite', ss.id, '', ss.site_id,
+                   left(ss.nom || ' (' || s.nom_site || ')', 255),
+                   lower(ss.nom), lower(concat_ws(' ', s.nom_site, s.code_site)),
+                   ss.geometrie
+            FROM {sous_sites} ss
+            JOIN {sites} s ON s.id = ss.site_id
+            WHERE ss.id = ANY(%s)
+            {_UPSERT}
+        """, [sous_site_ids])
+        count = cursor.rowcount
+    return count + _refresh_objets_where('o.sous_site_id = ANY(%s)', [sous_site_ids])
+
+
+def refresh_sites(site_ids: Iterable[int], contexte: bool = True) -> int:
+    """
+    Réindexe des sites et, si `contexte`, leurs sous-sites et le contexte de
+    leurs objets (nom / code du site repris dans texte_contexte).
+    """
+    site_ids = [pk for pk in set(site_ids) if pk]
+    if not site_ids:
+        return 0
+
+    index, _, sites, sous_sites = _tables()
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {index} {_COLONNES}
+            SELECT 'site', s.id, '', s.id, left(s.nom_site, 255),
+                   lower(concat_ws(' ', s.nom_site, s.code_site)), '',
+                   COALESCE(s.centroid, ST_Centroid(s.geometrie_emprise))
+            FROM {sites} s
+            WHERE s.id = ANY(%s)
+            {_UPSERT}
+        """, [site_ids])
+        count = cursor.rowcount
+        if not contexte:
+            return count
+        cursor.execute(f"SELECT id FROM {sous_sites} WHERE site_id = ANY(%s)", [site_ids])
+        sous_site_ids = [row[0] for row in cursor.fetchall()]
+
+    count += refresh_sous_sites(sous_site_ids)
+    # Objets hors sous-site (ceux des sous-sites sont déjà réindexés)
+    return count + _refresh_objets_where('o.site_id = ANY(%s) AND o.sous_site_id IS NULL', [site_ids])
+
+
+def remove(type_entite: str, entite_ids: Iterable[int]) -> int:
+    """Retire des entités supprimées de l'index."""
+    from api.models import IndexRecherche
+
+    deleted, _ = IndexRecherche.objects.filter(
+        type_entite=type_entite, entite_id__in=list(entite_ids)
+    ).delete()
+    return deleted
+
+
+def rebuild_search_index() -> int:
+    """Reconstruit tout l'index depuis les tables sources."""
+    from api.models import IndexRecherche, Site
+
+    IndexRecherche.objects.all().delete()
+    return refresh_sites(Site.objects.values_list('pk', flat=True))
+
+
+# ==============================================================================
+# RECHERCHE
+# ==============================================================================
+
+def matching_ids(terme: str, model=None):
+    """
+    Sous-requête des IDs d'objets (d'un type si `model` est donné) dont le
+    texte ou le contexte (site, sous-site) contient `terme`, ou dont l'ID
+    vaut `terme`.
+    """
+    from django.db.models import Q
+    from api.models import IndexRecherche
+
+    terme = normalize(terme)
+    condition = Q(texte__contains=terme) | Q(texte_contexte__contains=terme)
+    if terme.isdigit():
+        condition |= Q(entite_id=int(terme))
+
+    qs = IndexRecherche.objects.filter(type_entite='objet')
+    if model is not None:
+        qs = qs.filter(type_objet=model.__name__)
+    return qs.filter(condition).values('entite_id')
+
+
+def search(scope, query: str) -> List[dict]:
+    """
+    Recherche classée sur les sites, sous-sites et objets visibles, en une
+    requête : correspondance LIKE (index trigramme), classement par
+    word_similarity, au plus MAX_SITES sites et MAX_PAR_TYPE résultats par
+    type, MAX_RESULTATS au total (sites, puis sous-sites, puis objets).
+
+    Returns:
+        Lignes {type_entite, entite_id, type_objet, libelle, site_nom, x, y}
+    """
+    terme = normalize(query)
+    if scope.site_ids is not None and not scope.site_ids:
+        return []
+
+    index, _, sites, _ = _tables()
+    params = [terme, like_pattern(terme), int(terme) if terme.isdigit() else None]
+    scope_sql = ''
+    if scope.site_ids is not None:
+        scope_sql = 'AND r.site_id = ANY(%s)'
+        params.append(list(scope.site_ids))
+    params += [MAX_SITES, MAX_PAR_TYPE, MAX_RESULTATS]
+
+    sql = f"""
+        WITH correspondances AS (
+            SELECT r.type_entite, r.entite_id, r.type_objet, r.libelle, r.site_id, r.position,
+                   word_similarity(%s, r.texte) AS score
+            FROM {index} r
+            WHERE (r.texte LIKE %s OR (r.type_entite = 'objet' AND r.entite_id = %s))
+              {scope_sql}
+        ), classes AS (
+            SELECT c.*, row_number() OVER (
+                PARTITION BY c.type_entite, c.type_objet ORDER BY c.score DESC, c.entite_id
+            ) AS rang
+            FROM correspondances c
+        )
+        SELECT c.type_entite, c.entite_id, c.type_objet, c.libelle, s.nom_site,
+               ST_X(c.position), ST_Y(c.position)
+        FROM classes c
+        JOIN {sites} s ON s.id = c.site_id
+        WHERE c.rang <= CASE WHEN c.type_entite = 'site' THEN %s ELSE %s END
+        ORDER BY CASE c.type_entite WHEN 'site' THEN 0 WHEN 'soussite' THEN 1 ELSE 2 END,
+                 c.score DESC, c.entite_id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        colonnes = ('type_entite', 'entite_id', 'type_objet', 'libelle', 'site_nom', 'x', 'y')
+        return [dict(zip(colonnes, row)) for row in cursor.fetchall()]
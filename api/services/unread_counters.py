@@ -0,0 +1,104 @@
+# api/services/unread_counters.py
+"""
+Compteurs Redis de notifications non lues, par utilisateur.
+
+Le badge (GET /api/notifications/unread-count/) et la connexion WebSocket
+lisent le compteur au lieu de compter les lignes Notification.
+
+Définition : notifications non lues dont l'utilisateur n'est pas l'acteur
+(les auto-notifications ne comptent pas).
+
+Mise à jour (après le commit, INCRBY / DECRBY atomiques) :
+- bulk_create de notifications → +n par destinataire
+- lecture d'une notification, suppression d'une non lue → -1
+- tout marquer comme lu → 0
+
+Reconstruction paresseuse : un compteur absent est recalculé depuis la base
+(COUNT) et posé sans écraser une valeur concurrente (cache.add). Les mises à
+jour d'un compteur absent sont ignorées : la base reste la référence. Le TTL
+borne la durée d'une éventuelle dérive.
+"""
+
+import logging
+from functools import partial
+from typing import Dict, Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+UNREAD_KEY = 'notifications:non_lues:{user_id}'
+UNREAD_TTL = 24 * 3600  # 1 jour
+
+
+def _key(user_id: int) -> str:
+    return UNREAD_KEY.format(user_id=user_id)
+
+
+def _count_from_db(user_id: int) -> int:
+    from api.models import Notification
+    return Notification.objects.filter(
+        destinataire_id=user_id,
+        lu=False
+    ).exclude(
+        acteur_id=user_id
+    ).count()
+
+
+def get_unread_count(user_id: int) -> int:
+    """Nombre de notifications non lues (Redis, reconstruit depuis la base si absent)."""
+    try:
+        count = cache.get(_key(user_id))
+        if count is None:
+            count = _count_from_db(user_id)
+            cache.add(_key(user_id), count, UNREAD_TTL)
+        return max(0, int(count))
+    except Exception as e:
+        logger.warning(f"[NOTIF] Compteur non lues indisponible pour {user_id}: {e}")
+        return _count_from_db(user_id)
+
+
+def _apply(deltas: Dict[int, int]) -> None:
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(_key(user_id), delta)
+        except ValueError:
+            pass  # Compteur absent : reconstruit à la prochaine lecture
+        except Exception as e:
+            logger.warning(f"[NOTIF] Mise à jour du compteur non lues impossible ({user_id}): {e}")
+            cache.delete(_key(user_id))
+
+
+def _reset(user_ids: Iterable[int]) -> None:
+    try:
+        cache.set_many({_key(user_id): 0 for user_id in user_ids}, UNREAD_TTL)
+    except Exception as e:
+        logger.warning(f"[NOTIF] Remise à zéro du compteur non lues impossible: {e}")
+
+
+def _counted(notification) -> bool:
+    return not notification.lu and notification.acteur_id != notification.destinataire_id
+
+
+def notifications_created(notifications: Iterable) -> None:
+    """+1 par notification créée (non lue, pas une auto-notification), après le commit."""
+    deltas: Dict[int, int] = {}
+    for notification in notifications:
+        if _counted(notification):
+            deltas[notification.destinataire_id] = deltas.get(notification.destinataire_id, 0) + 1
+    if deltas:
+        transaction.on_commit(partial(_apply, deltas))
+
+
+def notification_removed(notification) -> None:
+    """-1 quand une notification comptée est lue ou supprimée (appeler avant le changement)."""
+    if _counted(notification):
+        transaction.on_commit(partial(_apply, {notification.destinataire_id: -1}))
+
+
+def all_read(user_id: int) -> None:
+    """Compteur à 0 après « tout marquer comme lu »."""
+    transaction.on_commit(partial(_reset, [user_id]))
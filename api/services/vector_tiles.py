@@ -0,0 +1,302 @@
+# api/services/vector_tiles.py
+"""
+Service de génération de tuiles vectorielles (Mapbox Vector Tiles) pour GreenSIG.
+
+Les tuiles sont entièrement construites par PostGIS (ST_AsMVT / ST_AsMVTGeom) :
+aucune instance Django ni serializer n'est instancié, quelle que soit la densité
+du site. Une seule requête SQL produit toutes les couches demandées.
+
+Couches disponibles (mêmes noms que les types de /api/map/):
+    sites, reclamations, arbres, gazons, palmiers, arbustes, vivaces, cactus,
+    graminees, puits, pompes, vannes, clapets, canalisations, aspersions,
+    gouttes, ballons
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Q
+
+from api.models import (
+    Site, Objet, Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
+    Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon
+)
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+TILE_EXTENT = 4096          # Résolution interne d'une tuile MVT
+TILE_BUFFER = 64            # Marge (en unités de tuile) pour éviter les coupures aux bords
+MAX_ZOOM = 22
+WEB_MERCATOR_WORLD_SIZE = 40075016.68557849  # Largeur du monde en mètres (EPSG:3857)
+
+# Couche -> modèle enfant (15 types d'objets)
+OBJECT_LAYERS = {
+    'arbres': Arbre,
+    'gazons': Gazon,
+    'palmiers': Palmier,
+    'arbustes': Arbuste,
+    'vivaces': Vivace,
+    'cactus': Cactus,
+    'graminees': Graminee,
+    'puits': Puit,
+    'pompes': Pompe,
+    'vannes': Vanne,
+    'clapets': Clapet,
+    'canalisations': Canalisation,
+    'aspersions': Aspersion,
+    'gouttes': Goutte,
+    'ballons': Ballon,
+}
+
+TILE_LAYERS = ['sites', 'reclamations'] + list(OBJECT_LAYERS.keys())
+
+# Attributs exposés dans les tuiles lorsqu'ils existent sur le modèle enfant
+OBJECT_PROPERTY_FIELDS = ('nom', 'marque', 'famille', 'type', 'taille')
+
+
+# =============================================================================
+# PORTÉE D'ACCÈS
+# =============================================================================
+
+def build_tile_scope(user) -> Dict:
+    """
+    Détermine la portée d'accès de l'utilisateur pour les tuiles.
+
+    Mêmes règles que MapObjectsView :
+    - ADMIN: voit tout
+    - CLIENT: uniquement les sites de sa structure
+    - SUPERVISEUR: uniquement les sites qui lui sont affectés (et leurs objets)
+
+    Les rôles et profils viennent du périmètre d'accès en cache
+    (api_users/access_scope.py) : aucune requête en cas de hit.
+
+    Returns:
+        Dict avec role, structure_id, superviseur_id, user_id et une clé
+        stable (`key`) utilisable pour le cache / l'ETag.
+    """
+    from api_users.access_scope import get_access_scope
+
+    access = get_access_scope(user)
+    scope = {'role': None, 'structure_id': None, 'superviseur_id': None, 'user_id': access.user_id}
+
+    if access.is_admin:
+        scope['role'] = 'ADMIN'
+    elif access.is_client:
+        scope['role'] = 'CLIENT'
+        scope['structure_id'] = access.structure_id
+    elif access.is_superviseur:
+        scope['role'] = 'SUPERVISEUR'
+        scope['superviseur_id'] = access.superviseur_id
+
+    if scope['role'] == 'ADMIN':
+        scope['key'] = 'admin'
+    elif scope['role'] == 'CLIENT':
+        scope['key'] = f"client-{scope['structure_id']}-{scope['user_id']}"
+    elif scope['role'] == 'SUPERVISEUR':
+        scope['key'] = f"superviseur-{scope['superviseur_id']}-{scope['user_id']}"
+    else:
+        scope['key'] = 'none'
+    return scope
+
+
+def _site_scope_sql(scope: Dict, alias: str = 's') -> Tuple[str, List]:
+    """Condition SQL sur la table des sites selon la portée."""
+    if scope['role'] == 'ADMIN':
+        return 'TRUE', []
+    if scope['role'] == 'CLIENT' and scope['structure_id']:
+        return f'{alias}.structure_client_id = %s', [scope['structure_id']]
+    if scope['role'] == 'SUPERVISEUR':
+        return f'{alias}.superviseur_id = %s', [scope['superviseur_id']]
+    return 'FALSE', []
+
+
+def _reclamation_scope_queryset(scope: Dict):
+    """
+    Réclamations visibles (mêmes règles que ReclamationViewSet.get_queryset).
+    """
+    from api_reclamations.models import Reclamation
+
+    queryset = Reclamation.objects.filter(actif=True, localisation__isnull=False)
+
+    if scope['role'] == 'ADMIN':
+        return queryset
+    if scope['role'] == 'SUPERVISEUR':
+        return queryset.filter(
+            Q(site__superviseur_id=scope['superviseur_id']) |
+            Q(equipe_affectee__site__superviseur_id=scope['superviseur_id']) |
+            Q(createur_id=scope['user_id'])
+        )
+    if scope['role'] == 'CLIENT':
+        return queryset.filter(
+            Q(createur_id=scope['user_id']) |
+            Q(structure_client_id=scope['structure_id'], visible_client=True)
+        )
+    if scope['user_id']:
+        return queryset.filter(createur_id=scope['user_id'])
+    return queryset.none()
+
+
+# =============================================================================
+# GÉNÉRATION DES TUILES
+# =============================================================================
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    """Vérifie que les coordonnées z/x/y désignent une tuile existante."""
+    if z < 0 or z > MAX_ZOOM:
+        return False
+    limit = 2 ** z
+    return 0 <= x < limit and 0 <= y < limit
+
+
+def tile_bbox_4326(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Emprise (west, south, east, north) en degrés d'une tuile XYZ, marge incluse.
+    """
+    n = 2 ** z
+    margin = TILE_BUFFER / TILE_EXTENT
+
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return (
+        max(lon(x - margin), -180.0),
+        max(lat(y + 1 + margin), -85.0511287798),
+        min(lon(x + 1 + margin), 180.0),
+        min(lat(y - margin), 85.0511287798),
+    )
+
+
+def simplification_tolerance(z: int) -> float:
+    """
+    Tolérance de simplification (mètres, EPSG:3857) pour un niveau de zoom.
+
+    Correspond à la taille d'une unité de tuile : les sommets plus proches
+    que cette distance seraient de toute façon fusionnés par la quantification MVT.
+    """
+    return WEB_MERCATOR_WORLD_SIZE / (2 ** z) / TILE_EXTENT
+
+
+def _mvt_geom_sql(column: str) -> str:
+    """Expression SQL transformant une géométrie 4326 en géométrie de tuile."""
+    return (
+        f"ST_AsMVTGeom("
+        f"ST_SimplifyPreserveTopology(ST_Transform({column}, 3857), bounds.tolerance), "
+        f"bounds.env, {TILE_EXTENT}, {TILE_BUFFER}, true)"
+    )
+
+
+def _wrap_layer(layer_name: str, inner_sql: str) -> str:
+    """Encapsule une sous-requête de features en couche MVT nommée."""
+    return (
+        f"COALESCE((SELECT ST_AsMVT(t, '{layer_name}', {TILE_EXTENT}, 'geom', 'id') "
+        f"FROM ({inner_sql}) AS t WHERE t.geom IS NOT NULL), ''::bytea)"
+    )
+
+
+def _object_layer_sql(layer_name: str, model, scope: Dict) -> Tuple[str, List]:
+    """SQL d'une couche d'objets GIS (table enfant jointe à api_objet et au site)."""
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    objet_table = qn(Objet._meta.db_table)
+    site_table = qn(Site._meta.db_table)
+
+    local_fields = {f.name for f in model._meta.local_fields}
+    props = [f'c.{qn(name)}' for name in OBJECT_PROPERTY_FIELDS if name in local_fields]
+    props_sql = ''.join(f'{p}, ' for p in props)
+
+    scope_sql, params = _site_scope_sql(scope)
+    inner = (
+        f"SELECT c.objet_ptr_id AS id, {props_sql}o.etat, o.site_id, "
+        f"'{model.__name__}' AS object_type, {_mvt_geom_sql('c.geometry')} AS geom "
+        f"FROM {table} c "
+        f"JOIN {objet_table} o ON o.id = c.objet_ptr_id "
+        f"JOIN {site_table} s ON s.id = o.site_id, bounds "
+        f"WHERE c.geometry && bounds.env_4326 AND {scope_sql}"
+    )
+    return _wrap_layer(layer_name, inner), params
+
+
+def _sites_layer_sql(scope: Dict) -> Tuple[str, List]:
+    """SQL de la couche des sites actifs."""
+    site_table = connection.ops.quote_name(Site._meta.db_table)
+    scope_sql, params = _site_scope_sql(scope)
+    inner = (
+        f"SELECT s.id, s.nom_site, s.code_site, 'Site' AS object_type, "
+        f"{_mvt_geom_sql('s.geometrie_emprise')} AS geom "
+        f"FROM {site_table} s, bounds "
+        f"WHERE s.actif AND s.geometrie_emprise && bounds.env_4326 AND {scope_sql}"
+    )
+    return _wrap_layer('sites', inner), params
+
+
+def _reclamations_layer_sql(scope: Dict) -> Tuple[str, List]:
+    """SQL de la couche des réclamations visibles (filtrage via le queryset ORM)."""
+    from api_reclamations.models import Reclamation
+
+    table = connection.ops.quote_name(Reclamation._meta.db_table)
+    visible_sql, params = _reclamation_scope_queryset(scope).values('id').query.sql_with_params()
+    inner = (
+        f"SELECT r.id, r.numero_reclamation, r.statut, r.site_id, 'Reclamation' AS object_type, "
+        f"{_mvt_geom_sql('r.localisation')} AS geom "
+        f"FROM {table} r, bounds "
+        f"WHERE r.localisation && bounds.env_4326 AND r.id IN ({visible_sql})"
+    )
+    return _wrap_layer('reclamations', inner), list(params)
+
+
+def build_tile(z: int, x: int, y: int, layers: Optional[List[str]], scope: Dict) -> bytes:
+    """
+    Construit une tuile MVT contenant les couches demandées.
+
+    Args:
+        z, x, y: Coordonnées de la tuile (schéma XYZ)
+        layers: Noms de couches (None = toutes)
+        scope: Portée d'accès (voir build_tile_scope)
+
+    Returns:
+        bytes: Tuile encodée (protobuf), éventuellement vide
+    """
+    layers = [l for l in (layers or TILE_LAYERS) if l in TILE_LAYERS]
+    if not layers or (scope['role'] is None and scope['user_id'] is None):
+        return b''
+
+    tile_size_m = WEB_MERCATOR_WORLD_SIZE / (2 ** z)
+    margin_m = tile_size_m * TILE_BUFFER / TILE_EXTENT
+
+    bounds_sql = (
+        "WITH bounds AS ("
+        "SELECT ST_TileEnvelope(%s, %s, %s) AS env, "
+        "ST_Transform(ST_Expand(ST_TileEnvelope(%s, %s, %s), %s), 4326) AS env_4326, "
+        "%s::float8 AS tolerance)"
+    )
+    params: List = [z, x, y, z, x, y, margin_m, simplification_tolerance(z)]
+
+    fragments = []
+    for layer in layers:
+        if layer == 'sites':
+            sql, layer_params = _sites_layer_sql(scope)
+        elif layer == 'reclamations':
+            sql, layer_params = _reclamations_layer_sql(scope)
+        else:
+            sql, layer_params = _object_layer_sql(layer, OBJECT_LAYERS[layer], scope)
+        fragments.append(sql)
+        params.extend(layer_params)
+
+    query = f"{bounds_sql} SELECT {' || '.join(fragments)}"
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+
+    tile = row[0] if row else None
+    return bytes(tile) if tile else b''
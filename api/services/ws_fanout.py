@@ -0,0 +1,148 @@
+# api/services/ws_fanout.py
+"""
+Diffusion WebSocket groupée des notifications.
+
+Au lieu d'un `async_to_sync(channel_layer.group_send)` par destinataire
+(un pont boucle d'événements + un aller-retour Redis chacun), tous les
+messages d'un lot sont envoyés sur une seule boucle, en parallèle : les
+envois partagent le pool de connexions Redis du channel layer.
+
+Regroupement :
+- publish() envoie le lot après le commit de la transaction (aucune
+  notification pour des données annulées par un rollback).
+- Dans un bloc `with coalesce():` (boucle d'une tâche Celery, traitement
+  en masse), les lots publiés sont cumulés et envoyés ensemble à la sortie.
+- Plusieurs notifications d'un même utilisateur dans un lot sont fusionnées
+  en un seul message 'notification_batch' (voir NotificationConsumer).
+
+Usage:
+    publish([(user_id, notification.to_websocket_payload()), ...])
+
+    with coalesce():
+        for reclamation in reclamations:
+            NotificationService.send(...)
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from functools import partial
+from typing import Iterable, List, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Envois simultanés au plus sur la boucle (taille raisonnable du pool Redis)
+MAX_ENVOIS_SIMULTANES = 50
+
+_pending = threading.local()
+
+
+def group_name(user_id: int) -> str:
+    """Groupe WebSocket d'un utilisateur (rejoint par NotificationConsumer)."""
+    return f"notifications_user_{user_id}"
+
+
+def _events(messages: Iterable[Tuple[int, dict]]) -> List[Tuple[str, dict]]:
+    """Un événement par utilisateur : message simple ou lot fusionné."""
+    par_utilisateur = {}
+    for user_id, payload in messages:
+        par_utilisateur.setdefault(user_id, []).append(payload)
+
+    events = []
+    for user_id, payloads in par_utilisateur.items():
+        if len(payloads) == 1:
+            event = {'type': 'notification_message', 'notification': payloads[0]}
+        else:
+            event = {'type': 'notification_batch', 'notifications': payloads}
+        events.append((group_name(user_id), event))
+    return events
+
+
+async def _send_all(channel_layer, events: List[Tuple[str, dict]]) -> int:
+    semaphore = asyncio.Semaphore(MAX_ENVOIS_SIMULTANES)
+
+    async def send(group, event):
+        async with semaphore:
+            await channel_layer.group_send(group, event)
+
+    results = await asyncio.gather(
+        *(send(group, event) for group, event in events),
+        return_exceptions=True,
+    )
+    return sum(1 for result in results if not isinstance(result, Exception))
+
+
+def send_now(messages: Iterable[Tuple[int, dict]]) -> int:
+    """
+    Envoie immédiatement un lot de messages (user_id, payload).
+
+    Returns:
+        Nombre de groupes utilisateurs atteints
+    """
+    events = _events(messages)
+    if not events:
+        return 0
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return 0
+
+    try:
+        return async_to_sync(_send_all)(channel_layer, events)
+    except Exception as e:
+        # WebSocket non disponible : les notifications restent en base
+        logger.warning(f"[WS] Echec de la diffusion de {len(events)} message(s): {e}")
+        return 0
+
+
+class _Lot:
+    """Messages cumulés par un bloc coalesce()."""
+
+    def __init__(self):
+        self.messages = []
+        self.ferme = False
+
+    def ajouter(self, messages):
+        # Transaction commitée après la sortie du bloc : envoi direct
+        if self.ferme:
+            send_now(messages)
+        else:
+            self.messages.extend(messages)
+
+
+def publish(messages: Iterable[Tuple[int, dict]]) -> None:
+    """Envoie un lot de messages (user_id, payload) après le commit (ou à la sortie de coalesce())."""
+    messages = list(messages)
+    if not messages:
+        return
+
+    lot = getattr(_pending, 'lot', None)
+    if lot is not None:
+        transaction.on_commit(partial(lot.ajouter, messages))
+        return
+
+    transaction.on_commit(partial(send_now, messages))
+
+
+@contextmanager
+def coalesce():
+    """
+    Cumule les lots publiés (et commités) dans le bloc et les envoie en un
+    seul à la sortie.
+    """
+    if getattr(_pending, 'lot', None) is not None:
+        yield  # Bloc imbriqué : le bloc englobant envoie
+        return
+
+    lot = _pending.lot = _Lot()
+    try:
+        yield
+    finally:
+        _pending.lot = None
+        lot.ferme = True
+        publish(lot.messages)
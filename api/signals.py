@@ -5,8 +5,29 @@ Ces signals sont connectes manuellement dans apps.py pour eviter les problemes
 avec les decorateurs @receiver et les string senders.
 
 Invalidation du cache :
-  - Site / SousSite → STATISTICS, FILTERS, REPORTING
-  - Objets GIS (15 types) → STATISTICS, FILTERS
+  - Site / SousSite → STATISTICS, FILTERS, REPORTING, MAP
+  - Objets GIS (15 types) → STATISTICS, FILTERS + version MAP du site (ancien et nouveau)
+  - Réclamations → KPIS, REPORTING + version MAP du site
+
+Cumuls mensuels des KPIs (KPIMensuel) :
+  - Tache, DistributionCharge, Reclamation, SatisfactionClient → recalcul des
+    lignes (mois, site) touchées, après le commit
+  - Objets d'une tâche (m2m_changed, liés après la sauvegarde) → mois de la
+    tâche et de ses distributions pour les sites des objets ajoutés / retirés
+
+Index de recherche (IndexRecherche) :
+  - Site → la ligne du site ; sous-sites et objets si le nom / code change
+  - SousSite → l'entité et le contexte de ses objets
+  - Objets GIS (15 types) → la ligne de l'objet
+  - La suppression d'un Site supprime ses lignes (CASCADE)
+
+Facettes de l'inventaire (FacetteInventaire) :
+  - Objets GIS (15 types) → recalcul des couples (type, site) touchés,
+    après le commit
+
+Snapshots des rapports de site (RapportMensuel) :
+  - Tache, DistributionCharge, Reclamation → péremption des rapports
+    (mois, site) touchés, avec les mêmes handlers (objets d'une tâche compris)
 """
 
 import logging
@@ -20,10 +41,47 @@ print("[SIGNALS] ========== api/signals.py CHARGE ==========")
 # INVALIDATION DU CACHE APRÈS MUTATIONS GIS
 # ==============================================================================
 
+def gis_object_pre_save(sender, instance, **kwargs):
+    """
+    Capture l'ancien site d'un objet GIS : si l'objet change de site,
+    les entrées carte des deux sites doivent être invalidées.
+    """
+    from api.models import Objet
+
+    instance._old_site_id = None
+    if instance.pk:
+        instance._old_site_id = Objet.objects.filter(pk=instance.pk).values_list('site_id', flat=True).first()
+
+
 def invalidate_gis_object_cache(sender, instance, **kwargs):
-    """Invalide les caches STATISTICS + FILTERS après mutation d'un objet GIS."""
+    """Invalide STATISTICS + FILTERS et le cache carte du (des) site(s) de l'objet GIS."""
     from greensig_web.cache_utils import invalidate_on_gis_object_mutation
-    invalidate_on_gis_object_mutation()
+    invalidate_on_gis_object_mutation(instance.site_id, getattr(instance, '_old_site_id', None))
+
+
+def reclamation_map_pre_save(sender, instance, **kwargs):
+    """Capture l'ancien site d'une réclamation (cache carte)."""
+    instance._old_map_values = None
+    if instance.pk:
+        instance._old_map_values = sender.objects.filter(pk=instance.pk).values('site_id').first()
+
+
+def invalidate_reclamation_map_cache(sender, instance, **kwargs):
+    """
+    Invalide le cache carte (couche 'reclamations') de l'ancien et du nouveau
+    site d'une réclamation. Une réclamation sans site apparaît dans les cartes
+    non filtrées par site : tout le domaine MAP est alors invalidé.
+    """
+    from greensig_web.cache_utils import invalidate, invalidate_sites
+
+    site_ids = [instance.site_id]
+    old_values = getattr(instance, '_old_map_values', None)
+    if old_values is not None:
+        site_ids.append(old_values['site_id'])
+    if None in site_ids:
+        invalidate('MAP')
+    else:
+        invalidate_sites(*site_ids)
 
 
 def invalidate_site_cache(sender, instance, **kwargs):
@@ -31,6 +89,243 @@ def invalidate_site_cache(sender, instance, **kwargs):
     from greensig_web.cache_utils import invalidate_on_site_mutation
     invalidate_on_site_mutation()
 
+    # Rapports du site (informations et emprise du site), recalculés à la lecture
+    from api.models import RapportMensuel, Site
+    if sender is Site and kwargs.get('created') is False:
+        from django.db.models import F
+        RapportMensuel.objects.filter(site_id=instance.pk).update(
+            perime=True, generation=F('generation') + 1
+        )
+
+
+# ==============================================================================
+# INDEX DE RECHERCHE (IndexRecherche)
+# ==============================================================================
+
+def search_index_site_pre_save(sender, instance, **kwargs):
+    """Capture l'ancien nom / code du site (contexte indexé de ses objets)."""
+    instance._old_index_values = None
+    if instance.pk:
+        instance._old_index_values = sender.objects.filter(pk=instance.pk).values_list(
+            'nom_site', 'code_site'
+        ).first()
+
+
+def search_index_site_saved(sender, instance, created, **kwargs):
+    """
+    Réindexe la ligne du site ; ses sous-sites et le contexte de ses objets
+    seulement si le nom ou le code a changé (une modification du superviseur,
+    de l'emprise, etc. ne réécrit pas l'index de tout le site).
+    """
+    from api.services.search_index import refresh_sites
+
+    old_values = getattr(instance, '_old_index_values', None)
+    contexte = not created and old_values != (instance.nom_site, instance.code_site)
+    refresh_sites([instance.pk], contexte=contexte)
+
+
+def search_index_soussite_saved(sender, instance, **kwargs):
+    """Réindexe un sous-site et le contexte de ses objets."""
+    from api.services.search_index import refresh_sous_sites
+    refresh_sous_sites([instance.pk])
+
+
+def search_index_soussite_pre_delete(sender, instance, **kwargs):
+    """
+    Capture les objets du sous-site : sa suppression les détache
+    (SET_NULL, sans signal), leur contexte doit être réindexé.
+    """
+    from api.models import Objet
+    instance._objets_a_reindexer = list(
+        Objet.objects.filter(sous_site_id=instance.pk).values_list('pk', flat=True)
+    )
+
+
+def search_index_soussite_deleted(sender, instance, **kwargs):
+    """Retire un sous-site de l'index et réindexe ses anciens objets."""
+    from api.services.search_index import refresh_objets, remove
+    remove('soussite', [instance.pk])
+    refresh_objets(getattr(instance, '_objets_a_reindexer', []))
+
+
+def search_index_objet_saved(sender, instance, **kwargs):
+    """Réindexe un objet GIS créé ou modifié."""
+    from api.services.search_index import refresh_objets
+    refresh_objets([instance.pk])
+
+
+def search_index_objet_deleted(sender, instance, **kwargs):
+    """Retire un objet GIS supprimé de l'index."""
+    from api.services.search_index import remove
+    remove('objet', [instance.pk])
+
+
+# ==============================================================================
+# FACETTES DE L'INVENTAIRE (FacetteInventaire)
+# ==============================================================================
+
+def inventory_facets_changed(sender, instance, **kwargs):
+    """Recalcule les facettes (type, site) de l'objet GIS (ancien et nouveau site), après le commit."""
+    from api.services.inventory_facets import mark_facets_dirty
+    mark_facets_dirty(sender.__name__, [instance.site_id, getattr(instance, '_old_site_id', None)])
+
+
+# ==============================================================================
+# CUMULS MENSUELS DES KPIs
+# ==============================================================================
+
+def _tache_site_ids(tache_id):
+    """Sites des objets d'une tâche."""
+    from api.models import Objet
+    return set(
+        Objet.objects.filter(taches=tache_id).values_list('site_id', flat=True).distinct()
+    )
+
+
+def kpi_tache_pre_save(sender, instance, **kwargs):
+    """Capture les anciennes dates (le mois de l'ancienne valeur change aussi)."""
+    instance._old_kpi_dates = []
+    instance._old_report_dates = []
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list(
+            'date_fin_reelle', 'date_debut_planifiee', 'date_fin_planifiee'
+        ).first()
+        if old:
+            instance._old_kpi_dates = [old[0]]
+            instance._old_report_dates = list(old)
+
+
+def kpi_tache_changed(sender, instance, **kwargs):
+    """
+    KPI 1 : recalcule le mois de fin réelle de la tâche pour ses sites.
+    Rapports : périme les mois de fin réelle et de planification.
+    """
+    from api.services.kpi_rollup import mark_kpis_dirty
+    from api.services.report_snapshots import mark_reports_stale
+
+    dates = [instance.date_fin_reelle, *getattr(instance, '_old_kpi_dates', [])]
+    report_dates = [
+        instance.date_fin_reelle, instance.date_debut_planifiee, instance.date_fin_planifiee,
+        *getattr(instance, '_old_report_dates', []),
+    ]
+    if kwargs.get('created') is None:
+        # Suppression : les liens vers les objets ont disparu → tout le mois
+        site_ids = None
+    else:
+        site_ids = _tache_site_ids(instance.pk)
+    mark_kpis_dirty(dates, site_ids)
+    mark_reports_stale(report_dates, site_ids)
+
+
+def kpi_tache_objets_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    KPIs et rapports : sites des objets ajoutés / retirés d'une tâche.
+
+    Les objets d'une tâche sont liés après sa sauvegarde (objets.set()) :
+    au post_save, la tâche n'a pas encore (ou plus seulement) ses nouveaux
+    sites. Recalcule les mois de la tâche (fin réelle, planification) et de
+    ses distributions pour ces sites.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    from api.models import Objet
+    from api.services.kpi_rollup import mark_kpis_dirty
+    from api.services.report_snapshots import mark_reports_stale
+    from api_planification.models import DistributionCharge, Tache
+
+    if reverse:
+        # objet.taches.add(...) : instance = objet, pk_set = tâches
+        site_ids = {instance.site_id}
+        if action == 'pre_clear':
+            tache_ids = set(instance.taches.values_list('pk', flat=True))
+        else:
+            tache_ids = set(pk_set or ())
+    else:
+        tache_ids = {instance.pk}
+        if action == 'pre_clear':
+            site_ids = _tache_site_ids(instance.pk)
+        else:
+            site_ids = set(
+                Objet.objects.filter(pk__in=pk_set or ()).values_list('site_id', flat=True).distinct()
+            )
+
+    if not site_ids or not tache_ids:
+        return
+
+    taches = list(
+        Tache.objects.filter(pk__in=tache_ids).values_list(
+            'date_fin_reelle', 'date_debut_planifiee', 'date_fin_planifiee'
+        )
+    )
+    distribution_dates = list(
+        DistributionCharge.objects.filter(tache_id__in=tache_ids).values_list('date', flat=True)
+    )
+    mark_kpis_dirty([t[0] for t in taches] + distribution_dates, site_ids)
+    mark_reports_stale([d for t in taches for d in t] + distribution_dates, site_ids)
+
+
+def kpi_distribution_pre_save(sender, instance, **kwargs):
+    """Capture l'ancienne date d'une distribution."""
+    instance._old_kpi_dates = []
+    if instance.pk:
+        instance._old_kpi_dates = list(
+            sender.objects.filter(pk=instance.pk).values_list('date', flat=True)
+        )
+
+
+def kpi_distribution_changed(sender, instance, **kwargs):
+    """KPIs 5 et 6 et rapports : mois de la distribution pour les sites de sa tâche."""
+    from api.services.kpi_rollup import mark_kpis_dirty
+    from api.services.report_snapshots import mark_reports_stale
+
+    dates = [instance.date, *getattr(instance, '_old_kpi_dates', [])]
+    site_ids = _tache_site_ids(instance.tache_id)
+    mark_kpis_dirty(dates, site_ids)
+    mark_reports_stale(dates, site_ids)
+
+
+def kpi_reclamation_pre_save(sender, instance, **kwargs):
+    """Capture l'ancien site et les anciennes dates d'une réclamation."""
+    instance._old_kpi_values = None
+    if instance.pk:
+        instance._old_kpi_values = sender.objects.filter(pk=instance.pk).values(
+            'site_id', 'date_creation', 'date_cloture_reelle'
+        ).first()
+
+
+def kpi_reclamation_changed(sender, instance, **kwargs):
+    """KPIs 2, 3 et 4 : recalcule les mois de création / clôture pour l'ancien et le nouveau site."""
+    from api.services.kpi_rollup import mark_kpis_dirty
+    from api_reclamations.models import SatisfactionClient
+
+    dates = [instance.date_creation, instance.date_cloture_reelle]
+    site_ids = {instance.site_id}
+    old = getattr(instance, '_old_kpi_values', None)
+    if old:
+        dates += [old['date_creation'], old['date_cloture_reelle']]
+        site_ids.add(old['site_id'])
+    if len(site_ids) > 1 or kwargs.get('created') is None:
+        # Changement de site / suppression : l'évaluation éventuelle suit
+        dates += SatisfactionClient.objects.filter(
+            reclamation_id=instance.pk
+        ).values_list('date_evaluation', flat=True)
+    mark_kpis_dirty(dates, site_ids)
+
+    from api.services.report_snapshots import mark_reports_stale
+    mark_reports_stale(dates, site_ids)
+
+
+def kpi_satisfaction_changed(sender, instance, **kwargs):
+    """KPI 2 : recalcule le mois de l'évaluation pour le site de la réclamation."""
+    from api.services.kpi_rollup import mark_kpis_dirty
+    from api_reclamations.models import Reclamation
+
+    site_ids = set(
+        Reclamation.objects.filter(pk=instance.reclamation_id).values_list('site_id', flat=True)
+    )
+    mark_kpis_dirty([instance.date_evaluation], site_ids)
+
 
 def site_pre_save(sender, instance, **kwargs):
     """
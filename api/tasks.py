@@ -4,13 +4,15 @@ Celery tasks for api module.
 Async tasks for:
 - PDF export (map with legend)
 - Data export (Excel, GeoJSON, KML, Shapefile)
+- Geo import jobs (resumable, with progress)
 - Async notifications
+- Notification retention (archive of old read notifications)
+- Monthly site report snapshots
 - Statistics calculation
 """
 
 import logging
 import os
-import json
 import base64
 from celery import shared_task
 from django.conf import settings
@@ -212,64 +214,34 @@ def export_data_async(self, user_id, model_name, export_format, filters=None, id
         export_dir = os.path.join(settings.MEDIA_ROOT, 'exports', export_format)
         os.makedirs(export_dir, exist_ok=True)
 
-        # Export based on format
+        # Export en flux vers le fichier : lecture par lots, mémoire constante
         if export_format == 'xlsx':
-            from openpyxl import Workbook
-
-            wb = Workbook()
-            ws = wb.active
-            ws.title = model_name.capitalize()
-
-            # Get model fields
-            fields = [f.name for f in model_class._meta.get_fields()
-                     if hasattr(f, 'column') and f.name != 'geom']
-
-            # Header
-            ws.append(fields)
-
-            # Data
-            for obj in queryset:
-                row = []
-                for field in fields:
-                    value = getattr(obj, field, '')
-                    if hasattr(value, 'pk'):
-                        value = str(value)
-                    row.append(value)
-                ws.append(row)
+            from api.services.geo_io import write_xlsx
 
             filename = f"{model_name}_{timestamp}.xlsx"
             filepath = os.path.join(export_dir, filename)
-            wb.save(filepath)
-
-        elif export_format == 'geojson':
-            from api.services.geo_io import export_to_geojson
-
-            geojson_data = export_to_geojson(queryset)
-            filename = f"{model_name}_{timestamp}.geojson"
-            filepath = os.path.join(export_dir, filename)
+            record_count = write_xlsx(queryset, filepath, title=model_name.capitalize())
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(geojson_data, f, ensure_ascii=False, indent=2)
-
-        elif export_format == 'kml':
-            from api.services.geo_io import export_to_kml
+        elif export_format in ('geojson', 'kml'):
+            from api.services.geo_io import iter_geojson, iter_kml
 
-            kml_content = export_to_kml(queryset)
-            filename = f"{model_name}_{timestamp}.kml"
+            stream = iter_geojson(queryset) if export_format == 'geojson' else iter_kml(queryset)
+            filename = f"{model_name}_{timestamp}.{export_format}"
             filepath = os.path.join(export_dir, filename)
 
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(kml_content)
+                for chunk in stream:
+                    f.write(chunk)
+            record_count = queryset.count()
 
         elif export_format == 'shp':
-            from api.services.geo_io import export_to_shapefile
+            from api.services.geo_io import write_shapefile
 
-            zip_content = export_to_shapefile(queryset, model_name)
             filename = f"{model_name}_{timestamp}.zip"
             filepath = os.path.join(export_dir, filename)
 
             with open(filepath, 'wb') as f:
-                f.write(zip_content)
+                record_count = write_shapefile(queryset, f, model_name)
 
         else:
             return {'success': False, 'error': f'Unsupported format: {export_format}'}
@@ -277,14 +249,14 @@ def export_data_async(self, user_id, model_name, export_format, filters=None, id
         relative_path = f"exports/{export_format}/{filename}"
         download_url = f"{settings.MEDIA_URL}{relative_path}"
 
-        logger.info(f"Data export completed: {filepath} ({queryset.count()} records)")
+        logger.info(f"Data export completed: {filepath} ({record_count} records)")
 
         return {
             'success': True,
             'file_path': filepath,
             'download_url': download_url,
             'filename': filename,
-            'record_count': queryset.count(),
+            'record_count': record_count,
         }
 
     except Exception as e:
@@ -292,6 +264,47 @@ def export_data_async(self, user_id, model_name, export_format, filters=None, id
         return {'success': False, 'error': str(e)}
 
 
+# ==============================================================================
+# IMPORT TASKS
+# ==============================================================================
+
+@shared_task(bind=True, name='api.tasks.import_job_async')
+def import_job_async(self, job_id):
+    """
+    Async task to run (or resume) a geo import job.
+
+    Progress (parsed/validated/inserted counts) is published in the task
+    state 'PROGRESS' and exposed by TaskStatusView.
+
+    Args:
+        job_id: ID of the ImportJob
+
+    Returns:
+        dict: Final job progress payload
+    """
+    from api.models import ImportJob
+    from api.services.import_jobs import run_import_job
+
+    try:
+        job = ImportJob.objects.get(pk=job_id)
+    except ImportJob.DoesNotExist:
+        return {'success': False, 'error': f'ImportJob {job_id} not found'}
+
+    def publish(current_job):
+        self.update_state(state='PROGRESS', meta=current_job.to_progress_payload())
+
+    try:
+        job = run_import_job(job, progress=publish)
+    except Exception as e:
+        logger.error(f"Error in import_job_async (job {job_id}): {str(e)}")
+        job.refresh_from_db()
+        job.statut = 'echec'
+        job.message_erreur = str(e)
+        job.save(update_fields=['statut', 'message_erreur', 'updated_at'])
+
+    return {'success': job.statut == 'termine', **job.to_progress_payload()}
+
+
 # ==============================================================================
 # NOTIFICATION TASKS
 # ==============================================================================
@@ -503,6 +516,54 @@ def cleanup_old_exports(self, days=7):
     return result
 
 
+@shared_task(bind=True, name='api.tasks.archive_notifications')
+def archive_notifications(self, days=None):
+    """
+    Periodic task moving read notifications older than
+    NOTIFICATION_RETENTION_DAYS into NotificationArchive.
+
+    Args:
+        days: Retention override in days (default: settings)
+
+    Returns:
+        dict: Number of archived notifications
+    """
+    from api.services.notification_retention import archiver_notifications
+
+    archived = archiver_notifications(days)
+    logger.info(f"archive_notifications: {archived} notification(s) archivee(s)")
+    return {
+        'success': True,
+        'archived': archived,
+    }
+
+
+@shared_task(bind=True, name='api.tasks.build_report_snapshots')
+def build_report_snapshots(self, snapshot_ids=None):
+    """
+    Builds monthly site report snapshots (RapportMensuel).
+
+    Args:
+        snapshot_ids: Stale snapshots to rebuild (scheduled by the signals).
+            None = daily pass: previous month of every active site and all
+            remaining stale snapshots.
+
+    Returns:
+        dict: Number of snapshots built
+    """
+    from api.services.report_snapshots import build_due_snapshots, rebuild_snapshots
+
+    if snapshot_ids is None:
+        built = build_due_snapshots()
+    else:
+        built = rebuild_snapshots(snapshot_ids)
+    logger.info(f"build_report_snapshots: {built} snapshot(s) calcule(s)")
+    return {
+        'success': True,
+        'built': built,
+    }
+
+
 # ==============================================================================
 # BULK NOTIFICATIONS TASK
 # ==============================================================================
@@ -530,8 +591,6 @@ def send_bulk_notifications_async(self, notifications_data):
     """
     from api.models import Notification
     from api_users.models import Utilisateur
-    from asgiref.sync import async_to_sync
-    from channels.layers import get_channel_layer
 
     if not notifications_data:
         return {'success': True, 'created_count': 0}
@@ -572,22 +631,15 @@ def send_bulk_notifications_async(self, notifications_data):
         created_notifications = Notification.objects.bulk_create(notifications_to_create)
         logger.info(f"Bulk notifications created: {len(created_notifications)}")
 
-        # Send via WebSocket
-        channel_layer = get_channel_layer()
-        ws_sent = 0
-        for notification in created_notifications:
-            group_name = f"notifications_user_{notification.destinataire_id}"
-            try:
-                async_to_sync(channel_layer.group_send)(
-                    group_name,
-                    {
-                        'type': 'notification_message',
-                        'notification': notification.to_websocket_payload(),
-                    }
-                )
-                ws_sent += 1
-            except Exception:
-                pass  # WebSocket not available for this user
+        from api.services.unread_counters import notifications_created
+        notifications_created(created_notifications)
+
+        # Send via WebSocket: one batch on a single event loop
+        from api.services.ws_fanout import send_now
+        ws_sent = send_now(
+            (notification.destinataire_id, notification.to_websocket_payload())
+            for notification in created_notifications
+        )
 
         return {
             'success': True,
@@ -32,10 +32,11 @@ from .views_export import (
     InventoryExportExcelView, InventoryExportPDFView,
 )
 from .views_inventory import (
-    InventoryListView, InventoryFilterOptionsView, MapObjectsView,
+    InventoryListView, InventoryFilterOptionsView, MapObjectsView, MapTileView,
 )
 from .views_import import (
     GeoImportPreviewView, GeoImportValidateView, GeoImportExecuteView,
+    ImportJobCreateView, ImportJobDetailView, ImportJobResumeView,
 )
 from .views_geometry import (
     GeometrySimplifyView, GeometrySplitView, GeometryMergeView,
@@ -59,6 +60,7 @@ urlpatterns = [
     # CARTE AVEC BOUNDING BOX (endpoint unifié et optimisé)
     # ==============================================================================
     path('map/', MapObjectsView.as_view(), name='map-objects'),
+    path('map/tiles/<int:z>/<int:x>/<int:y>.pbf', MapTileView.as_view(), name='map-tiles'),
 
     # ==============================================================================
     # RECHERCHE
@@ -92,6 +94,9 @@ urlpatterns = [
     path('import/preview/', GeoImportPreviewView.as_view(), name='import-preview'),
     path('import/validate/', GeoImportValidateView.as_view(), name='import-validate'),
     path('import/execute/', GeoImportExecuteView.as_view(), name='import-execute'),
+    path('import/jobs/', ImportJobCreateView.as_view(), name='import-job-create'),
+    path('import/jobs/<int:job_id>/', ImportJobDetailView.as_view(), name='import-job-detail'),
+    path('import/jobs/<int:job_id>/resume/', ImportJobResumeView.as_view(), name='import-job-resume'),
 
     # ==============================================================================
     # OPÉRATIONS GÉOMÉTRIQUES
@@ -2,15 +2,16 @@
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.contrib.gis.geos import GEOSGeometry
 from celery.result import AsyncResult
 import json
 
+from api_users.access_scope import get_access_scope
 from api_users.permissions import IsAdmin, IsAdminOrSuperviseur, CanExportData
 
 from .models import (
-    Site, SousSite, Objet, Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
+    Site, SousSite, Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
     Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon
 )
 from .serializers import (
@@ -40,33 +41,12 @@ class GISObjectPermissionMixin:
     - ADMIN: voit tous les objets
     - CLIENT: voit uniquement les objets de ses sites
     - SUPERVISEUR: voit uniquement les objets des sites qui lui sont affectés
+
+    Les sites visibles viennent du périmètre d'accès en cache (get_access_scope).
     """
     def get_queryset(self):
         queryset = super().get_queryset()
-        user = self.request.user
-
-        if not user or not user.is_authenticated:
-            return queryset.none()
-
-        roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-        # ADMIN voit tout
-        if 'ADMIN' in roles:
-            return queryset
-
-        # CLIENT voit uniquement les objets des sites de sa structure
-        if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-            structure = user.client_profile.structure
-            if structure:
-                return queryset.filter(site__structure_client=structure)
-            return queryset.none()
-
-        # SUPERVISEUR voit uniquement les objets des sites qui lui sont affectés
-        if 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-            return queryset.filter(site__superviseur=user.superviseur_profile)
-
-        # Par défaut, aucun accès
-        return queryset.none()
+        return get_access_scope(self.request.user).filter_sites(queryset, 'site_id')
 
 
 # ==============================================================================
@@ -80,7 +60,8 @@ class TaskStatusView(APIView):
     GET /api/tasks/<task_id>/status/
 
     Retourne:
-    - status: PENDING, STARTED, SUCCESS, FAILURE, RETRY, REVOKED
+    - status: PENDING, STARTED, PROGRESS, SUCCESS, FAILURE, RETRY, REVOKED
+    - progress: Avancement si PROGRESS (ex: compteurs d'un job d'import)
     - result: Résultat si SUCCESS, message d'erreur si FAILURE
     - ready: True si la tâche est terminée
     """
@@ -94,6 +75,10 @@ class TaskStatusView(APIView):
             'ready': result.ready(),
         }
 
+        # Avancement publié par la tâche (ex: jobs d'import)
+        if result.status == 'PROGRESS' and isinstance(result.info, dict):
+            response_data['progress'] = result.info
+
         if result.ready():
             if result.successful():
                 response_data['result'] = result.result
@@ -114,72 +99,13 @@ class SiteListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         """
-        Filtrage automatique basé sur les permissions utilisateur:
+        Filtrage automatique basé sur le périmètre d'accès (api_users/access_scope.py):
         - ADMIN: voit tous les sites
         - CLIENT: voit uniquement ses sites
-        - SUPERVISEUR: voit uniquement les sites liés aux tâches de ses équipes
+        - SUPERVISEUR: voit uniquement les sites qui lui sont affectés
         """
         queryset = Site.objects.all().order_by('id')
-        user = self.request.user
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            # ADMIN voit tout
-            if 'ADMIN' in roles:
-                return queryset
-
-            # CLIENT voit uniquement les sites de sa structure
-            if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure = user.client_profile.structure
-                if structure:
-                    return queryset.filter(structure_client=structure)
-                return queryset.none()
-
-            # SUPERVISEUR voit uniquement les sites qui lui sont affectés directement
-            if 'SUPERVISEUR' in roles:
-                if hasattr(user, 'superviseur_profile'):
-                    return queryset.filter(superviseur=user.superviseur_profile)
-                else:
-                    # Superviseur sans profil = aucun site visible
-                    return queryset.none()
-
-        # Par défaut, aucun accès pour les utilisateurs sans rôle reconnu
-        return queryset.none()
-
-    def _get_superviseur_site_ids(self, user):
-        """
-        Récupère les IDs des sites contenant les objets liés aux tâches du superviseur.
-        Seuls les sites avec des objets dans les tâches sont retournés.
-
-        OPTIMISÉ: Une seule requête SQL au lieu de N+1.
-        """
-        from api_planification.models import Tache
-
-        try:
-            superviseur = user.superviseur_profile
-            # Équipes gérées par ce superviseur
-            equipes_gerees = superviseur.equipes_gerees.filter(actif=True)
-            equipes_gerees_ids = list(equipes_gerees.values_list('id', flat=True))
-
-            if not equipes_gerees_ids:
-                return []
-
-            # Tâches assignées à ces équipes
-            taches_ids = Tache.objects.filter(
-                Q(equipes__id__in=equipes_gerees_ids) | Q(id_equipe__in=equipes_gerees_ids)
-            ).values_list('id', flat=True).distinct()
-
-            # OPTIMISÉ: Récupérer les site_ids en une seule requête via la relation inverse
-            # Au lieu de boucler sur chaque tâche puis chaque objet (N+1)
-            site_ids = list(Objet.objects.filter(
-                taches__id__in=taches_ids,
-                site_id__isnull=False
-            ).values_list('site_id', flat=True).distinct())
-
-            return site_ids
-        except Exception:
-            return []
+        return get_access_scope(self.request.user).filter_sites(queryset)
 
 
 class SiteDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -187,36 +113,12 @@ class SiteDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         """
-        Filtrage automatique basé sur les permissions utilisateur:
+        Filtrage automatique basé sur le périmètre d'accès (api_users/access_scope.py):
         - ADMIN: voit tous les sites
         - CLIENT: voit uniquement ses sites
         - SUPERVISEUR: voit uniquement les sites qui lui sont affectés
         """
-        queryset = Site.objects.all()
-        user = self.request.user
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            # ADMIN voit tout
-            if 'ADMIN' in roles:
-                return queryset
-
-            # CLIENT voit uniquement les sites de sa structure
-            if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure = user.client_profile.structure
-                if structure:
-                    return queryset.filter(structure_client=structure)
-                return queryset.none()
-
-            # SUPERVISEUR voit uniquement les sites qui lui sont affectés
-            if 'SUPERVISEUR' in roles:
-                if hasattr(user, 'superviseur_profile'):
-                    return queryset.filter(superviseur=user.superviseur_profile)
-                else:
-                    return queryset.none()
-
-        return queryset.none()
+        return get_access_scope(self.request.user).filter_sites(Site.objects.all())
 
 
 class SousSiteListCreateView(generics.ListCreateAPIView):
@@ -226,36 +128,13 @@ class SousSiteListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         """
-        Filtrage automatique basé sur les permissions utilisateur:
+        Filtrage automatique basé sur le périmètre d'accès (api_users/access_scope.py):
         - ADMIN: voit tous les sous-sites
         - CLIENT: voit uniquement les sous-sites de ses sites
         - SUPERVISEUR: voit uniquement les sous-sites des sites qui lui sont affectés
         """
         queryset = super().get_queryset()
-        user = self.request.user
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            # ADMIN voit tout
-            if 'ADMIN' in roles:
-                return queryset
-
-            # CLIENT voit uniquement les sous-sites des sites de sa structure
-            if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure = user.client_profile.structure
-                if structure:
-                    return queryset.filter(site__structure_client=structure)
-                return queryset.none()
-
-            # SUPERVISEUR voit uniquement les sous-sites des sites qui lui sont affectés
-            if 'SUPERVISEUR' in roles:
-                if hasattr(user, 'superviseur_profile'):
-                    return queryset.filter(site__superviseur=user.superviseur_profile)
-                else:
-                    return queryset.none()
-
-        return queryset.none()
+        return get_access_scope(self.request.user).filter_sites(queryset, 'site_id')
 
 
 class SousSiteDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -264,33 +143,13 @@ class SousSiteDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         """
-        Filtrage automatique basé sur les permissions utilisateur:
+        Filtrage automatique basé sur le périmètre d'accès (api_users/access_scope.py):
         - ADMIN: voit tous les sous-sites
         - CLIENT: voit uniquement les sous-sites de ses sites
         - SUPERVISEUR: voit uniquement les sous-sites des sites qui lui sont affectés
         """
         queryset = super().get_queryset()
-        user = self.request.user
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            # ADMIN voit tout
-            if 'ADMIN' in roles:
-                return queryset
-
-            # CLIENT voit uniquement les sous-sites des sites de sa structure
-            if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure = user.client_profile.structure
-                if structure:
-                    return queryset.filter(site__structure_client=structure)
-                return queryset.none()
-
-            # SUPERVISEUR voit uniquement les sous-sites des sites qui lui sont affectés
-            if 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-                return queryset.filter(site__superviseur=user.superviseur_profile)
-
-        return queryset
+        return get_access_scope(self.request.user).filter_sites(queryset, 'site_id')
 
 
 class DetectSiteView(APIView):
@@ -540,168 +399,50 @@ class SearchView(APIView):
     Accepte un paramètre de requête `q`.
     Recherche dans Sites, SousSites, et tous les 15 types d'objets (végétation + hydraulique).
 
-    🔒 FILTRAGE PAR RÔLE:
+    Une seule requête sur l'index de recherche unifié (IndexRecherche, index
+    trigramme, api/services/search_index.py) : nom/code des sites, nom des
+    sous-sites, nom/famille/marque/type/observation et ID des objets.
+
+    🔒 FILTRAGE PAR RÔLE (périmètre d'accès, api_users/access_scope.py):
     - ADMIN: voit tout
     - CLIENT: voit uniquement ses sites/objets
-    - SUPERVISEUR: voit uniquement les sites liés à ses équipes
+    - SUPERVISEUR: voit uniquement les sites qui lui sont affectés
     """
+    # Libellés de type affichés (par défaut : nom du modèle)
+    TYPE_LABELS = {'Graminee': 'Graminée'}
+
     def get(self, request, *args, **kwargs):
+        from api.services.search_index import search
+
         query = request.query_params.get('q', '').strip()
 
         if len(query) < 2:
             return Response([])
 
-        results = []
-
         # 🔒 Filtrage par rôle utilisateur
-        user = request.user
-        structure_filter = None
-        site_ids_filter = None
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            # CLIENT: uniquement les sites de sa structure
-            if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure_filter = user.client_profile.structure
-
-            # SUPERVISEUR: uniquement les sites de ses équipes
-            elif 'SUPERVISEUR' in roles and not ('ADMIN' in roles):
-                site_ids_filter = self._get_superviseur_site_ids(user)
-
-        # Recherche sur les Sites (par nom ou code)
-        site_query = Q(nom_site__icontains=query) | Q(code_site__icontains=query)
-        sites_queryset = Site.objects.filter(site_query)
-
-        # Appliquer le filtrage par rôle
-        if structure_filter:
-            sites_queryset = sites_queryset.filter(structure_client=structure_filter)
-        elif site_ids_filter is not None:
-            sites_queryset = sites_queryset.filter(id__in=site_ids_filter)
-
-        sites = sites_queryset.distinct()[:10]  # ✅ Limit to 10 unique sites
-        for item in sites:
-            location = item.centroid
-            results.append({
-                'id': f"site-{item.pk}",
-                'name': f"{item.nom_site}",
-                'type': 'Site',
-                'location': {'type': 'Point', 'coordinates': [location.x, location.y]} if location else None,
-            })
-
-        # Recherche sur les Sous-Sites (par nom)
-        sous_sites_queryset = SousSite.objects.filter(nom__icontains=query)
+        scope = get_access_scope(request.user)
 
-        # Appliquer le filtrage par rôle
-        if structure_filter:
-            sous_sites_queryset = sous_sites_queryset.filter(site__structure_client=structure_filter)
-        elif site_ids_filter is not None:
-            sous_sites_queryset = sous_sites_queryset.filter(site_id__in=site_ids_filter)
+        results = []
+        for row in search(scope, query):
+            location = (
+                {'type': 'Point', 'coordinates': [row['x'], row['y']]}
+                if row['x'] is not None else None
+            )
+            if row['type_entite'] == 'site':
+                item_id, name, type_name = f"site-{row['entite_id']}", row['libelle'], 'Site'
+            elif row['type_entite'] == 'soussite':
+                item_id, name, type_name = f"soussite-{row['entite_id']}", row['libelle'], 'Sous-site'
+            else:
+                type_name = self.TYPE_LABELS.get(row['type_objet'], row['type_objet'])
+                obj_name = row['libelle'] or f"{type_name} #{row['entite_id']}"
+                item_id = f"{row['type_objet'].lower()}-{row['entite_id']}"
+                name = f"{obj_name} ({row['site_nom']})"
 
-        sous_sites = sous_sites_queryset.distinct()[:5]  # ✅ Limit to 5 unique sous-sites
-        for item in sous_sites:
-            location = item.geometrie
             results.append({
-                'id': f"soussite-{item.pk}",
-                'name': f"{item.nom} ({item.site.nom_site})",
-                'type': 'Sous-site',
-                'location': {'type': 'Point', 'coordinates': [location.x, location.y]} if location else None,
+                'id': item_id,
+                'name': name,
+                'type': type_name,
+                'location': location,
             })
 
-        # ✅ Recherche sur TOUS les types d'objets (végétation + hydraulique)
-        # Mapping: (Model, type_name, id_prefix)
-        object_models = [
-            # Végétation (7 types)
-            (Arbre, 'Arbre', 'arbre'),
-            (Gazon, 'Gazon', 'gazon'),
-            (Palmier, 'Palmier', 'palmier'),
-            (Arbuste, 'Arbuste', 'arbuste'),
-            (Vivace, 'Vivace', 'vivace'),
-            (Cactus, 'Cactus', 'cactus'),
-            (Graminee, 'Graminée', 'graminee'),
-            # Hydraulique (8 types)
-            (Puit, 'Puit', 'puit'),
-            (Pompe, 'Pompe', 'pompe'),
-            (Vanne, 'Vanne', 'vanne'),
-            (Clapet, 'Clapet', 'clapet'),
-            (Canalisation, 'Canalisation', 'canalisation'),
-            (Aspersion, 'Aspersion', 'aspersion'),
-            (Goutte, 'Goutte', 'goutte'),
-            (Ballon, 'Ballon', 'ballon'),
-        ]
-
-        for Model, type_name, id_prefix in object_models:
-            try:
-                # Recherche par nom (ou marque pour certains types hydrauliques)
-                query_filter = Q(nom__icontains=query)
-                if hasattr(Model, 'marque'):
-                    query_filter |= Q(marque__icontains=query)
-                if hasattr(Model, 'famille'):
-                    query_filter |= Q(famille__icontains=query)
-
-                objects_queryset = Model.objects.filter(query_filter).select_related('site')
-
-                # 🔒 Appliquer le filtrage par rôle
-                if structure_filter:
-                    objects_queryset = objects_queryset.filter(site__structure_client=structure_filter)
-                elif site_ids_filter is not None:
-                    objects_queryset = objects_queryset.filter(site_id__in=site_ids_filter)
-
-                objects = objects_queryset[:5]  # Max 5 par type
-                for obj in objects:
-                    try:
-                        location = obj.geometry if hasattr(obj, 'geometry') else None
-                        site_name = obj.site.nom_site if hasattr(obj, 'site') and obj.site else 'Inconnu'
-
-                        # Centroid pour polygones/lignes
-                        if location and location.geom_type in ['Polygon', 'LineString', 'MultiPolygon', 'MultiLineString']:
-                            location = location.centroid
-
-                        # Nom de l'objet
-                        obj_name = obj.nom if hasattr(obj, 'nom') and obj.nom else f"{type_name} #{obj.pk}"
-
-                        results.append({
-                            'id': f"{id_prefix}-{obj.pk}",
-                            'name': f"{obj_name} ({site_name})",
-                            'type': type_name,
-                            'location': {'type': 'Point', 'coordinates': [location.x, location.y]} if location else None,
-                        })
-                    except Exception as e:
-                        # Log error but continue with next object
-                        print(f"Error processing {type_name} #{obj.pk}: {str(e)}")
-                        continue
-
-            except Exception as e:
-                # Log error but continue with next model type
-                print(f"Error searching {type_name}: {str(e)}")
-                continue
-
-        # Limiter le nombre total de résultats
-        return Response(results[:30])
-
-    def _get_superviseur_site_ids(self, user):
-        """
-        Récupère les IDs des sites contenant les objets liés aux tâches du superviseur.
-        """
-        from api_planification.models import Tache
-
-        try:
-            superviseur = user.superviseur_profile
-            equipes_gerees = superviseur.equipes_gerees.filter(actif=True)
-            equipes_gerees_ids = list(equipes_gerees.values_list('id', flat=True))
-
-            if not equipes_gerees_ids:
-                return []
-
-            taches_ids = Tache.objects.filter(
-                Q(equipes__id__in=equipes_gerees_ids) | Q(id_equipe__in=equipes_gerees_ids)
-            ).values_list('id', flat=True).distinct()
-
-            site_ids = list(Objet.objects.filter(
-                taches__id__in=taches_ids,
-                site_id__isnull=False
-            ).values_list('site_id', flat=True).distinct())
-
-            return site_ids
-        except Exception:
-            return []
+        return Response(results)
@@ -5,8 +5,8 @@ from rest_framework.response import Response
 from django.db.models import Q, Count
 from django.contrib.gis.geos import GEOSGeometry
 from celery.result import AsyncResult
-import json
 
+from api_users.access_scope import get_access_scope
 from api_users.permissions import IsAdmin, IsAdminOrSuperviseur, CanExportData
 
 from .models import (
@@ -381,9 +381,9 @@ class ExportDataView(APIView):
                 'message': f'Export {export_format.upper()} démarré en arrière-plan. Utilisez /api/tasks/{{task_id}}/status/ pour suivre la progression.'
             }, status=status.HTTP_202_ACCEPTED)
 
-        # Mode synchrone (comportement original)
-        from openpyxl import Workbook
-        from django.http import HttpResponse
+        # Mode synchrone : réponse en flux
+        import tempfile
+        from django.http import FileResponse, StreamingHttpResponse
         from datetime import datetime
 
         model_class = self.MODEL_MAPPING[model_name]
@@ -401,20 +401,12 @@ class ExportDataView(APIView):
         # Appliquer les filtres
         queryset = model_class.objects.all()
 
-        # Filtrer par structure pour les utilisateurs CLIENT
-        user = request.user
-        if user.roles_utilisateur.filter(role__nom_role='CLIENT').exists():
-            if hasattr(user, 'client_profile') and user.client_profile.structure:
-                structure = user.client_profile.structure
-                # Les modèles Objet ont une relation site -> structure_client
-                if hasattr(model_class, 'site'):
-                    queryset = queryset.filter(site__structure_client=structure)
-                # Sites ont directement structure_client
-                elif hasattr(model_class, 'structure_client'):
-                    queryset = queryset.filter(structure_client=structure)
-                # SousSite via site
-                elif model_class == SousSite:
-                    queryset = queryset.filter(site__structure_client=structure)
+        # Filtrer par structure pour les utilisateurs CLIENT (sites du périmètre d'accès)
+        scope = get_access_scope(request.user)
+        if scope.is_client and scope.structure_id:
+            # Objets GIS et SousSite : relation site ; Sites : la ligne elle-même
+            field = 'site_id' if hasattr(model_class, 'site') else 'pk'
+            queryset = scope.filter_sites(queryset, field)
 
         # Filtre par IDs si fourni
         ids_param = request.query_params.get('ids', '')
@@ -434,108 +426,75 @@ class ExportDataView(APIView):
         if not queryset.exists():
             return Response({'error': 'Aucune donnée à exporter'}, status=404)
 
+        # Export en flux : les objets sont lus par lots (QuerySet.iterator)
+        # et écrits au fur et à mesure, la mémoire reste constante
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
         # ==============================================================================
         # EXPORT GeoJSON
         # ==============================================================================
         if export_format == 'geojson':
-            from .services.geo_io import export_to_geojson
+            from .services.geo_io import iter_geojson
 
-            geojson_data = export_to_geojson(queryset)
-
-            response = HttpResponse(
-                json.dumps(geojson_data, ensure_ascii=False, indent=2),
+            response = StreamingHttpResponse(
+                iter_geojson(queryset),
                 content_type='application/geo+json; charset=utf-8'
             )
-            filename = f"{model_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['Content-Disposition'] = f'attachment; filename="{model_name}_{timestamp}.geojson"'
             return response
 
         # ==============================================================================
         # EXPORT KML
         # ==============================================================================
         if export_format == 'kml':
-            from .services.geo_io import export_to_kml
-
-            kml_content = export_to_kml(queryset)
+            from .services.geo_io import iter_kml
 
-            response = HttpResponse(
-                kml_content,
+            response = StreamingHttpResponse(
+                iter_kml(queryset),
                 content_type='application/vnd.google-earth.kml+xml; charset=utf-8'
             )
-            filename = f"{model_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.kml"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['Content-Disposition'] = f'attachment; filename="{model_name}_{timestamp}.kml"'
             return response
 
         # ==============================================================================
         # EXPORT Shapefile (ZIP)
         # ==============================================================================
         if export_format == 'shp':
-            from .services.geo_io import export_to_shapefile
+            from .services.geo_io import write_shapefile
 
+            # Le ZIP est écrit dans un fichier temporaire puis envoyé par blocs
+            tmp = tempfile.TemporaryFile()
             try:
-                zip_content = export_to_shapefile(queryset, model_name)
-
-                response = HttpResponse(
-                    zip_content,
-                    content_type='application/zip'
-                )
-                filename = f"{model_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                return response
+                write_shapefile(queryset, tmp, model_name)
             except ImportError as e:
+                tmp.close()
                 return Response({'error': str(e)}, status=500)
             except Exception as e:
+                tmp.close()
                 return Response({'error': f'Shapefile export error: {str(e)}'}, status=500)
 
-        # ==============================================================================
-        # EXPORT XLSX
-        # ==============================================================================
-        # Récupérer tous les objets (pas de pagination pour l'export)
-        objects = list(queryset.values())
-
-        # Obtenir les noms de colonnes
-        field_names = list(objects[0].keys())
-
-        # Export Excel
-        if export_format == 'xlsx':
-            wb = Workbook()
-            ws = wb.active
-            ws.title = model_name[:31]  # Excel limite à 31 caractères
-
-            # Écrire l'en-tête
-            ws.append(field_names)
-
-            # Écrire les données
-            for obj in objects:
-                ws.append([obj[field] for field in field_names])
-
-            # Ajuster la largeur des colonnes
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-
-            # Sauvegarder dans un buffer
-            from io import BytesIO
-            buffer = BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
-
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            tmp.seek(0)
+            return FileResponse(
+                tmp,
+                as_attachment=True,
+                filename=f"{model_name}_{timestamp}.zip",
+                content_type='application/zip'
             )
-            filename = f"{model_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
-            return response
+        # ==============================================================================
+        # EXPORT XLSX (openpyxl en mode write-only)
+        # ==============================================================================
+        from .services.geo_io import write_xlsx
+
+        tmp = tempfile.TemporaryFile()
+        write_xlsx(queryset, tmp, title=model_name)
+        tmp.seek(0)
+        return FileResponse(
+            tmp,
+            as_attachment=True,
+            filename=f"{model_name}_{timestamp}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
 
 # ==============================================================================
@@ -684,30 +643,9 @@ class InventoryExportExcelView(APIView):
             'critique': 'FFCDD2',   # Rouge clair
         }
 
-        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR)
-        user = request.user
-        structure_filter = None
-        superviseur_filter = None
-        if user.is_authenticated:
-            roles = list(user.roles_utilisateur.values_list('role__nom_role', flat=True))
-
-            if 'ADMIN' in roles:
-                pass  # ADMIN voit tout
-            elif 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure_filter = user.client_profile.structure
-            elif 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-                superviseur_filter = user.superviseur_profile
-
-        # Pré-cacher les IDs de sites pour éviter de répéter la jointure dans chaque type
-        role_site_ids = None
-        if structure_filter:
-            role_site_ids = set(
-                Site.objects.filter(structure_client=structure_filter).values_list('id', flat=True)
-            )
-        elif superviseur_filter:
-            role_site_ids = set(
-                Site.objects.filter(superviseur=superviseur_filter).values_list('id', flat=True)
-            )
+        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR) : sites visibles du
+        # périmètre d'accès en cache (None = ADMIN, voit tout)
+        role_site_ids = get_access_scope(request.user).site_ids
 
         # Pré-extraire les filtres de la requête (une seule fois)
         filter_site_id = request.query_params.get('site')
@@ -1112,30 +1050,9 @@ class InventoryExportPDFView(APIView):
             'critique': colors.HexColor('#FFCDD2'),
         }
 
-        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR)
-        user = request.user
-        structure_filter = None
-        superviseur_filter = None
-        if user.is_authenticated:
-            roles = list(user.roles_utilisateur.values_list('role__nom_role', flat=True))
-
-            if 'ADMIN' in roles:
-                pass  # ADMIN voit tout
-            elif 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure_filter = user.client_profile.structure
-            elif 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-                superviseur_filter = user.superviseur_profile
-
-        # Pré-cacher les IDs de sites pour éviter de répéter la jointure dans chaque type
-        role_site_ids = None
-        if structure_filter:
-            role_site_ids = set(
-                Site.objects.filter(structure_client=structure_filter).values_list('id', flat=True)
-            )
-        elif superviseur_filter:
-            role_site_ids = set(
-                Site.objects.filter(superviseur=superviseur_filter).values_list('id', flat=True)
-            )
+        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR) : sites visibles du
+        # périmètre d'accès en cache (None = ADMIN, voit tout)
+        role_site_ids = get_access_scope(request.user).site_ids
 
         # Pré-extraire les filtres de la requête (une seule fois)
         filter_site_id = request.query_params.get('site')
@@ -1,6 +1,7 @@
 # api/views_import.py
 import logging
 import json
+import uuid
 
 from rest_framework import status, permissions
 from rest_framework.views import APIView
@@ -21,9 +22,10 @@ from .services.geo_io import (
     convert_geometry, validate_geometry_for_type,
     export_to_geojson, export_to_kml, export_to_shapefile,
     apply_attribute_mapping, suggest_attribute_mapping,
-    GEOMETRY_TYPE_MAPPING, OBJECT_FIELDS
+    GEOMETRY_TYPE_MAPPING
 )
 from .services.validation import validate_geometry, find_existing_match
+from .services.bulk_import import run_bulk_import
 
 logger = logging.getLogger(__name__)
 
@@ -490,12 +492,10 @@ class GeoImportExecuteView(APIView):
         # Site is not required for Site objects
         site = None
         sous_site = None
-        all_sites = None  # For auto-detect mode
         if target_type != 'Site':
             if auto_detect_site:
-                # Load all active sites for geometry-based detection
-                all_sites = list(Site.objects.filter(actif=True))
-                if not all_sites:
+                # Sites detected per feature by a spatial join (bulk_import.resolve_sites)
+                if not Site.objects.filter(actif=True).exists():
                     return Response({'error': 'No active sites found for auto-detection'}, status=400)
             elif not site_id:
                 return Response({'error': 'site_id is required (or enable auto_detect_site)'}, status=400)
@@ -517,111 +517,20 @@ class GeoImportExecuteView(APIView):
         if not model_class:
             return Response({'error': f'Unknown model for type: {target_type}'}, status=400)
 
-        expected_geom_type = GEOMETRY_TYPE_MAPPING[target_type]
-
-        created_ids = []
-        skipped_ids = []
-        errors = []
-
+        # Import par lots : résolution site/doublons ensembliste + bulk_create
         try:
-            with transaction.atomic():
-                for feature in features:
-                    idx = feature.get('index', 0)
-
-                    try:
-                        geometry = feature.get('geometry')
-                        if not geometry:
-                            errors.append({'index': idx, 'error': 'Missing geometry'})
-                            continue
-
-                        # Convert geometry
-                        geom, _ = convert_geometry(geometry, expected_geom_type)
-
-                        # Apply attribute mapping
-                        attributes = apply_attribute_mapping(feature, mapping, target_type)
-
-                        # Handle Site objects differently
-                        if target_type == 'Site':
-                            # Sites have different field names
-                            attributes['geometrie_emprise'] = geom
-                            attributes['centroid'] = geom.centroid
-                            attributes['actif'] = True
-                            # Set default name if not provided
-                            if 'nom_site' not in attributes:
-                                props = feature.get('properties', {})
-                                attributes['nom_site'] = props.get('name') or props.get('nom') or f"Site Import {idx + 1}"
-                            # Set default code if not provided
-                            if 'code_site' not in attributes:
-                                import uuid
-                                attributes['code_site'] = f"SITE_{uuid.uuid4().hex[:8].upper()}"
-
-                            # Skip duplicates check for Site
-                            if import_mode == 'skip_duplicates':
-                                # Use original mapped properties (before auto-generated code_site)
-                                original_props = apply_attribute_mapping(feature, mapping, target_type)
-                                match = find_existing_match(
-                                    geometry=geom,
-                                    model_class=model_class,
-                                    site_id=None,
-                                    target_type=target_type,
-                                    mapped_properties=original_props,
-                                )
-                                if match:
-                                    skipped_ids.append(match['id'])
-                                    continue
-                        else:
-                            # Add required fields for other objects
-                            # Determine the site for this feature
-                            target_site = site  # Use provided site by default
-
-                            if auto_detect_site and all_sites:
-                                # Auto-detect: find the site that contains this geometry
-                                target_site = None
-                                for candidate_site in all_sites:
-                                    if candidate_site.geometrie_emprise:
-                                        if candidate_site.geometrie_emprise.contains(geom) or candidate_site.geometrie_emprise.intersects(geom):
-                                            target_site = candidate_site
-                                            break
-
-                                if not target_site:
-                                    errors.append({'index': idx, 'error': 'Geometry is not within any site boundary'})
-                                    continue
-
-                            attributes['site'] = target_site
-                            if sous_site:
-                                attributes['sous_site'] = sous_site
-                            attributes['geometry'] = geom
-
-                            # Set default name if not provided
-                            if 'nom' not in attributes and 'nom' in OBJECT_FIELDS.get(target_type, []):
-                                attributes['nom'] = f"{target_type} Import {idx + 1}"
-
-                            # Skip duplicates check for non-Site objects
-                            if import_mode == 'skip_duplicates':
-                                # Use original mapped properties (before auto-generated nom)
-                                original_props = apply_attribute_mapping(feature, mapping, target_type)
-                                match = find_existing_match(
-                                    geometry=geom,
-                                    model_class=model_class,
-                                    site_id=target_site.pk if target_site else None,
-                                    target_type=target_type,
-                                    mapped_properties=original_props,
-                                )
-                                if match:
-                                    skipped_ids.append(match['id'])
-                                    continue
-
-                        # Create object
-                        obj = model_class.objects.create(**attributes)
-                        created_ids.append(obj.pk)
-
-                    except Exception as e:
-                        errors.append({'index': idx, 'error': str(e)})
-
-                # If any errors occurred, rollback all created objects
-                if errors:
-                    transaction.set_rollback(True)
-                    created_ids = []
+            result = run_bulk_import(
+                features,
+                mapping,
+                target_type,
+                site=site,
+                sous_site=sous_site,
+                auto_detect_site=auto_detect_site,
+                import_mode=import_mode,
+                progress=lambda phase, done, total: logger.debug(
+                    f"[IMPORT] {target_type} {phase}: {done}/{total}"
+                ),
+            )
         except Exception as e:
             logger.error(f"Import transaction failed: {e}")
             return Response({
@@ -637,16 +546,166 @@ class GeoImportExecuteView(APIView):
                 'rolled_back': True
             })
 
-        rolled_back = len(errors) > 0
-        return Response({
-            'created': created_ids,
-            'skipped': skipped_ids,
-            'errors': errors,
-            'summary': {
-                'total': len(features),
-                'created': len(created_ids),
-                'skipped': len(skipped_ids),
-                'failed': len(errors)
+        return Response(result)
+
+
+# ==============================================================================
+# JOBS D'IMPORT ASYNCHRONES (Celery)
+# ==============================================================================
+
+class ImportJobCreateView(APIView):
+    """
+    Start an asynchronous import job (parsing, validation and insertion run
+    in a Celery worker).
+
+    POST /api/import/jobs/
+    Content-Type: multipart/form-data
+
+    Permission: ADMIN uniquement
+
+    Body:
+        - file: The geo file (GeoJSON, KML, KMZ, or ZIP with Shapefile)
+        - format: 'geojson' | 'kml' | 'shapefile' (auto-detected if not provided)
+        - target_type, mapping (JSON string), site_id, sous_site_id,
+          auto_detect_site, import_mode: same as /api/import/execute/
+
+    Returns (202):
+        {"job_id": 1, "task_id": "...", "status": "PENDING"}
+
+    Progress: GET /api/tasks/<task_id>/status/ or GET /api/import/jobs/<job_id>/
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        from .models import ImportJob
+        from .services.bulk_import import IMPORT_BATCH_SIZE
+        from .services.import_jobs import detect_import_format
+        from .tasks import import_job_async
+
+        file_obj = request.FILES.get('file')
+        if not file_obj:
+            return Response({'error': 'No file provided'}, status=400)
+
+        file_format = detect_import_format(file_obj.name, request.data.get('format', ''))
+        if not file_format:
+            return Response({'error': 'Could not detect file format. Please specify format parameter.'}, status=400)
+
+        target_type = request.data.get('target_type')
+        if not target_type or target_type not in GEOMETRY_TYPE_MAPPING:
+            return Response({'error': 'Invalid target_type'}, status=400)
+
+        mapping = request.data.get('mapping') or {}
+        if isinstance(mapping, str):
+            try:
+                mapping = json.loads(mapping)
+            except ValueError:
+                return Response({'error': 'mapping must be a JSON object'}, status=400)
+
+        auto_detect_site = str(request.data.get('auto_detect_site', 'false')).lower() in ('true', '1', 'yes')
+        site_id = request.data.get('site_id') or None
+        sous_site_id = request.data.get('sous_site_id') or None
+        import_mode = request.data.get('import_mode', 'create')
+        if import_mode not in ('create', 'skip_duplicates'):
+            import_mode = 'create'
+
+        if target_type != 'Site':
+            if auto_detect_site:
+                if not Site.objects.filter(actif=True).exists():
+                    return Response({'error': 'No active sites found for auto-detection'}, status=400)
+            elif not site_id:
+                return Response({'error': 'site_id is required (or enable auto_detect_site)'}, status=400)
+            elif not Site.objects.filter(pk=site_id).exists():
+                return Response({'error': f'Site {site_id} not found'}, status=400)
+
+            if sous_site_id and not SousSite.objects.filter(pk=sous_site_id).exists():
+                return Response({'error': f'SousSite {sous_site_id} not found'}, status=400)
+
+        job = ImportJob.objects.create(
+            utilisateur=request.user,
+            fichier=file_obj,
+            format_fichier=file_format,
+            target_type=target_type,
+            mapping=mapping,
+            options={
+                'site_id': int(site_id) if site_id else None,
+                'sous_site_id': int(sous_site_id) if sous_site_id else None,
+                'auto_detect_site': auto_detect_site,
+                'import_mode': import_mode,
             },
-            'rolled_back': rolled_back
-        })
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+
+        # Task ID stored before enqueueing: the worker never sees a job without it
+        job.task_id = str(uuid.uuid4())
+        job.save(update_fields=['task_id', 'updated_at'])
+        transaction.on_commit(
+            lambda: import_job_async.apply_async(args=[job.pk], task_id=job.task_id)
+        )
+
+        return Response({
+            'job_id': job.pk,
+            'task_id': job.task_id,
+            'status': 'PENDING',
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportJobDetailView(APIView):
+    """
+    Progress of an import job.
+
+    GET /api/import/jobs/<job_id>/
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request, job_id):
+        from .models import ImportJob
+
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+        except ImportJob.DoesNotExist:
+            return Response({'error': f'ImportJob {job_id} not found'}, status=404)
+
+        return Response({'task_id': job.task_id, **job.to_progress_payload()})
+
+
+class ImportJobResumeView(APIView):
+    """
+    Resume a failed import job from its last committed batch.
+
+    The parsed features stored with the job are reused: the file is not
+    parsed again and committed batches are not inserted twice.
+
+    POST /api/import/jobs/<job_id>/resume/
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request, job_id):
+        from .models import ImportJob
+        from .tasks import import_job_async
+
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+        except ImportJob.DoesNotExist:
+            return Response({'error': f'ImportJob {job_id} not found'}, status=404)
+
+        if job.statut != 'echec':
+            return Response({'error': f'Only failed jobs can be resumed (statut: {job.statut})'}, status=400)
+
+        # Save first, enqueue after commit: the worker must load the job as
+        # 'en_attente', and this save must not overwrite its progress
+        job.statut = 'en_attente'
+        job.message_erreur = ''
+        job.errors = []
+        job.task_id = str(uuid.uuid4())
+        job.save(update_fields=['statut', 'message_erreur', 'errors', 'task_id', 'updated_at'])
+        transaction.on_commit(
+            lambda: import_job_async.apply_async(args=[job.pk], task_id=job.task_id)
+        )
+
+        return Response({
+            'job_id': job.pk,
+            'task_id': job.task_id,
+            'status': 'PENDING',
+            'resume_from_batch': job.last_batch + 1,
+        }, status=status.HTTP_202_ACCEPTED)
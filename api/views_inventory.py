@@ -2,11 +2,16 @@
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Q, Count, Min, Max
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from django.db.models import Q, Count
+from django.db.models.expressions import RawSQL
 from django.contrib.gis.geos import GEOSGeometry
 import json
 
+from api_users.access_scope import get_access_scope
 from api_users.permissions import IsAdmin, IsAdminOrSuperviseur, CanExportData
+from greensig_web.cache_utils import cache_get, cache_set, hash_params
+from greensig_web.pagination import KeysetPagination
 
 from .models import (
     Site, SousSite, Objet, Arbre, Gazon, Palmier, Arbuste, Vivace, Cactus, Graminee,
@@ -21,6 +26,29 @@ from .serializers import (
 )
 
 
+# Mapping des types vers les modèles et serializers (clé = paramètre ?type=)
+INVENTORY_MODEL_MAP = {
+    'arbre': (Arbre, ArbreSerializer),
+    'palmier': (Palmier, PalmierSerializer),
+    'gazon': (Gazon, GazonSerializer),
+    'arbuste': (Arbuste, ArbusteSerializer),
+    'vivace': (Vivace, VivaceSerializer),
+    'cactus': (Cactus, CactusSerializer),
+    'graminee': (Graminee, GramineeSerializer),
+    'puit': (Puit, PuitSerializer),
+    'pompe': (Pompe, PompeSerializer),
+    'vanne': (Vanne, VanneSerializer),
+    'clapet': (Clapet, ClapetSerializer),
+    'canalisation': (Canalisation, CanalisationSerializer),
+    'aspersion': (Aspersion, AspersionSerializer),
+    'goutte': (Goutte, GoutteSerializer),
+    'ballon': (Ballon, BallonSerializer),
+}
+
+# Types polygones dont la superficie est pré-calculée (évite ST_Area par objet)
+POLYGON_INVENTORY_TYPES = {'gazon', 'arbuste', 'vivace', 'cactus', 'graminee'}
+
+
 # ==============================================================================
 # VUE INVENTAIRE UNIFIÉE (15 types combinés)
 # ==============================================================================
@@ -40,7 +68,9 @@ class InventoryListView(APIView):
     - site: filtrer par site ID ou liste d'IDs séparés par virgule
     - state: filtrer par état (bon, moyen, mauvais, critique) - liste séparée par virgule
     - search: recherche textuelle
-    - page: numéro de page (pagination 50 items)
+    - page_size: taille de page (défaut 50)
+    - cursor: curseur opaque fourni par next/previous (pagination keyset)
+    - page: numéro de page (repli OFFSET, compatibilité)
 
     Filtres par plages numériques:
     - surface_min, surface_max: plage de surface en m²
@@ -70,218 +100,166 @@ class InventoryListView(APIView):
 
     def get(self, request):
         """
-        Méthode GET optimisée: interroge directement les modèles enfants
-        au lieu de passer par Objet, ce qui évite les itérations Python.
-        """
-        from rest_framework.pagination import PageNumberPagination
-        from datetime import timedelta
-        from django.utils import timezone
-        from itertools import chain
-
-        # Mapping des types vers les modèles et serializers
-        MODEL_MAP = {
-            'arbre': (Arbre, ArbreSerializer),
-            'palmier': (Palmier, PalmierSerializer),
-            'gazon': (Gazon, GazonSerializer),
-            'arbuste': (Arbuste, ArbusteSerializer),
-            'vivace': (Vivace, VivaceSerializer),
-            'cactus': (Cactus, CactusSerializer),
-            'graminee': (Graminee, GramineeSerializer),
-            'puit': (Puit, PuitSerializer),
-            'pompe': (Pompe, PompeSerializer),
-            'vanne': (Vanne, VanneSerializer),
-            'clapet': (Clapet, ClapetSerializer),
-            'canalisation': (Canalisation, CanalisationSerializer),
-            'aspersion': (Aspersion, AspersionSerializer),
-            'goutte': (Goutte, GoutteSerializer),
-            'ballon': (Ballon, BallonSerializer),
-        }
+        Pagination keyset côté base de données.
+
+        1. Chaque type ciblé fournit une sous-requête d'IDs filtrés (aucune instance chargée)
+        2. Une seule requête ordonnée par id sur api_objet sélectionne les IDs de la page
+        3. Seules les lignes enfants de la page sont chargées puis sérialisées
 
+        Le coût d'une page ne dépend plus de la taille totale de l'inventaire.
+        """
         # Paramètres de filtrage
         type_filter = request.query_params.get('type', None)
-        site_filter = request.query_params.get('site', None)
-        etat_filter = request.query_params.get('etat', None)
-        famille_filter = request.query_params.get('famille', None)
-        search_query = request.query_params.get('search', '').strip()
-
-        # Filtres de date
-        never_intervened = request.query_params.get('never_intervened', '').lower() == 'true'
-        urgent_maintenance = request.query_params.get('urgent_maintenance', '').lower() == 'true'
-        last_intervention_start = request.query_params.get('last_intervention_start', None)
 
         # Déterminer quels types interroger
         if type_filter:
             target_types = [t.strip().lower() for t in type_filter.split(',')]
             # Normaliser 'graminée' -> 'graminee'
             target_types = ['graminee' if t == 'graminée' else t for t in target_types]
+            target_types = [t for t in target_types if t in INVENTORY_MODEL_MAP]
         else:
-            target_types = list(MODEL_MAP.keys())
-
-        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR)
-        user = request.user
-        structure_filter = None
-        superviseur_filter = None
-        if user.is_authenticated:
-            roles = list(user.roles_utilisateur.values_list('role__nom_role', flat=True))
-
-            # ADMIN voit tout - pas de filtre
-            if 'ADMIN' in roles:
-                pass
-            # CLIENT voit uniquement les sites de sa structure
-            elif 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure_filter = user.client_profile.structure
-            # SUPERVISEUR voit uniquement les sites qui lui sont affectés
-            elif 'SUPERVISEUR' in roles:
-                if hasattr(user, 'superviseur_profile'):
-                    superviseur_filter = user.superviseur_profile
-                else:
-                    # Superviseur sans profil = aucun objet visible
-                    return Response({
-                        'count': 0,
-                        'next': None,
-                        'previous': None,
-                        'results': []
-                    })
-
-        # Collecter les résultats de chaque type
-        all_results = []
-
+            target_types = list(INVENTORY_MODEL_MAP.keys())
+
+        # Filtrer par rôle (ADMIN, CLIENT, SUPERVISEUR) : périmètre d'accès en cache
+        scope = get_access_scope(request.user)
+        scope_key = scope.key
+        if scope.site_ids is not None and not scope.site_ids:
+            # Aucun site visible = aucun objet visible
+            target_types = []
+
+        if not target_types:
+            return Response({
+                'count': 0,
+                'next': None,
+                'previous': None,
+                'results': []
+            })
+
+        # Une sous-requête d'IDs par type : WHERE id IN (...) OR id IN (...)
+        type_conditions = Q()
         for type_name in target_types:
-            if type_name not in MODEL_MAP:
+            model_class, _ = INVENTORY_MODEL_MAP[type_name]
+            qs = self._build_type_queryset(model_class, type_name, request, scope)
+            type_conditions |= Q(pk__in=qs.values('pk'))
+
+        objets = Objet.objects.filter(type_conditions)
+
+        # COUNT unique sur la table parente, mis en cache (domaine STATISTICS)
+        count_params = {
+            k: v for k, v in request.query_params.items()
+            if k not in ('page', 'page_size', 'cursor')
+        }
+        count_parts = ('inventory_count', scope_key, hash_params(count_params))
+        total_count = cache_get('STATISTICS', *count_parts)
+        if total_count is None:
+            total_count = objets.count()
+            cache_set('STATISTICS', *count_parts, data=total_count)
+
+        paginator = KeysetPagination()
+        page_ids = paginator.paginate_queryset_ids(objets, request, total_count)
+
+        # Charger uniquement les lignes enfants de la page : une requête par type
+        # réellement présent (Objet.type_objet), repli sur les types ciblés sinon
+        instances = {}
+        if page_ids:
+            ids_by_type = Objet.objects.filter(pk__in=page_ids).ids_by_type()
+            untyped_ids = ids_by_type.pop('', [])
+            for type_name in target_types:
+                model_class, serializer_class = INVENTORY_MODEL_MAP[type_name]
+                ids = ids_by_type.get(model_class.__name__, []) + untyped_ids
+                if not ids:
+                    continue
+                qs = model_class.objects.select_related('site', 'sous_site').filter(pk__in=ids)
+                if type_name in POLYGON_INVENTORY_TYPES:
+                    qs = qs.annotate(_superficie_annotee=RawSQL("ST_Area(geometry::geography)", []))
+                for obj in qs:
+                    instances[obj.pk] = (obj, type_name.capitalize(), serializer_class)
+
+        # Sérialiser dans l'ordre des IDs de la page
+        serialized_results = []
+        for pk in page_ids:
+            if pk not in instances:
                 continue
+            obj, type_label, serializer_class = instances[pk]
+            data = serializer_class(obj).data
+            if 'properties' in data:
+                data['properties']['object_type'] = type_label
+            serialized_results.append(data)
 
-            model_class, serializer_class = MODEL_MAP[type_name]
-
-            # Construire le queryset avec select_related pour éviter les N+1
-            qs = model_class.objects.select_related('site', 'sous_site')
-
-            # Appliquer les filtres de rôle
-            if structure_filter:
-                qs = qs.filter(site__structure_client=structure_filter)
-            elif superviseur_filter:
-                qs = qs.filter(site__superviseur=superviseur_filter)
-
-            if site_filter:
-                qs = qs.filter(site_id=site_filter)
-
-            if etat_filter:
-                qs = qs.filter(etat=etat_filter)
-
-            # Filtre famille (pour les types qui ont ce champ)
-            if famille_filter and hasattr(model_class, 'famille'):
-                qs = qs.filter(famille__icontains=famille_filter)
-
-            # Filtre recherche
-            if search_query:
-                # Retirer le nom du type de la requête de recherche.
-                # Le frontend affiche "Vanne 3962" comme nom pour les objets
-                # sans champ 'nom', mais "Vanne" n'est pas stocké en base —
-                # c'est le object_type injecté à la sérialisation.
-                # On extrait les tokens utiles en retirant le nom du type.
-                type_aliases = {
-                    'graminee': ['graminée', 'graminee'],
-                    'puit': ['puits', 'puit'],
-                }
-                type_names_to_strip = {type_name.lower(), type_name.capitalize().lower()}
-                for alias in type_aliases.get(type_name, []):
-                    type_names_to_strip.add(alias.lower())
-
-                # Retirer les tokens qui correspondent au nom du type
-                tokens = search_query.split()
-                filtered_tokens = [t for t in tokens if t.lower() not in type_names_to_strip]
-                effective_query = ' '.join(filtered_tokens).strip()
-
-                # Si après retrait du nom de type il ne reste rien,
-                # la recherche visait uniquement le type → pas de filtre supplémentaire
-                if effective_query:
-                    q = Q(site__nom_site__icontains=effective_query) | Q(site__code_site__icontains=effective_query)
-                    if hasattr(model_class, 'nom'):
-                        q |= Q(nom__icontains=effective_query)
-                    if hasattr(model_class, 'famille'):
-                        q |= Q(famille__icontains=effective_query)
-                    if hasattr(model_class, 'marque'):
-                        q |= Q(marque__icontains=effective_query)
-                    if hasattr(model_class, 'type'):
-                        q |= Q(type__icontains=effective_query)
-                    if hasattr(model_class, 'observation'):
-                        q |= Q(observation__icontains=effective_query)
-                    if hasattr(model_class, 'sous_site'):
-                        q |= Q(sous_site__nom__icontains=effective_query)
-                    # Recherche par ID si la query restante est numérique
-                    if effective_query.isdigit():
-                        q |= Q(id=int(effective_query))
-                    qs = qs.filter(q)
-
-            # Filtres de date d'intervention
-            if hasattr(model_class, 'last_intervention_date'):
-                if never_intervened:
-                    qs = qs.filter(last_intervention_date__isnull=True)
-                if urgent_maintenance:
-                    six_months_ago = timezone.now().date() - timedelta(days=180)
-                    qs = qs.filter(last_intervention_date__lt=six_months_ago)
-                if last_intervention_start:
-                    qs = qs.filter(last_intervention_date__gte=last_intervention_start)
-
-            # Limiter le nombre d'objets récupérés pour éviter les timeout
-            qs = qs.order_by('id')
-
-            # Ajouter au résultat avec le type
-            for obj in qs:
-                all_results.append((obj, type_name.capitalize(), serializer_class))
-
-        # Trier par ID pour un ordre cohérent
-        all_results.sort(key=lambda x: x[0].id)
-
-        # Pagination - d'abord sur les objets, puis sérialisation
-        paginator = PageNumberPagination()
-        paginator.page_size = 50
-
-        page_size_param = request.query_params.get('page_size', None)
-        if page_size_param:
-            try:
-                paginator.page_size = int(page_size_param)
-            except ValueError:
-                pass
+        return paginator.get_paginated_response(serialized_results)
 
-        # Créer une structure paginable (liste d'objets)
-        total_count = len(all_results)
+    def _build_type_queryset(self, model_class, type_name, request, scope):
+        """
+        Construit le queryset filtré d'un type d'objet (sans le charger).
 
-        # Calculer la page manuellement pour éviter de tout sérialiser
-        page_num = int(request.query_params.get('page', 1))
-        start_idx = (page_num - 1) * paginator.page_size
-        end_idx = start_idx + paginator.page_size
+        Utilisé comme sous-requête d'IDs par get() : aucun select_related
+        ni tri n'est nécessaire ici.
+        """
+        from datetime import timedelta
+        from django.utils import timezone
 
-        page_items = all_results[start_idx:end_idx]
+        site_filter = request.query_params.get('site', None)
+        etat_filter = request.query_params.get('etat', None)
+        famille_filter = request.query_params.get('famille', None)
+        search_query = request.query_params.get('search', '').strip()
 
-        # Sérialiser uniquement les éléments de la page
-        serialized_results = []
-        for obj, type_name, serializer_class in page_items:
-            serializer = serializer_class(obj)
-            data = serializer.data
-            if 'properties' in data:
-                data['properties']['object_type'] = type_name
-            serialized_results.append(data)
+        # Filtres de date
+        never_intervened = request.query_params.get('never_intervened', '').lower() == 'true'
+        urgent_maintenance = request.query_params.get('urgent_maintenance', '').lower() == 'true'
+        last_intervention_start = request.query_params.get('last_intervention_start', None)
 
-        # Construire la réponse paginée
-        base_url = request.build_absolute_uri().split('?')[0]
-        query_params = request.query_params.copy()
+        # Appliquer les filtres de rôle
+        qs = scope.filter_sites(model_class.objects.all(), 'site_id')
 
-        next_url = None
-        if end_idx < total_count:
-            query_params['page'] = page_num + 1
-            next_url = f"{base_url}?{'&'.join(f'{k}={v}' for k, v in query_params.items())}"
+        if site_filter:
+            qs = qs.filter(site_id=site_filter)
 
-        previous_url = None
-        if page_num > 1:
-            query_params['page'] = page_num - 1
-            previous_url = f"{base_url}?{'&'.join(f'{k}={v}' for k, v in query_params.items())}"
+        if etat_filter:
+            qs = qs.filter(etat=etat_filter)
 
-        return Response({
-            'count': total_count,
-            'next': next_url,
-            'previous': previous_url,
-            'results': serialized_results
-        })
+        # Filtre famille (pour les types qui ont ce champ)
+        if famille_filter and hasattr(model_class, 'famille'):
+            qs = qs.filter(famille__icontains=famille_filter)
+
+        # Filtre recherche
+        if search_query:
+            # Retirer le nom du type de la requête de recherche.
+            # Le frontend affiche "Vanne 3962" comme nom pour les objets
+            # sans champ 'nom', mais "Vanne" n'est pas stocké en base —
+            # c'est le object_type injecté à la sérialisation.
+            # On extrait les tokens utiles en retirant le nom du type.
+            type_aliases = {
+                'graminee': ['graminée', 'graminee'],
+                'puit': ['puits', 'puit'],
+            }
+            type_names_to_strip = {type_name.lower(), type_name.capitalize().lower()}
+            for alias in type_aliases.get(type_name, []):
+                type_names_to_strip.add(alias.lower())
+
+            # Retirer les tokens qui correspondent au nom du type
+            tokens = search_query.split()
+            filtered_tokens = [t for t in tokens if t.lower() not in type_names_to_strip]
+            effective_query = ' '.join(filtered_tokens).strip()
+
+            # Si après retrait du nom de type il ne reste rien,
+            # la recherche visait uniquement le type → pas de filtre supplémentaire
+            if effective_query:
+                # Index de recherche unifié (index trigramme) : nom, famille,
+                # marque, type, observation, site, sous-site et ID de l'objet
+                from api.services.search_index import matching_ids
+                qs = qs.filter(pk__in=matching_ids(effective_query, model_class))
+
+        # Filtres de date d'intervention
+        if hasattr(model_class, 'last_intervention_date'):
+            if never_intervened:
+                qs = qs.filter(last_intervention_date__isnull=True)
+            if urgent_maintenance:
+                six_months_ago = timezone.now().date() - timedelta(days=180)
+                qs = qs.filter(last_intervention_date__lt=six_months_ago)
+            if last_intervention_start:
+                qs = qs.filter(last_intervention_date__gte=last_intervention_start)
+
+        return qs
 
     def apply_id_filter(self, queryset, request):
         """Filtre par ID d'objet (pour récupérer un objet spécifique)"""
@@ -298,14 +276,11 @@ class InventoryListView(APIView):
         type_filter = request.query_params.get('type', None)
         if type_filter:
             types = [t.lower().strip() for t in type_filter.split(',')]
-            objets_ids = []
-            for obj in queryset:
-                for t in types:
-                    if t == 'graminée': t = 'graminee'
-                    if hasattr(obj, t):
-                        objets_ids.append(obj.id)
-                        break
-            queryset = queryset.filter(id__in=objets_ids)
+            types = ['graminee' if t == 'graminée' else t for t in types]
+            type_names = [
+                INVENTORY_MODEL_MAP[t][0].__name__ for t in types if t in INVENTORY_MODEL_MAP
+            ]
+            queryset = queryset.filter(type_objet__in=type_names)
         return queryset
 
     def apply_site_filter(self, queryset, request):
@@ -329,23 +304,8 @@ class InventoryListView(APIView):
         """Filtre par recherche textuelle"""
         search_query = request.query_params.get('search', '').strip()
         if search_query:
-            q_search = Q()
-            q_search |= Q(site__nom_site__icontains=search_query)
-            q_search |= Q(site__code_site__icontains=search_query)
-            q_search |= Q(sous_site__nom__icontains=search_query)
-
-            for model_name in ['arbre', 'gazon', 'palmier', 'arbuste', 'vivace', 'cactus', 'graminee']:
-                q_search |= Q(**{f"{model_name}__nom__icontains": search_query})
-                q_search |= Q(**{f"{model_name}__famille__icontains": search_query})
-
-            for model_name in ['puit', 'pompe']:
-                q_search |= Q(**{f"{model_name}__nom__icontains": search_query})
-
-            for model_name in ['vanne', 'clapet', 'canalisation', 'aspersion', 'ballon']:
-                q_search |= Q(**{f"{model_name}__marque__icontains": search_query})
-
-            q_search |= Q(goutte__type__icontains=search_query)
-            queryset = queryset.filter(q_search)
+            from api.services.search_index import matching_ids
+            queryset = queryset.filter(pk__in=matching_ids(search_query))
         return queryset
 
     def apply_range_filters(self, queryset, request):
@@ -524,7 +484,13 @@ class MapObjectsView(APIView):
     Query params:
     - bbox: Bounding box au format "west,south,east,north" (ex: "-7.95,32.20,-7.90,32.25")
     - types: Liste des types à charger (ex: "sites,arbres,gazons")
-    - zoom: Niveau de zoom (pour optimisations futures)
+    - zoom: Niveau de zoom (défaut 10)
+        * zoom < MAP_CLUSTER_MAX_ZOOM : couches ponctuelles renvoyées en clusters
+          (properties.cluster = true, properties.point_count)
+        * zoom < MAP_SIMPLIFY_MAX_ZOOM : polygones et lignes simplifiés (~1 pixel)
+
+    Cache serveur (Redis) par (portée du rôle, types, bbox alignée, zoom),
+    invalidé par site via les signaux de api/signals.py.
 
     Returns:
         {
@@ -537,6 +503,13 @@ class MapObjectsView(APIView):
 
     def get(self, request):
         from django.contrib.gis.geos import Polygon
+        from .services.map_cache import (
+            bbox_key, get_cached, map_cache_key, set_cached, site_ids_in_bbox, snap_bbox,
+        )
+        from .services.map_generalization import (
+            apply_simplified_geometry, cluster_features, should_cluster, should_simplify,
+            with_simplified_geometry,
+        )
 
         # Paramètres
         bbox_str = request.GET.get('bbox')
@@ -545,23 +518,31 @@ class MapObjectsView(APIView):
 
         requested_types = [t.strip().lower() for t in types_str.split(',') if t.strip()]
 
-        results = []
+        # Bbox alignée sur une grille dépendant du zoom : des déplacements
+        # proches de la carte partagent la même entrée de cache
+        bbox = None
+        if bbox_str:
+            try:
+                west, south, east, north = map(float, bbox_str.split(','))
+                bbox = snap_bbox((west, south, east, north), zoom)
+            except (ValueError, AttributeError) as e:
+                return Response({
+                    'error': f'Invalid bbox format: {str(e)}'
+                }, status=400)
 
-        # Déterminer les permissions basées sur le rôle
-        user = request.user
-        is_admin = False
-        structure_filter = None
-        superviseur_filter = None  # (site_ids, object_ids)
+        results = []
 
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
+        # Permissions : périmètre d'accès en cache (rôles + sites visibles)
+        scope = get_access_scope(request.user)
+        scope_key = scope.key
 
-            if 'ADMIN' in roles:
-                is_admin = True
-            elif 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                structure_filter = user.client_profile.structure
-            elif 'SUPERVISEUR' in roles:
-                superviseur_filter = self._get_superviseur_filters(user)
+        # Cache serveur : invalidé uniquement pour les sites modifiés
+        cache_key = map_cache_key(
+            'objects', scope_key, requested_types, bbox_key(bbox), zoom, site_ids_in_bbox(bbox)
+        )
+        cached = get_cached(cache_key)
+        if cached is not None:
+            return Response(cached)
 
         # ==============================================================================
         # 1. CHARGER LES SITES (toujours tous car peu nombreux)
@@ -570,15 +551,7 @@ class MapObjectsView(APIView):
             sites = Site.objects.filter(actif=True).order_by('id')
 
             # Appliquer les filtres de permissions
-            if not is_admin:
-                if structure_filter:
-                    sites = sites.filter(structure_client=structure_filter)
-                elif superviseur_filter:
-                    site_ids, _ = superviseur_filter
-                    if site_ids:
-                        sites = sites.filter(id__in=site_ids)
-                    else:
-                        sites = sites.none()
+            sites = scope.filter_sites(sites)
 
             for site in sites:
                 # Utiliser le centroid pré-calculé (ou calculer depuis geometrie_emprise)
@@ -599,10 +572,9 @@ class MapObjectsView(APIView):
         # ==============================================================================
         # 2. CHARGER VÉGÉTATION / HYDRAULIQUE (avec bbox si fourni)
         # ==============================================================================
-        if bbox_str:
+        if bbox:
             try:
-                west, south, east, north = map(float, bbox_str.split(','))
-                bbox_polygon = Polygon.from_bbox((west, south, east, north))
+                bbox_polygon = Polygon.from_bbox(bbox)
 
                 # Mapping type -> (model, serializer)
                 type_mapping = {
@@ -650,22 +622,26 @@ class MapObjectsView(APIView):
                                 )
                             )
 
-                        # Appliquer les filtres de permissions (sauf pour ADMIN)
-                        if not is_admin:
-                            if structure_filter:
-                                queryset = queryset.filter(site__structure_client=structure_filter)
-                            elif superviseur_filter:
-                                _, object_ids = superviseur_filter
-                                # SUPERVISEUR: ne voir QUE les objets directement liés aux tâches
-                                if object_ids:
-                                    queryset = queryset.filter(objet_ptr_id__in=object_ids)
-                                else:
-                                    queryset = queryset.none()
+                        # Appliquer les filtres de permissions (sites visibles)
+                        queryset = scope.filter_sites(queryset, 'site_id')
+
+                        # Points aux petits zooms : clusters calculés par PostGIS
+                        if should_cluster(Model, zoom):
+                            results.extend(cluster_features(queryset, Model, zoom))
+                            continue
 
-                        queryset = queryset.order_by('id')[:100]  # 100 par type max
+                        # Polygones / lignes aux petits zooms : géométrie simplifiée
+                        simplify = should_simplify(Model, zoom)
+                        if simplify:
+                            queryset = with_simplified_geometry(queryset, zoom)
+
+                        # Pas de limite par type : les vues denses passent par /api/map/tiles/
+                        queryset = queryset.order_by('id')
 
                         # Serializer chaque objet
                         for obj in queryset:
+                            if simplify:
+                                apply_simplified_geometry(obj)
                             serializer = Serializer(obj)
                             feature = serializer.data
                             feature['properties']['object_type'] = Model.__name__
@@ -676,44 +652,103 @@ class MapObjectsView(APIView):
                     'error': f'Invalid bbox format: {str(e)}'
                 }, status=400)
 
-        return Response({
+        data = {
             'type': 'FeatureCollection',
             'features': results,
             'count': len(results),
             'bbox_used': bbox_str is not None,
             'zoom': zoom
-        })
+        }
+        set_cached(cache_key, data)
+        return Response(data)
 
-    def _get_superviseur_filters(self, user):
-        """
-        Récupère les IDs des sites et objets affectés directement au superviseur.
-        Returns: tuple (site_ids, object_ids)
 
-        Le superviseur voit:
-        - Les sites qui lui sont affectés directement (via site.superviseur)
-        - Tous les objets de ces sites
+# ==============================================================================
+# TUILES VECTORIELLES (Mapbox Vector Tiles générées par PostGIS)
+# ==============================================================================
 
-        NOUVEAU SYSTÈME: Affectation directe superviseur → sites (plus simple et plus clair)
-        """
-        try:
-            superviseur = user.superviseur_profile
+class MVTRenderer(BaseRenderer):
+    """
+    Renderer binaire pour les tuiles vectorielles.
 
-            # Sites affectés directement au superviseur
-            site_ids = list(
-                Site.objects.filter(superviseur=superviseur).values_list('id', flat=True)
-            )
+    Permet la négociation de contenu DRF lorsque le client envoie
+    Accept: application/vnd.mapbox-vector-tile (les erreurs restent en JSON).
+    """
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'pbf'
+    charset = None
+    render_style = 'binary'
 
-            if not site_ids:
-                return ([], [])
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        return json.dumps(data).encode()
 
-            # Tous les objets GIS de ces sites
-            object_ids = list(
-                Objet.objects.filter(site_id__in=site_ids).values_list('id', flat=True)
-            )
 
-            return (site_ids, object_ids)
-        except Exception:
-            return ([], [])
+class MapTileView(APIView):
+    """
+    Tuiles vectorielles pour la carte, construites par PostGIS (ST_AsMVT).
+
+    Aucune sérialisation Python ni limite par type : chaque tuile contient
+    tous les objets visibles de son emprise, géométries simplifiées selon le zoom.
+
+    Endpoint: GET /api/map/tiles/{z}/{x}/{y}.pbf
+
+    Query params:
+    - layers: couches à inclure (ex: "sites,arbres,gazons"), toutes par défaut
+
+    Permissions (mêmes règles que MapObjectsView):
+    - ADMIN: voit tout
+    - CLIENT: uniquement les sites/objets de sa structure
+    - SUPERVISEUR: uniquement les sites qui lui sont affectés et leurs objets
+
+    Réponse: application/vnd.mapbox-vector-tile (204 si tuile vide),
+    avec ETag / Cache-Control (304 si If-None-Match correspond).
+    Les tuiles sont mises en cache dans Redis et invalidées par site.
+    """
+    renderer_classes = [JSONRenderer, MVTRenderer]
+    TILE_CONTENT_TYPE = MVTRenderer.media_type
+    TILE_MAX_AGE = 60
+
+    def get(self, request, z, x, y):
+        from django.http import HttpResponse
+        from .services.map_cache import (
+            etag_for_key, get_cached, map_cache_key, set_cached, site_ids_in_bbox,
+        )
+        from .services.vector_tiles import (
+            TILE_LAYERS, build_tile, build_tile_scope, is_valid_tile, tile_bbox_4326,
+        )
+
+        if not is_valid_tile(z, x, y):
+            return Response({'error': f'Tuile invalide: {z}/{x}/{y}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        layers_str = request.GET.get('layers', '')
+        layers = [l.strip().lower() for l in layers_str.split(',') if l.strip()]
+        layers = [l for l in layers if l in TILE_LAYERS] or list(TILE_LAYERS)
+
+        scope = build_tile_scope(request.user)
+
+        # Clé de cache (et ETag) : versionnée par les sites recoupant la tuile,
+        # une édition sur un autre site ne l'invalide pas.
+        cache_key = map_cache_key(
+            'tile', scope['key'], layers, f'{z}/{x}/{y}', z,
+            site_ids_in_bbox(tile_bbox_4326(z, x, y)),
+        )
+        etag = etag_for_key(cache_key)
+
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+        else:
+            tile = get_cached(cache_key)
+            if tile is None:
+                tile = build_tile(z, x, y, layers, scope)
+                set_cached(cache_key, tile)
+            response = HttpResponse(tile, content_type=self.TILE_CONTENT_TYPE, status=200 if tile else 204)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = f'private, max-age={self.TILE_MAX_AGE}'
+        response['Vary'] = 'Authorization'
+        return response
 
 
 # ==============================================================================
@@ -729,6 +764,10 @@ class InventoryFilterOptionsView(APIView):
     Query params optionnels:
     - type: filtrer les options selon un type d'objet spécifique
 
+    Les familles, matériaux, types d'équipement, états et plages sont lus
+    en une requête dans les facettes matérialisées (FacetteInventaire,
+    api/services/inventory_facets.py), avec le nombre d'objets par option.
+
     Returns:
         {
             "sites": [{"id": 1, "name": "Site A"}, ...],
@@ -743,45 +782,34 @@ class InventoryFilterOptionsView(APIView):
                 "diameter": [0, 500],
                 "depth": [0, 100],
                 "density": [0, 100]
+            },
+            "counts": {
+                "families": {"Palmaceae": 12, ...},
+                "materials": {"PVC": 40, ...},
+                "equipment_types": {"Centrifuge": 3, ...},
+                "states": {"bon": 120, ...}
             }
         }
     """
 
+    # Plages renvoyées → attribut numérique des facettes
+    RANGE_ATTRIBUTES = {
+        'surface': 'area_sqm',
+        'diameter': 'diametre',
+        'depth': 'profondeur',
+        'density': 'densite',
+    }
+
     def get(self, request):
+        from api.services.inventory_facets import get_facets
+
         type_filter = request.query_params.get('type', None)
 
         # Obtenir les querysets filtrés selon les permissions de l'utilisateur
-        user = request.user
-        site_filter = Q()  # Par défaut, pas de filtre (ADMIN)
-
-        if user.is_authenticated:
-            roles = [ur.role.nom_role for ur in user.roles_utilisateur.all()]
-
-            if 'ADMIN' not in roles:
-                if 'CLIENT' in roles and hasattr(user, 'client_profile'):
-                    # CLIENT: uniquement les sites de sa structure
-                    structure = user.client_profile.structure
-                    if structure:
-                        site_filter = Q(structure_client=structure)
-                        object_filter = Q(site__structure_client=structure)
-                    else:
-                        site_filter = Q(pk__in=[])
-                        object_filter = Q(pk__in=[])
-                elif 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-                    # SUPERVISEUR: uniquement les sites qui lui sont affectés
-                    site_filter = Q(superviseur=user.superviseur_profile)
-                    object_filter = Q(site__superviseur=user.superviseur_profile)
-                else:
-                    # Aucun accès
-                    site_filter = Q(pk__in=[])
-                    object_filter = Q(pk__in=[])
-            else:
-                # ADMIN: pas de filtre
-                object_filter = Q()
-        else:
-            # Non authentifié: aucun accès
-            site_filter = Q(pk__in=[])
-            object_filter = Q(pk__in=[])
+        # (aucun site visible → site_ids vide → aucune option)
+        scope = get_access_scope(request.user)
+        site_filter = scope.site_condition('pk')
+        object_filter = scope.site_condition('site_id')
 
         # ==============================================================================
         # SITES
@@ -795,63 +823,32 @@ class InventoryFilterOptionsView(APIView):
         zones = list(SousSite.objects.filter(object_filter).values_list('nom', flat=True).distinct().order_by('nom'))
 
         # ==============================================================================
-        # FAMILLES (végétaux uniquement)
+        # FACETTES (familles, matériaux, types d'équipement, états, plages)
         # ==============================================================================
-        families = set()
-        if not type_filter or type_filter.lower() in ['arbre', 'arbres']:
-            families.update(Arbre.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['gazon', 'gazons']:
-            families.update(Gazon.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['palmier', 'palmiers']:
-            families.update(Palmier.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['arbuste', 'arbustes']:
-            families.update(Arbuste.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['vivace', 'vivaces']:
-            families.update(Vivace.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['cactus']:
-            families.update(Cactus.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['graminee', 'graminees']:
-            families.update(Graminee.objects.filter(object_filter).exclude(famille__isnull=True).exclude(famille='').values_list('famille', flat=True).distinct())
-
-        families_list = sorted(list(families))
+        facets = get_facets(object_filter)
 
-        # ==============================================================================
-        # MATÉRIAUX (hydraulique uniquement)
-        # ==============================================================================
-        materials = set()
-        if not type_filter or type_filter.lower() in ['vanne', 'vannes']:
-            materials.update(Vanne.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['clapet', 'clapets']:
-            materials.update(Clapet.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['canalisation', 'canalisations']:
-            materials.update(Canalisation.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['aspersion', 'aspersions']:
-            materials.update(Aspersion.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['goutte', 'gouttes']:
-            materials.update(Goutte.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['ballon', 'ballons']:
-            materials.update(Ballon.objects.filter(object_filter).exclude(materiau__isnull=True).exclude(materiau='').values_list('materiau', flat=True).distinct())
-
-        materials_list = sorted(list(materials))
+        # Type demandé ('arbres', 'puits', 'cactus'...) → nom du modèle
+        type_names = None
+        if type_filter:
+            wanted = type_filter.lower()
+            type_names = {
+                name for (name, _) in facets
+                if name.lower() in (wanted, wanted[:-1] if wanted.endswith('s') else wanted)
+            }
 
-        # ==============================================================================
-        # TYPES D'ÉQUIPEMENT
-        # ==============================================================================
-        equipment_types = set()
-        if not type_filter or type_filter.lower() in ['pompe', 'pompes']:
-            equipment_types.update(Pompe.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['vanne', 'vannes']:
-            equipment_types.update(Vanne.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['clapet', 'clapets']:
-            equipment_types.update(Clapet.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['canalisation', 'canalisations']:
-            equipment_types.update(Canalisation.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['aspersion', 'aspersions']:
-            equipment_types.update(Aspersion.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-        if not type_filter or type_filter.lower() in ['goutte', 'gouttes']:
-            equipment_types.update(Goutte.objects.filter(object_filter).exclude(type__isnull=True).exclude(type='').values_list('type', flat=True).distinct())
-
-        equipment_types_list = sorted(list(equipment_types))
+        def counts(attribut):
+            totals = {}
+            for (type_objet, attr), rows in facets.items():
+                if attr != attribut or (type_names is not None and type_objet not in type_names):
+                    continue
+                for valeur, nombre, _, _ in rows:
+                    totals[valeur] = totals.get(valeur, 0) + nombre
+            return dict(sorted(totals.items()))
+
+        family_counts = counts('famille')
+        material_counts = counts('materiau')
+        equipment_type_counts = counts('type')
+        state_counts = counts('etat')
 
         # ==============================================================================
         # TAILLES (statiques basées sur TAILLE_CHOICES)
@@ -864,55 +861,31 @@ class InventoryFilterOptionsView(APIView):
         states = ['bon', 'moyen', 'mauvais', 'critique']
 
         # ==============================================================================
-        # PLAGES DE VALEURS
+        # PLAGES DE VALEURS (tous types confondus)
         # ==============================================================================
         ranges = {}
-
-        # Surface (gazons)
-        surface_range = Gazon.objects.filter(object_filter).aggregate(min_val=Min('area_sqm'), max_val=Max('area_sqm'))
-        if surface_range['min_val'] is not None:
-            ranges['surface'] = [
-                float(surface_range['min_val'] or 0),
-                float(surface_range['max_val'] or 10000)
+        for key, attribut in self.RANGE_ATTRIBUTES.items():
+            bounds = [
+                (vmin, vmax)
+                for (_, attr), rows in facets.items() if attr == attribut
+                for _, _, vmin, vmax in rows
             ]
-
-        # Diamètre (puits, pompes, vannes, etc.)
-        diameter_values = []
-        for Model in [Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte]:
-            agg = Model.objects.filter(object_filter).aggregate(min_val=Min('diametre'), max_val=Max('diametre'))
-            if agg['min_val'] is not None:
-                diameter_values.append(agg['min_val'])
-            if agg['max_val'] is not None:
-                diameter_values.append(agg['max_val'])
-        if diameter_values:
-            ranges['diameter'] = [float(min(diameter_values)), float(max(diameter_values))]
-
-        # Profondeur (puits)
-        depth_range = Puit.objects.filter(object_filter).aggregate(min_val=Min('profondeur'), max_val=Max('profondeur'))
-        if depth_range['min_val'] is not None:
-            ranges['depth'] = [
-                float(depth_range['min_val'] or 0),
-                float(depth_range['max_val'] or 100)
-            ]
-
-        # Densité (arbustes, vivaces, cactus, graminées)
-        density_values = []
-        for Model in [Arbuste, Vivace, Cactus, Graminee]:
-            agg = Model.objects.filter(object_filter).aggregate(min_val=Min('densite'), max_val=Max('densite'))
-            if agg['min_val'] is not None:
-                density_values.append(agg['min_val'])
-            if agg['max_val'] is not None:
-                density_values.append(agg['max_val'])
-        if density_values:
-            ranges['density'] = [float(min(density_values)), float(max(density_values))]
+            if bounds:
+                ranges[key] = [float(min(b[0] for b in bounds)), float(max(b[1] for b in bounds))]
 
         return Response({
             'sites': sites_list,
             'zones': zones,
-            'families': families_list,
-            'materials': materials_list,
-            'equipment_types': equipment_types_list,
+            'families': list(family_counts),
+            'materials': list(material_counts),
+            'equipment_types': list(equipment_type_counts),
             'sizes': sizes,
             'states': states,
-            'ranges': ranges
+            'ranges': ranges,
+            'counts': {
+                'families': family_counts,
+                'materials': material_counts,
+                'equipment_types': equipment_type_counts,
+                'states': state_counts,
+            },
         })
@@ -4,6 +4,7 @@ Views pour l'API de notifications.
 Endpoints:
 - GET /api/notifications/ - Liste des notifications de l'utilisateur
 - GET /api/notifications/?all=true - (Admin) Liste de TOUTES les notifications
+- GET /api/notifications/?archives=true - Notifications lues archivees (hors donnees chaudes)
 - GET /api/notifications/unread-count/ - Nombre de notifications non lues
 - POST /api/notifications/<id>/mark-read/ - Marquer une notification comme lue
 - POST /api/notifications/mark-all-read/ - Marquer toutes les notifications comme lues
@@ -16,13 +17,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 
-from .models import Notification
-from .serializers import NotificationSerializer, AdminNotificationSerializer
+from api_users.access_scope import get_access_scope
+
+from .models import Notification, NotificationArchive
+from .serializers import (
+    NotificationSerializer, AdminNotificationSerializer, NotificationArchiveSerializer
+)
 
 
 def is_admin(user):
     """Verifie si l'utilisateur est admin."""
-    return user.roles_utilisateur.filter(role__nom_role='ADMIN').exists() or user.is_superuser
+    scope = get_access_scope(user)
+    return scope.is_admin or scope.is_superuser
 
 
 class NotificationListView(generics.ListAPIView):
@@ -37,12 +43,19 @@ class NotificationListView(generics.ListAPIView):
     - offset: int - Decalage pour pagination (defaut: 0)
     - all: true - (Admin seulement) Voir TOUTES les notifications du systeme
     - role: string - (Admin + all=true) Filtrer par role destinataire (ADMIN, SUPERVISEUR, CLIENT)
+    - archives: true - Notifications archivees de l'utilisateur (lues depuis plus de
+      NOTIFICATION_RETENTION_DAYS). Sans ce parametre, seule la table chaude est lue.
     """
     permission_classes = [IsAuthenticated]
     # Desactiver la pagination par defaut - on gere manuellement avec limit/offset
     pagination_class = None
 
+    def _show_archives(self):
+        return self.request.query_params.get('archives') == 'true'
+
     def get_serializer_class(self):
+        if self._show_archives():
+            return NotificationArchiveSerializer
         # Utiliser AdminNotificationSerializer si admin demande toutes les notifs
         # OU pour voir les destinataires d'actions effectuees (by_me)
         show_all = self.request.query_params.get('all') == 'true'
@@ -57,8 +70,16 @@ class NotificationListView(generics.ListAPIView):
         show_all = self.request.query_params.get('all') == 'true'
         show_by_me = self.request.query_params.get('by_me') == 'true'
 
+        # Archives : inbox de l'utilisateur, donnees froides uniquement
+        if self._show_archives():
+            queryset = NotificationArchive.objects.filter(
+                destinataire=user
+            ).exclude(
+                acteur=user
+            ).select_related('acteur').order_by('-created_at')
+
         # Mes actions (ce que j'ai declenche)
-        if show_by_me:
+        elif show_by_me:
             queryset = Notification.objects.filter(
                 acteur=user
             ).select_related('destinataire').order_by('-created_at')
@@ -91,7 +112,7 @@ class NotificationListView(generics.ListAPIView):
 
         # Filtre par statut de lecture
         lu = self.request.query_params.get('lu')
-        if lu is not None:
+        if lu is not None and not self._show_archives():
             queryset = queryset.filter(lu=lu.lower() == 'true')
 
         # Filtre par type
@@ -122,14 +143,9 @@ class UnreadCountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Compter seulement les notifications non lues qui ne sont pas des auto-notifications
-        count = Notification.objects.filter(
-            destinataire=request.user,
-            lu=False
-        ).exclude(
-            acteur=request.user
-        ).count()
-        return Response({'count': count})
+        # Notifications non lues hors auto-notifications (compteur Redis)
+        from api.services.unread_counters import get_unread_count
+        return Response({'count': get_unread_count(request.user.id)})
 
 
 class MarkReadView(APIView):
@@ -169,6 +185,9 @@ class MarkAllReadView(APIView):
             lu=False
         ).update(lu=True, date_lecture=timezone.now())
 
+        from api.services.unread_counters import all_read
+        all_read(request.user.id)
+
         return Response({'success': True, 'count': count})
 
 
@@ -184,6 +203,11 @@ class NotificationDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         return Notification.objects.filter(destinataire=self.request.user)
 
+    def perform_destroy(self, instance):
+        from api.services.unread_counters import notification_removed
+        notification_removed(instance)
+        super().perform_destroy(instance)
+
 
 class SendTestNotificationView(APIView):
     """
@@ -20,6 +20,7 @@ from .constants import (
     STATUTS_GERES,
     ERROR_MESSAGES,
 )
+from .sync import ENTITE_DISTRIBUTION, record_changes
 
 
 # ==============================================================================
@@ -260,6 +261,17 @@ def valider_limite_reports(distribution) -> int:
     return chain_length
 
 
+def _chaine_annotee(distribution):
+    """
+    Distribution annotée par DistributionChargeQuerySet.with_report_chain()
+    (l'instance elle-même si elle l'est déjà, sinon une requête).
+    """
+    if getattr(distribution, 'chaine_origine_id', None) is not None:
+        return distribution
+    from .models import DistributionCharge
+    return DistributionCharge.objects.with_report_chain().get(pk=distribution.pk)
+
+
 def compter_reports_chaine(distribution) -> int:
     """
     Compte le nombre de reports dans la chaîne d'une distribution.
@@ -270,19 +282,9 @@ def compter_reports_chaine(distribution) -> int:
     Returns:
         int: Nombre de reports (0 si pas de report)
     """
-    chain_length = 0
-    current = distribution
-    visited = set()  # Protection contre boucles infinies
-
-    while current.distribution_origine_id and current.id not in visited:
-        visited.add(current.id)
-        chain_length += 1
-        current = current.distribution_origine
-
-        if current is None:
-            break
-
-    return chain_length
+    if not distribution.distribution_origine_id:
+        return 0
+    return _chaine_annotee(distribution).chaine_nombre_reports
 
 
 def get_distribution_finale(distribution):
@@ -295,17 +297,11 @@ def get_distribution_finale(distribution):
     Returns:
         DistributionCharge: La dernière distribution de la chaîne
     """
-    current = distribution
-    visited = set()  # Protection contre boucles infinies
-
-    while current.distribution_remplacement_id and current.id not in visited:
-        visited.add(current.id)
-        if current.distribution_remplacement:
-            current = current.distribution_remplacement
-        else:
-            break
-
-    return current
+    if not distribution.distribution_remplacement_id:
+        return distribution
+    from .models import DistributionCharge
+    finale_id = _chaine_annotee(distribution).chaine_finale_id
+    return DistributionCharge.objects.get(pk=finale_id)
 
 
 def get_distribution_origine(distribution):
@@ -318,55 +314,71 @@ def get_distribution_origine(distribution):
     Returns:
         DistributionCharge: La première distribution de la chaîne
     """
-    current = distribution
-    visited = set()
-
-    while current.distribution_origine_id and current.id not in visited:
-        visited.add(current.id)
-        if current.distribution_origine:
-            current = current.distribution_origine
-        else:
-            break
-
-    return current
+    if not distribution.distribution_origine_id:
+        return distribution
+    from .models import DistributionCharge
+    origine_id = _chaine_annotee(distribution).chaine_origine_id
+    return DistributionCharge.objects.get(pk=origine_id)
 
 
 def get_chaine_reports(distribution) -> list:
     """
     Retourne l'historique complet des reports pour une distribution.
 
+    Une seule requête : CTE récursive remontant à l'origine puis
+    redescendant la chaîne via distribution_remplacement.
+
     Args:
         distribution: Instance de DistributionCharge
 
     Returns:
         list: Liste des dictionnaires avec les infos de chaque distribution
     """
-    chaine = []
-
-    # Remonter à l'origine
-    origine = get_distribution_origine(distribution)
-
-    # Descendre la chaîne
-    current = origine
-    visited = set()
+    from django.db import connection
+    from .models import DistributionCharge, PROFONDEUR_MAX_CHAINE
+
+    table = connection.ops.quote_name(DistributionCharge._meta.db_table)
+    sql = f"""
+        WITH RECURSIVE remontee(id, origine_id, profondeur) AS (
+            SELECT id, distribution_origine_id, 0 FROM {table} WHERE id = %s
+            UNION ALL
+            SELECT p.id, p.distribution_origine_id, r.profondeur + 1
+            FROM {table} p JOIN remontee r ON p.id = r.origine_id
+            WHERE r.profondeur < %s
+        ), descente(id, remplacement_id, rang) AS (
+            SELECT d.id, d.distribution_remplacement_id, 0
+            FROM {table} d
+            WHERE d.id = (SELECT id FROM remontee ORDER BY profondeur DESC LIMIT 1)
+            UNION ALL
+            SELECT n.id, n.distribution_remplacement_id, c.rang + 1
+            FROM {table} n JOIN descente c ON n.id = c.remplacement_id
+            WHERE c.rang < %s
+        )
+        SELECT d.id, d.date, d.status, d.motif_report_annulation, d.commentaire,
+               d.heures_planifiees, d.heures_reelles
+        FROM descente c JOIN {table} d ON d.id = c.id
+        ORDER BY c.rang
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [distribution.pk, PROFONDEUR_MAX_CHAINE, PROFONDEUR_MAX_CHAINE])
+        rows = cursor.fetchall()
 
-    while current and current.id not in visited:
-        visited.add(current.id)
+    chaine = []
+    vus = set()  # Protection contre boucles (données corrompues)
+    for pk, date, statut, motif, commentaire, heures_planifiees, heures_reelles in rows:
+        if pk in vus:
+            break
+        vus.add(pk)
         chaine.append({
-            'id': current.id,
-            'date': str(current.date),
-            'status': current.status,
-            'motif': current.motif_report_annulation or '',
-            'commentaire': current.commentaire or '',
-            'heures_planifiees': current.heures_planifiees,
-            'heures_reelles': current.heures_reelles,
+            'id': pk,
+            'date': str(date),
+            'status': statut,
+            'motif': motif or '',
+            'commentaire': commentaire or '',
+            'heures_planifiees': heures_planifiees,
+            'heures_reelles': heures_reelles,
         })
 
-        if current.distribution_remplacement_id:
-            current = current.distribution_remplacement
-        else:
-            break
-
     return chaine
 
 
@@ -520,7 +532,9 @@ def restaurer_distributions_apres_replanification(tache) -> int:
     count = distributions_annulees.count()
 
     if count > 0:
+        ids = list(distributions_annulees.values_list('pk', flat=True))
         distributions_annulees.update(status='NON_REALISEE')
+        record_changes(ENTITE_DISTRIBUTION, ids)
         print(f"[REPLANIFICATION] {count} distribution(s) restaurée(s) pour la tâche #{tache.id}")
 
     return count
@@ -704,11 +718,13 @@ def synchroniser_distributions_apres_annulation_tache(tache) -> int:
     count = distributions_actives.count()
 
     if count > 0:
+        ids = list(distributions_actives.values_list('pk', flat=True))
         distributions_actives.update(
             status='ANNULEE',
             motif_report_annulation='ANNULATION_TACHE',
             updated_at=timezone.now()
         )
+        record_changes(ENTITE_DISTRIBUTION, ids)
 
     return count
 
@@ -5,6 +5,9 @@
 # Limite maximale de reports chaînés pour une distribution
 MAX_REPORTS_CHAIN = 5
 
+# Nombre maximal d'occurrences créées par une duplication / récurrence
+MAX_OCCURRENCES_RECURRENCE = 1000
+
 # ==============================================================================
 # STATUTS DES DISTRIBUTIONS
 # ==============================================================================
@@ -0,0 +1,100 @@
+"""
+Commande Django : Planifie automatiquement les distributions de charge d'un
+lot de tâches selon la capacité des équipes (voir api_planification/planner.py).
+
+Sans --apply, le plan est seulement calculé (dry-run) ; les durées de
+chargement, planification et écriture sont affichées pour les mesures.
+
+Usage:
+    python manage.py planifier_distributions --du 2026-11-01 --au 2026-11-30
+    python manage.py planifier_distributions --du 2026-11-01 --au 2026-11-30 --apply
+    python manage.py planifier_distributions --taches 12 13 14 --apply
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from api_planification.models import Tache
+from api_planification.planner import MAX_TACHES_PLANIFICATION, STATUTS_PLANIFIABLES, planifier_distributions
+
+
+class Command(BaseCommand):
+    help = "Planifie les distributions de charge selon la capacité des équipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--taches',
+            type=int,
+            nargs='+',
+            help='IDs des tâches à planifier',
+        )
+        parser.add_argument(
+            '--du',
+            help='Tâches sans distribution débutant à partir de cette date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--au',
+            help='Tâches sans distribution débutant jusqu\'à cette date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Écrit les distributions (sans ce flag, mode dry-run uniquement)',
+        )
+
+    def _parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Date invalide '{value}'. Utilisez YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        if options['taches']:
+            tache_ids = options['taches']
+        elif options['du'] and options['au']:
+            tache_ids = list(
+                Tache.objects.filter(
+                    statut__in=STATUTS_PLANIFIABLES,
+                    date_debut_planifiee__gte=self._parse_date(options['du']),
+                    date_debut_planifiee__lte=self._parse_date(options['au']),
+                    charge_estimee_heures__gt=0,
+                )
+                .annotate(nb_distributions=Count('distributions_charge'))
+                .filter(nb_distributions=0)
+                .order_by('date_fin_planifiee')
+                .values_list('pk', flat=True)[:MAX_TACHES_PLANIFICATION]
+            )
+        else:
+            raise CommandError("Indiquez --taches ou --du et --au")
+
+        if not tache_ids:
+            self.stdout.write(self.style.WARNING("Aucune tâche à planifier"))
+            return
+
+        apply = options['apply']
+        self.stdout.write(
+            f"{len(tache_ids)} tâche(s) — mode {'APPLICATION' if apply else 'DRY-RUN (simulation)'}"
+        )
+
+        resultat = planifier_distributions(tache_ids, dry_run=not apply)
+
+        for distribution in resultat.distributions:
+            self.stdout.write(
+                f"  [{distribution['tache_id']}] {distribution['date']} : {distribution['heures']}h"
+            )
+        for tache_id, detail in sorted(resultat.non_planifiees.items()):
+            reste = f" ({detail['heures_non_placees']}h non placées)" if 'heures_non_placees' in detail else ''
+            self.stdout.write(self.style.WARNING(f"  [{tache_id}] non planifiée : {detail['motif']}{reste}"))
+
+        durees = ', '.join(f"{phase} {ms} ms" for phase, ms in resultat.durees_ms.items())
+        self.stdout.write(f"\nDurées : {durees}")
+
+        message = (
+            f"{len(resultat.distributions)} distribution(s) pour {len(resultat.planifiees)} tâche(s), "
+            f"{len(resultat.non_planifiees)} non planifiée(s)"
+        )
+        if apply:
+            self.stdout.write(self.style.SUCCESS(f"Terminé : {message}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"DRY-RUN terminé : {message}. Relancez avec --apply pour écrire."))
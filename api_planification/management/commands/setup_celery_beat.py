@@ -8,6 +8,9 @@ This creates/updates ALL periodic tasks in the database:
 
 API:
 - cleanup_old_exports: Daily at 3 AM (nettoie exports > 7 jours)
+- purge_sync_journal: Daily at 3 AM (journal de synchronisation > SYNC_JOURNAL_RETENTION_DAYS)
+- archive_notifications: Daily at 3 AM (notifications lues > NOTIFICATION_RETENTION_DAYS)
+- build_report_snapshots: Daily at 3 AM (rapports de site du mois precedent + snapshots perimes)
 
 DESACTIVEES (systeme simplifie - plus de EN_RETARD/EXPIREE):
 - refresh_all_task_statuses: Desactivee
@@ -58,6 +61,48 @@ class Command(BaseCommand):
         status = 'Created' if created else 'Updated'
         self.stdout.write(self.style.SUCCESS(f'  [OK] {status}: cleanup_old_exports (daily 03:00, retention: 7 days)'))
 
+        # purge_sync_journal (quotidien a 3h du matin)
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Purge Sync Journal (Daily)',
+            defaults={
+                'task': 'api_planification.tasks.purge_sync_journal',
+                'interval': None,
+                'crontab': crontab_3am,
+                'enabled': True,
+                'description': 'Supprime les lignes du journal de synchronisation differentielle (SyncChange) expirees',
+            }
+        )
+        status = 'Created' if created else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {status}: purge_sync_journal (daily 03:00)'))
+
+        # archive_notifications (quotidien a 3h du matin)
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Archive Read Notifications (Daily)',
+            defaults={
+                'task': 'api.tasks.archive_notifications',
+                'interval': None,
+                'crontab': crontab_3am,
+                'enabled': True,
+                'description': 'Deplace les notifications lues anciennes (NOTIFICATION_RETENTION_DAYS) dans NotificationArchive',
+            }
+        )
+        status = 'Created' if created else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {status}: archive_notifications (daily 03:00)'))
+
+        # build_report_snapshots (quotidien a 3h du matin)
+        task, created = PeriodicTask.objects.update_or_create(
+            name='Build Site Report Snapshots (Daily)',
+            defaults={
+                'task': 'api.tasks.build_report_snapshots',
+                'interval': None,
+                'crontab': crontab_3am,
+                'enabled': True,
+                'description': 'Calcule les rapports de site du mois precedent et reconstruit les snapshots perimes',
+            }
+        )
+        status = 'Created' if created else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {status}: build_report_snapshots (daily 03:00)'))
+
         # ===================================================================
         # RECLAMATIONS (Auto-cloture)
         # ===================================================================
@@ -117,7 +162,10 @@ class Command(BaseCommand):
         self.stdout.write('')
         self.stdout.write('Active periodic tasks:')
         self.stdout.write('  1. cleanup_old_exports                 -> Daily at 03:00')
-        self.stdout.write('  2. auto_close_pending_reclamations     -> Hourly (rappel 24h + auto-cloture 48h)')
+        self.stdout.write('  2. purge_sync_journal                  -> Daily at 03:00')
+        self.stdout.write('  3. archive_notifications               -> Daily at 03:00')
+        self.stdout.write('  4. build_report_snapshots              -> Daily at 03:00')
+        self.stdout.write('  5. auto_close_pending_reclamations     -> Hourly (rappel 24h + auto-cloture 48h)')
 
         self.stdout.write('')
         self.stdout.write('Disabled tasks (simplified status system):')
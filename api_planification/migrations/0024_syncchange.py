@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-16 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_planification', '0023_change_ratio_typetache_to_protect'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entite', models.CharField(choices=[('tache', 'Tâche'), ('distribution', 'Distribution de charge'), ('objet', 'Objet GIS')], max_length=20, verbose_name='Entité')),
+                ('element_id', models.BigIntegerField(verbose_name="ID de l'élément")),
+                ('supprime', models.BooleanField(default=False, verbose_name='Suppression')),
+                ('date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date')),
+            ],
+            options={
+                'verbose_name': 'Modification synchronisée',
+                'verbose_name_plural': 'Modifications synchronisées',
+                'ordering': ['id'],
+            },
+        ),
+    ]
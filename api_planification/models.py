@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models
 from django.core.exceptions import ValidationError
 from api_users.models import Client, StructureClient, Equipe, Operateur
 from api.models import Objet
@@ -33,6 +33,79 @@ class TypeTache(models.Model):
     def __str__(self):
         return self.nom_tache
 
+# Sources fiables du temps de travail (voir Tache.temps_travail_total)
+SOURCES_TEMPS_FIABLES = ('MANUEL', 'REEL', 'PARTICIPATION')
+
+
+class TacheQuerySet(models.QuerySet):
+    """QuerySet des tâches (métriques de temps de travail calculées en SQL)."""
+
+    @staticmethod
+    def _somme(modele, lien, expression, **filtres):
+        """Agrégat corrélé par tâche (sous-requête : pas de multiplication des jointures)."""
+        from django.db.models import OuterRef, Subquery
+        from django.db.models.functions import Coalesce
+
+        return Coalesce(
+            Subquery(
+                modele.objects.filter(**{lien: OuterRef('pk')}, **filtres)
+                .order_by().values(lien)
+                .annotate(total=expression).values('total')[:1]
+            ),
+            models.Value(0),
+            output_field=expression.output_field,
+        )
+
+    def with_work_metrics(self):
+        """
+        Annote chaque tâche avec ses métriques de temps de travail, en une
+        requête (utilisées par charge_totale_distributions,
+        nombre_jours_travail et temps_travail_total) :
+        - _annot_charge_totale : somme des heures planifiées des distributions
+        - _annot_nombre_jours : distributions avec des heures planifiées
+        - _annot_heures_reelles, _annot_heures_participation
+        - _annot_temps_travail, _annot_temps_source : résolution
+          MANUEL → REEL → PARTICIPATION → ESTIME → PLANIFIE → AUCUNE
+        """
+        from django.db.models import Case, F, Q, Value, When
+
+        heures = models.FloatField()
+        qs = self.select_related('temps_travail_manuel_par').annotate(
+            _annot_charge_totale=self._somme(
+                DistributionCharge, 'tache', models.Sum('heures_planifiees', output_field=heures)
+            ),
+            _annot_nombre_jours=self._somme(
+                DistributionCharge, 'tache', models.Count('id'), heures_planifiees__gt=0
+            ),
+            _annot_heures_reelles=self._somme(
+                DistributionCharge, 'tache', models.Sum('heures_reelles', output_field=heures)
+            ),
+            _annot_heures_participation=self._somme(
+                ParticipationTache, 'id_tache', models.Sum('heures_travaillees', output_field=heures)
+            ),
+        )
+
+        branches = [
+            (Q(temps_travail_manuel__gte=0), F('temps_travail_manuel'), 'MANUEL'),
+            (Q(_annot_heures_reelles__gt=0), F('_annot_heures_reelles'), 'REEL'),
+            (Q(_annot_heures_participation__gt=0), F('_annot_heures_participation'), 'PARTICIPATION'),
+            (Q(charge_estimee_heures__gt=0), F('charge_estimee_heures'), 'ESTIME'),
+            (Q(_annot_charge_totale__gt=0), F('_annot_charge_totale'), 'PLANIFIE'),
+        ]
+        return qs.annotate(
+            _annot_temps_travail=Case(
+                *(When(condition, then=valeur) for condition, valeur, _ in branches),
+                default=Value(0.0),
+                output_field=heures,
+            ),
+            _annot_temps_source=Case(
+                *(When(condition, then=Value(source)) for condition, _, source in branches),
+                default=Value('AUCUNE'),
+                output_field=models.CharField(),
+            ),
+        )
+
+
 class Tache(models.Model):
     PRIORITE_CHOICES = [
         (1, 'Priorité 1 (Très basse)'),
@@ -211,6 +284,8 @@ class Tache(models.Model):
         verbose_name="Date de saisie manuelle"
     )
 
+    objects = TacheQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Tâche"
         verbose_name_plural = "Tâches"
@@ -253,6 +328,8 @@ class Tache(models.Model):
         Returns:
             float: Somme des heures planifiées de toutes les distributions
         """
+        if hasattr(self, '_annot_charge_totale'):
+            return float(self._annot_charge_totale or 0.0)
         return self.distributions_charge.aggregate(
             total=models.Sum('heures_planifiees')
         )['total'] or 0.0
@@ -265,6 +342,8 @@ class Tache(models.Model):
         Returns:
             int: Nombre de jours avec des heures planifiées
         """
+        if hasattr(self, '_annot_nombre_jours'):
+            return self._annot_nombre_jours or 0
         return self.distributions_charge.filter(heures_planifiees__gt=0).count()
 
     @property
@@ -309,6 +388,20 @@ class Tache(models.Model):
                 'manuel_date': self.temps_travail_manuel_date.isoformat() if self.temps_travail_manuel_date else None
             }
 
+        # Sources automatiques déjà résolues en SQL (TacheQuerySet.with_work_metrics).
+        # Le temps manuel est lu sur l'instance (à jour après une saisie) ; une
+        # annotation 'MANUEL' périmée (temps réinitialisé) passe au calcul direct.
+        source = getattr(self, '_annot_temps_source', None)
+        if source is not None and source != 'MANUEL':
+            return {
+                'heures': float(self._annot_temps_travail or 0.0),
+                'source': source,
+                'fiable': source in SOURCES_TEMPS_FIABLES,
+                'manuel': False,
+                'manuel_par': None,
+                'manuel_date': None
+            }
+
         # 2. Essayer heures_reelles des distributions (données terrain réelles)
         heures_reelles = self.distributions_charge.aggregate(
             total=models.Sum('heures_reelles')
@@ -397,35 +490,43 @@ class Tache(models.Model):
 
         # Now generate reference if it's empty
         if not self.reference:
-            # Organisation (Client)
-            org_code = "UNK"
-            if self.id_structure_client:
-                org_code = (self.id_structure_client.nom[:3].upper()
-                           if self.id_structure_client.nom else "UNK")
-            elif self.id_client and self.id_client.structure:
-                org_code = (self.id_client.structure.nom[:3].upper()
-                           if self.id_client.structure.nom else "UNK")
-
-            # Site (via premier objet ou vide)
-            site_code = "GEN" # GEN = General
-            first_obj = self.objets.first()
-            if first_obj and first_obj.site:
-                site_code = (first_obj.site.nom_site[:3].upper()
-                            if first_obj.site.nom_site else "UNK")
-
-            # Type de tâche
-            type_code = "UNK"
-            if self.id_type_tache:
-                type_code = (self.id_type_tache.nom_tache[:3].upper()
-                            if self.id_type_tache.nom_tache else "UNK")
-
-            self.reference = f"{org_code}-{site_code}-{type_code}-{self.id}"
+            self.reference = self.generer_reference(self.objets.first())
             # Save the reference
             super().save(update_fields=['reference'])
 
             # Trigger updates for distributions if we just got a first reference?
             # (Usually distributions are created after task save)
 
+    def generer_reference(self, premier_objet=None) -> str:
+        """
+        Référence technique {ORG}-{SITE}-{TYPE}-{ID} (l'ID doit être connu).
+
+        Args:
+            premier_objet: Objet dont le site donne le code SITE (GEN si None)
+        """
+        # Organisation (Client)
+        org_code = "UNK"
+        if self.id_structure_client:
+            org_code = (self.id_structure_client.nom[:3].upper()
+                       if self.id_structure_client.nom else "UNK")
+        elif self.id_client and self.id_client.structure:
+            org_code = (self.id_client.structure.nom[:3].upper()
+                       if self.id_client.structure.nom else "UNK")
+
+        # Site (via premier objet ou vide)
+        site_code = "GEN" # GEN = General
+        if premier_objet and premier_objet.site:
+            site_code = (premier_objet.site.nom_site[:3].upper()
+                        if premier_objet.site.nom_site else "UNK")
+
+        # Type de tâche
+        type_code = "UNK"
+        if self.id_type_tache:
+            type_code = (self.id_type_tache.nom_tache[:3].upper()
+                        if self.id_type_tache.nom_tache else "UNK")
+
+        return f"{org_code}-{site_code}-{type_code}-{self.id}"
+
     def delete(self, using=None, keep_parents=False):
         """
         Suppression réelle de la tâche.
@@ -436,6 +537,57 @@ class Tache(models.Model):
         super().delete(using=using, keep_parents=keep_parents)
 
 
+# Garde-fou contre les boucles dans les chaînes de reports (données corrompues)
+PROFONDEUR_MAX_CHAINE = 100
+
+# Remonte (distribution_origine) ou descend (distribution_remplacement) la
+# chaîne depuis la ligne courante de la requête externe ; la dernière ligne
+# atteinte donne la longueur et l'extrémité de la chaîne.
+_CHAINE_REPORTS_SQL = """
+    WITH RECURSIVE chaine(id, suivant_id, profondeur) AS (
+        SELECT d.id, d.{lien}, 0 FROM {table} d WHERE d.id = {table}.id
+        UNION ALL
+        SELECT s.id, s.{lien}, c.profondeur + 1
+        FROM {table} s JOIN chaine c ON s.id = c.suivant_id
+        WHERE c.profondeur < %s
+    )
+    SELECT {colonne} FROM chaine ORDER BY profondeur DESC LIMIT 1
+"""
+
+
+class DistributionChargeQuerySet(models.QuerySet):
+    """QuerySet des distributions de charge (chaînes de reports résolues en SQL)."""
+
+    def _chaine(self, lien, colonne, defaut):
+        from django.db.models.expressions import RawSQL
+
+        qn = connection.ops.quote_name
+        sql = _CHAINE_REPORTS_SQL.format(
+            table=qn(self.model._meta.db_table), lien=qn(lien), colonne=colonne
+        )
+        # Pas de récursion pour les distributions hors chaîne (cas courant)
+        return RawSQL(
+            f"CASE WHEN {qn(self.model._meta.db_table)}.{qn(lien)} IS NULL THEN {defaut} ELSE ({sql}) END",
+            (PROFONDEUR_MAX_CHAINE,),
+            output_field=models.IntegerField(),
+        )
+
+    def with_report_chain(self):
+        """
+        Annote chaque distribution avec sa chaîne de reports, en une requête
+        (CTE récursives corrélées) :
+        - chaine_nombre_reports : nombre de reports depuis l'origine
+        - chaine_origine_id : première distribution de la chaîne
+        - chaine_finale_id : dernière distribution de la chaîne
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        return self.annotate(
+            chaine_nombre_reports=self._chaine('distribution_origine_id', 'profondeur', '0'),
+            chaine_origine_id=self._chaine('distribution_origine_id', 'id', f'{table}.id'),
+            chaine_finale_id=self._chaine('distribution_remplacement_id', 'id', f'{table}.id'),
+        )
+
+
 class DistributionCharge(models.Model):
     """
     ✅ Distribution journalière de la charge pour tâches multi-jours.
@@ -632,6 +784,8 @@ class DistributionCharge(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DistributionChargeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Distribution de charge"
         verbose_name_plural = "Distributions de charge"
@@ -721,7 +875,9 @@ class DistributionCharge(models.Model):
         return get_distribution_origine(self)
 
     def get_nombre_reports(self) -> int:
-        """Retourne le nombre de reports dans la chaîne."""
+        """Retourne le nombre de reports dans la chaîne (annotation with_report_chain si présente)."""
+        if getattr(self, 'chaine_nombre_reports', None) is not None:
+            return self.chaine_nombre_reports
         from .business_rules import compter_reports_chaine
         return compter_reports_chaine(self)
 
@@ -877,3 +1033,35 @@ class ParticipationTache(models.Model):
         
     def __str__(self):
         return f"{self.id_operateur} - {self.id_tache} ({self.get_role_display()})"
+
+
+class SyncChange(models.Model):
+    """
+    Journal des créations / modifications / suppressions de Tache,
+    DistributionCharge et Objet, lu par la synchronisation différentielle
+    (GET /planification/taches/sync/).
+
+    L'id (séquence) sert de curseur : un client ne relit que les lignes
+    postérieures à son dernier curseur. Alimenté par les signals et, pour
+    les .update() / bulk_create, explicitement via sync.record_changes().
+    """
+    ENTITE_CHOICES = [
+        ('tache', 'Tâche'),
+        ('distribution', 'Distribution de charge'),
+        ('objet', 'Objet GIS'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    entite = models.CharField(max_length=20, choices=ENTITE_CHOICES, verbose_name="Entité")
+    element_id = models.BigIntegerField(verbose_name="ID de l'élément")
+    supprime = models.BooleanField(default=False, verbose_name="Suppression")
+    date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Date")
+
+    class Meta:
+        verbose_name = "Modification synchronisée"
+        verbose_name_plural = "Modifications synchronisées"
+        ordering = ['id']
+
+    def __str__(self):
+        action = 'suppression' if self.supprime else 'modification'
+        return f"#{self.id} {self.entite} {self.element_id} ({action})"
@@ -0,0 +1,309 @@
+"""
+Planification automatique des distributions de charge
+
+Répartit la charge estimée (charge_estimee_heures) d'un lot de tâches en
+distributions journalières, sans dépasser la capacité des équipes assignées.
+
+Capacité :
+- Calendrier de capacité (api_users/capacity.py) chargé une fois pour
+  toutes les équipes et toute la plage : horaires, jours fériés, absences.
+  Un jour où l'équipe est indisponible (< 50 % de présents) vaut 0h.
+- Les distributions actives (NON_REALISEE, EN_COURS) d'autres tâches sur
+  ces équipes sont déduites de la grille.
+- Une tâche multi-équipes consomme les mêmes heures sur chaque équipe
+  (les équipes interviennent ensemble).
+- Une tâche sans équipe n'est bornée que par l'horaire global du jour.
+
+Algorithme (glouton, échéance la plus proche d'abord) :
+  tâches triées par (date_fin_planifiee, priorité décroissante, date_debut),
+  chaque tâche remplit ses jours au plus tôt dans [date_debut, date_fin].
+  Une tâche qui ne tient pas entièrement n'est pas planifiée et libère la
+  capacité réservée (tout ou rien).
+
+Écriture : IDs réservés, INSERT groupé des distributions (références
+incluses), journal de synchronisation, invalidation du cache tâches.
+
+Usage:
+    resultat = planifier_distributions(tache_ids, dry_run=True)
+    resultat.as_dict()
+"""
+
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import DistributionCharge, Tache
+
+logger = logging.getLogger(__name__)
+
+# Statuts de tâche planifiables
+STATUTS_PLANIFIABLES = ('PLANIFIEE', 'EN_COURS')
+
+# Distributions qui occupent encore la capacité d'une équipe
+STATUTS_DISTRIBUTION_ACTIFS = ('NON_REALISEE', 'EN_COURS')
+
+# Nombre maximal de tâches par lot
+MAX_TACHES_PLANIFICATION = 2000
+
+COMMENTAIRE_AUTO = 'Planifiée automatiquement selon la capacité des équipes'
+
+# Motifs de non-planification
+MOTIF_STATUT = 'statut'
+MOTIF_SANS_CHARGE = 'sans_charge'
+MOTIF_DEJA_DISTRIBUEE = 'deja_distribuee'
+MOTIF_CAPACITE = 'capacite_insuffisante'
+
+
+@dataclass
+class PlanningResult:
+    """Résultat d'une planification (appliquée ou simulée)."""
+    dry_run: bool
+    distributions: List[dict] = field(default_factory=list)
+    planifiees: List[int] = field(default_factory=list)
+    non_planifiees: Dict[int, dict] = field(default_factory=dict)
+    durees_ms: Dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            'dry_run': self.dry_run,
+            'nombre_taches_planifiees': len(self.planifiees),
+            'nombre_distributions': len(self.distributions),
+            'taches_planifiees': self.planifiees,
+            'taches_non_planifiees': [
+                {'tache_id': tache_id, **detail}
+                for tache_id, detail in sorted(self.non_planifiees.items())
+            ],
+            'distributions': [
+                {**d, 'date': d['date'].isoformat()} for d in self.distributions
+            ],
+            'durees_ms': self.durees_ms,
+        }
+
+
+def _minutes(heures: float) -> int:
+    return int(round((heures or 0) * 60))
+
+
+def _jours(date_debut: date, date_fin: date):
+    jour = date_debut
+    while jour <= date_fin:
+        yield jour
+        jour += timedelta(days=1)
+
+
+def _equipes_par_tache(tache_ids: List[int], equipes_legacy: Dict[int, Optional[int]]) -> Dict[int, List[int]]:
+    """Équipes assignées (M2M), repli sur l'équipe legacy id_equipe."""
+    equipes = defaultdict(list)
+    for tache_id, equipe_id in Tache.equipes.through.objects.filter(
+        tache_id__in=tache_ids
+    ).values_list('tache_id', 'equipe_id'):
+        equipes[tache_id].append(equipe_id)
+    for tache_id, equipe_id in equipes_legacy.items():
+        if not equipes[tache_id] and equipe_id:
+            equipes[tache_id].append(equipe_id)
+    return equipes
+
+
+def planifier_distributions(tache_ids: Iterable[int], dry_run: bool = False) -> PlanningResult:
+    """
+    Planifie les distributions journalières d'un lot de tâches.
+
+    Args:
+        tache_ids: IDs des tâches à planifier
+        dry_run: Si True, calcule le plan sans rien écrire
+
+    Returns:
+        PlanningResult (distributions prévues, tâches non planifiées et motif,
+        durées des phases chargement / planification / écriture en ms)
+    """
+    from api_users.capacity import CapacityCalendar
+
+    tache_ids = sorted(set(tache_ids))
+    if len(tache_ids) > MAX_TACHES_PLANIFICATION:
+        raise ValueError(f"Maximum {MAX_TACHES_PLANIFICATION} tâches par planification")
+
+    resultat = PlanningResult(dry_run=dry_run)
+    debut = time.perf_counter()
+
+    # ==========================================================================
+    # 1. CHARGEMENT (nombre de requêtes constant)
+    # ==========================================================================
+
+    taches = list(
+        Tache.objects.filter(pk__in=tache_ids).values(
+            'id', 'reference', 'statut', 'charge_estimee_heures', 'priorite',
+            'date_debut_planifiee', 'date_fin_planifiee', 'id_equipe_id',
+        )
+    )
+    deja_distribuees = set(
+        DistributionCharge.objects.filter(tache_id__in=tache_ids).values_list('tache_id', flat=True)
+    )
+
+    a_planifier = []
+    for tache in taches:
+        if tache['statut'] not in STATUTS_PLANIFIABLES:
+            resultat.non_planifiees[tache['id']] = {'motif': MOTIF_STATUT}
+        elif not tache['charge_estimee_heures'] or tache['charge_estimee_heures'] <= 0:
+            resultat.non_planifiees[tache['id']] = {'motif': MOTIF_SANS_CHARGE}
+        elif tache['id'] in deja_distribuees:
+            resultat.non_planifiees[tache['id']] = {'motif': MOTIF_DEJA_DISTRIBUEE}
+        else:
+            a_planifier.append(tache)
+
+    if not a_planifier:
+        resultat.durees_ms['chargement'] = round((time.perf_counter() - debut) * 1000, 1)
+        return resultat
+
+    equipes = _equipes_par_tache(
+        [t['id'] for t in a_planifier],
+        {t['id']: t['id_equipe_id'] for t in a_planifier},
+    )
+    equipe_ids = {e for ids in equipes.values() for e in ids}
+    date_debut = min(t['date_debut_planifiee'] for t in a_planifier)
+    date_fin = max(t['date_fin_planifiee'] for t in a_planifier)
+
+    calendrier = CapacityCalendar(equipe_ids, date_debut, date_fin)
+
+    # Grille de capacité restante (minutes) par (équipe, jour)
+    grille = {}
+    for equipe_id in equipe_ids:
+        for jour in calendrier.jours():
+            capacite = calendrier.jour(equipe_id, jour)
+            grille[(equipe_id, jour)] = _minutes(capacite.heures_disponibles) if capacite.disponible else 0
+
+    # Distributions actives des autres tâches sur ces équipes
+    reservations = list(
+        DistributionCharge.objects.filter(
+            date__gte=date_debut, date__lte=date_fin,
+            status__in=STATUTS_DISTRIBUTION_ACTIFS,
+        ).filter(
+            Q(tache__equipes__in=equipe_ids) | Q(tache__id_equipe__in=equipe_ids)
+        ).exclude(
+            tache_id__in=tache_ids
+        ).values_list('id', 'tache_id', 'date', 'heures_planifiees').distinct()
+    )
+    taches_reservees = {tache_id for _, tache_id, _, _ in reservations}
+    equipes_reservees = _equipes_par_tache(
+        list(taches_reservees),
+        dict(Tache.objects.filter(pk__in=taches_reservees).values_list('id', 'id_equipe_id')),
+    )
+    for _, tache_id, jour, heures in reservations:
+        for equipe_id in equipes_reservees.get(tache_id, ()):
+            if (equipe_id, jour) in grille:
+                grille[(equipe_id, jour)] = max(0, grille[(equipe_id, jour)] - _minutes(heures))
+
+    chargement = time.perf_counter()
+    resultat.durees_ms['chargement'] = round((chargement - debut) * 1000, 1)
+
+    # ==========================================================================
+    # 2. PLANIFICATION (glouton, échéance la plus proche d'abord)
+    # ==========================================================================
+
+    a_planifier.sort(key=lambda t: (
+        t['date_fin_planifiee'], -t['priorite'], t['date_debut_planifiee'], t['id']
+    ))
+
+    plan = []
+    for tache in a_planifier:
+        equipes_tache = equipes.get(tache['id'], [])
+        reste = _minutes(tache['charge_estimee_heures'])
+        allocations = []
+
+        for jour in _jours(tache['date_debut_planifiee'], tache['date_fin_planifiee']):
+            if reste <= 0:
+                break
+            if equipes_tache:
+                disponible = min(grille[(e, jour)] for e in equipes_tache)
+            else:
+                disponible = _minutes(calendrier.jour(None, jour).heures_disponibles)
+            pris = min(reste, disponible)
+            if pris > 0:
+                allocations.append((jour, pris))
+                reste -= pris
+
+        if reste > 0:
+            resultat.non_planifiees[tache['id']] = {
+                'motif': MOTIF_CAPACITE,
+                'heures_non_placees': round(reste / 60, 2),
+            }
+            continue
+
+        for jour, minutes in allocations:
+            for equipe_id in equipes_tache:
+                grille[(equipe_id, jour)] -= minutes
+            plan.append({
+                'tache_id': tache['id'],
+                'reference_tache': tache['reference'],
+                'date': jour,
+                'heures': round(minutes / 60, 2),
+            })
+        resultat.planifiees.append(tache['id'])
+
+    resultat.distributions = [
+        {'tache_id': d['tache_id'], 'date': d['date'], 'heures': d['heures']} for d in plan
+    ]
+    planification = time.perf_counter()
+    resultat.durees_ms['planification'] = round((planification - chargement) * 1000, 1)
+
+    if dry_run or not plan:
+        return resultat
+
+    # ==========================================================================
+    # 3. ÉCRITURE GROUPÉE
+    # ==========================================================================
+
+    from .sync import ENTITE_DISTRIBUTION, ENTITE_TACHE, record_changes
+    from .utils import RECURRENCE_BATCH_SIZE, _reserver_ids
+
+    with transaction.atomic():
+        distributions = [
+            DistributionCharge(
+                id=pk,
+                tache_id=d['tache_id'],
+                date=d['date'],
+                heures_planifiees=d['heures'],
+                status='NON_REALISEE',
+                commentaire=COMMENTAIRE_AUTO,
+                reference=f"{d['reference_tache']}-D{pk}" if d['reference_tache'] else None,
+            )
+            for pk, d in zip(_reserver_ids(DistributionCharge, len(plan)), plan)
+        ]
+        DistributionCharge.objects.bulk_create(distributions, batch_size=RECURRENCE_BATCH_SIZE)
+
+        record_changes(ENTITE_DISTRIBUTION, [d.pk for d in distributions])
+        record_changes(ENTITE_TACHE, resultat.planifiees)
+
+        # KPIs 5 et 6 (KPIMensuel) et rapports de site (RapportMensuel) : mois
+        # des distributions pour les sites de leur tâche (comme kpi_distribution_changed)
+        from api.services.kpi_rollup import mark_kpis_dirty
+        from api.services.report_snapshots import mark_reports_stale
+
+        sites_par_tache = defaultdict(set)
+        for tache_id, site_id in Tache.objets.through.objects.filter(
+            tache_id__in={d.tache_id for d in distributions}
+        ).values_list('tache_id', 'objet__site_id').distinct():
+            sites_par_tache[tache_id].add(site_id)
+
+        dates_par_tache = defaultdict(list)
+        for distribution in distributions:
+            dates_par_tache[distribution.tache_id].append(distribution.date)
+        for tache_id, dates in dates_par_tache.items():
+            site_ids = sites_par_tache.get(tache_id, set())
+            mark_kpis_dirty(dates, site_ids)
+            mark_reports_stale(dates, site_ids)
+
+    from greensig_web.cache_utils import invalidate_on_distribution_mutation
+    invalidate_on_distribution_mutation()
+
+    resultat.durees_ms['ecriture'] = round((time.perf_counter() - planification) * 1000, 1)
+    logger.info(
+        f"[PLANNER] {len(distributions)} distribution(s) pour {len(resultat.planifiees)} tâche(s), "
+        f"{len(resultat.non_planifiees)} non planifiée(s) ({resultat.durees_ms})"
+    )
+    return resultat
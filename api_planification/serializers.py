@@ -1,6 +1,7 @@
 import logging
 from rest_framework import serializers
 from .models import TypeTache, Tache, ParticipationTache, RatioProductivite, DistributionCharge
+from .constants import MAX_OCCURRENCES_RECURRENCE
 from api_users.models import Equipe, Client, StructureClient
 from api.models import Objet
 
@@ -57,7 +58,7 @@ class ObjetMinimalSerializer(serializers.ModelSerializer):
 class ObjetSimpleSerializer(serializers.ModelSerializer):
     """Serializer ultra-léger pour les objets dans les tâches.
 
-    N'utilise PAS get_nom_type() ou __str__() car ils causent des N+1.
+    get_nom_type() lit la colonne matérialisée Objet.type_objet (aucune requête).
     Utilise select_related/prefetch_related dans la vue pour éviter N+1.
     """
     site_nom = serializers.CharField(source='site.nom_site', read_only=True, allow_null=True)
@@ -1154,10 +1155,10 @@ class DupliquerTacheSerializer(serializers.Serializer):
     )
     nombre_occurrences = serializers.IntegerField(
         min_value=1,
-        max_value=100,
+        max_value=MAX_OCCURRENCES_RECURRENCE,
         required=False,
         allow_null=True,
-        help_text="Nombre max de tâches à créer (optionnel, max 100)"
+        help_text=f"Nombre max de tâches à créer (optionnel, max {MAX_OCCURRENCES_RECURRENCE})"
     )
     date_fin_recurrence = serializers.DateField(
         required=False,
@@ -1230,10 +1231,10 @@ class DupliquerTacheRecurrenceSerializer(serializers.Serializer):
 
     nombre_occurrences = serializers.IntegerField(
         min_value=1,
-        max_value=100,
+        max_value=MAX_OCCURRENCES_RECURRENCE,
         required=False,
         allow_null=True,
-        help_text="Nombre max d'occurrences (optionnel, max 100)"
+        help_text=f"Nombre max d'occurrences (optionnel, max {MAX_OCCURRENCES_RECURRENCE})"
     )
     date_fin_recurrence = serializers.DateField(
         required=False,
@@ -1338,8 +1339,8 @@ class DupliquerTacheDatesSpecifiquesSerializer(serializers.Serializer):
     dates_cibles = serializers.ListField(
         child=serializers.DateField(),
         min_length=1,
-        max_length=100,
-        help_text="Liste des dates de début pour les nouvelles tâches (max 100)"
+        max_length=MAX_OCCURRENCES_RECURRENCE,
+        help_text=f"Liste des dates de début pour les nouvelles tâches (max {MAX_OCCURRENCES_RECURRENCE})"
     )
     conserver_equipes = serializers.BooleanField(
         default=True,
@@ -1,8 +1,7 @@
 import datetime
 import logging
-from typing import Dict, Optional, Tuple
-from django.db import transaction
-from django.db.models import QuerySet
+from typing import List, Optional, Tuple
+from django.db import connection, transaction
 from .models import Tache, RatioProductivite, DistributionCharge
 
 logger = logging.getLogger(__name__)
@@ -20,13 +19,46 @@ class WorkloadCalculationService:
     LINE_OBJECTS = ['Canalisation', 'Aspersion', 'Goutte']
 
     @staticmethod
-    def _get_work_hours_for_day(equipe, date):
+    def get_calendrier(equipes, date_debut, date_fin):
+        """
+        Calendrier de capacité (horaires, jours fériés, absences) chargé une
+        seule fois pour des équipes et une plage de dates.
+
+        À passer aux helpers ci-dessous pour éviter des requêtes par jour.
+
+        Args:
+            equipes: Instances d'Equipe ou IDs (None ignorés)
+            date_debut: datetime.date ou datetime.datetime
+            date_fin: datetime.date ou datetime.datetime
+
+        Returns:
+            CapacityCalendar
+        """
+        from api_users.capacity import CapacityCalendar
+        equipe_ids = [getattr(equipe, 'pk', equipe) for equipe in equipes]
+        return CapacityCalendar(equipe_ids, date_debut, date_fin)
+
+    @staticmethod
+    def _calendrier_pour(equipe, date, calendrier=None):
+        """Réutilise le calendrier fourni s'il couvre la date, sinon en charge un d'un jour."""
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        if calendrier is not None and calendrier.date_debut <= date <= calendrier.date_fin:
+            return calendrier
+        return WorkloadCalculationService.get_calendrier([equipe], date, date)
+
+    @staticmethod
+    def _get_work_hours_for_day(equipe, date, calendrier=None):
         """
         Retourne les heures travaillables pour une équipe à une date donnée.
 
+        Horaire actif de l'équipe, sinon horaire global (sans équipe), sinon
+        valeurs par défaut : samedi 4h (08:00-12:00), dimanche 0h, autres jours 8h.
+
         Args:
             equipe: Instance d'Equipe
             date: datetime.date ou datetime.datetime
+            calendrier: CapacityCalendar déjà chargé (optionnel)
 
         Returns:
             float: Nombre d'heures travaillables dans la journée (défaut: 8h si pas d'horaire)
@@ -34,43 +66,8 @@ class WorkloadCalculationService:
         if not equipe:
             return 8.0  # Défaut si pas d'équipe
 
-        # Convertir en date si datetime
-        if isinstance(date, datetime.datetime):
-            date = date.date()
-
-        # Mapper jour de semaine (0=lundi, 6=dimanche) vers code BDD
-        jours_mapping = {
-            0: 'LUN',
-            1: 'MAR',
-            2: 'MER',
-            3: 'JEU',
-            4: 'VEN',
-            5: 'SAM',
-            6: 'DIM',
-        }
-        jour_code = jours_mapping[date.weekday()]
-
-        # Chercher l'horaire actif pour cette équipe et ce jour
-        try:
-            from api_users.models import HoraireTravail
-            horaire = HoraireTravail.objects.get(
-                equipe=equipe,
-                jour_semaine=jour_code,
-                actif=True
-            )
-            return horaire.heures_travaillables
-        except Exception:
-            # Pas d'horaire défini, utiliser des valeurs par défaut intelligentes
-            # Samedi : 4h (08:00-12:00), Dimanche : 0h, Autres jours : 8h
-            if jour_code == 'SAM':
-                logger.debug(f"Pas d'horaire pour équipe {equipe.id} le samedi. Défaut: 4h (08:00-12:00)")
-                return 4.0
-            elif jour_code == 'DIM':
-                logger.debug(f"Pas d'horaire pour équipe {equipe.id} le dimanche. Défaut: 0h (repos)")
-                return 0.0
-            else:
-                logger.debug(f"Pas d'horaire pour équipe {equipe.id} le {jour_code}. Défaut: 8h")
-                return 8.0
+        calendrier = WorkloadCalculationService._calendrier_pour(equipe, date, calendrier)
+        return calendrier.heures_travaillables(equipe.pk, date)
 
     @staticmethod
     def _est_weekend(date):
@@ -92,24 +89,22 @@ class WorkloadCalculationService:
         return date.weekday() == 6
 
     @staticmethod
-    def _est_jour_ferie(date):
+    def _est_jour_ferie(date, calendrier=None):
         """
-        Vérifie si une date est un jour férié.
+        Vérifie si une date est un jour férié (y compris les fériés récurrents).
 
         Args:
             date: datetime.date ou datetime.datetime
+            calendrier: CapacityCalendar déjà chargé (optionnel)
 
         Returns:
             bool: True si jour férié, False sinon
         """
-        try:
-            from api_users.models import JourFerie
-            return JourFerie.est_jour_ferie(date, actif_uniquement=True)
-        except Exception:
-            return False
+        calendrier = WorkloadCalculationService._calendrier_pour(None, date, calendrier)
+        return calendrier.est_ferie(date)
 
     @staticmethod
-    def _est_equipe_disponible(equipe, date):
+    def _est_equipe_disponible(equipe, date, calendrier=None):
         """
         Vérifie si une équipe a suffisamment de membres disponibles pour une date.
 
@@ -118,6 +113,7 @@ class WorkloadCalculationService:
         Args:
             equipe: Instance d'Equipe
             date: datetime.date ou datetime.datetime
+            calendrier: CapacityCalendar déjà chargé (optionnel)
 
         Returns:
             bool: True si équipe disponible, False sinon
@@ -125,48 +121,21 @@ class WorkloadCalculationService:
         if not equipe:
             return True  # Pas d'équipe = pas de contrainte
 
-        # Convertir en date si datetime
-        if isinstance(date, datetime.datetime):
-            date = date.date()
+        calendrier = WorkloadCalculationService._calendrier_pour(equipe, date, calendrier)
+        capacite = calendrier.jour(equipe.pk, date)
 
-        try:
-            from api_users.models import StatutOperateur, Absence, StatutAbsence
-
-            # Compter les membres actifs
-            membres_actifs = equipe.operateurs.filter(statut=StatutOperateur.ACTIF)
-            nombre_membres = membres_actifs.count()
-
-            if nombre_membres == 0:
-                logger.warning(f"Équipe {equipe.id} n'a aucun membre actif")
-                return False
-
-            # Compter les membres en absence ce jour-là
-            absences = Absence.objects.filter(
-                operateur__in=membres_actifs,
-                statut=StatutAbsence.VALIDEE,
-                date_debut__lte=date,
-                date_fin__gte=date
+        if capacite.membres == 0:
+            logger.warning(f"Équipe {equipe.pk} n'a aucun membre actif")
+        elif not capacite.disponible:
+            logger.info(
+                f"Équipe {equipe.pk} indisponible le {date}: "
+                f"{capacite.presents}/{capacite.membres} présents"
             )
-            nombre_absents = absences.count()
-            nombre_presents = nombre_membres - nombre_absents
-
-            # Critère: au moins 50% des membres doivent être présents
-            seuil_minimum = nombre_membres * 0.5
-            disponible = nombre_presents >= seuil_minimum
-
-            if not disponible:
-                logger.info(
-                    f"Équipe {equipe.id} indisponible le {date}: "
-                    f"{nombre_presents}/{nombre_membres} présents (seuil: {seuil_minimum:.0f})"
-                )
-
-            return disponible
-        except Exception as e:
-            logger.warning(f"Erreur vérification disponibilité équipe: {e}")
-            return True
+        return capacite.disponible
 
     @staticmethod
-    def _est_jour_travaillable(equipe, date, skip_weekends=True, skip_holidays=True, check_availability=True):
+    def _est_jour_travaillable(equipe, date, skip_weekends=True, skip_holidays=True,
+                               check_availability=True, calendrier=None):
         """
         Vérifie si un jour est travaillable pour une équipe.
 
@@ -176,6 +145,7 @@ class WorkloadCalculationService:
             skip_weekends: Si True, exclut les weekends
             skip_holidays: Si True, exclut les jours fériés
             check_availability: Si True, vérifie la disponibilité de l'équipe
+            calendrier: CapacityCalendar déjà chargé (optionnel)
 
         Returns:
             bool: True si jour travaillable, False sinon
@@ -184,16 +154,40 @@ class WorkloadCalculationService:
         if skip_weekends and WorkloadCalculationService._est_weekend(date):
             return False
 
+        if skip_holidays or check_availability:
+            calendrier = WorkloadCalculationService._calendrier_pour(equipe, date, calendrier)
+
         # Vérifier jour férié
-        if skip_holidays and WorkloadCalculationService._est_jour_ferie(date):
+        if skip_holidays and WorkloadCalculationService._est_jour_ferie(date, calendrier):
             return False
 
         # Vérifier disponibilité équipe
-        if check_availability and not WorkloadCalculationService._est_equipe_disponible(equipe, date):
+        if check_availability and not WorkloadCalculationService._est_equipe_disponible(equipe, date, calendrier):
             return False
 
         return True
 
+    @staticmethod
+    def jours_travaillables(equipe, date_debut, date_fin, skip_weekends=True,
+                            skip_holidays=True, check_availability=True):
+        """
+        Jours travaillables d'une équipe sur une plage, avec leurs heures.
+
+        Un seul calendrier est chargé pour toute la plage (requêtes en
+        nombre constant, quelle que soit sa longueur).
+
+        Returns:
+            list[tuple[datetime.date, float]]: (jour, heures travaillables)
+        """
+        calendrier = WorkloadCalculationService.get_calendrier([equipe], date_debut, date_fin)
+        return [
+            (jour, WorkloadCalculationService._get_work_hours_for_day(equipe, jour, calendrier))
+            for jour in calendrier.jours()
+            if WorkloadCalculationService._est_jour_travaillable(
+                equipe, jour, skip_weekends, skip_holidays, check_availability, calendrier
+            )
+        ]
+
     @classmethod
     def calculate_workload(cls, tache: Tache) -> Optional[float]:
         """
@@ -209,35 +203,28 @@ class WorkloadCalculationService:
             logger.warning(f"Tache {tache.id}: Pas de type de tâche défini")
             return None
 
-        objets = tache.objets.all()
-        if not objets.exists():
+        rows = cls._quantities_by_type(tache.id, tache.id_type_tache_id)
+        if not rows:
             logger.info(f"Tache {tache.id}: Aucun objet lié, charge = 0")
             return 0.0
 
-        # Récupérer les ratios de productivité pour ce type de tâche
-        ratios = cls._get_ratios_for_task_type(tache.id_type_tache_id)
-        if not ratios:
+        if not rows[0]['ratios_definis']:
             logger.warning(f"Tache {tache.id}: Aucun ratio défini pour le type {tache.id_type_tache}")
             return None
 
         total_hours = 0.0
         objects_without_ratio = []
 
-        # Grouper les objets par type
-        objects_by_type = cls._group_objects_by_type(objets)
-
-        for type_objet, objs in objects_by_type.items():
-            if type_objet not in ratios:
+        for row in rows:
+            type_objet, quantity, ratio = row['type_objet'], row['quantite'], row['ratio']
+            if ratio is None:
                 objects_without_ratio.append(type_objet)
                 continue
 
-            ratio_info = ratios[type_objet]
-            quantity = cls._calculate_quantity(objs, type_objet, ratio_info['unite_mesure'])
-
-            if quantity > 0 and ratio_info['ratio'] > 0:
-                hours = quantity / ratio_info['ratio']
+            if quantity > 0 and ratio > 0:
+                hours = quantity / ratio
                 total_hours += hours
-                logger.debug(f"  {type_objet}: {quantity} {ratio_info['unite_mesure']} / {ratio_info['ratio']} = {hours:.2f}h")
+                logger.debug(f"  {type_objet}: {quantity} {row['unite_mesure']} / {ratio} = {hours:.2f}h")
 
         if objects_without_ratio:
             logger.warning(f"Tache {tache.id}: Types sans ratio défini: {objects_without_ratio}")
@@ -245,110 +232,66 @@ class WorkloadCalculationService:
         return round(total_hours, 2)
 
     @classmethod
-    def _get_ratios_for_task_type(cls, type_tache_id: int) -> Dict[str, dict]:
-        """
-        Récupère les ratios de productivité pour un type de tâche.
-
-        Returns:
-            Dict mapping type_objet -> {ratio, unite_mesure}
-        """
-        ratios = RatioProductivite.objects.filter(
-            id_type_tache_id=type_tache_id,
-            actif=True
-        ).values('type_objet', 'ratio', 'unite_mesure')
-
-        return {
-            r['type_objet']: {'ratio': r['ratio'], 'unite_mesure': r['unite_mesure']}
-            for r in ratios
-        }
-
-    @classmethod
-    def _group_objects_by_type(cls, objets: QuerySet) -> Dict[str, list]:
-        """
-        Groupe les objets par leur type réel (Arbre, Gazon, etc.).
-
-        Optimisé : 15 requêtes IN au total au lieu de N×15 requêtes lazy.
-        Pour 400 objets, passe de ~6000 queries à 15.
-        """
-        from api.models import (
-            Arbre, Palmier, Gazon, Arbuste, Vivace, Cactus, Graminee,
-            Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon
-        )
-
-        CHILD_MODELS = [
-            Arbre, Palmier, Gazon, Arbuste, Vivace, Cactus, Graminee,
-            Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon
-        ]
-
-        objet_ids = set(objets.values_list('id', flat=True))
-        grouped: Dict[str, list] = {}
-
-        for Model in CHILD_MODELS:
-            # Une seule requête par type : SELECT ... WHERE objet_ptr_id IN (...)
-            children = Model.objects.filter(objet_ptr_id__in=objet_ids)
-            child_list = list(children)
-            if child_list:
-                grouped[Model.__name__] = child_list
-
-        return grouped
-
-    @classmethod
-    def _calculate_quantity(cls, objets: list, type_objet: str, unite_mesure: str) -> float:
+    def _quantities_by_type(cls, tache_id: int, type_tache_id: int) -> List[dict]:
         """
-        Calcule la quantité totale pour un groupe d'objets.
-        Les objets sont déjà des instances typées (Arbre, Gazon, etc.),
-        pas besoin de get_type_reel().
+        Quantités des objets liés à une tâche, groupées par type d'objet et
+        jointes aux ratios de productivité actifs, en une seule requête.
 
-        Args:
-            objets: Liste d'instances typées (déjà résolues par _group_objects_by_type)
-            type_objet: Nom du type (Arbre, Gazon, etc.)
-            unite_mesure: 'm2', 'ml', ou 'unite'
+        Les quantités sont calculées par PostGIS sur le type geography
+        (mètres exacts sur l'ellipsoïde), aucune géométrie n'est chargée :
+        - 'unite' : nombre d'objets
+        - 'm2'    : area_sqm saisie si renseignée, sinon ST_Area (polygones)
+        - 'ml'    : ST_Length (lignes)
 
         Returns:
-            Quantité totale dans l'unité spécifiée
+            Liste de {type_objet, unite_mesure, ratio, quantite, ratios_definis} ;
+            ratio vaut None pour un type sans ratio, ratios_definis indique si
+            le type de tâche a au moins un ratio actif.
         """
-        if unite_mesure == 'unite':
-            return float(len(objets))
-
-        total = 0.0
-        for obj in objets:
-            geometry = getattr(obj, 'geometry', None)
-            if not geometry:
-                continue
-
-            try:
-                if unite_mesure == 'm2':
-                    if hasattr(obj, 'area_sqm') and obj.area_sqm:
-                        total += obj.area_sqm
-                    elif geometry.geom_type in ('Polygon', 'MultiPolygon'):
-                        total += cls._calculate_area_m2(geometry)
-
-                elif unite_mesure == 'ml':
-                    if geometry.geom_type in ('LineString', 'MultiLineString'):
-                        total += cls._calculate_length_m(geometry)
-            except Exception as e:
-                logger.error(f"Erreur calcul géométrie pour {type_objet}: {e}")
-                continue
-
-        return total
-
-    @classmethod
-    def _calculate_area_m2(cls, geometry) -> float:
-        """Calcule l'aire en m² d'une géométrie polygonale."""
-        import math
-        area_deg = geometry.area
-        centroid = geometry.centroid
-        cos_lat = math.cos(math.radians(centroid.y))
-        return area_deg * (111000 ** 2) * cos_lat
+        from api.models import OBJET_TYPE_MODELS
+
+        qn = connection.ops.quote_name
+        objets_through = Tache.objets.through._meta
+        ratio_table = qn(RatioProductivite._meta.db_table)
+
+        branches = []
+        for type_objet, model in OBJET_TYPE_MODELS.items():
+            has_area = any(f.name == 'area_sqm' for f in model._meta.concrete_fields)
+            area = 'c.area_sqm' if has_area else 'NULL::double precision'
+            branches.append(
+                f"SELECT '{type_objet}'::varchar AS type_objet, c.geometry::geometry AS geom, {area} AS area_sqm "
+                f"FROM {qn(model._meta.db_table)} c JOIN liens l ON l.objet_id = c.objet_ptr_id"
+            )
+        union = '\n            UNION ALL '.join(branches)
 
-    @classmethod
-    def _calculate_length_m(cls, geometry) -> float:
-        """Calcule la longueur en mètres d'une géométrie linéaire."""
-        import math
-        length_deg = geometry.length
-        centroid = geometry.centroid
-        cos_lat = math.cos(math.radians(centroid.y))
-        return length_deg * 111000 * cos_lat
+        sql = f"""
+            WITH liens AS (
+                SELECT objet_id FROM {qn(objets_through.db_table)} WHERE tache_id = %s
+            ), geoms AS (
+                {union}
+            )
+            SELECT g.type_objet, r.unite_mesure, r.ratio,
+                   COALESCE(SUM(CASE
+                       WHEN r.unite_mesure = 'm2' THEN COALESCE(
+                           NULLIF(g.area_sqm, 0),
+                           CASE WHEN GeometryType(g.geom) IN ('POLYGON', 'MULTIPOLYGON')
+                                THEN ST_Area(g.geom::geography) END)
+                       WHEN r.unite_mesure = 'ml' THEN
+                           CASE WHEN GeometryType(g.geom) IN ('LINESTRING', 'MULTILINESTRING')
+                                THEN ST_Length(g.geom::geography) END
+                       ELSE 1
+                   END), 0) AS quantite,
+                   EXISTS (SELECT 1 FROM {ratio_table} WHERE id_type_tache_id = %s AND actif) AS ratios_definis
+            FROM geoms g
+            LEFT JOIN {ratio_table} r
+                ON r.type_objet = g.type_objet AND r.id_type_tache_id = %s AND r.actif
+            GROUP BY g.type_objet, r.unite_mesure, r.ratio
+            ORDER BY g.type_objet
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tache_id, type_tache_id, type_tache_id])
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
     @classmethod
     def recalculate_and_save(cls, tache: Tache, force: bool = False) -> Tuple[Optional[float], bool]:
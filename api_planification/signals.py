@@ -3,12 +3,15 @@ Signals pour le module Planification
 
 - Auto-remplissage du champ id_client basé sur les objets liés à la tâche
 - Notifications temps réel via Novu
+- Journal de synchronisation différentielle (SyncChange)
 """
 
 import logging
-from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Tache
+from api.models import OBJET_TYPE_MODELS, Objet
+from .models import DistributionCharge, Tache
+from .sync import ENTITE_DISTRIBUTION, ENTITE_OBJET, ENTITE_TACHE, record_changes
 
 logger = logging.getLogger(__name__)
 
@@ -21,29 +24,38 @@ def update_last_intervention_date(tache):
     Utilise la date de fin réelle de la tâche ou la date courante.
     """
     from django.utils import timezone
-    from api.models import (
-        Arbre, Palmier, Gazon, Arbuste, Vivace, Cactus, Graminee,
-        Puit, Pompe, Vanne, Clapet, Canalisation, Aspersion, Goutte, Ballon
-    )
+    from api.models import OBJET_TYPE_MODELS
+    from greensig_web.cache_utils import invalidate_on_gis_object_mutation
 
     # Date à utiliser: date_fin_reelle ou date du jour
     intervention_date = tache.date_fin_reelle.date() if tache.date_fin_reelle else timezone.now().date()
 
-    # Récupérer tous les objets liés à cette tâche
-    objets = tache.objets.all()
+    # Regrouper les objets liés par type réel (une requête via Objet.type_objet)
+    ids_by_type = tache.objets.all().ids_by_type()
 
-    if not objets.exists():
+    if not ids_by_type:
         logger.debug(f"[LAST_INTERVENTION] Tache #{tache.id}: aucun objet lié")
         return
 
+    # Objets non backfillés : résolution par les tables enfants
+    untyped_ids = ids_by_type.pop('', None)
+    if untyped_ids:
+        for enfant in tache.objets.filter(pk__in=untyped_ids).resolve_children().values():
+            ids_by_type.setdefault(enfant.__class__.__name__, []).append(enfant.pk)
+
+    # Un UPDATE par type présent (au lieu d'un save() par objet)
     updated_count = 0
-    for objet in objets:
-        # Obtenir l'instance réelle (enfant polymorphique)
-        real_obj = objet.get_type_reel()
-        if real_obj and hasattr(real_obj, 'last_intervention_date'):
-            real_obj.last_intervention_date = intervention_date
-            real_obj.save(update_fields=['last_intervention_date'])
-            updated_count += 1
+    for type_name, ids in ids_by_type.items():
+        Model = OBJET_TYPE_MODELS.get(type_name)
+        if Model is None or not hasattr(Model, 'last_intervention_date'):
+            continue
+        updated_count += Model.objects.filter(pk__in=ids).update(last_intervention_date=intervention_date)
+
+    if updated_count:
+        # update() ne déclenche pas post_save : invalider et journaliser explicitement
+        site_ids = set(tache.objets.values_list('site_id', flat=True))
+        invalidate_on_gis_object_mutation(*site_ids)
+        record_changes(ENTITE_OBJET, [pk for ids in ids_by_type.values() for pk in ids])
 
     logger.info(f"[LAST_INTERVENTION] Tache #{tache.id} TERMINEE: {updated_count} objets mis à jour avec date {intervention_date}")
 
@@ -235,3 +247,46 @@ def notify_tache_on_objects_added(sender, instance, action, **kwargs):
 
     except Exception as e:
         logger.error(f"[NOTIF] Erreur notification tache #{instance.id} apres ajout objets: {e}")
+
+
+# ==============================================================================
+# JOURNAL DE SYNCHRONISATION (SyncChange)
+# ==============================================================================
+
+@receiver(post_save, sender=Tache)
+@receiver(post_delete, sender=Tache)
+def sync_tache_changed(sender, instance, **kwargs):
+    record_changes(ENTITE_TACHE, [instance.pk], supprime=kwargs['signal'] is post_delete)
+
+
+@receiver(post_save, sender=DistributionCharge)
+@receiver(post_delete, sender=DistributionCharge)
+def sync_distribution_changed(sender, instance, **kwargs):
+    record_changes(ENTITE_DISTRIBUTION, [instance.pk], supprime=kwargs['signal'] is post_delete)
+    # La liste des tâches embarque charge totale et distributions
+    record_changes(ENTITE_TACHE, [instance.tache_id])
+
+
+@receiver(m2m_changed, sender=Tache.objets.through)
+@receiver(m2m_changed, sender=Tache.equipes.through)
+def sync_tache_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Ajout / retrait d'objets ou d'équipes : la tâche est re-synchronisée."""
+    if not reverse:
+        if action.startswith('post_'):
+            record_changes(ENTITE_TACHE, [instance.pk])
+    elif action == 'pre_clear':
+        # Côté Objet / Equipe : pk_set est vide pour un clear()
+        record_changes(ENTITE_TACHE, instance.taches.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        record_changes(ENTITE_TACHE, pk_set or [])
+
+
+def sync_objet_changed(sender, instance, **kwargs):
+    record_changes(ENTITE_OBJET, [instance.pk], supprime=kwargs['signal'] is post_delete)
+
+
+# Héritage multi-tables : save() n'émet post_save que pour la classe enfant,
+# delete() émet post_delete pour l'enfant et pour Objet (dédoublonné).
+for _model in [Objet, *OBJET_TYPE_MODELS.values()]:
+    post_save.connect(sync_objet_changed, sender=_model, dispatch_uid=f'sync_objet_save_{_model.__name__}')
+    post_delete.connect(sync_objet_changed, sender=_model, dispatch_uid=f'sync_objet_delete_{_model.__name__}')
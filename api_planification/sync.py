@@ -0,0 +1,179 @@
+"""
+Synchronisation différentielle (curseurs « modifié depuis »)
+
+Le journal SyncChange enregistre chaque création, modification ou
+suppression de Tache, DistributionCharge et Objet. Un client (application
+mobile des superviseurs, planning) conserve un curseur opaque et ne
+récupère que les lignes modifiées depuis, au lieu de recharger toute la
+liste des tâches.
+
+Écriture :
+- Signals (api_planification/signals.py) pour save() / delete() / M2M
+- record_changes() explicite après les .update() et bulk_create, qui
+  n'émettent pas de signal
+Les lignes sont insérées en une fois après le commit de la transaction.
+
+Lecture :
+- Seules les lignes plus anciennes que SYNC_CURSOR_LAG_SECONDS sont lues :
+  une transaction concurrente dont l'id est plus petit mais le commit plus
+  tardif ne peut pas être sautée par le curseur.
+- Un curseur plus ancien que SYNC_JOURNAL_RETENTION_DAYS est refusé
+  (journal purgé) : le client doit recharger les listes complètes.
+"""
+
+import base64
+import logging
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import SyncChange
+
+logger = logging.getLogger(__name__)
+
+ENTITE_TACHE = 'tache'
+ENTITE_DISTRIBUTION = 'distribution'
+ENTITE_OBJET = 'objet'
+
+CURSOR_VERSION = 'v1'
+
+_pending = threading.local()
+
+
+class CursorError(ValueError):
+    """Curseur illisible ou expiré."""
+
+    def __init__(self, message, expired=False):
+        super().__init__(message)
+        self.expired = expired
+
+
+# ==============================================================================
+# ÉCRITURE DU JOURNAL
+# ==============================================================================
+
+def record_changes(entite: str, ids: Iterable, supprime: bool = False) -> None:
+    """
+    Journalise des éléments modifiés (ou supprimés) après le commit.
+
+    Args:
+        entite: ENTITE_TACHE, ENTITE_DISTRIBUTION ou ENTITE_OBJET
+        ids: IDs des éléments (None ignorés)
+        supprime: True pour une suppression (tombstone)
+    """
+    ids = [pk for pk in ids if pk is not None]
+    if not ids:
+        return
+
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        pending = _pending.changes = {}
+    for pk in ids:
+        pending[(entite, pk)] = supprime
+
+    # Un callback par appel : après un rollback, les lignes restées en
+    # attente sont écrites au commit suivant (re-synchronisation sans effet).
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    pending = getattr(_pending, 'changes', None)
+    if not pending:
+        return
+    _pending.changes = {}
+
+    try:
+        SyncChange.objects.bulk_create([
+            SyncChange(entite=entite, element_id=pk, supprime=supprime)
+            for (entite, pk), supprime in pending.items()
+        ])
+    except Exception:
+        logger.exception(f"[SYNC] Echec de l'écriture de {len(pending)} modification(s) dans le journal")
+
+
+# ==============================================================================
+# CURSEURS
+# ==============================================================================
+
+def encode_cursor(change_id: int) -> str:
+    """Curseur opaque : dernier id lu + date d'émission (contrôle d'expiration)."""
+    raw = f"{CURSOR_VERSION}:{change_id}:{int(timezone.now().timestamp())}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Retourne le dernier id lu encodé dans le curseur.
+
+    Raises:
+        CursorError: curseur invalide, ou expiré (expired=True)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        version, change_id, issued = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        change_id, issued = int(change_id), int(issued)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorError("Curseur de synchronisation invalide")
+    if version != CURSOR_VERSION:
+        raise CursorError("Curseur de synchronisation invalide")
+
+    issued_at = datetime.fromtimestamp(issued, tz=dt_timezone.utc)
+    if issued_at < timezone.now() - timedelta(days=settings.SYNC_JOURNAL_RETENTION_DAYS):
+        raise CursorError("Curseur de synchronisation expiré", expired=True)
+    return change_id
+
+
+# ==============================================================================
+# LECTURE DU JOURNAL
+# ==============================================================================
+
+def _visible_changes():
+    """Lignes assez anciennes pour que toutes les transactions antérieures soient commitées."""
+    lag = timedelta(seconds=settings.SYNC_CURSOR_LAG_SECONDS)
+    return SyncChange.objects.filter(date__lte=timezone.now() - lag)
+
+
+def head_change_id() -> int:
+    """Id de la dernière ligne lisible (curseur initial)."""
+    return _visible_changes().aggregate(last=Max('id'))['last'] or 0
+
+
+def read_changes(after_id: int, limit: int) -> Tuple[Dict[str, Dict[int, bool]], int, bool]:
+    """
+    Lit le journal après un curseur.
+
+    Args:
+        after_id: Dernier id déjà lu par le client
+        limit: Nombre maximal de lignes du journal
+
+    Returns:
+        ({entite: {element_id: supprime}}, dernier id lu, has_more)
+        Pour un élément modifié plusieurs fois, seul le dernier état compte.
+    """
+    rows = list(
+        _visible_changes()
+        .filter(id__gt=after_id)
+        .order_by('id')
+        .values_list('id', 'entite', 'element_id', 'supprime')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = {ENTITE_TACHE: {}, ENTITE_DISTRIBUTION: {}, ENTITE_OBJET: {}}
+    for _, entite, element_id, supprime in rows:
+        changes.setdefault(entite, {})[element_id] = supprime
+
+    last_id = rows[-1][0] if rows else after_id
+    return changes, last_id, has_more
+
+
+def purge_journal(days: int = None) -> int:
+    """Supprime les lignes du journal plus anciennes que la rétention."""
+    days = settings.SYNC_JOURNAL_RETENTION_DAYS if days is None else days
+    deleted, _ = SyncChange.objects.filter(date__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -6,6 +6,7 @@ Les taches restent PLANIFIEE jusqu'a demarrage explicite par l'utilisateur.
 
 Taches restantes:
 - invalidate_taches_cache: Invalide le cache des taches (utilitaire)
+- purge_sync_journal: Purge du journal de synchronisation differentielle
 - export_planning_pdf_async: Export PDF du planning (nouvelle fonctionnalite)
 """
 
@@ -113,6 +114,27 @@ def mark_expired_tasks(self):
     }
 
 
+# ==============================================================================
+# JOURNAL DE SYNCHRONISATION
+# ==============================================================================
+
+@shared_task(bind=True, name='api_planification.tasks.purge_sync_journal')
+def purge_sync_journal(self, days=None):
+    """
+    Supprime les lignes du journal SyncChange plus anciennes que
+    SYNC_JOURNAL_RETENTION_DAYS (les curseurs correspondants sont expirés).
+    """
+    from .sync import purge_journal
+
+    deleted = purge_journal(days)
+    logger.info(f"purge_sync_journal: {deleted} ligne(s) supprimee(s)")
+    return {
+        'success': True,
+        'deleted': deleted,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
 # ==============================================================================
 # EXPORT PDF DU PLANNING
 # ==============================================================================
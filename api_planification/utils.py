@@ -1,12 +1,16 @@
 """
 Utilitaires pour la planification
 """
+import logging
 from datetime import timedelta, date, datetime
-from typing import Dict, List, Optional, Tuple
-from django.db import transaction
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import connection, models, transaction
 from django.core.exceptions import ValidationError
+from .constants import MAX_OCCURRENCES_RECURRENCE
 from .models import Tache, DistributionCharge
 
+logger = logging.getLogger(__name__)
+
 
 def calculer_duree_tache(tache: Tache) -> int:
     """
@@ -136,6 +140,217 @@ def calculer_nouvelle_date(date_originale: date, decalage_jours: int) -> date:
     return date_originale + timedelta(days=decalage_jours)
 
 
+# ==============================================================================
+# MOTEUR DE RÉCURRENCE (écriture ensembliste)
+# ==============================================================================
+
+# Taille des lots INSERT (lignes M2M : occurrences x objets)
+RECURRENCE_BATCH_SIZE = 5000
+
+
+def _reserver_ids(model, nombre: int) -> List[int]:
+    """Réserve `nombre` IDs dans la séquence de la table (une requête)."""
+    if nombre <= 0:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, nombre],
+        )
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def charger_tache_source(tache_id: int) -> Tache:
+    """Tâche source avec les relations copiées par creer_occurrences()."""
+    return Tache.objects.select_related(
+        'id_type_tache',
+        'id_structure_client',
+        'id_client__structure',
+        'id_equipe'
+    ).prefetch_related(
+        'distributions_charge'
+    ).get(id=tache_id)
+
+
+def creer_occurrences(
+    tache_source: Tache,
+    decalages: Iterable[int],
+    conserver_equipes: bool = True,
+    conserver_objets: bool = True,
+    nouveau_statut: Optional[str] = 'PLANIFIEE'
+) -> List[Tache]:
+    """
+    Crée les occurrences d'une tâche, une par décalage (en jours).
+
+    Toutes les occurrences sont préparées en mémoire puis écrites en un
+    nombre fixe de requêtes, quel que soit le nombre d'occurrences :
+    réservation des IDs (tâches, distributions), INSERT groupés des tâches
+    (références incluses), des lignes M2M équipes / objets et des
+    distributions.
+
+    bulk_create n'émet ni post_save ni m2m_changed : le journal de
+    synchronisation, les cumuls KPI et les rapports de site sont mis à jour
+    explicitement et une seule notification « tâche créée » est envoyée pour
+    la série (première occurrence).
+
+    Returns:
+        Liste des nouvelles tâches, rechargées avec leurs relations
+    """
+    decalages = sorted(decalages)
+    if not decalages:
+        return []
+    if len(decalages) > MAX_OCCURRENCES_RECURRENCE:
+        raise ValueError(f"Maximum {MAX_OCCURRENCES_RECURRENCE} occurrences autorisées")
+
+    distributions_source = list(tache_source.distributions_charge.all())
+    equipe_ids = list(tache_source.equipes.values_list('pk', flat=True)) if conserver_equipes else []
+    objet_ids = list(tache_source.objets.values_list('pk', flat=True)) if conserver_objets else []
+
+    with transaction.atomic():
+        # 1. Tâches (ID réservé → référence calculée avant l'INSERT)
+        nouvelles_taches = []
+        for pk, decalage in zip(_reserver_ids(Tache, len(decalages)), decalages):
+            decalage_jours = timedelta(days=decalage)
+            nouvelle_tache = Tache(
+                id=pk,
+
+                # Relations
+                id_structure_client=tache_source.id_structure_client,
+                id_client=tache_source.id_client,
+                id_type_tache=tache_source.id_type_tache,
+                id_equipe=tache_source.id_equipe if conserver_equipes else None,
+                reclamation=None,  # Ne pas dupliquer le lien réclamation
+
+                # Dates (décalées)
+                date_debut_planifiee=tache_source.date_debut_planifiee + decalage_jours,
+                date_fin_planifiee=tache_source.date_fin_planifiee + decalage_jours,
+                date_echeance=(
+                    tache_source.date_echeance + decalage_jours
+                    if tache_source.date_echeance else None
+                ),
+
+                # Données métier
+                priorite=tache_source.priorite,
+                commentaires=tache_source.commentaires,
+                charge_estimee_heures=tache_source.charge_estimee_heures,
+                charge_manuelle=tache_source.charge_manuelle,
+                description_travaux=tache_source.description_travaux,
+
+                # Statut réinitialisé
+                statut=nouveau_statut,
+                etat_validation='EN_ATTENTE',
+                note_qualite=None,
+
+                # Dates réelles vides (nouvelle tâche)
+                date_affectation=None,
+                date_debut_reelle=None,
+                date_fin_reelle=None,
+                duree_reelle_minutes=None,
+                date_validation=None,
+                validee_par=None,
+                commentaire_validation='',
+
+                # Notifications : la série est notifiée une seule fois (ci-dessous)
+                notifiee=bool(objet_ids),
+                confirmee=False,
+            )
+            # Comme Tache.save() : objets liés après la sauvegarde → site GEN
+            nouvelle_tache.reference = nouvelle_tache.generer_reference()
+            nouvelles_taches.append((nouvelle_tache, decalage_jours))
+
+        Tache.objects.bulk_create([t for t, _ in nouvelles_taches], batch_size=RECURRENCE_BATCH_SIZE)
+
+        # 2. Relations ManyToMany
+        EquipeLien = Tache.equipes.through
+        EquipeLien.objects.bulk_create([
+            EquipeLien(tache_id=tache.pk, equipe_id=equipe_id)
+            for tache, _ in nouvelles_taches for equipe_id in equipe_ids
+        ], batch_size=RECURRENCE_BATCH_SIZE)
+
+        ObjetLien = Tache.objets.through
+        ObjetLien.objects.bulk_create([
+            ObjetLien(tache_id=tache.pk, objet_id=objet_id)
+            for tache, _ in nouvelles_taches for objet_id in objet_ids
+        ], batch_size=RECURRENCE_BATCH_SIZE)
+
+        # 3. Distributions de charge (décalées, statut et heures réelles réinitialisés)
+        distribution_ids = iter(_reserver_ids(
+            DistributionCharge, len(nouvelles_taches) * len(distributions_source)
+        ))
+        nouvelles_distributions = []
+        for tache, decalage_jours in nouvelles_taches:
+            for dist_source in distributions_source:
+                pk = next(distribution_ids)
+                nouvelles_distributions.append(DistributionCharge(
+                    id=pk,
+                    tache=tache,
+                    date=dist_source.date + decalage_jours,
+                    heures_planifiees=dist_source.heures_planifiees,
+                    heures_reelles=None,
+                    commentaire=dist_source.commentaire,
+                    heure_debut=dist_source.heure_debut,
+                    heure_fin=dist_source.heure_fin,
+                    status='NON_REALISEE',
+                    reference=f"{tache.reference}-D{pk}",
+                ))
+        DistributionCharge.objects.bulk_create(nouvelles_distributions, batch_size=RECURRENCE_BATCH_SIZE)
+
+        # 4. Effets des signals non émis par bulk_create
+        from .sync import ENTITE_DISTRIBUTION, ENTITE_TACHE, record_changes
+        tache_ids = [tache.pk for tache, _ in nouvelles_taches]
+        record_changes(ENTITE_TACHE, tache_ids)
+        record_changes(ENTITE_DISTRIBUTION, [d.pk for d in nouvelles_distributions])
+
+        # KPIs (KPIMensuel) et rapports de site (RapportMensuel) des mois générés,
+        # pour les sites des objets (comme kpi_tache_changed / kpi_distribution_changed)
+        from api.models import Objet
+        from api.services.kpi_rollup import mark_kpis_dirty
+        from api.services.report_snapshots import mark_reports_stale
+
+        site_ids = set(
+            Objet.objects.filter(pk__in=objet_ids).values_list('site_id', flat=True).distinct()
+        ) if objet_ids else set()
+        distribution_dates = [d.date for d in nouvelles_distributions]
+        mark_kpis_dirty(distribution_dates, site_ids)
+        mark_reports_stale(
+            [tache.date_debut_planifiee for tache, _ in nouvelles_taches]
+            + [tache.date_fin_planifiee for tache, _ in nouvelles_taches]
+            + distribution_dates,
+            site_ids
+        )
+
+    taches = list(
+        Tache.objects.filter(pk__in=tache_ids)
+        .select_related(
+            'id_client__utilisateur', 'id_structure_client', 'id_type_tache',
+            'id_equipe', 'reclamation__site',
+        )
+        .prefetch_related(
+            'equipes', 'objets__site',
+            models.Prefetch('distributions_charge', queryset=DistributionCharge.objects.with_report_chain()),
+        )
+        .order_by('date_debut_planifiee')
+    )
+
+    if objet_ids and taches:
+        _notifier_serie(taches[0], len(taches))
+
+    return taches
+
+
+def _notifier_serie(premiere_tache: Tache, nombre: int) -> None:
+    """Une notification « tâche créée » pour toute la série d'occurrences."""
+    from api.services.notifications import NotificationService
+
+    try:
+        NotificationService.notify_tache_creee(premiere_tache)
+    except Exception as e:
+        logger.error(
+            f"[RECURRENCE] Erreur notification série ({nombre} occurrence(s)) "
+            f"tache #{premiere_tache.id}: {e}"
+        )
+
+
 def dupliquer_tache_avec_distributions(
     tache_id: int,
     decalage_jours: int,
@@ -159,7 +374,7 @@ def dupliquer_tache_avec_distributions(
     Args:
         tache_id: ID de la tâche source à dupliquer
         decalage_jours: Décalage en jours entre chaque occurrence
-        nombre_occurrences: Nombre max de tâches à créer (optionnel, max: 100)
+        nombre_occurrences: Nombre max de tâches à créer (optionnel, max: MAX_OCCURRENCES_RECURRENCE)
         date_fin_recurrence: Date limite pour créer des occurrences (optionnel)
         conserver_equipes: Conserver les équipes assignées (défaut: True)
         conserver_objets: Conserver les objets liés (défaut: True)
@@ -177,8 +392,8 @@ def dupliquer_tache_avec_distributions(
     Règles de génération:
         - Si nombre_occurrences ET date_fin_recurrence: utilise le plus restrictif
         - Si seulement nombre_occurrences: crée exactement N tâches
-        - Si seulement date_fin_recurrence: crée jusqu'à cette date (max 100)
-        - Si aucun des deux: crée jusqu'au 31/12 de l'année en cours (max 100)
+        - Si seulement date_fin_recurrence: crée jusqu'à cette date (max MAX_OCCURRENCES_RECURRENCE)
+        - Si aucun des deux: crée jusqu'au 31/12 de l'année en cours (max MAX_OCCURRENCES_RECURRENCE)
 
     Exemples:
         # Créer des tâches jusqu'au 31/12/2026
@@ -209,67 +424,28 @@ def dupliquer_tache_avec_distributions(
     if nombre_occurrences is not None and nombre_occurrences < 1:
         raise ValueError("Le nombre d'occurrences doit être au moins 1")
 
-    if nombre_occurrences is not None and nombre_occurrences > 100:
-        raise ValueError("Maximum 100 occurrences autorisées")
+    if nombre_occurrences is not None and nombre_occurrences > MAX_OCCURRENCES_RECURRENCE:
+        raise ValueError(f"Maximum {MAX_OCCURRENCES_RECURRENCE} occurrences autorisées")
 
     # Récupérer la tâche source avec les relations
     try:
-        tache_source = Tache.objects.select_related(
-            'id_type_tache',
-            'id_structure_client',
-            'id_client',
-            'id_equipe'
-        ).prefetch_related(
-            'equipes',
-            'objets',
-            'distributions_charge'
-        ).get(id=tache_id)
-
-        print(f"[RECURRENCE] Tâche source #{tache_id} chargée")
-        print(f"[RECURRENCE] Date début: {tache_source.date_debut_planifiee}")
-        print(f"[RECURRENCE] Date fin: {tache_source.date_fin_planifiee}")
-        print(f"[RECURRENCE] Nombre de distributions: {tache_source.distributions_charge.count()}")
-
+        tache_source = charger_tache_source(tache_id)
     except Tache.DoesNotExist:
         raise Tache.DoesNotExist(f"Tâche {tache_id} introuvable")
 
     # ✅ VALIDATION : Vérifier la compatibilité de la fréquence (sauf si skip_validation=True)
-    duree_tache = calculer_duree_tache(tache_source)
-    print(f"[RECURRENCE] Durée tâche: {duree_tache} jours, Décalage: {decalage_jours} jours")
-
     if not skip_validation:
         valider_frequence_compatible(tache_source, decalage_jours, raise_exception=True)
-        print(f"[RECURRENCE] Validation de compatibilité OK")
-    else:
-        print(f"[RECURRENCE] Validation de compatibilité SKIP (déjà validée en amont)")
 
     # Déterminer le nombre d'occurrences à créer
     if date_fin_recurrence is None and nombre_occurrences is None:
         # Par défaut : jusqu'au 31/12 de l'année en cours
-        from datetime import datetime
-        annee_courante = datetime.now().year
-        date_fin_recurrence = date(annee_courante, 12, 31)
+        date_fin_recurrence = date(datetime.now().year, 12, 31)
 
-    # Calculer le nombre d'occurrences basé sur la date de fin
     if date_fin_recurrence is not None:
-        # Calculer combien d'occurrences peuvent tenir jusqu'à la date de fin
-        date_debut_source = tache_source.date_debut_planifiee
-        occurrences_calculees = 0
-        occurrence = 1
-
-        while True:
-            decalage_total = decalage_jours * occurrence
-            nouvelle_date_debut = calculer_nouvelle_date(date_debut_source, decalage_total)
-
-            if nouvelle_date_debut > date_fin_recurrence:
-                break
-
-            occurrences_calculees += 1
-            occurrence += 1
-
-            # Sécurité : limiter à 100 occurrences
-            if occurrences_calculees >= 100:
-                break
+        # Occurrences dont la date de début tient avant la date de fin
+        jours_disponibles = (date_fin_recurrence - tache_source.date_debut_planifiee).days
+        occurrences_calculees = min(max(jours_disponibles // decalage_jours, 0), MAX_OCCURRENCES_RECURRENCE)
 
         # Si nombre_occurrences est aussi fourni, prendre le minimum
         if nombre_occurrences is not None:
@@ -290,110 +466,13 @@ def dupliquer_tache_avec_distributions(
         else:
             raise ValueError("Aucune occurrence à créer")
 
-    print(f"[RECURRENCE] Nombre d'occurrences à créer: {nombre_occurrences_final}")
-
-    nouvelles_taches = []
-
-    # Transaction atomique pour garantir la cohérence
-    with transaction.atomic():
-        print(f"[RECURRENCE] Début de la transaction atomique")
-        for occurrence in range(1, nombre_occurrences_final + 1):
-            print(f"[RECURRENCE] === Création occurrence #{occurrence} ===")
-            # Calculer le décalage total pour cette occurrence
-            decalage_total = decalage_jours * occurrence
-            print(f"[RECURRENCE] Décalage total: {decalage_total} jours")
-
-            # Créer la nouvelle tâche (copie)
-            nouvelle_tache = Tache(
-                # Relations
-                id_structure_client=tache_source.id_structure_client,
-                id_client=tache_source.id_client,
-                id_type_tache=tache_source.id_type_tache,
-                id_equipe=tache_source.id_equipe if conserver_equipes else None,
-                reclamation=None,  # Ne pas dupliquer le lien réclamation
-
-                # Dates (décalées)
-                date_debut_planifiee=calculer_nouvelle_date(
-                    tache_source.date_debut_planifiee,
-                    decalage_total
-                ),
-                date_fin_planifiee=calculer_nouvelle_date(
-                    tache_source.date_fin_planifiee,
-                    decalage_total
-                ),
-                date_echeance=calculer_nouvelle_date(
-                    tache_source.date_echeance,
-                    decalage_total
-                ) if tache_source.date_echeance else None,
-
-                # Données métier
-                priorite=tache_source.priorite,
-                commentaires=tache_source.commentaires,
-                charge_estimee_heures=tache_source.charge_estimee_heures,
-                charge_manuelle=tache_source.charge_manuelle,
-                description_travaux=tache_source.description_travaux,
-
-                # Statut réinitialisé
-                statut=nouveau_statut,
-                etat_validation='EN_ATTENTE',
-                note_qualite=None,
-
-                # Dates réelles vides (nouvelle tâche)
-                date_affectation=None,
-                date_debut_reelle=None,
-                date_fin_reelle=None,
-                duree_reelle_minutes=None,
-                date_validation=None,
-                validee_par=None,
-                commentaire_validation='',
-
-                # Notifications
-                notifiee=False,
-                confirmee=False,
-
-                # Référence sera générée automatiquement par save()
-                reference=None
-            )
-
-            # Sauvegarder pour obtenir un ID
-            nouvelle_tache.save()
-            print(f"[RECURRENCE] Nouvelle tâche #{nouvelle_tache.id} créée (occurrence #{occurrence})")
-            print(f"[RECURRENCE] Dates: {nouvelle_tache.date_debut_planifiee} -> {nouvelle_tache.date_fin_planifiee}")
-
-            # Copier les relations ManyToMany
-            if conserver_equipes:
-                nouvelle_tache.equipes.set(tache_source.equipes.all())
-                print(f"[RECURRENCE] {tache_source.equipes.count()} équipe(s) copiée(s)")
-
-            if conserver_objets:
-                nouvelle_tache.objets.set(tache_source.objets.all())
-                print(f"[RECURRENCE] {tache_source.objets.count()} objet(s) copié(s)")
-
-            # Dupliquer les distributions de charge
-            distributions_source = tache_source.distributions_charge.all()
-            print(f"[RECURRENCE] Duplication de {distributions_source.count()} distribution(s)")
-
-            for idx, dist_source in enumerate(distributions_source, 1):
-                nouvelle_distribution = DistributionCharge(
-                    tache=nouvelle_tache,
-                    date=calculer_nouvelle_date(dist_source.date, decalage_total),
-                    heures_planifiees=dist_source.heures_planifiees,
-                    heures_reelles=None,  # Réinitialiser les heures réelles
-                    commentaire=dist_source.commentaire,
-                    heure_debut=dist_source.heure_debut,
-                    heure_fin=dist_source.heure_fin,
-                    status='NON_REALISEE',  # Réinitialiser le statut
-                    reference=None  # Sera généré automatiquement
-                )
-                nouvelle_distribution.save()
-                print(f"[RECURRENCE]   Distribution #{idx} créée: date={nouvelle_distribution.date}, "
-                      f"heures={dist_source.heure_debut}-{dist_source.heure_fin}")
-
-            nouvelles_taches.append(nouvelle_tache)
-
-        print(f"[RECURRENCE] Transaction terminée. {len(nouvelles_taches)} tâche(s) créée(s)")
-
-    return nouvelles_taches
+    return creer_occurrences(
+        tache_source,
+        [decalage_jours * occurrence for occurrence in range(1, nombre_occurrences_final + 1)],
+        conserver_equipes=conserver_equipes,
+        conserver_objets=conserver_objets,
+        nouveau_statut=nouveau_statut,
+    )
 
 
 def dupliquer_tache_recurrence_multiple(
@@ -524,39 +603,35 @@ def dupliquer_tache_dates_specifiques(
     if not dates_cibles:
         raise ValueError("Au moins une date cible est requise")
 
-    if len(dates_cibles) > 100:
-        raise ValueError("Maximum 100 dates cibles autorisées")
+    if len(dates_cibles) > MAX_OCCURRENCES_RECURRENCE:
+        raise ValueError(f"Maximum {MAX_OCCURRENCES_RECURRENCE} dates cibles autorisées")
 
     # Récupérer la tâche source pour connaître sa date de début
     try:
-        tache_source = Tache.objects.get(id=tache_id)
+        tache_source = charger_tache_source(tache_id)
     except Tache.DoesNotExist:
         raise Tache.DoesNotExist(f"Tâche {tache_id} introuvable")
 
     date_debut_source = tache_source.date_debut_planifiee
-    nouvelles_taches = []
+    decalages = []
+    for date_cible in sorted(dates_cibles):
+        # Calculer le décalage en jours
+        decalage = (date_cible - date_debut_source).days
 
-    with transaction.atomic():
-        for date_cible in sorted(dates_cibles):
-            # Calculer le décalage en jours
-            decalage = (date_cible - date_debut_source).days
-
-            if decalage < 1:
-                raise ValueError(
-                    f"Date cible {date_cible} doit être postérieure à {date_debut_source}"
-                )
-
-            # Créer une seule occurrence avec ce décalage
-            taches_creees = dupliquer_tache_avec_distributions(
-                tache_id=tache_id,
-                decalage_jours=decalage,
-                nombre_occurrences=1,
-                **kwargs
+        if decalage < 1:
+            raise ValueError(
+                f"Date cible {date_cible} doit être postérieure à {date_debut_source}"
             )
-
-            nouvelles_taches.extend(taches_creees)
-
-    return nouvelles_taches
+        valider_frequence_compatible(tache_source, decalage, raise_exception=True)
+        decalages.append(decalage)
+
+    return creer_occurrences(
+        tache_source,
+        decalages,
+        conserver_equipes=kwargs.get('conserver_equipes', True),
+        conserver_objets=kwargs.get('conserver_objets', True),
+        nouveau_statut=kwargs.get('nouveau_statut', 'PLANIFIEE'),
+    )
 
 
 # ==============================================================================
@@ -656,7 +731,7 @@ def generer_dates_jours_mois(
         date_limite = date(date_debut.year, 12, 31)
 
     # Déterminer le nombre max d'occurrences
-    max_occurrences = nombre_occurrences if nombre_occurrences else 100
+    max_occurrences = min(nombre_occurrences or MAX_OCCURRENCES_RECURRENCE, MAX_OCCURRENCES_RECURRENCE)
 
     # Commencer à partir du lendemain de la date de début
     # (la tâche source existe déjà)
@@ -719,7 +794,7 @@ def dupliquer_tache_recurrence_jours_mois(
     """
     # Récupérer la tâche source
     try:
-        tache_source = Tache.objects.get(id=tache_id)
+        tache_source = charger_tache_source(tache_id)
     except Tache.DoesNotExist:
         raise ValidationError(f"Tâche #{tache_id} introuvable")
 
@@ -762,30 +837,15 @@ def dupliquer_tache_recurrence_jours_mois(
             "Vérifiez la date de fin de récurrence."
         )
 
-    # Créer les tâches avec transaction atomique
-    nouvelles_taches = []
-
-    with transaction.atomic():
-        for date_occurrence in dates_occurrences:
-            # Calculer le décalage (en jours) par rapport à la tâche source
-            decalage = (date_occurrence - tache_source.date_debut_planifiee).days
-
-            # Dupliquer la tâche avec ce décalage (réutilise la fonction existante)
-            # ✅ skip_validation=True car l'intervalle minimum a déjà été validé en amont
-            taches_creees = dupliquer_tache_avec_distributions(
-                tache_id=tache_id,
-                decalage_jours=decalage,
-                nombre_occurrences=1,
-                date_fin_recurrence=None,
-                conserver_equipes=conserver_equipes,
-                conserver_objets=conserver_objets,
-                nouveau_statut=nouveau_statut,
-                skip_validation=True  # ✅ Skip validation car déjà faite
-            )
-
-            nouvelles_taches.extend(taches_creees)
-
-    return nouvelles_taches
+    # Toutes les occurrences en une écriture ensembliste
+    # (l'intervalle minimum a déjà été validé ci-dessus)
+    return creer_occurrences(
+        tache_source,
+        [(date_occurrence - tache_source.date_debut_planifiee).days for date_occurrence in dates_occurrences],
+        conserver_equipes=conserver_equipes,
+        conserver_objets=conserver_objets,
+        nouveau_statut=nouveau_statut,
+    )
 
 
 # ==============================================================================
@@ -880,7 +940,7 @@ def generer_dates_jours_semaine(
         date_limite = date(date_debut.year, 12, 31)
 
     # Déterminer le nombre max d'occurrences
-    max_occurrences = nombre_occurrences if nombre_occurrences else 100
+    max_occurrences = min(nombre_occurrences or MAX_OCCURRENCES_RECURRENCE, MAX_OCCURRENCES_RECURRENCE)
 
     # Commencer à partir du lendemain de la date de début
     # (la tâche source existe déjà)
@@ -943,7 +1003,7 @@ def dupliquer_tache_recurrence_jours_semaine(
     """
     # Récupérer la tâche source
     try:
-        tache_source = Tache.objects.get(id=tache_id)
+        tache_source = charger_tache_source(tache_id)
     except Tache.DoesNotExist:
         raise ValidationError(f"Tâche #{tache_id} introuvable")
 
@@ -987,256 +1047,12 @@ def dupliquer_tache_recurrence_jours_semaine(
             "Vérifiez la date de fin de récurrence."
         )
 
-    # Créer les tâches avec transaction atomique
-    nouvelles_taches = []
-
-    with transaction.atomic():
-        for date_occurrence in dates_occurrences:
-            # Calculer le décalage (en jours) par rapport à la tâche source
-            decalage = (date_occurrence - tache_source.date_debut_planifiee).days
-
-            # Dupliquer la tâche avec ce décalage (réutilise la fonction existante)
-            # ✅ skip_validation=True car l'intervalle minimum a déjà été validé en amont
-            taches_creees = dupliquer_tache_avec_distributions(
-                tache_id=tache_id,
-                decalage_jours=decalage,
-                nombre_occurrences=1,
-                date_fin_recurrence=None,
-                conserver_equipes=conserver_equipes,
-                conserver_objets=conserver_objets,
-                nouveau_statut=nouveau_statut,
-                skip_validation=True  # ✅ NOUVEAU: Skip validation car déjà faite
-            )
-
-            nouvelles_taches.extend(taches_creees)
-
-    return nouvelles_taches
-
-
-# ==============================================================================
-# FONCTIONS POUR LA SÉLECTION DE JOURS DU MOIS (MONTHLY)
-# ==============================================================================
-
-def calculer_intervalle_minimum_jours_mois(jours_mois: List[int]) -> int:
-    """
-    Calcule l'intervalle minimum (en jours) entre deux jours consécutifs du mois sélectionnés.
-
-    Args:
-        jours_mois: Liste triée des jours du mois (1-31)
-
-    Returns:
-        int: Nombre de jours minimum entre deux occurrences
-
-    Exemples:
-        >>> calculer_intervalle_minimum_jours_mois([1, 15])
-        14  # 1er et 15 du mois : intervalle minimum = 14 jours
-
-        >>> calculer_intervalle_minimum_jours_mois([5, 10, 20])
-        5  # 5-10-20 : intervalle minimum = 5 jours
-
-        >>> calculer_intervalle_minimum_jours_mois([28, 1])
-        3  # 28 → 1er du mois suivant (approximation 28 jours) = 3 jours
-
-        >>> calculer_intervalle_minimum_jours_mois([15])
-        28  # Un seul jour = intervalle minimum de 28 jours (mois le plus court)
-    """
-    if not jours_mois or len(jours_mois) == 0:
-        return 30  # Par défaut, mensuel
-
-    if len(jours_mois) == 1:
-        return 28  # Un seul jour = répétition mensuelle (28 jours minimum)
-
-    jours_tries = sorted(jours_mois)
-    intervalles = []
-
-    # Calculer les intervalles entre jours consécutifs du même mois
-    for i in range(len(jours_tries) - 1):
-        intervalle = jours_tries[i + 1] - jours_tries[i]
-        intervalles.append(intervalle)
-
-    # Calculer l'intervalle de retour (dernier jour du mois → premier jour du mois suivant)
-    # Approximation : mois le plus court = 28 jours (février non bissextile)
-    intervalle_retour = 28 - jours_tries[-1] + jours_tries[0]
-    intervalles.append(intervalle_retour)
-
-    return min(intervalles)
-
-
-def generer_dates_jours_mois(
-    date_debut: date,
-    jours_mois: List[int],
-    nombre_occurrences: Optional[int] = None,
-    date_fin_recurrence: Optional[date] = None
-) -> List[date]:
-    """
-    Génère une liste de dates selon les jours du mois sélectionnés.
-
-    Args:
-        date_debut: Date de début (première occurrence)
-        jours_mois: Liste des jours du mois (1-31)
-        nombre_occurrences: Nombre max d'occurrences (optionnel)
-        date_fin_recurrence: Date limite (optionnel)
-
-    Returns:
-        List[date]: Liste des dates d'occurrences
-
-    Exemples:
-        >>> date_debut = date(2026, 1, 15)  # 15 janvier
-        >>> jours_mois = [1, 15]  # 1er et 15 de chaque mois
-        >>> generer_dates_jours_mois(date_debut, jours_mois, nombre_occurrences=5)
-        [
-            date(2026, 2, 1),   # 1er février
-            date(2026, 2, 15),  # 15 février
-            date(2026, 3, 1),   # 1er mars
-            date(2026, 3, 15),  # 15 mars
-            date(2026, 4, 1)    # 1er avril
-        ]
-
-    Note:
-        - Si un jour n'existe pas dans un mois (ex: 31 février), il est ignoré
-        - Les dates sont générées chronologiquement
-    """
-    if not jours_mois:
-        raise ValueError("jours_mois ne peut pas être vide")
-
-    jours_tries = sorted(jours_mois)
-    dates = []
-
-    # Déterminer la date limite
-    if date_fin_recurrence:
-        date_limite = date_fin_recurrence
-    else:
-        # Par défaut: jusqu'au 31/12 de l'année en cours
-        date_limite = date(date_debut.year, 12, 31)
-
-    # Déterminer le nombre max d'occurrences
-    max_occurrences = nombre_occurrences if nombre_occurrences else 100
-
-    # Commencer à partir du lendemain de la date de début
-    # (la tâche source existe déjà)
-    date_courante = date_debut + timedelta(days=1)
-
-    while len(dates) < max_occurrences:
-        # Vérifier si on dépasse la date limite
-        if date_courante > date_limite:
-            break
-
-        # Jour du mois (1-31)
-        jour_mois = date_courante.day
-
-        # Si ce jour est dans la sélection, ajouter à la liste
-        if jour_mois in jours_tries:
-            dates.append(date_courante)
-
-        # Passer au jour suivant
-        date_courante += timedelta(days=1)
-
-    return dates
-
-
-def dupliquer_tache_recurrence_jours_mois(
-    tache_id: int,
-    jours_mois: List[int],
-    nombre_occurrences: Optional[int] = None,
-    date_fin_recurrence: Optional[date] = None,
-    conserver_equipes: bool = True,
-    conserver_objets: bool = True,
-    nouveau_statut: str = 'PLANIFIEE'
-) -> List[Tache]:
-    """
-    Duplique une tâche selon les jours du mois sélectionnés.
-
-    Args:
-        tache_id: ID de la tâche source
-        jours_mois: Liste des jours du mois (1-31)
-        nombre_occurrences: Nombre max d'occurrences (optionnel)
-        date_fin_recurrence: Date limite (optionnel)
-        conserver_equipes: Conserver les équipes assignées
-        conserver_objets: Conserver les objets liés
-        nouveau_statut: Statut des nouvelles tâches
-
-    Returns:
-        List[Tache]: Liste des nouvelles tâches créées
-
-    Raises:
-        ValidationError: Si intervalle < durée tâche (chevauchement)
-
-    Exemples:
-        >>> # Tâche source : 15/01/2026 (1 jour)
-        >>> # Créer des occurrences 1er et 15 de chaque mois
-        >>> dupliquer_tache_recurrence_jours_mois(
-        ...     tache_id=123,
-        ...     jours_mois=[1, 15],
-        ...     nombre_occurrences=10
-        ... )
-        # Résultat : 10 tâches aux dates : 1er fév, 15 fév, 1er mars, ...
-    """
-    # Récupérer la tâche source
-    try:
-        tache_source = Tache.objects.get(id=tache_id)
-    except Tache.DoesNotExist:
-        raise ValidationError(f"Tâche #{tache_id} introuvable")
-
-    # Calculer la durée de la tâche
-    duree_tache = calculer_duree_tache(tache_source)
-
-    # Calculer l'intervalle minimum entre les jours sélectionnés
-    intervalle_min = calculer_intervalle_minimum_jours_mois(jours_mois)
-
-    # ⚠️ VALIDATION CRITIQUE: intervalle >= durée tâche
-    if intervalle_min < duree_tache:
-        jours_selectionnes_str = ', '.join([str(j) for j in sorted(jours_mois)])
-
-        raise ValidationError(
-            f"Impossible de créer une récurrence avec les jours du mois sélectionnés.\n\n"
-            f"La tâche dure {duree_tache} jour(s) "
-            f"(du {tache_source.date_debut_planifiee.strftime('%d/%m/%Y')} "
-            f"au {tache_source.date_fin_planifiee.strftime('%d/%m/%Y')}).\n\n"
-            f"Jours du mois sélectionnés : {jours_selectionnes_str}\n"
-            f"Intervalle minimum : {intervalle_min} jour(s)\n\n"
-            f"❌ L'intervalle minimum ({intervalle_min} jour(s)) est inférieur à la durée "
-            f"de la tâche ({duree_tache} jour(s)), ce qui provoquerait un chevauchement.\n\n"
-            f"💡 Suggestions :\n"
-            f"  • Sélectionnez des jours plus espacés (minimum {duree_tache} jours d'intervalle)\n"
-            f"  • Réduisez la durée de la tâche\n"
-            f"  • Utilisez un décalage personnalisé au lieu de jours spécifiques"
-        )
-
-    # Générer les dates selon les jours du mois sélectionnés
-    dates_occurrences = generer_dates_jours_mois(
-        date_debut=tache_source.date_debut_planifiee,
-        jours_mois=jours_mois,
-        nombre_occurrences=nombre_occurrences,
-        date_fin_recurrence=date_fin_recurrence
+    # Toutes les occurrences en une écriture ensembliste
+    # (l'intervalle minimum a déjà été validé ci-dessus)
+    return creer_occurrences(
+        tache_source,
+        [(date_occurrence - tache_source.date_debut_planifiee).days for date_occurrence in dates_occurrences],
+        conserver_equipes=conserver_equipes,
+        conserver_objets=conserver_objets,
+        nouveau_statut=nouveau_statut,
     )
-
-    if len(dates_occurrences) == 0:
-        raise ValidationError(
-            "Aucune occurrence ne peut être créée avec les paramètres fournis. "
-            "Vérifiez la date de fin de récurrence."
-        )
-
-    # Créer les tâches avec transaction atomique
-    nouvelles_taches = []
-
-    with transaction.atomic():
-        for date_occurrence in dates_occurrences:
-            # Calculer le décalage (en jours) par rapport à la tâche source
-            decalage = (date_occurrence - tache_source.date_debut_planifiee).days
-
-            # Dupliquer la tâche avec ce décalage (réutilise la fonction existante)
-            # ✅ skip_validation=True car l'intervalle minimum a déjà été validé en amont
-            taches_creees = dupliquer_tache_avec_distributions(
-                tache_id=tache_id,
-                decalage_jours=decalage,
-                nombre_occurrences=1,
-                date_fin_recurrence=None,
-                conserver_equipes=conserver_equipes,
-                conserver_objets=conserver_objets,
-                nouveau_statut=nouveau_statut,
-                skip_validation=True  # ✅ Skip validation car déjà faite
-            )
-
-            nouvelles_taches.extend(taches_creees)
-
-    return nouvelles_taches
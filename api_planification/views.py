@@ -57,6 +57,7 @@ from .business_rules import (
     synchroniser_tache_apres_suppression_distribution,
 )
 from .constants import MOTIFS_VALIDES, ERROR_MESSAGES
+from .sync import ENTITE_DISTRIBUTION, record_changes
 
 
 # ==============================================================================
@@ -233,6 +234,7 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
         'partial_update': [permissions.IsAuthenticated, IsAdminOrSuperviseur],
         'destroy': [permissions.IsAuthenticated, IsAdminOrSuperviseur],
         'update_distributions': [permissions.IsAuthenticated, IsAdminOrSuperviseur],
+        'planifier_distributions': [permissions.IsAuthenticated, IsAdminOrSuperviseur],
         'valider': [permissions.IsAuthenticated, IsAdmin],
         'default': [permissions.IsAuthenticated],
     }
@@ -248,7 +250,7 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
 
         Note: La suppression est réelle (pas de soft delete).
         """
-        from django.db.models import Q, Prefetch, Sum, Count
+        from django.db.models import Q
         from api_users.models import Equipe
 
         # Appeler le mixin pour filtrage par rôle + soft-delete
@@ -270,15 +272,13 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
         qs = qs.prefetch_related(
             'equipes',  # Juste les IDs et noms (pas de relations supplémentaires)
             'objets__site',  # Site ID + nom seulement (via ObjetMinimalSerializer)
-            'distributions_charge'  # ✅ Evite N+1 pour les distributions
+            # ✅ Evite N+1 pour les distributions (chaînes de reports résolues en SQL)
+            models.Prefetch('distributions_charge', queryset=DistributionCharge.objects.with_report_chain())
         )
 
-        # ⚡ ANNOTATIONS: Calculer les agrégations en une seule requête (pas N+1)
+        # ⚡ ANNOTATIONS: Charge, jours et temps de travail calculés en SQL (pas N+1)
         # Note: Préfixe "_annot" pour éviter conflit avec les propriétés du modèle
-        qs = qs.annotate(
-            _annot_charge_totale=Sum('distributions_charge__heures_planifiees'),
-            _annot_nombre_jours=Count('distributions_charge', filter=Q(distributions_charge__heures_planifiees__gt=0))
-        )
+        qs = qs.with_work_metrics()
 
         # Filtres optionnels via query params
         client_id = self.request.query_params.get('client_id')
@@ -399,6 +399,142 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
+    # ==========================================================================
+    # SYNCHRONISATION DIFFÉRENTIELLE
+    # ==========================================================================
+
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync(self, request):
+        """
+        Renvoie uniquement les tâches, distributions et objets modifiés depuis
+        un curseur (journal SyncChange, voir api_planification/sync.py).
+
+        GET /api/planification/taches/sync/
+            → curseur initial : le demander AVANT de charger les listes
+        GET /api/planification/taches/sync/?cursor=<curseur>&limit=<n>
+            → éléments créés / modifiés depuis le curseur + nouveau curseur
+
+        Les éléments supprimés, ou sortis du périmètre de l'utilisateur (ou
+        des filtres de la liste : start_date, equipe_id...), sont renvoyés
+        dans `deleted`. Rappeler tant que `has_more` est vrai. Un curseur
+        expiré (journal purgé) renvoie 410 : recharger les listes complètes.
+        """
+        from django.conf import settings
+        from .sync import (
+            ENTITE_OBJET, ENTITE_TACHE,
+            CursorError, decode_cursor, encode_cursor, head_change_id, read_changes,
+        )
+
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            return Response({
+                'cursor': encode_cursor(head_change_id()),
+                'has_more': False,
+                'full_resync': True,
+            })
+
+        try:
+            after_id = decode_cursor(cursor)
+        except CursorError as e:
+            return Response({
+                'error': 'cursor_expired' if e.expired else 'invalid_cursor',
+                'message': str(e),
+                'full_resync': True,
+            }, status=status.HTTP_410_GONE if e.expired else status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = settings.SYNC_PAGE_SIZE
+        limit = max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+        changes, last_id, has_more = read_changes(after_id, limit)
+
+        def split(entite):
+            upserted = [pk for pk, supprime in changes[entite].items() if not supprime]
+            deleted = [pk for pk, supprime in changes[entite].items() if supprime]
+            return upserted, deleted
+
+        # Tâches : même queryset (rôle + filtres) et serializer que la liste
+        tache_ids, deleted_taches = split(ENTITE_TACHE)
+        taches = list(self.get_queryset().filter(pk__in=tache_ids)) if tache_ids else []
+        deleted_taches += sorted(set(tache_ids) - {tache.pk for tache in taches})
+
+        distribution_ids, deleted_distributions = split(ENTITE_DISTRIBUTION)
+        distributions = []
+        if distribution_ids:
+            distributions = list(
+                self.filter_by_role(DistributionCharge.objects.filter(pk__in=distribution_ids))
+                .with_report_chain()
+                .select_related('tache', 'tache__id_type_tache')
+                .prefetch_related('tache__equipes', 'tache__objets__site')
+            )
+        deleted_distributions += sorted(set(distribution_ids) - {d.pk for d in distributions})
+
+        objet_ids, deleted_objets = split(ENTITE_OBJET)
+        objets, found_objet_ids = self._sync_objets(request, objet_ids)
+        deleted_objets += sorted(set(objet_ids) - found_objet_ids)
+
+        context = self.get_serializer_context()
+        return Response({
+            'cursor': encode_cursor(last_id),
+            'has_more': has_more,
+            'taches': TacheListSerializer(taches, many=True, context=context).data,
+            'distributions': DistributionChargeEnrichedSerializer(distributions, many=True, context=context).data,
+            'objets': objets,
+            'deleted': {
+                'taches': deleted_taches,
+                'distributions': deleted_distributions,
+                'objets': deleted_objets,
+            },
+        })
+
+    def _sync_objets(self, request, objet_ids):
+        """
+        Objets visibles parmi objet_ids, sérialisés comme l'inventaire.
+
+        Returns:
+            (features, IDs trouvés)
+        """
+        from django.db.models.expressions import RawSQL
+        from api.models import Objet
+        from api.views_inventory import INVENTORY_MODEL_MAP, POLYGON_INVENTORY_TYPES
+        from api_users.access_scope import get_access_scope
+
+        if not objet_ids:
+            return [], set()
+
+        scope = get_access_scope(request.user)
+        visible = scope.filter_sites(Objet.objects.filter(pk__in=objet_ids), 'site_id')
+
+        # Une requête par type réellement présent (Objet.type_objet)
+        ids_by_type = visible.ids_by_type()
+        untyped_ids = ids_by_type.pop('', None)
+        if untyped_ids:
+            for enfant in Objet.objects.filter(pk__in=untyped_ids).resolve_children().values():
+                ids_by_type.setdefault(enfant.__class__.__name__, []).append(enfant.pk)
+
+        types_by_model = {
+            model_class.__name__: (type_name, model_class, serializer_class)
+            for type_name, (model_class, serializer_class) in INVENTORY_MODEL_MAP.items()
+        }
+
+        features, found = [], set()
+        for model_name, ids in ids_by_type.items():
+            if model_name not in types_by_model:
+                continue
+            type_name, model_class, serializer_class = types_by_model[model_name]
+            qs = model_class.objects.select_related('site', 'sous_site').filter(pk__in=ids)
+            if type_name in POLYGON_INVENTORY_TYPES:
+                qs = qs.annotate(_superficie_annotee=RawSQL("ST_Area(geometry::geography)", []))
+            for obj in qs:
+                data = serializer_class(obj).data
+                if 'properties' in data:
+                    data['properties']['object_type'] = type_name.capitalize()
+                features.append(data)
+                found.add(obj.pk)
+        return features, found
+
     # perform_destroy() utilise la suppression standard (CASCADE sur distributions)
 
     @action(detail=True, methods=['post'])
@@ -456,6 +592,50 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
             'total_updated': 0
         })
 
+    @action(detail=False, methods=['post'], url_path='planifier-distributions')
+    def planifier_distributions(self, request):
+        """
+        Répartit la charge estimée d'un lot de tâches en distributions
+        journalières selon la capacité des équipes (horaires, jours fériés,
+        absences, distributions déjà planifiées).
+        POST /api/planification/taches/planifier-distributions/
+
+        Body:
+        {
+            "tache_ids": [1, 2, 3],
+            "dry_run": true
+        }
+
+        Seules les tâches visibles par l'utilisateur sont planifiées. Les
+        tâches ayant déjà des distributions sont ignorées.
+        """
+        from .planner import MAX_TACHES_PLANIFICATION, planifier_distributions
+
+        tache_ids = request.data.get('tache_ids')
+        if not isinstance(tache_ids, list) or not tache_ids:
+            return Response(
+                {'error': 'tache_ids doit être une liste non vide'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            tache_ids = [int(pk) for pk in tache_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'tache_ids doit contenir des entiers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(tache_ids) > MAX_TACHES_PLANIFICATION:
+            return Response(
+                {'error': f'Maximum {MAX_TACHES_PLANIFICATION} tâches par planification'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = str(request.data.get('dry_run', False)).lower() in ('true', '1')
+        visibles = list(self.get_queryset().filter(pk__in=tache_ids).values_list('pk', flat=True))
+
+        resultat = planifier_distributions(visibles, dry_run=dry_run)
+        return Response(
+            resultat.as_dict(),
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
+
     @action(detail=True, methods=['post'])
     def update_distributions(self, request, pk=None):
         """
@@ -942,7 +1122,9 @@ class TacheViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.Mo
         # Si le statut passe à TERMINEE, marquer toutes les distributions non réalisées comme réalisées
         if tache.statut == 'TERMINEE' and ancien_statut != 'TERMINEE':
             distributions_non_realisees = tache.distributions_charge.filter(status='NON_REALISEE')
+            ids = list(distributions_non_realisees.values_list('pk', flat=True))
             nombre_mis_a_jour = distributions_non_realisees.update(status='REALISEE')
+            record_changes(ENTITE_DISTRIBUTION, ids)
 
             if nombre_mis_a_jour > 0:
                 print(f"✅ {nombre_mis_a_jour} distribution(s) marquée(s) comme réalisée(s) automatiquement")
@@ -1052,7 +1234,7 @@ class DistributionChargeViewSet(RoleBasedQuerySetMixin, viewsets.ModelViewSet):
     from .filters import DistributionChargeFilter
     from django_filters.rest_framework import DjangoFilterBackend
 
-    queryset = DistributionCharge.objects.select_related('tache').all()
+    queryset = DistributionCharge.objects.select_related('tache').with_report_chain()
     serializer_class = DistributionChargeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
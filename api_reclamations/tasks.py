@@ -27,6 +27,7 @@ def auto_close_pending_reclamations():
     """
     from api_reclamations.models import Reclamation, HistoriqueReclamation
     from api.services.notifications import NotificationService, NotificationTypes
+    from api.services.ws_fanout import coalesce
 
     now = timezone.now()
     seuil_48h = now - timedelta(hours=48)
@@ -35,38 +36,82 @@ def auto_close_pending_reclamations():
     auto_closed_count = 0
     reminder_count = 0
 
-    # ===================================================================
-    # PASSE 1: Auto-cloture (>= 48h) — traite en premier pour eviter
-    # d'envoyer un rappel inutile a une reclamation qu'on va cloturer
-    # ===================================================================
-    reclamations_to_close = Reclamation.objects.filter(
-        statut='EN_ATTENTE_VALIDATION_CLOTURE',
-        date_proposition_cloture__lte=seuil_48h,
-    )
+    # Notifications WebSocket envoyees en un seul lot a la fin des deux passes
+    with coalesce():
+        # ===================================================================
+        # PASSE 1: Auto-cloture (>= 48h) — traite en premier pour eviter
+        # d'envoyer un rappel inutile a une reclamation qu'on va cloturer
+        # ===================================================================
+        reclamations_to_close = Reclamation.objects.filter(
+            statut='EN_ATTENTE_VALIDATION_CLOTURE',
+            date_proposition_cloture__lte=seuil_48h,
+        )
+
+        for reclamation in reclamations_to_close:
+            try:
+                with transaction.atomic():
+                    old_statut = reclamation.statut
+                    reclamation.statut = 'CLOTUREE'
+                    reclamation._current_user = None  # Action systeme
+                    reclamation.save()
+
+                    # Historique
+                    HistoriqueReclamation.objects.create(
+                        reclamation=reclamation,
+                        statut_precedent=old_statut,
+                        statut_nouveau='CLOTUREE',
+                        auteur=None,
+                        commentaire="Cloture automatique apres 48h sans reponse du client"
+                    )
 
-    for reclamation in reclamations_to_close:
-        try:
-            with transaction.atomic():
-                old_statut = reclamation.statut
-                reclamation.statut = 'CLOTUREE'
-                reclamation._current_user = None  # Action systeme
-                reclamation.save()
-
-                # Historique
-                HistoriqueReclamation.objects.create(
-                    reclamation=reclamation,
-                    statut_precedent=old_statut,
-                    statut_nouveau='CLOTUREE',
-                    auteur=None,
-                    commentaire="Cloture automatique apres 48h sans reponse du client"
+                    # Notification au createur
+                    if reclamation.createur:
+                        NotificationService.send(
+                            type_notification=NotificationTypes.RECLAMATION_AUTO_CLOTURE,
+                            titre=f"Reclamation {reclamation.numero_reclamation} auto-cloturee",
+                            message="La reclamation a ete automatiquement cloturee apres 48h sans reponse de votre part.",
+                            recipients=[reclamation.createur],
+                            data={
+                                'reclamation_id': reclamation.id,
+                                'numero': reclamation.numero_reclamation,
+                                'site': reclamation.site.nom_site if reclamation.site else '',
+                            },
+                            priorite='high',
+                        )
+
+                    auto_closed_count += 1
+                    logger.info(
+                        f"[AUTO-CLOTURE] Reclamation {reclamation.numero_reclamation} "
+                        f"auto-cloturee (proposition: {reclamation.date_proposition_cloture})"
+                    )
+
+            except Exception as e:
+                logger.error(
+                    f"[AUTO-CLOTURE] Erreur pour reclamation {reclamation.numero_reclamation}: {e}"
                 )
 
+        # ===================================================================
+        # PASSE 2: Rappel (>= 24h et < 48h, pas encore rappele)
+        # ===================================================================
+        reclamations_to_remind = Reclamation.objects.filter(
+            statut='EN_ATTENTE_VALIDATION_CLOTURE',
+            date_proposition_cloture__lte=seuil_24h,
+            date_proposition_cloture__gt=seuil_48h,
+            rappel_cloture_envoye=False,
+        )
+
+        for reclamation in reclamations_to_remind:
+            try:
+                # Marquer le rappel comme envoye (update_fields pour eviter les signals)
+                reclamation.rappel_cloture_envoye = True
+                reclamation.save(update_fields=['rappel_cloture_envoye'])
+
                 # Notification au createur
                 if reclamation.createur:
                     NotificationService.send(
-                        type_notification=NotificationTypes.RECLAMATION_AUTO_CLOTURE,
-                        titre=f"Reclamation {reclamation.numero_reclamation} auto-cloturee",
-                        message="La reclamation a ete automatiquement cloturee apres 48h sans reponse de votre part.",
+                        type_notification=NotificationTypes.RECLAMATION_RAPPEL_CLOTURE,
+                        titre=f"Rappel: validez la cloture de {reclamation.numero_reclamation}",
+                        message="Une proposition de cloture attend votre validation. Sans reponse sous 24h, la reclamation sera automatiquement cloturee.",
                         recipients=[reclamation.createur],
                         data={
                             'reclamation_id': reclamation.id,
@@ -76,58 +121,16 @@ def auto_close_pending_reclamations():
                         priorite='high',
                     )
 
-                auto_closed_count += 1
+                reminder_count += 1
                 logger.info(
-                    f"[AUTO-CLOTURE] Reclamation {reclamation.numero_reclamation} "
-                    f"auto-cloturee (proposition: {reclamation.date_proposition_cloture})"
+                    f"[RAPPEL-CLOTURE] Rappel envoye pour reclamation {reclamation.numero_reclamation}"
                 )
 
-        except Exception as e:
-            logger.error(
-                f"[AUTO-CLOTURE] Erreur pour reclamation {reclamation.numero_reclamation}: {e}"
-            )
-
-    # ===================================================================
-    # PASSE 2: Rappel (>= 24h et < 48h, pas encore rappele)
-    # ===================================================================
-    reclamations_to_remind = Reclamation.objects.filter(
-        statut='EN_ATTENTE_VALIDATION_CLOTURE',
-        date_proposition_cloture__lte=seuil_24h,
-        date_proposition_cloture__gt=seuil_48h,
-        rappel_cloture_envoye=False,
-    )
-
-    for reclamation in reclamations_to_remind:
-        try:
-            # Marquer le rappel comme envoye (update_fields pour eviter les signals)
-            reclamation.rappel_cloture_envoye = True
-            reclamation.save(update_fields=['rappel_cloture_envoye'])
-
-            # Notification au createur
-            if reclamation.createur:
-                NotificationService.send(
-                    type_notification=NotificationTypes.RECLAMATION_RAPPEL_CLOTURE,
-                    titre=f"Rappel: validez la cloture de {reclamation.numero_reclamation}",
-                    message="Une proposition de cloture attend votre validation. Sans reponse sous 24h, la reclamation sera automatiquement cloturee.",
-                    recipients=[reclamation.createur],
-                    data={
-                        'reclamation_id': reclamation.id,
-                        'numero': reclamation.numero_reclamation,
-                        'site': reclamation.site.nom_site if reclamation.site else '',
-                    },
-                    priorite='high',
+            except Exception as e:
+                logger.error(
+                    f"[RAPPEL-CLOTURE] Erreur pour reclamation {reclamation.numero_reclamation}: {e}"
                 )
 
-            reminder_count += 1
-            logger.info(
-                f"[RAPPEL-CLOTURE] Rappel envoye pour reclamation {reclamation.numero_reclamation}"
-            )
-
-        except Exception as e:
-            logger.error(
-                f"[RAPPEL-CLOTURE] Erreur pour reclamation {reclamation.numero_reclamation}: {e}"
-            )
-
     # ===================================================================
     # Invalidation du cache si des reclamations ont ete auto-cloturees
     # ===================================================================
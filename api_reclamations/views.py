@@ -8,6 +8,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models import TypeReclamation, Urgence, Reclamation, HistoriqueReclamation, SatisfactionClient
+from api_users.access_scope import get_access_scope
 from api_users.models import Equipe
 from django.db import transaction
 from .serializers import (
@@ -1043,25 +1044,23 @@ class ReclamationExportExcelView(APIView):
     def get(self, request, *args, **kwargs):
         user = request.user
 
-        # Construire le queryset de base selon le rôle
-        roles = list(user.roles_utilisateur.values_list('role__nom_role', flat=True))
+        # Construire le queryset de base selon le rôle (périmètre d'accès en cache)
+        scope = get_access_scope(user)
 
-        if 'ADMIN' in roles:
+        if scope.is_admin:
             queryset = Reclamation.objects.filter(actif=True)
-        elif 'CLIENT' in roles and hasattr(user, 'client_profile'):
-            structure = user.client_profile.structure
-            if structure:
+        elif scope.is_client:
+            if scope.structure_id:
                 # Le client voit ses réclamations + celles de sa structure si visible_client=True
                 queryset = Reclamation.objects.filter(
                     Q(createur=user) |
-                    Q(structure_client=structure, visible_client=True),
+                    Q(structure_client_id=scope.structure_id, visible_client=True),
                     actif=True
                 )
             else:
                 queryset = Reclamation.objects.filter(createur=user, actif=True)
-        elif 'SUPERVISEUR' in roles and hasattr(user, 'superviseur_profile'):
-            superviseur = user.superviseur_profile
-            queryset = Reclamation.objects.filter(site__superviseur=superviseur, actif=True)
+        elif scope.is_superviseur:
+            queryset = scope.filter_sites(Reclamation.objects.filter(actif=True), 'site_id')
         else:
             queryset = Reclamation.objects.filter(createur=user, actif=True)
 
@@ -5,3 +5,7 @@ class ApiSuiviTachesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_suivi_taches'
     verbose_name = 'Suivi des Tâches'
+
+    def ready(self):
+        """Import signals when Django starts"""
+        import api_suivi_taches.signals  # noqa
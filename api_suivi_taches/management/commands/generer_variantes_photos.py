@@ -0,0 +1,69 @@
+"""
+Commande Django : Produit les variantes (miniature, moyenne, WebP) des photos
+existantes (voir api_suivi_taches/photo_variants.py).
+
+Seules les photos dont les variantes manquent ou ne correspondent plus au
+fichier sont traitées, sauf avec --force.
+
+Usage:
+    python manage.py generer_variantes_photos
+    python manage.py generer_variantes_photos --celery      # Planifie via Celery
+    python manage.py generer_variantes_photos --force --limit 500
+"""
+from django.core.management.base import BaseCommand
+
+from api_suivi_taches.models import Photo
+from api_suivi_taches.photo_variants import generer_variantes, variantes_a_jour
+
+
+class Command(BaseCommand):
+    help = "Produit les variantes des photos existantes (backfill)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénère aussi les variantes à jour',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Nombre maximal de photos à traiter',
+        )
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            help='Planifie une tâche Celery par photo au lieu de traiter ici',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        limit = options['limit']
+
+        photos = Photo.objects.exclude(fichier='').exclude(fichier__isnull=True).order_by('pk')
+
+        traitees = 0
+        echecs = 0
+        for photo in photos.iterator(chunk_size=200):
+            if limit and traitees + echecs >= limit:
+                break
+            if not force and variantes_a_jour(photo):
+                continue
+
+            if options['celery']:
+                from api_suivi_taches.tasks import generer_variantes_photo
+                generer_variantes_photo.delay(photo.pk, force=force)
+                traitees += 1
+                continue
+
+            if generer_variantes(photo, force=force):
+                traitees += 1
+            else:
+                echecs += 1
+                self.stdout.write(self.style.WARNING(f"  Photo #{photo.pk} : fichier illisible ({photo.fichier.name})"))
+
+            if (traitees + echecs) % 100 == 0:
+                self.stdout.write(f"  {traitees + echecs} photo(s) traitée(s)...")
+
+        action = 'planifiée(s)' if options['celery'] else 'traitée(s)'
+        self.stdout.write(self.style.SUCCESS(f"Terminé : {traitees} photo(s) {action}, {echecs} échec(s)"))
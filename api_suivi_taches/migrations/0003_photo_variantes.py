@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_suivi_taches', '0002_add_fertilisant_ravageurmaladie'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, help_text='Miniature, moyenne et WebP : chemin et dimensions', verbose_name='Variantes'),
+        ),
+    ]
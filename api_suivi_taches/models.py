@@ -323,6 +323,14 @@ class Photo(models.Model):
         verbose_name="Longitude"
     )
 
+    # Variantes dérivées (api_suivi_taches/photo_variants.py)
+    variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Variantes",
+        help_text="Miniature, moyenne et WebP : chemin et dimensions"
+    )
+
     class Meta:
         verbose_name = "Photo"
         verbose_name_plural = "Photos"
@@ -332,6 +340,21 @@ class Photo(models.Model):
         entity = self.tache or self.objet or "Sans lien"
         return f"Photo {self.get_type_photo_display()} - {entity}"
 
+    def url_variante(self, *noms):
+        """
+        URL de la première variante disponible parmi `noms`, sinon du
+        fichier d'origine (variantes pas encore produites).
+        """
+        if not self.fichier:
+            return None
+        from .photo_variants import variantes_a_jour
+        if variantes_a_jour(self):
+            for nom in noms:
+                info = self.variantes.get(nom)
+                if info and info.get('path'):
+                    return self.fichier.storage.url(info['path'])
+        return self.fichier.url
+
     def clean(self):
         """Validation: une photo doit être liée à au moins une entité."""
         if not any([self.tache, self.objet, self.reclamation]):
@@ -0,0 +1,140 @@
+"""
+Variantes dérivées des photos (miniature, moyenne, WebP)
+
+Le fichier d'origine (`Photo.fichier`) est l'image de l'appareil photo,
+souvent 4000 px et plusieurs Mo. Après l'upload, la tâche Celery
+`generer_variantes_photo` produit des variantes redressées selon l'EXIF
+et enregistre leur chemin et leurs dimensions dans `Photo.variantes` :
+
+    {
+        'source': 'photos/2026/10/16/IMG_0001.jpg',
+        'miniature': {'path': ..., 'width': 320, 'height': 240},
+        'moyenne': {'path': ..., 'width': 1280, 'height': 960},
+        'webp': {'path': ..., 'width': 1280, 'height': 960},
+    }
+
+`source` est le fichier à partir duquel les variantes ont été produites :
+un fichier remplacé est détecté et ses variantes régénérées.
+
+Les listes et les rapports servent la plus petite variante adaptée
+(`Photo.url_variante`) ; à défaut (variantes pas encore produites), le
+fichier d'origine.
+
+Usage:
+    generer_variantes(photo)
+    python manage.py generer_variantes_photos
+"""
+
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+# nom -> (côté le plus long en px, format Pillow, extension, qualité)
+VARIANTES = {
+    'miniature': (320, 'JPEG', 'jpg', 80),
+    'moyenne': (1280, 'JPEG', 'jpg', 85),
+    'webp': (1280, 'WEBP', 'webp', 80),
+}
+
+# Variantes à servir par usage, de la plus adaptée au repli
+VARIANTES_LISTE = ('moyenne', 'webp')
+VARIANTES_RAPPORT = ('moyenne',)
+
+
+def variantes_a_jour(photo) -> bool:
+    """True si les variantes correspondent au fichier actuel de la photo."""
+    return bool(photo.fichier) and (photo.variantes or {}).get('source') == photo.fichier.name
+
+
+def _chemin_variante(photo, nom: str, extension: str) -> str:
+    base = os.path.splitext(os.path.basename(photo.fichier.name))[0]
+    return f"photos/variantes/{photo.pk}/{base}_{nom}.{extension}"
+
+
+def _encoder(image, cote_max: int, format_pillow: str, qualite: int):
+    from PIL import Image
+
+    variante = image.copy()
+    variante.thumbnail((cote_max, cote_max), Image.LANCZOS)
+    buffer = io.BytesIO()
+    variante.save(buffer, format=format_pillow, quality=qualite, optimize=True)
+    return buffer.getvalue(), variante.size
+
+
+def supprimer_variantes(photo, variantes=None) -> None:
+    """Supprime les fichiers des variantes (fichier remplacé ou photo supprimée)."""
+    storage = photo.fichier.storage
+    for nom, info in (variantes if variantes is not None else photo.variantes or {}).items():
+        if nom in VARIANTES and info.get('path'):
+            try:
+                storage.delete(info['path'])
+            except Exception as e:
+                logger.warning(f"[PHOTO] Suppression de la variante {info['path']} impossible: {e}")
+
+
+def generer_variantes(photo, force: bool = False) -> dict:
+    """
+    Produit les variantes d'une photo et les enregistre dans `photo.variantes`.
+
+    Args:
+        photo: Instance Photo avec un fichier
+        force: Régénère même si les variantes sont à jour
+
+    Returns:
+        Dictionnaire des variantes (vide si la photo n'a pas de fichier lisible)
+    """
+    from PIL import Image, ImageOps
+
+    from .models import Photo
+
+    if not photo.fichier:
+        return {}
+    if variantes_a_jour(photo) and not force:
+        return photo.variantes
+
+    storage = photo.fichier.storage
+    try:
+        with storage.open(photo.fichier.name, 'rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except Exception as e:
+        logger.warning(f"[PHOTO] Photo #{photo.pk} illisible ({photo.fichier.name}): {e}")
+        return {}
+
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    anciennes = photo.variantes or {}
+    variantes = {'source': photo.fichier.name}
+    for nom, (cote_max, format_pillow, extension, qualite) in VARIANTES.items():
+        try:
+            contenu, (largeur, hauteur) = _encoder(image, cote_max, format_pillow, qualite)
+        except Exception as e:
+            # Ex: Pillow compilé sans WebP
+            logger.warning(f"[PHOTO] Variante {nom} impossible pour la photo #{photo.pk}: {e}")
+            continue
+        chemin = _chemin_variante(photo, nom, extension)
+        if storage.exists(chemin):
+            storage.delete(chemin)
+        chemin = storage.save(chemin, ContentFile(contenu))
+        variantes[nom] = {'path': chemin, 'width': largeur, 'height': hauteur}
+
+    # Variantes d'un ancien fichier devenues orphelines
+    supprimer_variantes(photo, {
+        nom: info for nom, info in anciennes.items()
+        if nom in VARIANTES and info.get('path') != variantes.get(nom, {}).get('path')
+    })
+
+    # update() : pas de post_save (qui replanifierait la génération)
+    Photo.objects.filter(pk=photo.pk).update(variantes=variantes)
+    photo.variantes = variantes
+
+    # Les rapports de site servent désormais la variante moyenne
+    from .signals import marquer_rapports_perimes
+    marquer_rapports_perimes(photo)
+    return variantes
@@ -157,6 +157,8 @@ class PhotoSerializer(serializers.ModelSerializer):
     
     type_photo_display = serializers.CharField(source='get_type_photo_display', read_only=True)
     url_fichier = serializers.SerializerMethodField()
+    url_miniature = serializers.SerializerMethodField()
+    url_moyenne = serializers.SerializerMethodField()
 
     class Meta:
         model = Photo
@@ -164,6 +166,8 @@ class PhotoSerializer(serializers.ModelSerializer):
             'id',
             'fichier',
             'url_fichier',
+            'url_miniature',
+            'url_moyenne',
             'type_photo',
             'type_photo_display',
             'date_prise',
@@ -176,15 +180,26 @@ class PhotoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['date_prise']
     
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
     def get_url_fichier(self, obj):
         """Retourne l'URL complète du fichier image."""
         if obj.fichier:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.fichier.url)
-            return obj.fichier.url
+            return self._absolute(obj.fichier.url)
         return None
 
+    def get_url_miniature(self, obj):
+        """Miniature (320 px), ou fichier d'origine si pas encore produite."""
+        return self._absolute(obj.url_variante('miniature'))
+
+    def get_url_moyenne(self, obj):
+        """Variante moyenne (1280 px), ou fichier d'origine si pas encore produite."""
+        return self._absolute(obj.url_variante('moyenne'))
+
 
 
 class PhotoCreateSerializer(serializers.ModelSerializer):
@@ -242,25 +257,41 @@ class PhotoListSerializer(serializers.ModelSerializer):
 
     type_photo_display = serializers.CharField(source='get_type_photo_display', read_only=True)
     url_fichier = serializers.SerializerMethodField()
+    url_miniature = serializers.SerializerMethodField()
+    url_original = serializers.SerializerMethodField()
 
     class Meta:
         model = Photo
         fields = [
             'id',
             'url_fichier',
+            'url_miniature',
+            'url_original',
             'type_photo',
             'type_photo_display',
             'date_prise',
             'legende'
         ]
 
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if url and request:
+            return request.build_absolute_uri(url)
+        return url
+
     def get_url_fichier(self, obj):
-        """Retourne l'URL complète du fichier image."""
+        """URL d'affichage : variante moyenne, à défaut le fichier d'origine."""
+        from .photo_variants import VARIANTES_LISTE
+        return self._absolute(obj.url_variante(*VARIANTES_LISTE))
+
+    def get_url_miniature(self, obj):
+        """Miniature (320 px) pour les grilles de galerie."""
+        return self._absolute(obj.url_variante('miniature'))
+
+    def get_url_original(self, obj):
+        """Fichier d'origine pleine résolution (téléchargement)."""
         if obj.fichier:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.fichier.url)
-            return obj.fichier.url
+            return self._absolute(obj.fichier.url)
         return None
 
 
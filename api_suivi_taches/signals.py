@@ -0,0 +1,61 @@
+"""
+Signals pour le module Suivi des Tâches
+
+- Génération des variantes d'une photo après l'upload (Celery)
+- Suppression des fichiers de variantes avec la photo
+- Péremption des snapshots de rapport de site (section photos)
+"""
+
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Photo
+
+logger = logging.getLogger(__name__)
+
+
+def _planifier_variantes(photo_id):
+    try:
+        from .tasks import generer_variantes_photo
+        generer_variantes_photo.delay(photo_id)
+    except Exception as e:
+        # Celery indisponible : rattrapé par `manage.py generer_variantes_photos`
+        logger.warning(f"[PHOTO] Variantes de la photo #{photo_id} non planifiees: {e}")
+
+
+def marquer_rapports_perimes(photo):
+    """Périme les rapports (mois, site) qui affichent la photo (AVANT / APRES)."""
+    from api.models import Objet
+    from api.services.report_snapshots import mark_reports_stale
+
+    if photo.type_photo not in ('AVANT', 'APRES'):
+        return
+    site_ids = set()
+    if photo.objet_id:
+        site_ids.update(Objet.objects.filter(pk=photo.objet_id).values_list('site_id', flat=True))
+    if photo.tache_id:
+        site_ids.update(Objet.objects.filter(taches=photo.tache_id).values_list('site_id', flat=True))
+    mark_reports_stale([photo.date_prise], site_ids)
+
+
+@receiver(post_save, sender=Photo)
+def photo_post_save(sender, instance, created, **kwargs):
+    """Planifie la génération des variantes pour un fichier nouveau ou remplacé."""
+    from .photo_variants import variantes_a_jour
+
+    if instance.fichier and not variantes_a_jour(instance):
+        transaction.on_commit(partial(_planifier_variantes, instance.pk))
+    marquer_rapports_perimes(instance)
+
+
+@receiver(post_delete, sender=Photo)
+def photo_post_delete(sender, instance, **kwargs):
+    """Supprime les fichiers de variantes de la photo."""
+    marquer_rapports_perimes(instance)
+    if instance.variantes and instance.fichier:
+        from .photo_variants import supprimer_variantes
+        transaction.on_commit(partial(supprimer_variantes, instance))
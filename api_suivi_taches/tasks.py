@@ -0,0 +1,37 @@
+"""
+Celery tasks pour le module Suivi des Tâches.
+
+Tâches asynchrones:
+- generer_variantes_photo: Miniature, moyenne et WebP d'une photo uploadée
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, name='api_suivi_taches.tasks.generer_variantes_photo')
+def generer_variantes_photo(self, photo_id, force=False):
+    """
+    Produit les variantes d'une photo (voir api_suivi_taches/photo_variants.py).
+
+    Args:
+        photo_id: ID de la Photo
+        force: Régénère même si les variantes sont à jour
+    """
+    from .models import Photo
+    from .photo_variants import generer_variantes
+
+    try:
+        photo = Photo.objects.get(pk=photo_id)
+    except Photo.DoesNotExist:
+        return {'success': False, 'error': 'Photo introuvable'}
+
+    variantes = generer_variantes(photo, force=force)
+    return {
+        'success': bool(variantes),
+        'photo_id': photo_id,
+        'variantes': [nom for nom in variantes if nom != 'source'],
+    }
@@ -0,0 +1,176 @@
+"""
+Périmètre d'accès d'un utilisateur - GreenSIG
+
+Résout une seule fois les rôles, la structure cliente, le profil superviseur
+et les sites visibles d'un utilisateur, puis les met en cache Redis (domaine
+ACCESS de greensig_web.cache_utils). Le résultat est aussi mémorisé sur
+l'objet user : une requête HTTP ne le résout qu'une fois.
+
+Invalidation :
+  - Rôles, profil client ou superviseur d'un utilisateur → son entrée
+    (signals dans api_users/signals.py)
+  - Sites (affectation superviseur / structure) et équipes → tout le domaine
+
+Usage:
+    scope = get_access_scope(request.user)
+    if not scope.is_admin:
+        queryset = scope.filter_sites(queryset, 'site_id')
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+from django.db.models import Q
+
+ROLE_ADMIN = 'ADMIN'
+ROLE_CLIENT = 'CLIENT'
+ROLE_SUPERVISEUR = 'SUPERVISEUR'
+
+
+@dataclass(frozen=True)
+class AccessScope:
+    """
+    Périmètre résolu d'un utilisateur.
+
+    site_ids vaut None pour un ADMIN (tous les sites) ; pour les autres
+    rôles, c'est la liste (éventuellement vide) des sites visibles.
+    """
+    user_id: Optional[int] = None
+    roles: Tuple[str, ...] = ()
+    is_superuser: bool = False
+    client_id: Optional[int] = None
+    structure_id: Optional[int] = None
+    superviseur_id: Optional[int] = None
+    site_ids: Optional[Tuple[int, ...]] = ()
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.user_id is not None
+
+    @property
+    def is_admin(self) -> bool:
+        return ROLE_ADMIN in self.roles
+
+    @property
+    def is_client(self) -> bool:
+        """Rôle CLIENT avec un profil client (prioritaire sur SUPERVISEUR)."""
+        return not self.is_admin and ROLE_CLIENT in self.roles and self.client_id is not None
+
+    @property
+    def is_superviseur(self) -> bool:
+        """Rôle SUPERVISEUR avec un profil superviseur."""
+        return (
+            not self.is_admin and not self.is_client
+            and ROLE_SUPERVISEUR in self.roles and self.superviseur_id is not None
+        )
+
+    @property
+    def key(self) -> str:
+        """Clé de périmètre pour les caches partagés entre utilisateurs."""
+        if self.is_admin:
+            return 'admin'
+        if self.is_client:
+            return f'structure-{self.structure_id or 0}'
+        if self.is_superviseur:
+            return f'superviseur-{self.superviseur_id}'
+        return 'none'
+
+    def site_condition(self, field: str = 'pk') -> Q:
+        """
+        Condition « site visible » sur le champ donné ('pk' pour Site,
+        'site_id' pour les objets GIS, SousSite, Reclamation...).
+        """
+        if self.site_ids is None:
+            return Q()
+        return Q(**{f'{field}__in': self.site_ids})
+
+    def filter_sites(self, queryset, field: str = 'pk'):
+        """Restreint un queryset aux sites visibles (voir site_condition)."""
+        if self.site_ids is not None and not self.site_ids:
+            return queryset.none()
+        return queryset.filter(self.site_condition(field))
+
+    def structure(self):
+        """Instance StructureClient du client (None sinon)."""
+        from .models import StructureClient
+        if not self.is_client or not self.structure_id:
+            return None
+        return StructureClient.objects.filter(pk=self.structure_id).first()
+
+    def superviseur(self):
+        """Instance Superviseur (None si l'utilisateur n'est pas superviseur)."""
+        from .models import Superviseur
+        if not self.is_superviseur:
+            return None
+        return Superviseur.objects.filter(pk=self.superviseur_id).first()
+
+
+ANONYMOUS_SCOPE = AccessScope()
+
+
+def _resolve(user) -> AccessScope:
+    """Calcule le périmètre depuis la base (4 requêtes au plus)."""
+    from api.models import Site
+    from .models import Client, Superviseur
+
+    roles = tuple(sorted(set(
+        user.roles_utilisateur.values_list('role__nom_role', flat=True)
+    )))
+
+    client = None
+    if ROLE_CLIENT in roles:
+        client = Client.objects.filter(utilisateur_id=user.pk).values('pk', 'structure_id').first()
+    superviseur_id = None
+    if ROLE_SUPERVISEUR in roles:
+        superviseur_id = Superviseur.objects.filter(utilisateur_id=user.pk).values_list('pk', flat=True).first()
+
+    scope = AccessScope(
+        user_id=user.pk,
+        roles=roles,
+        is_superuser=user.is_superuser,
+        client_id=client['pk'] if client else None,
+        structure_id=client['structure_id'] if client else None,
+        superviseur_id=superviseur_id,
+    )
+
+    if scope.is_admin:
+        site_ids = None
+    elif scope.is_client and scope.structure_id:
+        site_ids = Site.objects.filter(structure_client_id=scope.structure_id).values_list('pk', flat=True)
+    elif scope.is_superviseur:
+        site_ids = Site.objects.filter(superviseur_id=superviseur_id).values_list('pk', flat=True)
+    else:
+        site_ids = ()
+
+    return AccessScope(**{
+        **asdict(scope),
+        'site_ids': None if site_ids is None else tuple(sorted(site_ids)),
+    })
+
+
+def get_access_scope(user) -> AccessScope:
+    """
+    Périmètre d'accès de l'utilisateur (mémoire de requête → Redis → base).
+    """
+    if not user or not user.is_authenticated:
+        return ANONYMOUS_SCOPE
+
+    scope = getattr(user, '_access_scope', None)
+    if scope is not None:
+        return scope
+
+    from greensig_web.cache_utils import cache_get, cache_set
+
+    cached = cache_get('ACCESS', user.pk)
+    if cached:
+        scope = AccessScope(**{
+            **cached,
+            'roles': tuple(cached['roles']),
+            'site_ids': None if cached['site_ids'] is None else tuple(cached['site_ids']),
+        })
+    else:
+        scope = _resolve(user)
+        cache_set('ACCESS', user.pk, data=asdict(scope))
+
+    user._access_scope = scope
+    return scope
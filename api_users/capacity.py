@@ -0,0 +1,190 @@
+"""
+Calendrier de capacité des équipes - GreenSIG
+
+Charge en un nombre constant de requêtes (4, quel que soit le nombre
+d'équipes et de jours) les horaires de travail, jours fériés et absences
+validées d'un ensemble d'équipes sur une plage de dates, puis fournit une
+matrice (équipe, jour) : heures travaillables et taux de membres présents.
+
+Utilisé par :
+  - WorkloadCalculationService (jours travaillables d'une tâche)
+  - Equipe.statut_operationnel et le filtre statut_operationnel
+  - GET /api/users/equipes/capacite/ (vue planning)
+
+Usage:
+    calendrier = CapacityCalendar([equipe.id], date_debut, date_fin)
+    jour = calendrier.jour(equipe.id, date(2026, 10, 16))
+    jour.heures, jour.ratio_presents, jour.disponible
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Count, Q
+
+# Code BDD HoraireTravail.jour_semaine par jour de semaine (0=lundi)
+JOURS_SEMAINE = ['LUN', 'MAR', 'MER', 'JEU', 'VEN', 'SAM', 'DIM']
+
+# Heures par défaut sans horaire défini (équipe ni global)
+HEURES_PAR_DEFAUT = {'SAM': 4.0, 'DIM': 0.0}
+HEURES_PAR_DEFAUT_SEMAINE = 8.0
+
+# Part minimale de membres présents pour qu'une équipe soit disponible
+SEUIL_DISPONIBILITE = 0.5
+
+
+@dataclass(frozen=True)
+class JourCapacite:
+    """Capacité d'une équipe pour un jour donné."""
+    heures: float
+    ferie: bool
+    membres: int
+    presents: int
+
+    @property
+    def ratio_presents(self) -> float:
+        return self.presents / self.membres if self.membres else 0.0
+
+    @property
+    def disponible(self) -> bool:
+        """Au moins SEUIL_DISPONIBILITE des membres actifs présents."""
+        return self.membres > 0 and self.presents >= self.membres * SEUIL_DISPONIBILITE
+
+    @property
+    def heures_disponibles(self) -> float:
+        """Heures travaillables, nulles un jour férié."""
+        return 0.0 if self.ferie else self.heures
+
+    def as_dict(self) -> Dict:
+        return {
+            'heures': self.heures,
+            'heures_disponibles': self.heures_disponibles,
+            'ferie': self.ferie,
+            'membres': self.membres,
+            'presents': self.presents,
+            'ratio_presents': round(self.ratio_presents, 3),
+            'disponible': self.disponible,
+        }
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+class CapacityCalendar:
+    """
+    Matrice de capacité (équipe, jour) sur une plage de dates.
+
+    Les équipes absentes de equipe_ids (ou None) n'ont pas de membres :
+    seuls les horaires globaux et les jours fériés s'appliquent.
+    """
+
+    def __init__(self, equipe_ids: Iterable[Optional[int]], date_debut, date_fin):
+        from .models import Absence, HoraireTravail, JourFerie, Operateur, StatutAbsence, StatutOperateur
+
+        self.equipe_ids = sorted({pk for pk in equipe_ids if pk is not None})
+        self.date_debut = _as_date(date_debut)
+        self.date_fin = _as_date(date_fin)
+
+        # 1. Horaires actifs : par équipe + configuration globale (equipe NULL)
+        self._horaires = {}
+        horaires = HoraireTravail.objects.filter(actif=True).filter(
+            Q(equipe_id__in=self.equipe_ids) | Q(equipe__isnull=True)
+        )
+        for horaire in horaires:
+            self._horaires[(horaire.equipe_id, horaire.jour_semaine)] = horaire.heures_travaillables
+
+        # 2. Jours fériés actifs de la plage (+ récurrents, comparés sur jour/mois)
+        self._feries = set()
+        self._feries_recurrents = set()
+        feries = JourFerie.objects.filter(actif=True).filter(
+            Q(date__gte=self.date_debut, date__lte=self.date_fin) | Q(recurrent=True)
+        ).values_list('date', 'recurrent')
+        for jour, recurrent in feries:
+            if recurrent:
+                self._feries_recurrents.add((jour.month, jour.day))
+            else:
+                self._feries.add(jour)
+
+        # 3. Membres actifs par équipe
+        self._membres = dict(
+            Operateur.objects.filter(equipe_id__in=self.equipe_ids, statut=StatutOperateur.ACTIF)
+            .values('equipe_id')
+            .annotate(nombre=Count('pk'))
+            .values_list('equipe_id', 'nombre')
+        )
+
+        # 4. Absences validées des membres actifs chevauchant la plage
+        absents = {}
+        absences = Absence.objects.filter(
+            operateur__equipe_id__in=self.equipe_ids,
+            operateur__statut=StatutOperateur.ACTIF,
+            statut=StatutAbsence.VALIDEE,
+            date_debut__lte=self.date_fin,
+            date_fin__gte=self.date_debut,
+        ).values_list('operateur_id', 'operateur__equipe_id', 'date_debut', 'date_fin')
+        for operateur_id, equipe_id, debut, fin in absences:
+            jour = max(debut, self.date_debut)
+            while jour <= min(fin, self.date_fin):
+                absents.setdefault((equipe_id, jour), set()).add(operateur_id)
+                jour += timedelta(days=1)
+        self._absents = {cle: len(operateurs) for cle, operateurs in absents.items()}
+
+    # ==========================================================================
+    # LECTURE
+    # ==========================================================================
+
+    def jours(self):
+        """Dates de la plage, dans l'ordre."""
+        jour = self.date_debut
+        while jour <= self.date_fin:
+            yield jour
+            jour += timedelta(days=1)
+
+    def est_ferie(self, jour) -> bool:
+        jour = _as_date(jour)
+        return jour in self._feries or (jour.month, jour.day) in self._feries_recurrents
+
+    def heures_travaillables(self, equipe_id: Optional[int], jour) -> float:
+        """Horaire de l'équipe, sinon horaire global, sinon 8h (samedi 4h, dimanche 0h)."""
+        code = JOURS_SEMAINE[_as_date(jour).weekday()]
+        if (equipe_id, code) in self._horaires:
+            return self._horaires[(equipe_id, code)]
+        if (None, code) in self._horaires:
+            return self._horaires[(None, code)]
+        return HEURES_PAR_DEFAUT.get(code, HEURES_PAR_DEFAUT_SEMAINE)
+
+    def jour(self, equipe_id: Optional[int], jour) -> JourCapacite:
+        jour = _as_date(jour)
+        if not self.date_debut <= jour <= self.date_fin:
+            raise ValueError(f"{jour} hors de la plage du calendrier ({self.date_debut} - {self.date_fin})")
+        membres = self._membres.get(equipe_id, 0)
+        return JourCapacite(
+            heures=self.heures_travaillables(equipe_id, jour),
+            ferie=self.est_ferie(jour),
+            membres=membres,
+            presents=membres - self._absents.get((equipe_id, jour), 0),
+        )
+
+    def est_disponible(self, equipe_id: Optional[int], jour) -> bool:
+        """Pas d'équipe = pas de contrainte de disponibilité."""
+        return equipe_id is None or self.jour(equipe_id, jour).disponible
+
+    def statut_operationnel(self, equipe_id: int, jour) -> str:
+        """COMPLETE, PARTIELLE ou INDISPONIBLE (voir Equipe.statut_operationnel)."""
+        from .models import StatutEquipe
+
+        capacite = self.jour(equipe_id, jour)
+        if capacite.membres == 0 or capacite.presents == 0:
+            return StatutEquipe.INDISPONIBLE
+        if capacite.presents == capacite.membres:
+            return StatutEquipe.COMPLETE
+        return StatutEquipe.PARTIELLE
+
+    def matrice(self) -> Dict[int, Dict[date, JourCapacite]]:
+        """{equipe_id: {jour: JourCapacite}} pour toutes les équipes et tous les jours."""
+        return {
+            equipe_id: {jour: self.jour(equipe_id, jour) for jour in self.jours()}
+            for equipe_id in self.equipe_ids
+        }
@@ -290,8 +290,14 @@ class EquipeFilter(django_filters.FilterSet):
     def filter_statut_operationnel(self, queryset, name, value):
         """Filtre par statut operationnel calcule."""
         if value:
-            # On doit filtrer en Python car c'est une propriete calculee
-            ids = [e.id for e in queryset if e.statut_operationnel == value]
+            # Propriete calculee : un seul calendrier de capacite pour toutes les equipes
+            from django.utils import timezone
+            from .capacity import CapacityCalendar
+
+            today = timezone.now().date()
+            equipe_ids = list(queryset.values_list('id', flat=True))
+            calendrier = CapacityCalendar(equipe_ids, today, today)
+            ids = [pk for pk in equipe_ids if calendrier.statut_operationnel(pk, today) == value]
             return queryset.filter(id__in=ids)
         return queryset
 
@@ -15,6 +15,8 @@ Usage:
 import logging
 from django.db.models import Q
 
+from .access_scope import ROLE_CLIENT, ROLE_SUPERVISEUR, get_access_scope
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,62 +36,42 @@ class RoleBasedQuerySetMixin:
         """
         Filtre le queryset en fonction du rôle de l'utilisateur.
 
+        Les rôles et profils viennent du périmètre d'accès en cache
+        (api_users/access_scope.py) : aucune requête de résolution par appel.
+
         Returns:
             QuerySet filtré selon le rôle
         """
-        queryset = super().get_queryset()
-        user = self.request.user
+        return self.filter_by_role(super().get_queryset())
+
+    def filter_by_role(self, queryset):
+        """
+        Applique le filtrage par rôle à un queryset quelconque (utile pour
+        les actions qui lisent un autre modèle que celui du ViewSet).
+        """
+        scope = get_access_scope(self.request.user)
         model_name = queryset.model.__name__
 
-        if not user or not user.is_authenticated:
+        if not scope.is_authenticated:
             logger.debug(f"[RoleBasedQuerySetMixin] {model_name}: Utilisateur non authentifié")
             return queryset.none()
 
-        # Récupérer tous les rôles de l'utilisateur
-        roles = list(user.roles_utilisateur.values_list('role__nom_role', flat=True))
-
-        # Les superusers Django sont traités comme ADMIN
-        if user.is_superuser and 'ADMIN' not in roles:
-            roles.append('ADMIN')
-
-        logger.info(f"[RoleBasedQuerySetMixin] {model_name}: User={user.email}, Roles={roles}")
-
-        # ADMIN : Aucun filtre, voit tout
-        if 'ADMIN' in roles:
-            logger.info(f"[RoleBasedQuerySetMixin] {model_name}: ADMIN → pas de filtrage")
+        # ADMIN (ou superuser Django) : Aucun filtre, voit tout
+        if scope.is_admin or scope.is_superuser:
             return queryset
 
         # SUPERVISEUR : Filtrage selon le type de ressource
-        if 'SUPERVISEUR' in roles:
-            has_profile = hasattr(user, 'superviseur_profile')
-            logger.info(f"[RoleBasedQuerySetMixin] {model_name}: SUPERVISEUR, has_profile={has_profile}")
-            if has_profile:
-                try:
-                    superviseur = user.superviseur_profile
-                    logger.info(f"[RoleBasedQuerySetMixin] {model_name}: Superviseur ID={superviseur.utilisateur_id}")
-                    result = self._filter_for_superviseur(queryset, superviseur)
-                    logger.info(f"[RoleBasedQuerySetMixin] {model_name}: Après filtrage SUPERVISEUR: {result.count()} résultats")
-                    return result
-                except Exception as e:
-                    logger.error(f"[RoleBasedQuerySetMixin] {model_name}: Erreur profil superviseur: {e}")
-            else:
-                logger.warning(f"[RoleBasedQuerySetMixin] {model_name}: SUPERVISEUR sans profil superviseur_profile!")
+        if ROLE_SUPERVISEUR in scope.roles:
+            if scope.superviseur_id is not None:
+                return self._filter_for_superviseur(queryset, scope.superviseur_id)
+            logger.warning(f"[RoleBasedQuerySetMixin] {model_name}: SUPERVISEUR sans profil superviseur_profile!")
 
         # CLIENT : Filtrage selon le type de ressource
-        if 'CLIENT' in roles:
-            has_profile = hasattr(user, 'client_profile')
-            logger.info(f"[RoleBasedQuerySetMixin] {model_name}: CLIENT, has_profile={has_profile}")
-            if has_profile:
-                try:
-                    client = user.client_profile
-                    result = self._filter_for_client(queryset, client)
-                    logger.info(f"[RoleBasedQuerySetMixin] {model_name}: Après filtrage CLIENT: {result.count()} résultats")
-                    return result
-                except Exception as e:
-                    logger.error(f"[RoleBasedQuerySetMixin] {model_name}: Erreur profil client: {e}")
+        if ROLE_CLIENT in scope.roles and scope.client_id is not None:
+            return self._filter_for_client(queryset, scope)
 
         # Par défaut, aucun accès
-        logger.warning(f"[RoleBasedQuerySetMixin] {model_name}: Aucun rôle valide → queryset.none()")
+        logger.debug(f"[RoleBasedQuerySetMixin] {model_name}: Aucun rôle valide → queryset.none()")
         return queryset.none()
 
     def _filter_for_superviseur(self, queryset, superviseur):
@@ -98,7 +80,7 @@ class RoleBasedQuerySetMixin:
 
         Args:
             queryset: QuerySet à filtrer
-            superviseur: Profil Superviseur de l'utilisateur
+            superviseur: ID du profil Superviseur de l'utilisateur
 
         Returns:
             QuerySet filtré
@@ -162,7 +144,6 @@ class RoleBasedQuerySetMixin:
             # 2. Équipes ayant des tâches sur les sites du superviseur
             # Via Tache.equipes (M2M) ou Tache.id_equipe (legacy)
             from api_planification.models import Tache
-            sites_superviseur_ids = superviseur.equipes_gerees.values_list('site_id', flat=True).distinct()
 
             taches_sur_mes_sites = Tache.objects.filter(
                 objets__site__superviseur=superviseur
@@ -247,35 +228,36 @@ class RoleBasedQuerySetMixin:
         # Par défaut, retourner le queryset complet (au cas où)
         return queryset
 
-    def _filter_for_client(self, queryset, client):
+    def _filter_for_client(self, queryset, scope):
         """
         Filtre le queryset pour un client.
 
         Args:
             queryset: QuerySet à filtrer
-            client: Profil Client de l'utilisateur
+            scope: Périmètre d'accès (client_id, structure_id, site_ids)
 
         Returns:
             QuerySet filtré
         """
         model_name = queryset.model.__name__
+        structure = scope.structure_id
 
         # Vérifier que le client a une structure assignée
-        if not client.structure:
+        if not structure:
             # Pas de structure = pas d'accès (sauf son propre profil)
             if model_name == 'Client':
-                return queryset.filter(pk=client.pk)
+                return queryset.filter(pk=scope.client_id)
             if model_name == 'Competence':
                 return queryset.all()  # Compétences accessibles à tous
             return queryset.none()
 
         # Sites : Uniquement ses sites (via structure_client)
         if model_name == 'Site':
-            return queryset.filter(structure_client=client.structure)
+            return queryset.filter(structure_client=structure)
 
         # SousSite : Sous-sites de ses sites (via structure_client)
         if model_name == 'SousSite':
-            return queryset.filter(site__structure_client=client.structure)
+            return queryset.filter(site__structure_client=structure)
 
         # Tâches : Tâches du client (lecture seule)
         if model_name == 'Tache':
@@ -284,79 +266,56 @@ class RoleBasedQuerySetMixin:
             # 2. Tâches liées à des réclamations de la structure client
             # 3. Tâches sur les sites de la structure client
             return queryset.filter(
-                Q(id_structure_client=client.structure) |
-                Q(reclamation__structure_client=client.structure) |
-                Q(objets__site__structure_client=client.structure)
+                Q(id_structure_client=structure) |
+                Q(reclamation__structure_client=structure) |
+                Q(objets__site__structure_client=structure)
             ).distinct()
 
         # Distributions de charge : Distributions des tâches de sa structure
         if model_name == 'DistributionCharge':
             return queryset.filter(
-                Q(tache__id_structure_client=client.structure) |
-                Q(tache__reclamation__structure_client=client.structure) |
-                Q(tache__objets__site__structure_client=client.structure)
+                Q(tache__id_structure_client=structure) |
+                Q(tache__reclamation__structure_client=structure) |
+                Q(tache__objets__site__structure_client=structure)
             ).distinct()
 
         # Réclamations : Ses réclamations (via structure_client)
         if model_name == 'Reclamation':
-            return queryset.filter(structure_client=client.structure)
+            return queryset.filter(structure_client=structure)
 
         # Équipes : Équipes travaillant sur ses sites (via structure_client)
         # Une équipe est visible si son site principal OU un site secondaire appartient au client
         if model_name == 'Equipe':
-            # 🔍 DEBUG
-            from api.models import Site
-            logger.info(f"[RoleBasedQuerySetMixin] Equipe: CLIENT structure={client.structure.nom}")
-
-            sites_client = Site.objects.filter(structure_client=client.structure)
-            logger.info(f"[RoleBasedQuerySetMixin] Equipe: {sites_client.count()} sites pour ce client → {list(sites_client.values_list('nom_site', flat=True))}")
+            equipes_site_principal = Q(site_principal__structure_client=structure)
+            equipes_site_secondaire = Q(sites_secondaires__structure_client=structure)
+            equipes_legacy = Q(site__structure_client=structure)  # Legacy
 
-            equipes_site_principal = Q(site_principal__structure_client=client.structure)
-            equipes_site_secondaire = Q(sites_secondaires__structure_client=client.structure)
-            equipes_legacy = Q(site__structure_client=client.structure)  # Legacy
-
-            filtered = queryset.filter(
+            return queryset.filter(
                 equipes_site_principal |
                 equipes_site_secondaire |
                 equipes_legacy
             ).distinct()
 
-            logger.info(f"[RoleBasedQuerySetMixin] Equipe: {filtered.count()} équipes après filtrage")
-            if filtered.exists():
-                for eq in filtered[:5]:  # Log les 5 premières
-                    logger.info(f"[RoleBasedQuerySetMixin] Equipe: → {eq.nom_equipe} (site_principal={eq.site_principal}, sites_secondaires={list(eq.sites_secondaires.values_list('nom_site', flat=True))})")
-
-            return filtered
-
         # Opérateurs : Opérateurs des équipes travaillant sur ses sites (via structure_client)
         if model_name == 'Operateur':
             from api_planification.models import Tache
             from api_users.models import Equipe
 
-            # 🔍 DEBUG
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: CLIENT structure={client.structure.nom}")
-
             # 1. Opérateurs dont l'équipe est affectée aux sites du client (via site principal ou secondaire)
-            from api.models import Site
-            sites_client = Site.objects.filter(structure_client=client.structure)
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {sites_client.count()} sites pour ce client")
-
-            # Équipes avec site principal = sites du client
-            equipes_via_principal = Equipe.objects.filter(site_principal__in=sites_client)
-            # Équipes avec sites secondaires = sites du client
-            equipes_via_secondaire = Equipe.objects.filter(sites_secondaires__in=sites_client)
+            sites_client = list(scope.site_ids or ())
 
             equipes_affectees_ids = set()
-            equipes_affectees_ids.update(equipes_via_principal.values_list('id', flat=True))
-            equipes_affectees_ids.update(equipes_via_secondaire.values_list('id', flat=True))
-
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {len(equipes_affectees_ids)} équipes affectées aux sites")
+            equipes_affectees_ids.update(
+                Equipe.objects.filter(site_principal_id__in=sites_client).values_list('id', flat=True)
+            )
+            equipes_affectees_ids.update(
+                Equipe.objects.filter(sites_secondaires__in=sites_client).values_list('id', flat=True)
+            )
 
             # 2. Opérateurs dont l'équipe a des tâches sur les sites du client
             taches_sur_sites_client = Tache.objects.filter(
-                objets__site__structure_client=client.structure
+                objets__site_id__in=sites_client
             ).distinct()
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {taches_sur_sites_client.count()} tâches sur les sites du client")
 
             # M2M relation
             equipes_ids_avec_taches = set()
@@ -367,26 +326,21 @@ class RoleBasedQuerySetMixin:
             equipes_ids_avec_taches.update(
                 taches_sur_sites_client.exclude(id_equipe__isnull=True).values_list('id_equipe', flat=True)
             )
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {len(equipes_ids_avec_taches)} équipes avec tâches")
 
             # Combiner tous les IDs d'équipes
             all_equipes_ids = equipes_affectees_ids | equipes_ids_avec_taches
             all_equipes_ids.discard(None)
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {len(all_equipes_ids)} équipes au total → {list(all_equipes_ids)}")
 
             if not all_equipes_ids:
-                logger.warning(f"[RoleBasedQuerySetMixin] Operateur: Aucune équipe trouvée pour ce client → queryset.none()")
                 return queryset.none()
 
-            filtered = queryset.filter(equipe__id__in=all_equipes_ids).distinct()
-            logger.info(f"[RoleBasedQuerySetMixin] Operateur: {filtered.count()} opérateurs après filtrage")
-            return filtered
+            return queryset.filter(equipe__id__in=all_equipes_ids).distinct()
 
         # Absences : Absences des opérateurs de ses équipes (via structure_client)
         if model_name == 'Absence':
-            absences_via_principal = Q(operateur__equipe__site_principal__structure_client=client.structure)
-            absences_via_secondaire = Q(operateur__equipe__sites_secondaires__structure_client=client.structure)
-            absences_legacy = Q(operateur__equipe__site__structure_client=client.structure)  # Legacy
+            absences_via_principal = Q(operateur__equipe__site_principal__structure_client=structure)
+            absences_via_secondaire = Q(operateur__equipe__sites_secondaires__structure_client=structure)
+            absences_legacy = Q(operateur__equipe__site__structure_client=structure)  # Legacy
             return queryset.filter(
                 absences_via_principal |
                 absences_via_secondaire |
@@ -400,11 +354,11 @@ class RoleBasedQuerySetMixin:
         # Objets GIS (15 types) : Objets sur ses sites (via structure_client)
         # Tous les objets GIS ont un champ 'site'
         if hasattr(queryset.model, 'site'):
-            return queryset.filter(site__structure_client=client.structure)
+            return queryset.filter(site__structure_client=structure)
 
         # Client : Son profil uniquement
         if model_name == 'Client':
-            return queryset.filter(pk=client.pk)
+            return queryset.filter(pk=scope.client_id)
 
         # Autres ressources : Aucun accès
         return queryset.none()
@@ -669,31 +669,10 @@ class Equipe(models.Model):
             str: COMPLETE, PARTIELLE ou INDISPONIBLE
         """
         from django.utils import timezone
-        today = timezone.now().date()
+        from .capacity import CapacityCalendar
 
-        membres = self.operateurs.filter(statut=StatutOperateur.ACTIF)
-        total = membres.count()
-
-        if total == 0:
-            return StatutEquipe.INDISPONIBLE
-
-        # Compte les membres disponibles (sans absence validée aujourd'hui)
-        disponibles = 0
-        for membre in membres:
-            absence_aujourdhui = membre.absences.filter(
-                statut=StatutAbsence.VALIDEE,
-                date_debut__lte=today,
-                date_fin__gte=today
-            ).exists()
-            if not absence_aujourdhui:
-                disponibles += 1
-
-        if disponibles == total:
-            return StatutEquipe.COMPLETE
-        elif disponibles > 0:
-            return StatutEquipe.PARTIELLE
-        else:
-            return StatutEquipe.INDISPONIBLE
+        today = timezone.now().date()
+        return CapacityCalendar([self.pk], today, today).statut_operationnel(self.pk, today)
 
     def save(self, *args, **kwargs):
         # Le chef d'équipe est une simple nomination, pas de validation de compétence requise
@@ -2,16 +2,44 @@
 Signals pour le module Utilisateurs
 
 - Notifications pour les absences (via Django Channels)
+- Invalidation du périmètre d'accès en cache (api_users/access_scope.py)
 """
 
 import logging
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Absence
+from .models import Absence, Client, Superviseur, Utilisateur, UtilisateurRole
 
 logger = logging.getLogger(__name__)
 
 
+# =============================================================================
+# INVALIDATION DU PÉRIMÈTRE D'ACCÈS
+# =============================================================================
+
+@receiver(post_save, sender=UtilisateurRole)
+@receiver(post_delete, sender=UtilisateurRole)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Superviseur)
+@receiver(post_delete, sender=Superviseur)
+def invalidate_access_scope_on_profile_change(sender, instance, **kwargs):
+    """Rôles ou profil client/superviseur modifiés → périmètre de l'utilisateur à recalculer."""
+    from greensig_web.cache_utils import invalidate_on_role_mutation
+    invalidate_on_role_mutation(instance.utilisateur_id)
+
+
+@receiver(post_save, sender=Utilisateur)
+def invalidate_access_scope_on_user_change(sender, instance, created, **kwargs):
+    """is_superuser peut avoir changé (sans effet à la création : aucun cache)."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and 'is_superuser' not in update_fields:
+        return  # ex: last_login à la connexion
+    if not created:
+        from greensig_web.cache_utils import invalidate_on_role_mutation
+        invalidate_on_role_mutation(instance.pk)
+
+
 # =============================================================================
 # NOTIFICATIONS ABSENCES
 # =============================================================================
@@ -628,7 +628,7 @@ class ClientViewSet(viewsets.ModelViewSet):
                 'bySite': []
             })
 
-        sites = Site.objects.filter(structure_client=client.structure).prefetch_related('objets')
+        sites = Site.objects.filter(structure_client=client.structure)
 
         if not sites.exists():
             return Response({
@@ -642,6 +642,16 @@ class ClientViewSet(viewsets.ModelViewSet):
         VEGETATION_TYPES = {'Arbre', 'Palmier', 'Gazon', 'Arbuste', 'Vivace', 'Cactus', 'Graminee'}
         HYDRAULIQUE_TYPES = {'Puit', 'Pompe', 'Vanne', 'Clapet', 'Ballon', 'Canalisation', 'Aspersion', 'Goutte'}
 
+        # Comptage groupé (site, type) en une requête grâce à Objet.type_objet
+        counts_by_site = defaultdict(lambda: defaultdict(int))
+        objets = Objet.objects.filter(site__in=sites)
+        for row in objets.exclude(type_objet='').values('site_id', 'type_objet').annotate(total=Count('id')):
+            counts_by_site[row['site_id']][row['type_objet']] += row['total']
+
+        # Objets pas encore backfillés : résolution groupée (une requête par type)
+        for enfant in objets.filter(type_objet='').resolve_children().values():
+            counts_by_site[enfant.site_id][enfant.__class__.__name__] += 1
+
         # Totaux globaux
         global_vegetation_counts = defaultdict(int)
         global_hydraulique_counts = defaultdict(int)
@@ -656,25 +666,20 @@ class ClientViewSet(viewsets.ModelViewSet):
             site_hydraulique = 0
             site_by_type = defaultdict(int)
 
-            # Compter les objets de ce site
-            objets = site.objets.all()
-
-            for obj in objets:
-                type_name = obj.get_nom_type()
-
+            for type_name, count in counts_by_site.get(site.id, {}).items():
                 if type_name in VEGETATION_TYPES:
                     type_key = type_name.lower()
-                    site_by_type[type_key] += 1
-                    site_vegetation += 1
-                    global_vegetation_counts[type_key] += 1
-                    global_total_vegetation += 1
+                    site_by_type[type_key] += count
+                    site_vegetation += count
+                    global_vegetation_counts[type_key] += count
+                    global_total_vegetation += count
 
                 elif type_name in HYDRAULIQUE_TYPES:
                     type_key = type_name.lower()
-                    site_by_type[type_key] += 1
-                    site_hydraulique += 1
-                    global_hydraulique_counts[type_key] += 1
-                    global_total_hydraulique += 1
+                    site_by_type[type_key] += count
+                    site_hydraulique += count
+                    global_hydraulique_counts[type_key] += count
+                    global_total_hydraulique += count
 
             # Ajouter les stats de ce site (seulement si le site a des objets)
             site_total = site_vegetation + site_hydraulique
@@ -1384,6 +1389,68 @@ class EquipeViewSet(RoleBasedQuerySetMixin, RoleBasedPermissionMixin, viewsets.M
         serializer = HistoriqueEquipeOperateurSerializer(historique, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def capacite(self, request):
+        """
+        Matrice de capacité (équipe, jour) pour la vue planning.
+
+        Horaires, jours fériés et absences validées sont chargés en un
+        nombre constant de requêtes pour toutes les équipes visibles.
+
+        Query params:
+        - date_debut: Date de début (format: YYYY-MM-DD)
+        - date_fin: Date de fin (format: YYYY-MM-DD, 92 jours au plus)
+        - equipe: IDs d'équipes séparés par des virgules (optionnel)
+        """
+        from datetime import datetime
+        from .capacity import CapacityCalendar
+
+        date_debut_str = request.query_params.get('date_debut')
+        date_fin_str = request.query_params.get('date_fin')
+        if not date_debut_str or not date_fin_str:
+            return Response(
+                {'error': 'Les paramètres date_debut et date_fin sont requis (format: YYYY-MM-DD).'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            date_debut = datetime.strptime(date_debut_str, '%Y-%m-%d').date()
+            date_fin = datetime.strptime(date_fin_str, '%Y-%m-%d').date()
+            equipe_ids = [int(pk) for pk in request.query_params.get('equipe', '').split(',') if pk.strip()]
+        except ValueError:
+            return Response(
+                {'error': 'Format invalide. Dates en YYYY-MM-DD, équipes en IDs séparés par des virgules.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if date_fin < date_debut or (date_fin - date_debut).days > 91:
+            return Response(
+                {'error': 'La plage doit être croissante et couvrir 92 jours au plus.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        equipes = self.filter_by_role(Equipe.objects.filter(actif=True))
+        if equipe_ids:
+            equipes = equipes.filter(id__in=equipe_ids)
+        equipes = dict(equipes.values_list('id', 'nom_equipe'))
+
+        calendrier = CapacityCalendar(equipes.keys(), date_debut, date_fin)
+        return Response({
+            'date_debut': date_debut_str,
+            'date_fin': date_fin_str,
+            'equipes': [
+                {
+                    'id': equipe_id,
+                    'nom_equipe': equipes[equipe_id],
+                    'jours': {
+                        jour.isoformat(): capacite.as_dict()
+                        for jour, capacite in jours.items()
+                    },
+                }
+                for equipe_id, jours in calendrier.matrice().items()
+            ],
+        })
+
 
 # ==============================================================================
 # VUES HORAIRE TRAVAIL (PHASE 2)
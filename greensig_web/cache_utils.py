@@ -16,6 +16,12 @@ Domaines :
   - REPORTING : statistiques globales (dashboard)
   - STATISTICS: inventaire des objets GIS
   - FILTERS   : options de filtrage dynamiques
+  - MAP       : réponses carte (/api/map/) et tuiles vectorielles
+  - ACCESS    : périmètre d'accès par utilisateur (api_users/access_scope.py)
+
+Le domaine MAP dispose en plus de compteurs **par site** : une modification
+d'objet n'invalide que les entrées carte couvrant le site concerné, au lieu
+de vider le cache de tous les clients.
 """
 
 import hashlib
@@ -37,8 +43,14 @@ VERSION_KEYS = {
     'REPORTING': 'cache_version:reporting',
     'STATISTICS': 'cache_version:statistics',
     'FILTERS': 'cache_version:filters',
+    'MAP': 'cache_version:map',
+    'ACCESS': 'cache_version:access',
 }
 
+# Compteur de version par site (domaine MAP)
+SITE_VERSION_KEY = 'cache_version:map:site:{site_id}'
+
+
 # ==============================================================================
 # TTL PAR DOMAINE (secondes)
 # ==============================================================================
@@ -49,6 +61,8 @@ CACHE_TTL = {
     'REPORTING': 300,    # 5 minutes
     'STATISTICS': 300,   # 5 minutes
     'FILTERS': 300,      # 5 minutes
+    'MAP': 3600,         # 1 heure (invalidation explicite par site)
+    'ACCESS': 3600,      # 1 heure (invalidation explicite par utilisateur)
 }
 
 
@@ -135,6 +149,42 @@ def invalidate(*domains: str):
             cache.set(key, 1, timeout=None)
 
 
+def get_site_versions(site_ids) -> dict:
+    """Retourne {site_id: version} pour les sites donnés (un seul MGET)."""
+    site_ids = sorted(set(site_ids))
+    if not site_ids:
+        return {}
+    keys = {SITE_VERSION_KEY.format(site_id=site_id): site_id for site_id in site_ids}
+    found = cache.get_many(list(keys.keys()))
+    return {site_id: found.get(key, 0) for key, site_id in keys.items()}
+
+
+def invalidate_sites(*site_ids):
+    """Incrémente la version MAP des sites donnés (invalidation ciblée).
+
+    Exemples:
+        invalidate_sites(12)
+        invalidate_sites(old_site_id, new_site_id)
+    """
+    for site_id in set(site_ids):
+        if site_id is None:
+            continue
+        key = SITE_VERSION_KEY.format(site_id=site_id)
+        version = cache.get(key)
+        cache.set(key, (version or 0) + 1, timeout=None)
+
+
+def invalidate_user_access(*user_ids):
+    """Supprime le périmètre d'accès en cache des utilisateurs donnés.
+
+    Exemples:
+        invalidate_user_access(42)
+    """
+    keys = [make_cache_key('ACCESS', user_id) for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
 def hash_params(params: dict) -> str:
     """Hash un dictionnaire de paramètres pour l'inclure dans une clé de cache."""
     params_str = json.dumps(params, sort_keys=True, default=str)
@@ -155,21 +205,40 @@ def invalidate_on_distribution_mutation():
     invalidate('TACHES', 'KPIS', 'REPORTING')
 
 
-def invalidate_on_reclamation_mutation():
-    """Appelé après create/update/delete d'une Réclamation."""
+def invalidate_on_reclamation_mutation(*site_ids):
+    """Appelé après create/update/delete d'une Réclamation.
+
+    Les site_ids (optionnels) invalident aussi la couche carte de ces sites.
+    """
     invalidate('KPIS', 'REPORTING')
+    invalidate_sites(*site_ids)
 
 
-def invalidate_on_gis_object_mutation():
-    """Appelé après create/update/delete d'un Objet GIS (Arbre, Gazon, Puits, etc.)."""
+def invalidate_on_gis_object_mutation(*site_ids):
+    """Appelé après create/update/delete d'un Objet GIS (Arbre, Gazon, Puits, etc.).
+
+    Les site_ids (site courant et éventuel ancien site) invalident uniquement
+    les entrées carte de ces sites.
+    """
     invalidate('STATISTICS', 'FILTERS')
+    invalidate_sites(*site_ids)
 
 
 def invalidate_on_site_mutation():
-    """Appelé après create/update/delete d'un Site ou SousSite."""
-    invalidate('STATISTICS', 'FILTERS', 'REPORTING')
+    """Appelé après create/update/delete d'un Site ou SousSite.
+
+    Emprise, affectation superviseur ou structure peuvent changer :
+    tout le domaine MAP est invalidé (les sites sont peu nombreux et peu modifiés),
+    ainsi que les périmètres d'accès (sites visibles de chaque utilisateur).
+    """
+    invalidate('STATISTICS', 'FILTERS', 'REPORTING', 'MAP', 'ACCESS')
 
 
 def invalidate_on_team_mutation():
     """Appelé après create/update/delete d'une Équipe, Opérateur ou Superviseur."""
-    invalidate('REPORTING')
+    invalidate('REPORTING', 'ACCESS')
+
+
+def invalidate_on_role_mutation(*user_ids):
+    """Appelé après modification des rôles ou du profil client/superviseur d'utilisateurs."""
+    invalidate_user_access(*user_ids)
@@ -1,7 +1,11 @@
 """
 Custom pagination classes for GreenSIG API.
 """
+import base64
+
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -19,3 +23,131 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size = 100000
     page_size_query_param = 'page_size'
     max_page_size = None
+
+
+class KeysetPagination:
+    """
+    Pagination par curseur (keyset) sur la clé primaire.
+
+    Au lieu d'un OFFSET (coût proportionnel au numéro de page), chaque page est
+    obtenue par `WHERE pk > dernier_id ORDER BY pk LIMIT n`, ce qui reste en
+    temps constant grâce à l'index de clé primaire.
+
+    Conserve le contrat {count, next, previous, results} de PageNumberPagination :
+    - next / previous : URLs contenant un curseur opaque (?cursor=...)
+    - ?page=N reste accepté (repli OFFSET) pour les liens existants du frontend
+
+    Le paginateur ne travaille que sur des IDs : la vue charge ensuite
+    elle-même les instances de la page.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_query_param = 'page'
+
+    def paginate_queryset_ids(self, queryset, request, count):
+        """
+        Retourne la liste ordonnée des PKs de la page demandée.
+
+        Args:
+            queryset: QuerySet non ordonné (ordonné ici par pk)
+            request: Requête DRF
+            count: Nombre total de résultats (calculé/caché par l'appelant)
+        """
+        self.request = request
+        self.count = count
+        self.page_size = self.get_page_size(request)
+        self.has_next = False
+        self.has_previous = False
+        self.page_number = None
+
+        direction, position = self.decode_cursor(request)
+        ids_qs = queryset.values_list('pk', flat=True)
+
+        if direction == 'b':
+            # Page précédente : on lit à rebours puis on remet dans l'ordre
+            ids = list(ids_qs.filter(pk__lt=position).order_by('-pk')[:self.page_size + 1])
+            self.has_previous = len(ids) > self.page_size
+            ids = ids[:self.page_size]
+            ids.reverse()
+            self.has_next = True
+        elif direction == 'a':
+            ids = list(ids_qs.filter(pk__gt=position).order_by('pk')[:self.page_size + 1])
+            self.has_next = len(ids) > self.page_size
+            ids = ids[:self.page_size]
+            self.has_previous = True
+        else:
+            # Repli ?page=N : OFFSET sur un parcours d'index (IDs uniquement)
+            try:
+                self.page_number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+            except (TypeError, ValueError):
+                self.page_number = 1
+            offset = (self.page_number - 1) * self.page_size
+            ids = list(ids_qs.order_by('pk')[offset:offset + self.page_size + 1])
+            self.has_next = len(ids) > self.page_size
+            ids = ids[:self.page_size]
+            self.has_previous = self.page_number > 1
+
+        self.page_ids = ids
+        return ids
+
+    def get_paginated_response(self, results):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': results,
+        })
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                size = int(value)
+                if size > 0:
+                    return min(size, self.max_page_size) if self.max_page_size else size
+            except ValueError:
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page_ids:
+            return None
+        return self._build_link('a', self.page_ids[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page_number is not None or not self.page_ids:
+            # Mode ?page=N : lien vers la page précédente classique
+            url = self.request.build_absolute_uri()
+            url = remove_query_param(url, self.cursor_query_param)
+            if self.page_number and self.page_number - 1 > 1:
+                return replace_query_param(url, self.page_query_param, self.page_number - 1)
+            return remove_query_param(url, self.page_query_param)
+        return self._build_link('b', self.page_ids[0])
+
+    def _build_link(self, direction, position):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(direction, position))
+
+    @staticmethod
+    def encode_cursor(direction, position):
+        raw = f'{direction}:{position}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        """Retourne (direction, position) ou (None, None) si absent/invalide."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            direction, position = base64.urlsafe_b64decode(padded).decode().split(':', 1)
+            if direction not in ('a', 'b'):
+                return None, None
+            return direction, int(position)
+        except (ValueError, UnicodeDecodeError):
+            return None, None
@@ -318,4 +318,43 @@ CACHES = {
 # Durées de cache spécifiques (en secondes)
 CACHE_TIMEOUT_STATISTICS = 5 * 60  # 5 minutes pour les statistiques
 CACHE_TIMEOUT_MAP_DATA = 2 * 60    # 2 minutes pour les données de carte
-CACHE_TIMEOUT_USER_PERMS = 10 * 60  # 10 minutes pour les permissions utilisateur
\ No newline at end of file
+CACHE_TIMEOUT_USER_PERMS = 10 * 60  # 10 minutes pour les permissions utilisateur
+# ==============================================================================
+# CARTE (/api/map/) : généralisation selon le zoom
+# ==============================================================================
+# En dessous de ce zoom, les couches ponctuelles sont renvoyées en clusters
+MAP_CLUSTER_MAX_ZOOM = config('MAP_CLUSTER_MAX_ZOOM', default=16, cast=int)
+# Taille d'une cellule de clustering (en pixels écran)
+MAP_CLUSTER_RADIUS_PX = config('MAP_CLUSTER_RADIUS_PX', default=60, cast=int)
+# En dessous de ce zoom, polygones et lignes sont simplifiés
+MAP_SIMPLIFY_MAX_ZOOM = config('MAP_SIMPLIFY_MAX_ZOOM', default=18, cast=int)
+
+# ==============================================================================
+# KPIs : table de cumuls mensuels (KPIMensuel)
+# ==============================================================================
+# Âge maximal (secondes) des cumuls du mois en cours avant recalcul à la lecture
+KPI_ROLLUP_CURRENT_MONTH_TTL = config('KPI_ROLLUP_CURRENT_MONTH_TTL', default=300, cast=int)
+
+# ==============================================================================
+# SYNCHRONISATION DIFFÉRENTIELLE (/api/planification/taches/sync/)
+# ==============================================================================
+# Lignes du journal SyncChange renvoyées au plus par appel
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+# Délai (secondes) avant qu'une modification soit lisible par curseur
+SYNC_CURSOR_LAG_SECONDS = config('SYNC_CURSOR_LAG_SECONDS', default=2, cast=int)
+# Rétention du journal ; un curseur plus ancien impose un rechargement complet
+SYNC_JOURNAL_RETENTION_DAYS = config('SYNC_JOURNAL_RETENTION_DAYS', default=30, cast=int)
+
+# ==============================================================================
+# NOTIFICATIONS : rétention (archivage des notifications lues)
+# ==============================================================================
+# Âge (jours) au-delà duquel une notification lue est déplacée dans NotificationArchive
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+# Notifications déplacées par requête (un lot = une transaction)
+NOTIFICATION_ARCHIVE_BATCH_SIZE = config('NOTIFICATION_ARCHIVE_BATCH_SIZE', default=5000, cast=int)
+
+# ==============================================================================
+# RAPPORTS DE SITE : snapshots mensuels (RapportMensuel)
+# ==============================================================================
+# Âge maximal (secondes) d'un snapshot de mois encore ouvert avant recalcul à la lecture
+REPORT_SNAPSHOT_TTL = config('REPORT_SNAPSHOT_TTL', default=6 * 3600, cast=int)